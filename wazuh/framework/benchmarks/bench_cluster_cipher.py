@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Benchmark of the ciphers used to encrypt the messages between cluster nodes. Each message is built with
+# `Handler.msg_build` in one node and parsed and decrypted with `Handler.data_received` in its peer, as it happens when
+# they are sent through the network.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_cluster_cipher.py
+#  - `--total` MB are sent in messages of `--message-size` KB with each cipher in `--ciphers`. Messages bigger than
+#    the cluster request chunk (5 MB) are divided.
+#  - The throughput and the CPU seconds used per GB sent are shown for each cipher.
+#  - The script fails if AES-GCM does not use at least `--min-speedup` times less CPU than Fernet.
+
+import argparse
+import os
+import time
+
+from wazuh.core.cluster import common as c_common
+
+FERNET_KEY = '0' * 32
+
+
+def run(ciphers: list, total: int, message_size: int, min_speedup: float):
+    data = os.urandom(message_size * 2 ** 10)
+    n_messages = total * 2 ** 20 // len(data)
+    results = {}
+    received = []
+
+    print(f"{'Cipher':>10}{'Messages':>10}{'Time (s)':>10}{'MB/s':>10}{'CPU s/GB':>10}")
+    for cipher in ciphers:
+        master_handler = c_common.Handler(FERNET_KEY, {})
+        worker_handler = c_common.Handler(FERNET_KEY, {})
+        if cipher == 'aes-gcm':
+            salt = os.urandom(16)
+            worker_handler.setup_cipher(salt, is_master=False)
+            master_handler.setup_cipher(salt, is_master=True)
+        master_handler.cipher = worker_handler.cipher = cipher
+        worker_handler.dispatch = lambda command, counter, payload: received.append(len(payload))
+
+        start, start_cpu = time.perf_counter(), time.process_time()
+        for counter in range(n_messages):
+            for buffer in master_handler.msg_build(b'bench', counter, data):
+                worker_handler.data_received(buffer)
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+        assert received == [len(data)] * n_messages
+        received.clear()
+
+        size = n_messages * len(data) / 2 ** 20
+        results[cipher] = cpu / size * 2 ** 10
+        print(f'{cipher:>10}{n_messages:>10}{elapsed:>10.2f}{size / elapsed:>10.1f}{results[cipher]:>10.2f}')
+
+    if 'fernet' in results and 'aes-gcm' in results:
+        speedup = results['fernet'] / results['aes-gcm']
+        print(f'AES-GCM uses {speedup:.1f} times less CPU than Fernet')
+        assert speedup >= min_speedup, f'AES-GCM speedup {speedup:.1f} is lower than {min_speedup}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cluster message encryption benchmark')
+    parser.add_argument('--ciphers', nargs='+', default=c_common.CIPHERS, choices=c_common.CIPHERS,
+                        help='Ciphers to benchmark')
+    parser.add_argument('--total', type=int, default=1024, help='Data sent with each cipher, in MB')
+    parser.add_argument('--message-size', type=int, default=1024, help='Size of each message, in KB')
+    parser.add_argument('--min-speedup', type=float, default=2,
+                        help='Minimum ratio between the CPU used by Fernet and AES-GCM')
+    args = parser.parse_args()
+
+    run(args.ciphers, args.total, args.message_size, args.min_speedup)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Profiling of the framing of the messages sent between cluster nodes. `--total` MB are sent from one
+# `wazuh.core.cluster.common.Handler` to another in the same process: the buffers passed by `msg_build` to the
+# transport are delivered to `data_received` of the peer in reads of `--read-size` KB, as a socket would do.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_cluster_framing.py
+#  - Messages of `--message-size` KB are encrypted with `--cipher`. Messages bigger than the cluster request chunk
+#    (5 MB) are divided.
+#  - The allocations made while sending are reported per MB sent: the traced memory above the size of the message
+#    (the encrypted copy, the received payload and so on) and the minor page faults, which are caused by every new
+#    large buffer. The memory of the simulated socket reads is counted too.
+#  - The script fails if the traced memory per MB is higher than `--max-overhead`.
+
+import argparse
+import os
+import resource
+import time
+import tracemalloc
+
+from wazuh.core.cluster import common as c_common
+
+FERNET_KEY = '0' * 32
+
+
+class PeerTransport:
+    """Transport that delivers the written buffers to the peer handler in reads of a fixed size."""
+
+    def __init__(self, peer: c_common.Handler, read_size: int):
+        self.peer = peer
+        self.read_size = read_size
+
+    def writelines(self, buffers):
+        for buffer in buffers:
+            with memoryview(buffer) as view:
+                for offset in range(0, len(view), self.read_size):
+                    self.peer.data_received(bytes(view[offset:offset + self.read_size]))
+
+
+def run(total: int, message_size: int, read_size: int, cipher: str, max_overhead: float):
+    data = os.urandom(message_size * 2 ** 10)
+    n_messages = total * 2 ** 20 // len(data)
+    received = []
+
+    master_handler = c_common.Handler(FERNET_KEY, {})
+    worker_handler = c_common.Handler(FERNET_KEY, {})
+    if cipher == 'aes-gcm':
+        salt = os.urandom(16)
+        worker_handler.setup_cipher(salt, is_master=False)
+        master_handler.setup_cipher(salt, is_master=True)
+    master_handler.cipher = worker_handler.cipher = cipher
+    master_handler.transport = PeerTransport(worker_handler, read_size * 2 ** 10)
+    worker_handler.dispatch = lambda command, counter, payload: received.append(len(payload))
+
+    tracemalloc.start()
+    overhead = 0
+    start_faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    start, start_cpu = time.perf_counter(), time.process_time()
+    for counter in range(n_messages):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        master_handler.push(master_handler.msg_build(b'bench', counter, data))
+        overhead = max(overhead, tracemalloc.get_traced_memory()[1] - current)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - start_faults
+    tracemalloc.stop()
+
+    assert received == [len(data)] * n_messages
+    size = n_messages * len(data) / 2 ** 20
+    overhead_per_mb = overhead / len(data)
+    print(f'Sent {size:.0f} MB in {n_messages} messages of {message_size} KB with {cipher}')
+    print(f'Time: {elapsed:.2f} s | {size / elapsed:.1f} MB/s | CPU: {cpu / size * 2 ** 10:.2f} s/GB')
+    print(f'Peak traced memory per MB of message: {overhead_per_mb:.2f} MB')
+    print(f'Minor page faults per MB sent: {faults / size:.1f}')
+    assert overhead_per_mb <= max_overhead, \
+        f'Peak traced memory per MB {overhead_per_mb:.2f} is higher than {max_overhead}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cluster message framing profiling')
+    parser.add_argument('--total', type=int, default=1024, help='Data sent, in MB')
+    parser.add_argument('--message-size', type=int, default=16384, help='Size of each message, in KB')
+    parser.add_argument('--read-size', type=int, default=256, help='Size of each simulated socket read, in KB')
+    parser.add_argument('--cipher', default='aes-gcm', choices=c_common.CIPHERS, help='Cipher of the messages')
+    parser.add_argument('--max-overhead', type=float, default=4,
+                        help='Maximum peak traced memory per MB of message, in MB')
+    args = parser.parse_args()
+
+    run(args.total, args.message_size, args.read_size, args.cipher, args.max_overhead)
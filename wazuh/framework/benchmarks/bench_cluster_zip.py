@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Benchmark of `wazuh.core.cluster.cluster.decompress_files`, used to unpack the zips received from other cluster nodes.
+# It checks that the time grows linearly with the size of the zip and that the memory used does not depend on it.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_cluster_zip.py
+#  - A zip with a mix of small files (4 KB - 256 KB) and large ones (64 MB) is created with `compress_files` for each
+#    size in `--sizes`, in MB, e.g. `--sizes 256 512 1024`. Half of the bytes are in small files and half of the
+#    content of each file is random.
+#  - The peak anonymous RSS is sampled while decompressing. The page cache used by the memory-mapped zip is not
+#    counted, as the kernel can reclaim it at any time.
+#  - The script fails if the throughput of any size is more than `--tolerance` times lower than the best one or if the
+#    RSS grows more than `--max-rss` MB.
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from wazuh.core.cluster import cluster
+
+LARGE_FILE_SIZE = 64 * 2 ** 20
+
+
+def get_anon_rss() -> int:
+    """Get the anonymous RSS of the process, in bytes."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class RSSSampler(threading.Thread):
+    """Thread that keeps the peak anonymous RSS of the process while it runs."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = get_anon_rss()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(0.005):
+            self.peak = max(self.peak, get_anon_rss())
+
+    def stop(self) -> int:
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+def create_files(wazuh_path: str, size: int, rng: random.Random) -> list:
+    """Create files under `etc/shared` adding up to `size` bytes, half of them in large files, and get their paths."""
+    files = []
+    os.makedirs(os.path.join(wazuh_path, 'etc', 'shared'), exist_ok=True)
+    sizes = [LARGE_FILE_SIZE] * (size // 2 // LARGE_FILE_SIZE)
+    while (written := sum(sizes)) < size:
+        sizes.append(min(size - written, rng.randint(4096, 262144)))
+    rng.shuffle(sizes)
+
+    for file_size in sizes:
+        relative_path = os.path.join('etc', 'shared', f'file{len(files)}')
+        with open(os.path.join(wazuh_path, relative_path), 'wb') as f:
+            for offset in range(0, file_size, 2 ** 20):
+                chunk = min(2 ** 20, file_size - offset)
+                f.write(os.urandom(chunk // 2) + bytes(chunk - chunk // 2))
+        files.append(relative_path)
+    return files
+
+
+def run(sizes: list, tolerance: float, max_rss: int, seed: int):
+    rng = random.Random(seed)
+    cluster_items = {'intervals': {'communication': {'compress_level': 1, 'compress_pool_size': 1,
+                                                     'max_zip_size': 2 ** 40}}}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir, patch('wazuh.core.common.WAZUH_PATH', new=tmp_dir), \
+            patch('wazuh.core.cluster.cluster.get_cluster_items', return_value=cluster_items):
+        print(f"{'Size (MB)':>10}{'Files':>8}{'Zip (MB)':>10}{'Time (s)':>10}{'MB/s':>10}{'RSS (MB)':>10}")
+        for size in sizes:
+            files = create_files(tmp_dir, size * 2 ** 20, rng)
+            zip_path, _ = cluster.compress_files('worker1', files, {'missing': {}})
+            zip_size = os.path.getsize(zip_path)
+            shutil.rmtree(os.path.join(tmp_dir, 'etc'))
+
+            sampler = RSSSampler()
+            baseline = sampler.peak
+            sampler.start()
+            start = time.perf_counter()
+            ko_files, zip_dir = cluster.decompress_files(zip_path)
+            elapsed = time.perf_counter() - start
+            rss = (sampler.stop() - baseline) / 2 ** 20
+
+            assert ko_files == {'missing': {}}
+            assert sum(os.path.getsize(os.path.join(zip_dir, f)) for f in files) == size * 2 ** 20
+            shutil.rmtree(zip_dir)
+            results.append((size, size / elapsed, rss))
+            print(f'{size:>10}{len(files):>8}{zip_size / 2 ** 20:>10.1f}{elapsed:>10.2f}{size / elapsed:>10.1f}'
+                  f'{rss:>10.1f}')
+
+    best = max(throughput for _, throughput, _ in results)
+    for size, throughput, rss in results:
+        assert best / throughput <= tolerance, f'{size} MB: {throughput:.1f} MB/s is not linear (best {best:.1f} MB/s)'
+        assert rss <= max_rss, f'{size} MB: RSS grew {rss:.1f} MB (max {max_rss} MB)'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cluster zip decompression benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[256, 512, 1024], help='Sizes of the zips, in MB')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='Maximum ratio between the best throughput and the throughput of any size')
+    parser.add_argument('--max-rss', type=int, default=64, help='Maximum RSS growth while decompressing, in MB')
+    parser.add_argument('--seed', type=int, default=0, help='Seed used to choose the size of the files')
+    args = parser.parse_args()
+
+    run(args.sizes, args.tolerance, args.max_rss, args.seed)
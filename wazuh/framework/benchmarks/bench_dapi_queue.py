@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Benchmark of the latency of the requests forwarded to the master through
+# `wazuh.core.cluster.dapi.dapi.APIRequestQueue` when some nodes send slow requests.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_dapi_queue.py
+#  - `--slow-nodes` nodes send requests that take `--slow-time` ms each, and `--fast-nodes` nodes send requests that
+#    take 1 ms, `--requests` in total. The processing of the requests is simulated with a sleep.
+#  - The requests are processed once one at a time, as the queue did before, and once with the limits of `--max` and
+#    `--max-per-node` in-flight requests. The latency percentiles of the fast requests are shown, in milliseconds.
+
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+from wazuh.core.cluster.dapi import dapi
+
+
+class BenchRequestQueue(dapi.APIRequestQueue):
+    """Queue that simulates the processing time of each request and keeps the latency of the fast ones."""
+
+    def __init__(self, max_in_flight: int, max_in_flight_per_node: int, slow_time: float):
+        with patch('wazuh.core.cluster.utils.get_cluster_items',
+                   return_value={'distributed_api': {'max_in_flight_requests': max_in_flight,
+                                                     'max_in_flight_requests_per_node': max_in_flight_per_node}}):
+            super().__init__(server=None)
+        self.slow_time = slow_time
+        self.latencies = []
+        self.done = asyncio.Event()
+        self.pending_requests = 0
+
+    async def process_request(self, names, request):
+        sent_time = float(request.split(' ')[1])
+        await asyncio.sleep(self.slow_time if request.startswith('slow') else 0.001)
+        if request.startswith('fast'):
+            self.latencies.append((time.perf_counter() - sent_time) * 1000)
+        self.pending_requests -= 1
+        if not self.pending_requests:
+            self.done.set()
+
+
+async def send_requests(request_queue: BenchRequestQueue, n_requests: int, slow_nodes: int, fast_nodes: int):
+    """Send the requests of every node in turns and wait until all of them are processed."""
+    run_task = asyncio.create_task(request_queue.run())
+    request_queue.pending_requests = n_requests
+    nodes = [f'slow{i}' for i in range(slow_nodes)] + [f'fast{i}' for i in range(fast_nodes)]
+    for i in range(n_requests):
+        node = nodes[i % len(nodes)]
+        request_queue.add_request(f'{node}*{i} {node[:4]} {time.perf_counter()}'.encode())
+        await asyncio.sleep(0.0005)
+    await request_queue.done.wait()
+    run_task.cancel()
+
+
+async def run(n_requests: int, slow_nodes: int, fast_nodes: int, slow_time: int, max_in_flight: int,
+              max_in_flight_per_node: int):
+    print(f"{'Max':>6}{'Per node':>10}{'Time (s)':>10}{'p50 (ms)':>10}{'p90 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}")
+    for limits in ((1, 1), (max_in_flight, max_in_flight_per_node)):
+        request_queue = BenchRequestQueue(*limits, slow_time=slow_time / 1000)
+        start = time.perf_counter()
+        await send_requests(request_queue, n_requests, slow_nodes, fast_nodes)
+        elapsed = time.perf_counter() - start
+
+        percentiles = statistics.quantiles(request_queue.latencies, n=100)
+        print(f'{limits[0]:>6}{limits[1]:>10}{elapsed:>10.2f}{percentiles[49]:>10.1f}{percentiles[89]:>10.1f}'
+              f'{percentiles[98]:>10.1f}{max(request_queue.latencies):>10.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed API request queue benchmark')
+    parser.add_argument('--requests', type=int, default=2000, help='Number of requests sent')
+    parser.add_argument('--slow-nodes', type=int, default=1, help='Number of nodes sending slow requests')
+    parser.add_argument('--fast-nodes', type=int, default=3, help='Number of nodes sending fast requests')
+    parser.add_argument('--slow-time', type=int, default=50, help='Processing time of the slow requests, in ms')
+    parser.add_argument('--max', type=int, default=16, help='Maximum number of requests in flight')
+    parser.add_argument('--max-per-node', type=int, default=4, help='Maximum number of requests in flight per node')
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests, args.slow_nodes, args.fast_nodes, args.slow_time, args.max, args.max_per_node))
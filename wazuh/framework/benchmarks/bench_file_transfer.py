@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Benchmark of `wazuh.core.cluster.common.Handler.send_file`, used to send the integrity zips between cluster nodes. It
+# compares the throughput of the stop-and-wait transfer (`file_transfer_window` 1) with the windowed one.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_file_transfer.py
+#  - Two cluster handlers are connected through a localhost TCP socket. Every write is delayed half of the `--latency`
+#    RTT, in milliseconds, e.g. `--latency 1 20 80` to simulate nodes in the same datacenter or in other regions.
+#  - Use `--windows` to choose the window sizes to compare and `--size` to choose the size of the file, in MB.
+#  - Use `--chunk` to change the maximum size of each request (`Handler.request_chunk`), in bytes.
+
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from wazuh.core.cluster.common import Handler
+
+FERNET_KEY = '0' * 32
+
+
+class DelayedTransport:
+    """Transport wrapper that delivers each write after a fixed delay, keeping the order of the writes."""
+
+    def __init__(self, transport: asyncio.Transport, delay: float):
+        self.transport = transport
+        self.delay = delay
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.deliver())
+
+    async def deliver(self):
+        while True:
+            deliver_at, data = await self.queue.get()
+            await asyncio.sleep(deliver_at - time.monotonic())
+            self.transport.write(data)
+
+    def write(self, data: bytes):
+        self.queue.put_nowait((time.monotonic() + self.delay, bytes(data)))
+
+    def close(self):
+        self.task.cancel()
+        self.transport.close()
+
+
+class BenchmarkHandler(Handler):
+    """Cluster handler whose outgoing messages are delayed and whose received files are written in `output_dir`."""
+
+    def __init__(self, cluster_items: dict, delay: float, output_dir: str):
+        super().__init__(fernet_key=FERNET_KEY, cluster_items=cluster_items, tag='Benchmark')
+        self.delay = delay
+        self.output_dir = output_dir
+
+    def connection_made(self, transport):
+        self.transport = DelayedTransport(transport, self.delay)
+
+    def receive_file(self, data: bytes):
+        self.in_file[data] = {'fd': open(os.path.join(self.output_dir, os.path.basename(data.decode())), 'wb'),
+                              'checksum': hashlib.sha256(), 'received': 0}
+        return b'ok ', b'Ready to receive new file'
+
+
+async def transfer(path: str, output_dir: str, window: int, delay: float, request_chunk: int = None) -> float:
+    """Get the time, in seconds, to send a file with the given window and one-way delay."""
+    cluster_items = {'intervals': {'communication': {'timeout_cluster_request': 60, 'file_transfer_window': window}}}
+    loop = asyncio.get_running_loop()
+    receiver = None
+
+    def receiver_factory():
+        nonlocal receiver
+        receiver = BenchmarkHandler(cluster_items, delay, output_dir)
+        return receiver
+
+    server = await loop.create_server(receiver_factory, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    _, sender = await loop.create_connection(lambda: BenchmarkHandler(cluster_items, delay, output_dir),
+                                             '127.0.0.1', port)
+    if request_chunk:
+        sender.request_chunk = request_chunk
+
+    start = time.perf_counter()
+    await sender.send_file(path)
+    elapsed = time.perf_counter() - start
+
+    sender.transport.close()
+    receiver.transport.close()
+    server.close()
+    await server.wait_closed()
+    return elapsed
+
+
+def run(size: int, latencies: list, windows: list, repeat: int, request_chunk: int = None):
+    with tempfile.TemporaryDirectory() as tmp_dir, patch('wazuh.core.common.WAZUH_PATH', new=tmp_dir):
+        path = os.path.join(tmp_dir, 'file.zip')
+        output_dir = os.path.join(tmp_dir, 'received')
+        os.mkdir(output_dir)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size * 2 ** 20))
+
+        print(f"{'RTT (ms)':>9}" + ''.join(f"{f'window {w} (MB/s)':>18}" for w in windows))
+        for latency in latencies:
+            row = f'{latency:>9.1f}'
+            for window in windows:
+                elapsed = min(asyncio.run(transfer(path, output_dir, window, latency / 2000, request_chunk)) for _ in range(repeat))
+                assert os.path.getsize(os.path.join(output_dir, 'file.zip')) == size * 2 ** 20
+                row += f'{size / elapsed:>18.2f}'
+            print(row)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cluster file transfer benchmark')
+    parser.add_argument('--size', type=int, default=64, help='Size of the file to send, in MB')
+    parser.add_argument('--latency', type=float, nargs='+', default=[1, 20, 80], help='RTT to simulate, in ms')
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 4, 8, 16], help='Window sizes to compare')
+    parser.add_argument('--chunk', type=int, help='Maximum size of each request, in bytes (default: 5 MB)')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of repetitions of each transfer')
+    args = parser.parse_args()
+
+    run(args.size, args.latency, args.windows, args.repeat, args.chunk)
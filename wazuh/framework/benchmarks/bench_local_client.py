@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Benchmark of the latency of the requests sent by the API to the cluster's local server with
+# `wazuh.core.cluster.local_client.LocalClient.execute`, with and without the pool of persistent connections.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_local_client.py
+#  - A local server is started in this process, in a temporary directory, and `--requests` 'get_config' requests are
+#    sent to it by `--concurrency` concurrent clients. The local server of a running node is not used.
+#  - The requests are sent once with pooling disabled and once with a pool of `--pool-size` connections. The latency
+#    percentiles of each run are shown, in milliseconds.
+
+import argparse
+import asyncio
+import copy
+import logging
+import os
+import statistics
+import tempfile
+import time
+import types
+from unittest.mock import patch
+
+import uvloop
+
+from wazuh.core.cluster import local_client, local_server
+from wazuh.core.cluster.utils import get_cluster_items
+
+CONFIGURATION = {'name': 'wazuh', 'node_name': 'master-node', 'node_type': 'master', 'disabled': False}
+
+
+async def send_requests(n_requests: int, concurrency: int) -> list:
+    """Send 'get_config' requests to the local server and get the latency of each one, in milliseconds."""
+    latencies = []
+
+    async def client_task(n):
+        for _ in range(n):
+            start = time.perf_counter()
+            await local_client.LocalClient().execute(b'get_config', b'')
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(client_task(n_requests // concurrency) for _ in range(concurrency)))
+    return latencies
+
+
+async def run(n_requests: int, concurrency: int, pool_size: int):
+    cluster_items = get_cluster_items()
+    server = local_server.LocalServer(node=types.SimpleNamespace(), performance_test=0, concurrency_test=0,
+                                      configuration=CONFIGURATION, cluster_items=cluster_items, enable_ssl=False,
+                                      logger=logging.getLogger('wazuh'))
+    server_task = asyncio.create_task(server.start())
+    while not os.path.exists(os.path.join(local_client.common.WAZUH_PATH, 'queue', 'cluster', 'c-internal.sock')):
+        await asyncio.sleep(0.01)
+
+    print(f"{'Pool size':>10}{'Requests':>10}{'req/s':>10}{'p50 (ms)':>10}{'p90 (ms)':>10}{'p99 (ms)':>10}"
+          f"{'max (ms)':>10}")
+    for size in (0, pool_size):
+        items = copy.deepcopy(cluster_items)
+        items['distributed_api']['local_client_pool_size'] = size
+        with patch('wazuh.core.cluster.utils.get_cluster_items', return_value=items):
+            # Warm up the event loop and the pool.
+            await send_requests(concurrency, concurrency)
+            start = time.perf_counter()
+            latencies = await send_requests(n_requests, concurrency)
+            elapsed = time.perf_counter() - start
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f'{size:>10}{len(latencies):>10}{len(latencies) / elapsed:>10.0f}{percentiles[49]:>10.2f}'
+              f'{percentiles[89]:>10.2f}{percentiles[98]:>10.2f}{max(latencies):>10.2f}')
+
+    server_task.cancel()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local client latency benchmark')
+    parser.add_argument('--requests', type=int, default=10000, help='Number of requests sent in each run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent clients')
+    parser.add_argument('--pool-size', type=int, default=8, help='Size of the pool of connections')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, patch('wazuh.core.common.WAZUH_PATH', new=tmp_dir), \
+            patch('wazuh.core.cluster.utils.read_config', return_value=CONFIGURATION):
+        os.makedirs(os.path.join(tmp_dir, 'queue', 'cluster'))
+        uvloop.install()
+        asyncio.run(run(args.requests, args.concurrency, args.pool_size))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Micro-benchmark of `wazuh.core.utils.process_array`, the helper used by the rules, decoders, lists, groups and MITRE
+# endpoints to search, filter, sort, select and paginate in-memory results.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_process_array.py
+#  - Use `--sizes` to choose the number of synthetic elements, e.g. `--sizes 10000 100000 1000000`.
+#  - Use `--columnar` to process a `ColumnarTable` built from the same elements instead of the list of dictionaries.
+
+import argparse
+import random
+import time
+
+from wazuh.core.columnar import ColumnarTable
+from wazuh.core.utils import process_array
+
+SCENARIOS = {
+    'sort + page': dict(sort_by=['level', 'description'], offset=0, limit=500),
+    'sort desc + deep page': dict(sort_by=['id'], sort_ascending=False, offset=5000, limit=500),
+    'q + sort + page': dict(q='level>5;groups~web,status=disabled', sort_by=['id'], offset=0, limit=500),
+    'search + select': dict(search_text='sshd', select=['id', 'description'],
+                            allowed_select_fields=['id', 'description'], offset=0, limit=500),
+    'select + distinct': dict(select=['level', 'status'], allowed_select_fields=['level', 'status'], distinct=True,
+                              offset=0, limit=500),
+}
+
+
+def generate_rules(n: int, seed: int = 0) -> list:
+    """Generate `n` synthetic rule-like dictionaries."""
+    rng = random.Random(seed)
+    programs = ['sshd', 'sudo', 'apache', 'nginx', 'pam', 'syslog', 'windows', 'audit']
+    groups = ['web', 'authentication_failed', 'syslog', 'ids', 'attack', 'pci_dss']
+    return [{'id': i,
+             'level': rng.randint(0, 15),
+             'status': 'enabled' if rng.random() > 0.1 else 'disabled',
+             'description': f'{rng.choice(programs)} event number {rng.randint(0, 10 ** 6)}',
+             'groups': rng.sample(groups, 2),
+             'filename': f'{rng.randint(0, 200):04}-rules.xml'}
+            for i in range(n)]
+
+
+def run(sizes: list, repeat: int, columnar: bool = False):
+    print(f"{'elements':>10}  {'scenario':<24}{'best (ms)':>12}{'mean (ms)':>12}")
+    for size in sizes:
+        array = generate_rules(size)
+        if columnar:
+            start = time.perf_counter()
+            array = ColumnarTable.from_dicts(array)
+            print(f'{size:>10}  {"build table":<24}{(time.perf_counter() - start) * 1000:>12.2f}')
+        for name, kwargs in SCENARIOS.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                process_array(array, **kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f'{size:>10}  {name:<24}{min(timings):>12.2f}{sum(timings) / len(timings):>12.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='process_array micro-benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Number of synthetic elements of each run')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions of each scenario')
+    parser.add_argument('--columnar', action='store_true', help='Use the columnar representation')
+    args = parser.parse_args()
+
+    run(args.sizes, args.repeat, args.columnar)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Benchmark of the agent queries whose RBAC filter does not fit in a wazuh-db query. `WazuhDBQuery.oversized_run` fetches
+# every agent ID and filters them in Python, while the compressed filter resolves the query in the database.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_rbac_filter.py
+#  - An in-memory SQLite database is used instead of wazuh-db, so only the cost of the queries and their processing is
+#    measured. Use `--sizes` to choose the number of synthetic agents, e.g. `--sizes 50000 200000`.
+
+import argparse
+import random
+import sqlite3
+import time
+from unittest.mock import patch
+
+from wazuh.core import common
+from wazuh.core.agent import WazuhDBQueryAgents, get_rbac_filters
+from wazuh.core.utils import get_id_ranges
+
+SCENARIOS = {
+    'all but 1%': lambda ids, rng: [i for i in ids if rng.random() > 0.01],
+    'half, contiguous': lambda ids, rng: ids[:len(ids) // 2],
+    'groups of 100': lambda ids, rng: [i for block in range(0, len(ids), 100) if rng.random() < 0.4
+                                       for i in ids[block:block + 100]],
+    'random 40%': lambda ids, rng: [i for i in ids if rng.random() < 0.4],
+}
+
+
+class SQLiteConnection:
+    """Replacement of `WazuhDBConnection` that runs the queries in an in-memory SQLite database."""
+    db = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def execute(self, query: str, count: bool = False, date_fields: set = None):
+        cursor = self.db.execute(query.split(' ', 2)[2])
+        return cursor.fetchone()[0] if count else [dict(zip(('id', 'name'), row)) for row in cursor]
+
+    def close(self):
+        pass
+
+
+def create_database(n: int) -> sqlite3.Connection:
+    """Create an agent table with `n` agents."""
+    db = sqlite3.connect(':memory:')
+    db.execute('CREATE TABLE agent (id INTEGER PRIMARY KEY, name TEXT)')
+    db.executemany('INSERT INTO agent VALUES (?, ?)', ((i, f'agent-{i}') for i in range(n)))
+    return db
+
+
+def measure(rbac_filters: dict, oversized: bool) -> tuple:
+    """Get the time, in milliseconds, and the result of the query."""
+    start = time.perf_counter()
+    query = WazuhDBQueryAgents(select=['id', 'name'], limit=common.DATABASE_LIMIT, **rbac_filters)
+    result = query.oversized_run() if oversized else query.run()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def run(sizes: list, repeat: int):
+    print(f"{'agents':>8}  {'scenario':<18}{'IDs':>8}{'list (KB)':>11}{'ranges (KB)':>13}{'oversized (ms)':>16}"
+          f"{'run (ms)':>10}")
+    rng = random.Random(0)
+    for size in sizes:
+        SQLiteConnection.db = create_database(size)
+        ids = [str(i).zfill(3) for i in range(size)]
+        for name, generate in SCENARIOS.items():
+            rbac_filters = get_rbac_filters(system_resources=set(ids), permitted_resources=generate(ids, rng))
+            rbac_ids = rbac_filters['filters']['rbac_ids']
+            ranges, singles = get_id_ranges(map(int, rbac_ids))
+            ranges_size = sum(len(f'id BETWEEN {a} AND {b} OR ') for a, b in ranges) + len(','.join(map(str, singles)))
+
+            timings, items = {True: [], False: []}, {}
+            for _ in range(repeat):
+                for oversized, oversized_timings in timings.items():
+                    elapsed, result = measure(rbac_filters, oversized)
+                    oversized_timings.append(elapsed)
+                    items[oversized] = result['items']
+            assert items[True] == items[False]
+            print(f"{size:>8}  {name:<18}{len(rbac_ids):>8}{len(','.join(rbac_ids)) / 1024:>11.1f}"
+                  f"{ranges_size / 1024:>13.1f}{min(timings[True]):>16.2f}{min(timings[False]):>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Oversized RBAC filters benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50000, 200000], help='Number of synthetic agents')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions of each scenario')
+    args = parser.parse_args()
+
+    with patch('wazuh.core.utils.WazuhDBConnection', new=SQLiteConnection):
+        run(args.sizes, args.repeat)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Benchmark of the merge of the `wazuh.core.results.AffectedItemsWazuhResult` objects returned by the nodes of the
+# cluster to a distributed API request, as `DistributedAPI.forward_request` does.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_results_merge.py
+#  - `--nodes` results of `--items` agents each, sorted by id, are merged once one by one with `|` and once with
+#    `AffectedItemsWazuhResult.merge_all`. Every node also returns `--failed` failed items.
+#  - The time of each merge is shown. The script fails if both merges do not return the same result.
+
+import argparse
+import time
+from functools import reduce
+from operator import or_
+
+from wazuh.core.exception import WazuhError
+from wazuh.core.results import AffectedItemsWazuhResult
+
+
+def build_results(n_nodes: int, n_items: int, n_failed: int) -> list:
+    """Build the results of every node, with the agents of all of them interleaved."""
+    results = []
+    for node in range(n_nodes):
+        result = AffectedItemsWazuhResult(all_msg='All selected agents information was returned',
+                                          some_msg='Some agents information was not returned',
+                                          none_msg='No agent information was returned',
+                                          sort_fields=['id'], sort_ascending=[True])
+        result.affected_items = [{'id': str(i * n_nodes + node).zfill(7), 'node_name': f'worker{node}'}
+                                 for i in range(n_items)]
+        result.total_affected_items = n_items
+        for i in range(n_failed):
+            result.add_failed_item(id_=f'{node}-{i}', error=WazuhError(1701))
+        results.append(result)
+    return results
+
+
+def run(n_nodes: int, n_items: int, n_failed: int):
+    print(f"{'Merge':>10}{'Items':>10}{'Time (s)':>10}")
+    merged = []
+    for name, merge_function in (('|', lambda results: reduce(or_, results)),
+                                 ('merge_all', AffectedItemsWazuhResult.merge_all)):
+        results = build_results(n_nodes, n_items, n_failed)
+        start = time.perf_counter()
+        result = merge_function(results)
+        elapsed = time.perf_counter() - start
+        merged.append(result)
+        print(f'{name:>10}{result.total_affected_items:>10}{elapsed:>10.2f}')
+
+    assert merged[0].render() == merged[1].render(), 'The merged results are different'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed API results merge benchmark')
+    parser.add_argument('--nodes', type=int, default=20, help='Number of nodes')
+    parser.add_argument('--items', type=int, default=50000, help='Number of affected items returned by each node')
+    parser.add_argument('--failed', type=int, default=100, help='Number of failed items returned by each node')
+    args = parser.parse_args()
+
+    run(args.nodes, args.items, args.failed)
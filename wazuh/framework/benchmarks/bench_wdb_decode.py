@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+###
+#  Copyright (C) 2015, Wazuh Inc.All rights reserved.
+#  Wazuh.com
+#
+#  This program is free software; you can redistribute it
+#  and/or modify it under the terms of the GNU General Public
+#  License (version 2) as published by the FSF - Free Software
+#  Foundation.
+###
+
+# Micro-benchmark of `wazuh.core.wdb.WazuhDBConnection.loads`, used to decode every page received from wazuh-db.
+#
+# Instructions:
+#  - Use the embedded interpreter to run the script: {wazuh_path}/framework/python/bin/python3 bench_wdb_decode.py
+#  - By default, synthetic syscollector and syscheck pages are used. Use `--payload` to decode responses recorded from
+#    wazuh-db instead: one response per line, without the status (e.g. the `[...]` part of `ok [...]`).
+#  - Use `--date-fields` to specify the date columns of the recorded responses.
+
+import argparse
+import json
+import random
+import time
+from unittest.mock import patch
+
+from wazuh.core.wdb import WazuhDBConnection
+
+SYSCOLLECTOR_DATE_FIELDS = {'scan_time', 'install_time'}
+SYSCHECK_DATE_FIELDS = {'date', 'mtime'}
+
+
+def generate_syscollector_page(n: int, rng: random.Random) -> str:
+    """Generate a page of `n` syscollector packages."""
+    return json.dumps([{'scan_id': 0,
+                        'scan_time': f'2023/{rng.randint(1, 12):02}/{rng.randint(1, 28):02} 10:11:12',
+                        'format': 'deb',
+                        'name': f'package-{i}',
+                        'priority': rng.choice(['optional', 'important', '(null)']),
+                        'section': rng.choice(['libs', 'admin', 'utils']),
+                        'size': rng.randint(0, 10 ** 6),
+                        'vendor': 'Ubuntu Developers <ubuntu-devel-discuss@lists.ubuntu.com>',
+                        'install_time': '(null)' if rng.random() < 0.5 else '2023/01/02 10:11:12',
+                        'version': f'{rng.randint(0, 9)}.{rng.randint(0, 99)}-{rng.randint(0, 9)}ubuntu1',
+                        'architecture': 'amd64',
+                        'multiarch': '(null)',
+                        'source': '(null)',
+                        'description': 'Shared library with a long enough description of the package contents',
+                        'location': '(null)',
+                        'cpe': '(null)',
+                        'msu_name': '(null)',
+                        'checksum': f'{rng.getrandbits(160):040x}',
+                        'item_id': f'{rng.getrandbits(160):040x}'} for i in range(n)])
+
+
+def generate_syscheck_page(n: int, rng: random.Random) -> str:
+    """Generate a page of `n` syscheck entries."""
+    return json.dumps([{'file': f'/etc/file-{i}',
+                        'type': 'file',
+                        'date': rng.randint(1600000000, 1700000000),
+                        'changes': rng.randint(1, 10),
+                        'size': rng.randint(0, 10 ** 6),
+                        'perm': 'rw-r--r--',
+                        'uid': '0',
+                        'gid': '0',
+                        'md5': f'{rng.getrandbits(128):032x}',
+                        'sha1': f'{rng.getrandbits(160):040x}',
+                        'uname': 'root',
+                        'gname': 'root',
+                        'mtime': rng.randint(1600000000, 1700000000),
+                        'inode': rng.randint(0, 10 ** 7),
+                        'sha256': f'{rng.getrandbits(256):064x}',
+                        'attributes': '(null)',
+                        'symbolic_path': '(null)'} for i in range(n)])
+
+
+def measure(payloads: list, repeat: int, **kwargs) -> float:
+    """Get the best time, in milliseconds, to decode every payload."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            WazuhDBConnection.loads(payload, **kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return min(timings)
+
+
+def run(datasets: dict, repeat: int):
+    print(f"{'dataset':<14}{'pages':>6}{'MB':>8}{'hook (ms)':>12}{'schema (ms)':>13}{'orjson (ms)':>13}")
+    for name, (payloads, date_fields) in datasets.items():
+        size = sum(map(len, payloads)) / 2 ** 20
+        legacy = measure(payloads, repeat)
+        with patch('wazuh.core.wdb.orjson', None):
+            schema = measure(payloads, repeat, date_fields=date_fields)
+        fast = measure(payloads, repeat, date_fields=date_fields)
+        print(f'{name:<14}{len(payloads):>6}{size:>8.2f}{legacy:>12.2f}{schema:>13.2f}{fast:>13.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='wazuh-db response decoding micro-benchmark')
+    parser.add_argument('--pages', type=int, default=50, help='Number of synthetic pages of each dataset')
+    parser.add_argument('--rows', type=int, default=500, help='Number of rows of each synthetic page')
+    parser.add_argument('--payload', help='File with recorded wazuh-db responses, one per line')
+    parser.add_argument('--date-fields', nargs='*', default=[], help='Date columns of the recorded responses')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of repetitions')
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload) as f:
+            datasets = {'recorded': ([line.rstrip('\n') for line in f if line.strip()], set(args.date_fields))}
+    else:
+        rng = random.Random(0)
+        datasets = {
+            'syscollector': ([generate_syscollector_page(args.rows, rng) for _ in range(args.pages)],
+                             SYSCOLLECTOR_DATE_FIELDS),
+            'syscheck': ([generate_syscheck_page(args.rows, rng) for _ in range(args.pages)], SYSCHECK_DATE_FIELDS)
+        }
+
+    run(datasets, args.repeat)
@@ -10,7 +10,7 @@ from typing import Union
 
 from wazuh.core import common, configuration
 from wazuh.core.InputValidator import InputValidator
-from wazuh.core.agent import WazuhDBQueryAgents, WazuhDBQueryGroupByAgents, Agent, \
+from wazuh.core.agent import WazuhDBQueryAgents, AsyncWazuhDBQueryAgents, WazuhDBQueryGroupByAgents, Agent, \
     WazuhDBQueryGroup, create_upgrade_tasks, get_agents_info, get_groups, get_rbac_filters, send_restart_command, \
     GROUP_FIELDS, GROUP_REQUIRED_FIELDS, GROUP_FILES_FIELDS, GROUP_FILES_REQUIRED_FIELDS
 from wazuh.core.wdb_http import get_wdb_http_client
@@ -335,6 +335,94 @@ def restart_agents_by_group(agent_list: list = None) -> AffectedItemsWazuhResult
     return restart_agents(agent_list=agent_list)
 
 
+def _get_agents_result() -> AffectedItemsWazuhResult:
+    """Create the result of `get_agents`."""
+    return AffectedItemsWazuhResult(all_msg='All selected agents information was returned',
+                                    some_msg='Some agents information was not returned',
+                                    none_msg='No agent information was returned')
+
+
+def _get_agents_rbac_filters(result: AffectedItemsWazuhResult, agent_list: list, filters: dict = None) -> dict:
+    """Add the agents that do not exist to the failed items of `result` and get the RBAC filters of the query.
+
+    Parameters
+    ----------
+    result : AffectedItemsWazuhResult
+        Result of `get_agents`.
+    agent_list : list
+        List of agents IDs.
+    filters : dict
+        Defines required field filters. Format: {"field1":"value1", "field2":["value2","value3"]}
+
+    Returns
+    -------
+    dict
+        Filters and RBAC negation of the query.
+    """
+    if filters is None:
+        filters = dict()
+
+    system_agents = get_agents_info()
+
+    for agent_id in agent_list:
+        if agent_id not in system_agents:
+            result.add_failed_item(id_=agent_id, error=WazuhResourceNotFound(1701))
+
+    return get_rbac_filters(system_resources=system_agents, permitted_resources=agent_list, filters=filters)
+
+
+def _add_agents_data(result: AffectedItemsWazuhResult, data: dict, sort: dict = None):
+    """Add the agents returned by the query to the affected items of `result`.
+
+    Parameters
+    ----------
+    result : AffectedItemsWazuhResult
+        Result of `get_agents`.
+    data : dict
+        Items and total number of items returned by the query.
+    sort : dict
+        Sorts the items. Format: {"fields":["field1","field2"],"order":"asc|desc"}.
+    """
+    if sort and 'version' in sort['fields']:
+        data['items'] = sorted(data['items'],
+                               key=lambda o: tuple(
+                                   parse_wazuh_agent_version(o.get(a)) if a == 'version' and
+                                   check_if_wazuh_agent_version(o.get(a))
+                                   else (0, 0, 0) if o.get(a) is None and a == 'version'
+                                   else o.get(a).lower() if type(o.get(a)) == str else o.get(a)
+                                   for a in sort['fields']),
+                               reverse=False if sort['order'] == 'asc' else True)
+
+    result.affected_items.extend(data['items'])
+    result.total_affected_items = data['totalItems']
+
+
+@expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"],
+                  post_proc_func=async_list_handler, post_proc_kwargs={'exclude_codes': [1701]})
+async def get_agents_async(agent_list: list = None, offset: int = 0, limit: int = common.DATABASE_LIMIT,
+                           sort: dict = None, search: dict = None, select: dict = None, filters: dict = None,
+                           q: str = None, distinct: bool = False) -> AffectedItemsWazuhResult:
+    """Gets a list of available agents with basic attributes, without blocking the event loop. Same as `get_agents`.
+
+    Returns
+    -------
+    AffectedItemsWazuhResult
+        Affected items.
+    """
+    result = _get_agents_result()
+    if agent_list:
+        rbac_filters = _get_agents_rbac_filters(result, agent_list, filters)
+
+        async with AsyncWazuhDBQueryAgents(offset=offset, limit=limit, sort=sort, search=search, select=select,
+                                           query=q, **rbac_filters, distinct=distinct) as db_query:
+            data = await db_query.run()
+
+        _add_agents_data(result, data, sort)
+
+    return result
+
+
+@common.async_variant(get_agents_async)
 @expose_resources(actions=["agent:read"], resources=["agent:id:{agent_list}"],
                   post_proc_kwargs={'exclude_codes': [1701]})
 def get_agents(agent_list: list = None, offset: int = 0, limit: int = common.DATABASE_LIMIT, sort: dict = None,
@@ -368,36 +456,15 @@ def get_agents(agent_list: list = None, offset: int = 0, limit: int = common.DAT
     AffectedItemsWazuhResult
         Affected items.
     """
-    result = AffectedItemsWazuhResult(all_msg='All selected agents information was returned',
-                                      some_msg='Some agents information was not returned',
-                                      none_msg='No agent information was returned'
-                                      )
+    result = _get_agents_result()
     if agent_list:
-        if filters is None:
-            filters = dict()
-
-        system_agents = get_agents_info()
-
-        for agent_id in agent_list:
-            if agent_id not in system_agents:
-                result.add_failed_item(id_=agent_id, error=WazuhResourceNotFound(1701))
-
-        rbac_filters = get_rbac_filters(system_resources=system_agents, permitted_resources=agent_list, filters=filters)
+        rbac_filters = _get_agents_rbac_filters(result, agent_list, filters)
 
         with WazuhDBQueryAgents(offset=offset, limit=limit, sort=sort, search=search, select=select,
                                 query=q, **rbac_filters, distinct=distinct) as db_query:
             data = db_query.run()
 
-        if sort and 'version' in sort['fields']:
-            data['items'] = sorted(data['items'],
-                          key=lambda o: tuple(
-                              parse_wazuh_agent_version(o.get(a)) if a == 'version' and check_if_wazuh_agent_version(o.get(a))
-                              else (0, 0, 0) if o.get(a) is None and a == 'version'
-                              else o.get(a).lower() if type(o.get(a)) == str else o.get(a) for a in sort['fields']),
-                          reverse=False if sort['order'] == 'asc' else True)
-
-        result.affected_items.extend(data['items'])
-        result.total_affected_items = data['totalItems']
+        _add_agents_data(result, data, sort)
 
     return result
 
@@ -521,9 +588,7 @@ def delete_agents(agent_list: list = None, purge: bool = False, filters: dict =
                                         filters=filters)
 
         with WazuhDBQueryAgents(limit=None, select=["id"], query=q, **rbac_filters) as db_query:
-            data = db_query.run()
-
-        can_purge_agents = set(map(operator.itemgetter('id'), data['items']))
+            can_purge_agents = {agent['id'] for agent in db_query.stream(key='id')}
         agent_list = set(agent_list)
 
         try:
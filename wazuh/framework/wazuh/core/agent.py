@@ -19,11 +19,11 @@ from wazuh.core.cluster.utils import get_manager_status
 from wazuh.core.common import AGENT_COMPONENT_STATS_REQUIRED_VERSION, DATE_FORMAT
 from wazuh.core.exception import WazuhException, WazuhError, WazuhInternalError, WazuhResourceNotFound
 from wazuh.core.utils import WazuhVersion, plain_dict_to_nested_dict, get_fields_to_nest, WazuhDBQuery, \
-    WazuhDBQueryDistinct, WazuhDBQueryGroupBy, WazuhDBBackend, get_utc_now, get_utc_strptime, \
-    get_date_from_timestamp
+    AsyncWazuhDBQuery, WazuhDBQueryDistinct, WazuhDBQueryGroupBy, WazuhDBBackend, get_utc_now, get_utc_strptime, \
+    get_date_from_timestamp, get_id_ranges
 from wazuh.core.wazuh_queue import WazuhQueue
 from wazuh.core.wazuh_socket import WazuhSocket, WazuhSocketJSON, create_wazuh_socket_message
-from wazuh.core.wdb import WazuhDBConnection
+from wazuh.core.wdb import WazuhDBConnection, connection_pool
 from wazuh.core.wdb_http import get_wdb_http_client
 from wazuh.rbac.utils import resource_cache
 
@@ -86,7 +86,7 @@ class WazuhDBQueryAgents(WazuhDBQuery):
         unify_wazuh_version_format(filters)
         if min_select_fields is None:
             min_select_fields = {'id'}
-        backend = WazuhDBBackend(query_format='global')
+        backend = self.backend_class(query_format='global')
         WazuhDBQuery.__init__(self, offset=offset, limit=limit, table='agent', sort=sort, search=search, select=select,
                               filters=filters, fields=Agent.fields, default_sort_field=default_sort_field,
                               default_sort_order='ASC', query=query, backend=backend,
@@ -94,6 +94,35 @@ class WazuhDBQueryAgents(WazuhDBQuery):
                               date_fields={'lastKeepAlive', 'dateAdd'}, extra_fields={'internal_key'},
                               distinct=distinct, rbac_negate=rbac_negate)
         self.remove_extra_fields = remove_extra_fields
+        self.rbac_filter = None
+
+    def _compress_rbac_filter(self, rbac_ids: set) -> bool:
+        """Replace the list of agent IDs used by RBAC with ranges of consecutive IDs (`id BETWEEN first AND last`), so
+        the query can be resolved by wazuh-db without fetching every agent ID.
+
+        Parameters
+        ----------
+        rbac_ids : set
+            Agent IDs used to filter.
+
+        Returns
+        -------
+        bool
+            True if the compressed filter fits in the query, False otherwise.
+        """
+        try:
+            ranges, singles = get_id_ranges(map(int, rbac_ids))
+        except (TypeError, ValueError):
+            return False
+
+        conditions = [f'id BETWEEN {first} AND {last}' for first, last in ranges]
+        singles and conditions.append(f"id IN ({','.join(map(str, singles))})")
+        rbac_filter = ' OR '.join(conditions)
+        if len(rbac_filter) >= common.MAX_QUERY_FILTERS_RESERVED_SIZE:
+            return False
+
+        self.rbac_filter = f'NOT ({rbac_filter})' if self.rbac_negate else rbac_filter
+        return True
 
     def _filter_date(self, date_filter: dict, filter_db_name: str):
         """Add date filter to the Wazuh query."""
@@ -216,7 +245,9 @@ class WazuhDBQueryAgents(WazuhDBQuery):
         WazuhError(1409)
             If the operator of the filter is not valid.
         """
-        if field_name == 'group' and q_filter['value'] is not None:
+        if field_name == 'rbac_id' and self.rbac_filter is not None:
+            self.query += self.rbac_filter
+        elif field_name == 'group' and q_filter['value'] is not None:
             valid_group_operators = {'=', '!=', '~'}
 
             if q_filter['operator'] == '=':
@@ -235,6 +266,10 @@ class WazuhDBQueryAgents(WazuhDBQuery):
             WazuhDBQuery._process_filter(self, field_name, field_filter, q_filter)
 
 
+class AsyncWazuhDBQueryAgents(AsyncWazuhDBQuery, WazuhDBQueryAgents):
+    """Class used to query Wazuh agents without blocking the event loop."""
+
+
 class WazuhDBQueryGroup(WazuhDBQuery):
     """Class used to query Wazuh groups."""
 
@@ -1324,8 +1359,7 @@ def expand_group(group_name: str) -> set:
         Set of agent IDs.
     """
     agents_ids = []
-    wdb_conn = WazuhDBConnection()
-    try:
+    with connection_pool.connection(factory=WazuhDBConnection) as wdb_conn:
         last_id = 0
         while True:
             command = f'global get-group-agents {group_name} last_id {last_id}'
@@ -1342,9 +1376,6 @@ def expand_group(group_name: str) -> set:
             else:
                 last_id = int(agents_ids[-1])
 
-    finally:
-        wdb_conn.close()
-
     system_agents = get_agents_info()
     return set(agents_ids) & system_agents
 
@@ -1358,9 +1389,8 @@ def get_manager_name() -> str:
     str
         Manager name.
     """
-    wdb_conn = WazuhDBConnection()
-    manager_name = wdb_conn.execute("global sql SELECT name FROM agent WHERE (id = 0)")[0]['name']
-    wdb_conn.close()
+    with connection_pool.connection(factory=WazuhDBConnection) as wdb_conn:
+        manager_name = wdb_conn.execute("global sql SELECT name FROM agent WHERE (id = 0)")[0]['name']
 
     return manager_name
 
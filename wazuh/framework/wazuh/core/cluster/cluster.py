@@ -2,18 +2,24 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import base64
 import errno
+import hashlib
 import itertools
 import json
 import logging
+import mmap
 import os.path
 import shutil
+import struct
 import zlib
 from asyncio import wait_for
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-from operator import eq
+from operator import eq, itemgetter
 from os import listdir, path, remove, stat, walk
+from time import perf_counter
 from uuid import uuid4
 
 from jsonschema import ValidationError, validate, validators
@@ -35,14 +41,41 @@ from wazuh.core.cluster.utils import (
 from wazuh.core.InputValidator import InputValidator
 from wazuh.core.utils import blake2b, get_date_from_timestamp, get_utc_now, mkdir_with_mode, to_relative_path
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 logger = logging.getLogger('wazuh')
 
-# Separators used in compression/decompression functions to delimit files.
-FILE_SEP = '|@@//@@|'
-PATH_SEP = '|//@@//|'
+# Header of each file inside the compressed files sent between nodes: ID of the compression codec, length of the path
+# and length of the compressed content. It is followed by the path and the compressed content.
+FILE_HEADER = struct.Struct('!BHQ')
+# Codecs (keys) that can be used to compress the files sent between nodes and their IDs (values) in FILE_HEADER.
+COMPRESSION_CODECS = {'zlib': 0, 'zstd': 1}
+# Size, in bytes, of the chunks in which files are read and compressed.
+COMPRESS_CHUNK_SIZE = 1048576
+# Files bigger than this size, in bytes, are compressed while they are written instead of in parallel.
+COMPRESS_STREAM_SIZE = 16777216
+# Size, in bytes, of the compressed chunks passed to the decompressor at a time, bounding the memory used per file.
+DECOMPRESS_CHUNK_SIZE = 65536
+# Weak rolling checksum and BLAKE2b hash of each block in the signature of a file, used to send only its differences.
+SIGNATURE_BLOCK = struct.Struct('!I8s')
+# Operation of a file delta: type, offset in the local file (only for copies) and length. Literal operations are
+# followed by their content.
+DELTA_OP = struct.Struct('!BQQ')
+DELTA_COPY = 0
+DELTA_LITERAL = 1
 MIN_PORT = 1024
 MAX_PORT = 65535
 
+# Maximum size, in bytes, of each batch of files hashed by the same thread.
+HASH_BATCH_SIZE = 33554432
+# Maximum number of cached file hashes.
+HASH_CACHE_SIZE = 500000
+# Hashes (values) of the files identified by their device, inode, size and modification time in ns (keys).
+hash_cache = {}
+
 HAPROXY_HELPER_SCHEMA = {
     'type': 'object',
     'properties': {
@@ -169,6 +202,90 @@ def check_cluster_status():
 # Files
 #
 
+def get_file_metadata(dirname, filename, cluster_item_key, previous_status=None, get_hash=True):
+    """Get the metadata of a file inside one of the directories listed in cluster.json['files'].
+
+    Parameters
+    ----------
+    dirname : str
+        Absolute path of the directory that contains the file.
+    filename : str
+        Name of the file.
+    cluster_item_key : str
+        Key inside cluster.json['files'] to which the file belongs.
+    previous_status : dict
+        Information collected in the previous integration process.
+    get_hash : bool
+        Whether to calculate and save the BLAKE2b hash of the file.
+
+    Returns
+    -------
+    relative_file_path : str
+        Path of the file, relative to the Wazuh path.
+    file_metadata : dict
+        Metadata of the file. The one in `previous_status` is returned if the file mtime has not changed.
+    """
+    if previous_status is None:
+        previous_status = {}
+    relative_file_path = path.join(path.relpath(dirname, common.WAZUH_PATH), filename)
+    abs_file_path = path.join(dirname, filename)
+    file_mod_time = path.getmtime(abs_file_path)
+    try:
+        if file_mod_time == previous_status[relative_file_path]['mod_time']:
+            # The current file has not changed its mtime since the last integrity process.
+            return relative_file_path, previous_status[relative_file_path]
+    except KeyError:
+        pass
+    # Create dict with metadata for the current file.
+    # The TYPE string is a placeholder to define the type of merge performed.
+    file_metadata = {"mod_time": file_mod_time, 'cluster_item_key': cluster_item_key}
+    if '.merged' not in filename:
+        file_metadata['merged'] = False
+    else:
+        file_metadata['merged'] = True
+        file_metadata['merge_type'] = 'TYPE'
+        file_metadata['merge_name'] = abs_file_path
+    if get_hash:
+        file_metadata['hash'] = blake2b(abs_file_path)
+
+    return relative_file_path, file_metadata
+
+
+def get_cluster_item_key(relative_path, cluster_items, directory=False):
+    """Get the key inside cluster.json['files'] to which a file or directory belongs.
+
+    Parameters
+    ----------
+    relative_path : str
+        Path of the file or directory, relative to the Wazuh path.
+    cluster_items : dict
+        Content of the cluster.json file.
+    directory : bool
+        Whether the path is a directory.
+
+    Returns
+    -------
+    str or None
+        Key of the last item in cluster.json['files'] that includes the path, as `get_files_status` gives precedence
+        to the last one. None if no item includes it.
+    """
+    dirname, filename = (relative_path, '') if directory else path.split(relative_path)
+    if not directory and (filename in cluster_items['files']['excluded_files'] or
+                          any([filename.endswith(ext) for ext in cluster_items['files']['excluded_extensions']])):
+        return None
+
+    cluster_item_key = None
+    for file_path, item in cluster_items['files'].items():
+        if file_path == "excluded_files" or file_path == "excluded_extensions":
+            continue
+        item_dirname = path.normpath(file_path)
+        in_item = dirname == item_dirname or item['recursive'] and dirname.startswith(item_dirname + path.sep)
+        if in_item and (directory or item['files'] == ['all'] or filename in item['files']):
+            cluster_item_key = file_path
+
+    return cluster_item_key
+
+
 def walk_dir(dirname, recursive, files, excluded_files, excluded_extensions, get_cluster_item_key, previous_status=None,
              get_hash=True):
     """Iterate recursively inside a directory, save the path of each found file and obtain its metadata.
@@ -217,27 +334,8 @@ def walk_dir(dirname, recursive, files, excluded_files, excluded_extensions, get
                     try:
                         #  If 'all' files have been requested or entry is in the specified files list.
                         if files == ['all'] or file_ in files:
-                            relative_file_path = path.join(path.relpath(root_, common.WAZUH_PATH), file_)
-                            abs_file_path = path.join(root_, file_)
-                            file_mod_time = path.getmtime(abs_file_path)
-                            try:
-                                if file_mod_time == previous_status[relative_file_path]['mod_time']:
-                                    # The current file has not changed its mtime since the last integrity process.
-                                    walk_files[relative_file_path] = previous_status[relative_file_path]
-                                    continue
-                            except KeyError:
-                                pass
-                            # Create dict with metadata for the current file.
-                            # The TYPE string is a placeholder to define the type of merge performed.
-                            file_metadata = {"mod_time": file_mod_time, 'cluster_item_key': get_cluster_item_key}
-                            if '.merged' not in file_:
-                                file_metadata['merged'] = False
-                            else:
-                                file_metadata['merged'] = True
-                                file_metadata['merge_type'] = 'TYPE'
-                                file_metadata['merge_name'] = abs_file_path
-                            if get_hash:
-                                file_metadata['hash'] = blake2b(abs_file_path)
+                            relative_file_path, file_metadata = get_file_metadata(root_, file_, get_cluster_item_key,
+                                                                                  previous_status, get_hash)
                             # Use the relative file path as a key to save its metadata dictionary.
                             walk_files[relative_file_path] = file_metadata
                     except FileNotFoundError as e:
@@ -251,7 +349,117 @@ def walk_dir(dirname, recursive, files, excluded_files, excluded_extensions, get
     return walk_files, result_logs
 
 
-def get_files_status(previous_status=None, get_hash=True):
+def hash_files(file_paths, pool_size=1):
+    """Calculate the BLAKE2b hash of several files.
+
+    Hashes are cached by device, inode, size and modification time, so unchanged files (even if they were renamed) are
+    not read again in later calls made from the same process. The rest of files are sorted by size and grouped in
+    batches of up to HASH_BATCH_SIZE bytes, which are hashed by a pool of threads: hashlib releases the GIL while
+    hashing, so batches are hashed in parallel.
+
+    Parameters
+    ----------
+    file_paths : list
+        Absolute paths of the files.
+    pool_size : int
+        Number of threads used to hash the files.
+
+    Returns
+    -------
+    hashes : dict
+        Paths (keys) and hexadecimal hashes (values) of the files.
+    errors : dict
+        Paths (keys) and exceptions (values) of the files that could not be read.
+    """
+    hashes, errors, pending = {}, {}, []
+    for file_path in file_paths:
+        try:
+            file_stat = stat(file_path)
+        except OSError as e:
+            errors[file_path] = e
+            continue
+        cache_key = (file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+        try:
+            hashes[file_path] = hash_cache[cache_key]
+        except KeyError:
+            pending.append((file_stat.st_size, file_path, cache_key))
+
+    batches, batch, batch_size = [], [], 0
+    for size, file_path, cache_key in sorted(pending, key=itemgetter(0), reverse=True):
+        if batch and batch_size + size > HASH_BATCH_SIZE:
+            batches.append(batch)
+            batch, batch_size = [], 0
+        batch.append((file_path, cache_key))
+        batch_size += size
+    if batch:
+        batches.append(batch)
+
+    def hash_batch(files):
+        result = []
+        for file_path_, cache_key_ in files:
+            try:
+                result.append((file_path_, cache_key_, blake2b(file_path_)))
+            except OSError as exc:
+                result.append((file_path_, cache_key_, exc))
+        return result
+
+    if pool_size > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            results = list(itertools.chain.from_iterable(executor.map(hash_batch, batches)))
+    else:
+        results = list(itertools.chain.from_iterable(map(hash_batch, batches)))
+
+    if len(hash_cache) + len(results) > HASH_CACHE_SIZE:
+        hash_cache.clear()
+    for file_path, cache_key, file_hash in results:
+        if isinstance(file_hash, Exception):
+            errors[file_path] = file_hash
+        else:
+            hashes[file_path] = hash_cache[cache_key] = file_hash
+
+    return hashes, errors
+
+
+def hash_files_status(files_status, result_logs, pool_size=1):
+    """Add the BLAKE2b hash to the metadata of the files that do not include it yet.
+
+    Files that cannot be read anymore are removed from `files_status`.
+
+    Parameters
+    ----------
+    files_status : dict
+        Paths, relative to the Wazuh path, (keys) and metadata (values) of the files. It is updated in place.
+    result_logs : dict
+        Dict where the debug or error messages emitted in the process are added.
+    pool_size : int
+        Number of threads used to hash the files.
+
+    Returns
+    -------
+    int
+        Number of files whose hash had to be calculated.
+    """
+    pending = [file_path for file_path, metadata in files_status.items() if 'hash' not in metadata]
+    hashes, errors = hash_files([path.join(common.WAZUH_PATH, file_path) for file_path in pending], pool_size)
+    for file_path in pending:
+        abs_file_path = path.join(common.WAZUH_PATH, file_path)
+        try:
+            files_status[file_path]['hash'] = hashes[abs_file_path]
+        except KeyError:
+            metadata = files_status.pop(file_path)
+            dirname, filename = path.split(abs_file_path)
+            e = errors[abs_file_path]
+            if isinstance(e, FileNotFoundError):
+                result_logs['debug'][metadata['cluster_item_key']].setdefault(dirname, []).append(
+                    f"File {filename} was deleted in previous iteration: {e}")
+            else:
+                result_logs['error'][metadata['cluster_item_key']].setdefault(dirname, []).append(
+                    f"Can't read metadata from file {filename}: {e}")
+
+    return len(pending)
+
+
+def get_files_status(previous_status=None, get_hash=True, hash_pool_size=1):
     """Get all files and metadata inside the directories listed in cluster.json['files'].
 
     Parameters
@@ -260,13 +468,16 @@ def get_files_status(previous_status=None, get_hash=True):
         Information collected in the previous integration process.
     get_hash : bool
         Whether to calculate and save the BLAKE2b hash of the found file.
+    hash_pool_size : int
+        Number of threads used to hash the files.
 
     Returns
     -------
     final_items : dict
         Paths (keys) and metadata (values) of all the files requested in cluster.json['files'].
     result_logs: dict
-        Dict containing debug or any error messages emitted in the process.
+        Dict containing debug or any error messages emitted in the process, and the number of hashed files and the
+        time spent hashing them under the 'hashing' key.
     """
     if previous_status is None:
         previous_status = {}
@@ -282,7 +493,7 @@ def get_files_status(previous_status=None, get_hash=True):
             items, logs = walk_dir(file_path, item['recursive'], item['files'],
                                    cluster_items['files']['excluded_files'],
                                    cluster_items['files']['excluded_extensions'],
-                                   file_path, previous_status, get_hash)
+                                   file_path, previous_status, get_hash=False)
             if 'debug' in logs and logs['debug']:
                 result_logs['debug'][file_path].update(dict(logs['debug']))
             if 'error' in logs and logs['error']:
@@ -291,6 +502,85 @@ def get_files_status(previous_status=None, get_hash=True):
         except Exception as e:
             result_logs['warning'][file_path].append(f"Error getting file status: {e}.")
 
+    if get_hash:
+        before = perf_counter()
+        hashed_files = hash_files_status(final_items, result_logs, hash_pool_size)
+        result_logs['hashing'] = {'files': hashed_files, 'time': perf_counter() - before}
+
+    return final_items, result_logs
+
+
+def update_files_status(previous_status, changed_paths, get_hash=True):
+    """Update the metadata of the files that changed inside the directories listed in cluster.json['files'].
+
+    Parameters
+    ----------
+    previous_status : dict
+        Information collected in the previous integration process.
+    changed_paths : set
+        Paths, relative to the Wazuh path, of the files that were created, modified or removed. Directory paths end
+        with a path separator: the metadata of every file inside them is updated.
+    get_hash : bool
+        Whether to calculate and save the BLAKE2b hash of the changed files.
+
+    Returns
+    -------
+    final_items : dict
+        Paths (keys) and metadata (values) of all the files requested in cluster.json['files'].
+    result_logs: dict
+        Dict containing debug or any error messages emitted in the process, and the number of hashed files and the
+        time spent hashing them under the 'hashing' key.
+    """
+    cluster_items = get_cluster_items()
+
+    final_items = dict(previous_status)
+    result_logs = {'debug': defaultdict(dict), 'warning': defaultdict(list), 'error': defaultdict(dict)}
+    directories = {changed_path for changed_path in changed_paths if changed_path.endswith(path.sep)}
+    if directories:
+        # Remove the files of created, moved or removed directories. Existing ones are walked again below.
+        prefixes = tuple(directories)
+        final_items = {k: v for k, v in final_items.items() if not k.startswith(prefixes)}
+
+    for directory in directories:
+        cluster_item_key = get_cluster_item_key(path.normpath(directory), cluster_items, directory=True)
+        if cluster_item_key is None or not path.isdir(path.join(common.WAZUH_PATH, directory)):
+            continue
+        try:
+            item = cluster_items['files'][cluster_item_key]
+            items, logs = walk_dir(directory, item['recursive'], item['files'],
+                                   cluster_items['files']['excluded_files'],
+                                   cluster_items['files']['excluded_extensions'],
+                                   cluster_item_key, previous_status, get_hash=False)
+            if 'debug' in logs and logs['debug']:
+                result_logs['debug'][cluster_item_key].update(dict(logs['debug']))
+            if 'error' in logs and logs['error']:
+                result_logs['error'][cluster_item_key].update(dict(logs['error']))
+            final_items.update(items)
+        except Exception as e:
+            result_logs['warning'][cluster_item_key].append(f"Error getting file status: {e}.")
+
+    for file_path in changed_paths - directories:
+        final_items.pop(file_path, None)
+        cluster_item_key = get_cluster_item_key(file_path, cluster_items)
+        if cluster_item_key is None:
+            continue
+        try:
+            _, final_items[file_path] = get_file_metadata(path.join(common.WAZUH_PATH, path.dirname(file_path)),
+                                                          path.basename(file_path), cluster_item_key,
+                                                          previous_status, get_hash=False)
+        except FileNotFoundError:
+            # The file was removed.
+            pass
+        except PermissionError as e:
+            result_logs['error'][cluster_item_key][file_path] = f"Can't read metadata from file: {e}"
+        except OSError as e:
+            result_logs['warning'][cluster_item_key].append(f"Error getting file status: {e}.")
+
+    if get_hash:
+        before = perf_counter()
+        hashed_files = hash_files_status(final_items, result_logs)
+        result_logs['hashing'] = {'files': hashed_files, 'time': perf_counter() - before}
+
     return final_items, result_logs
 
 
@@ -358,12 +648,337 @@ def update_cluster_control(failed_file, ko_files, exists=True):
         pass
 
 
-def compress_files(name, list_path, cluster_control_json=None, max_zip_size=None):
+def get_compression_codecs():
+    """Get the codecs that this node can use to compress and decompress files.
+
+    Returns
+    -------
+    list
+        Names of the available codecs, from the most to the least preferred. zlib is always available.
+    """
+    return ['zstd', 'zlib'] if zstandard else ['zlib']
+
+
+def negotiate_compression_codec(preferred_codec, peer_codecs):
+    """Choose the codec used to compress the files sent between this node and a peer.
+
+    Parameters
+    ----------
+    preferred_codec : str
+        Codec configured in cluster.json.
+    peer_codecs : list
+        Codecs available in the peer node.
+
+    Returns
+    -------
+    str
+        The preferred codec if both nodes support it, 'zlib' otherwise.
+    """
+    if preferred_codec in get_compression_codecs() and preferred_codec in peer_codecs:
+        return preferred_codec
+    return 'zlib'
+
+
+def get_compressor(codec, level):
+    """Get a streaming compressor.
+
+    Parameters
+    ----------
+    codec : str
+        Compression codec.
+    level : int
+        Compression level.
+
+    Returns
+    -------
+    Compressor object with the compress() and flush() methods.
+    """
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    return zlib.compressobj(level)
+
+
+def get_decompressor(codec_id):
+    """Get a streaming decompressor.
+
+    Parameters
+    ----------
+    codec_id : int
+        ID of the compression codec, as stored in FILE_HEADER.
+
+    Returns
+    -------
+    Decompressor object with the decompress() and flush() methods.
+
+    Raises
+    ------
+    ValueError
+        If the codec is unknown or not available in this node.
+    """
+    if codec_id == COMPRESSION_CODECS['zlib']:
+        return zlib.decompressobj()
+    elif codec_id == COMPRESSION_CODECS['zstd'] and zstandard:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f'Unsupported compression codec: {codec_id}')
+
+
+def compress_file(file_path, codec, level):
+    """Read and compress a file in chunks of COMPRESS_CHUNK_SIZE bytes.
+
+    Parameters
+    ----------
+    file_path : str
+        Full path to the file.
+    codec : str
+        Compression codec.
+    level : int
+        Compression level.
+
+    Yields
+    ------
+    bytes
+        Compressed chunk.
+    """
+    compressor = get_compressor(codec, level)
+    with open(file_path, 'rb') as rf:
+        while chunk := rf.read(COMPRESS_CHUNK_SIZE):
+            if compressed_chunk := compressor.compress(chunk):
+                yield compressed_chunk
+    yield compressor.flush()
+
+
+def decompress_file(data, codec_id, wf):
+    """Decompress a file in chunks of DECOMPRESS_CHUNK_SIZE bytes and write it.
+
+    Parameters
+    ----------
+    data : memoryview
+        Compressed content of the file.
+    codec_id : int
+        ID of the compression codec, as stored in FILE_HEADER.
+    wf : BinaryIO
+        File object where the decompressed content is written.
+    """
+    decompressor = get_decompressor(codec_id)
+    for offset in range(0, len(data), DECOMPRESS_CHUNK_SIZE):
+        with data[offset:offset + DECOMPRESS_CHUNK_SIZE] as chunk:
+            wf.write(decompressor.decompress(chunk))
+    wf.write(decompressor.flush())
+
+
+def get_weak_checksum(block):
+    """Calculate the rsync weak checksum of a block.
+
+    Parameters
+    ----------
+    block : bytes
+        Content of the block.
+
+    Returns
+    -------
+    a : int
+        Sum of the bytes of the block, modulo 2^16.
+    b : int
+        Sum of the bytes of the block weighted by their distance to its end, modulo 2^16.
+    """
+    return sum(block) & 0xffff, sum(itertools.accumulate(block)) & 0xffff
+
+
+def get_file_signature(file_path, block_size):
+    """Get the signature of a file: the weak checksum and BLAKE2b hash of each of its blocks.
+
+    Parameters
+    ----------
+    file_path : str
+        Full path to the file.
+    block_size : int
+        Size of the blocks, in bytes. The last incomplete block is not included.
+
+    Returns
+    -------
+    dict
+        Size of the blocks and base64 encoded SIGNATURE_BLOCK of each one.
+    """
+    blocks = []
+    with open(file_path, 'rb') as rf:
+        while len(block := rf.read(block_size)) == block_size:
+            a, b = get_weak_checksum(block)
+            blocks.append(SIGNATURE_BLOCK.pack(a | b << 16, hashlib.blake2b(block, digest_size=8).digest()))
+    return {'block_size': block_size, 'blocks': base64.b64encode(b''.join(blocks)).decode()}
+
+
+def add_files_signatures(files_metadata):
+    """Add the signature of the files that can be updated with a delta to their metadata.
+
+    Only regular (not merged) files between communication.delta_min_size and communication.delta_max_size bytes have
+    a signature, so the master can send their differences instead of the whole file.
+
+    Parameters
+    ----------
+    files_metadata : dict
+        Paths (keys) and metadata (values) of the files. It is not modified.
+
+    Returns
+    -------
+    dict
+        Paths (keys) and metadata (values) of the files, with a 'signature' in the metadata of those that have one.
+    """
+    min_size = get_cluster_items()['intervals']['communication']['delta_min_size']
+    max_size = get_cluster_items()['intervals']['communication']['delta_max_size']
+    block_size = get_cluster_items()['intervals']['communication']['delta_block_size']
+    result = {}
+    for file_path, metadata in files_metadata.items():
+        try:
+            if not metadata['merged'] and \
+                    min_size <= stat(path.join(common.WAZUH_PATH, file_path)).st_size <= max_size:
+                metadata = {**metadata, 'signature': get_file_signature(path.join(common.WAZUH_PATH, file_path),
+                                                                        block_size)}
+        except OSError:
+            # The file will be sent whole if the master needs to update it.
+            pass
+        result[file_path] = metadata
+    return result
+
+
+def get_file_delta(file_path, signature):
+    """Get the differences between a file and the file with the given signature.
+
+    The file is compared with the blocks of the signature at every offset using a rolling checksum, so inserted or
+    removed content does not prevent the next blocks from being found. It is mapped in memory instead of read, so only
+    the pages being compared are loaded.
+
+    Parameters
+    ----------
+    file_path : str
+        Full path to the file.
+    signature : dict
+        Signature of the other file, obtained with get_file_signature().
+
+    Returns
+    -------
+    bytes or None
+        Sequence of DELTA_OP to build the file from the other one. None if it would be bigger than the file itself or
+        if no block of the other file is found in the first eighth of this one.
+    """
+    block_size = signature['block_size']
+    blocks = {}
+    for index, (weak, strong) in enumerate(SIGNATURE_BLOCK.iter_unpack(base64.b64decode(signature['blocks']))):
+        blocks.setdefault(weak, {}).setdefault(strong, index * block_size)
+
+    with open(file_path, 'rb') as rf:
+        if os.fstat(rf.fileno()).st_size < block_size:
+            return None
+        with mmap.mmap(rf.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _get_mapped_file_delta(data, blocks, block_size)
+
+
+def _get_mapped_file_delta(data, blocks, block_size):
+    """Get the differences between the content of a file and the blocks of a signature. See get_file_delta()."""
+    delta = []
+    delta_size = 0
+    copy_offset = copy_length = 0
+    literal_start = offset = 0
+    last_offset = len(data) - block_size
+    a = b = None
+
+    def add_literal(end):
+        nonlocal delta_size, copy_length
+        if copy_length:
+            delta.append(DELTA_OP.pack(DELTA_COPY, copy_offset, copy_length))
+            delta_size += DELTA_OP.size
+            copy_length = 0
+        if literal_start < end:
+            delta.append(DELTA_OP.pack(DELTA_LITERAL, 0, end - literal_start))
+            delta.append(data[literal_start:end])
+            delta_size += DELTA_OP.size + end - literal_start
+
+    while offset <= last_offset:
+        if a is None:
+            a, b = get_weak_checksum(data[offset:offset + block_size])
+        if (strong_blocks := blocks.get(a | b << 16)) and \
+                (block_offset := strong_blocks.get(hashlib.blake2b(data[offset:offset + block_size],
+                                                                   digest_size=8).digest())) is not None:
+            if literal_start < offset or copy_offset + copy_length != block_offset:
+                add_literal(offset)
+                copy_offset = block_offset
+            copy_length += block_size
+            offset += block_size
+            literal_start = offset
+            a = None
+            continue
+
+        # Roll the checksum forward until a block may match, as long as the delta is smaller than the file. The file is
+        # considered unrelated to the other one if no block is found in its first eighth.
+        stop = min(last_offset, literal_start + len(data) - delta_size - 1,
+                   last_offset if delta or copy_length else block_size + len(data) // 8)
+        if offset >= stop:
+            if offset < last_offset:
+                return None
+            break
+        offset += 1
+        while True:
+            out_byte = data[offset - 1]
+            a = (a - out_byte + data[offset + block_size - 1]) & 0xffff
+            b = (b - block_size * out_byte + a) & 0xffff
+            if offset == stop or (a | b << 16) in blocks:
+                break
+            offset += 1
+
+    add_literal(len(data))
+    return b''.join(delta) if delta_size < len(data) else None
+
+
+def apply_file_delta(file_path, delta_path, file_hash):
+    """Build a file from a local file and its differences with it, replacing the delta.
+
+    Parameters
+    ----------
+    file_path : str
+        Full path to the local file.
+    delta_path : str
+        Full path to the delta obtained with get_file_delta(). It is replaced with the built file.
+    file_hash : str
+        Expected BLAKE2b hash of the built file.
+
+    Raises
+    ------
+    ValueError
+        If the delta is not valid for the local file.
+    """
+    tmp_path = delta_path + '.tmp'
+    with open(file_path, 'rb') as basis, open(delta_path, 'rb') as delta, open(tmp_path, 'wb') as wf:
+        while header := delta.read(DELTA_OP.size):
+            if len(header) < DELTA_OP.size:
+                raise ValueError('Truncated file delta')
+            op, offset, length = DELTA_OP.unpack(header)
+            if op == DELTA_COPY:
+                basis.seek(offset)
+                content = basis.read(length)
+            else:
+                content = delta.read(length)
+            if len(content) != length:
+                raise ValueError('Invalid file delta')
+            wf.write(content)
+
+    os.replace(tmp_path, delta_path)
+    if blake2b(delta_path) != file_hash:
+        raise ValueError('The file built from the delta does not match the expected hash')
+
+
+def compress_files(name, list_path, cluster_control_json=None, max_zip_size=None, codec='zlib'):
     """Create a zip with cluster_control.json and the files listed in list_path.
 
     Iterate the list of files and groups them in a compressed file. If a file does not
     exist, the cluster_control_json dictionary is updated.
 
+    Each file is preceded by a FILE_HEADER and read in chunks of COMPRESS_CHUNK_SIZE bytes. Files up to
+    COMPRESS_STREAM_SIZE bytes are compressed in parallel by a pool of threads, while bigger ones are compressed as
+    they are written, so they are never fully loaded in memory.
+
+    Shared files whose metadata has the 'signature' of the copy in the receiving node are replaced by their delta
+    (see get_file_delta) when it is smaller, and marked with 'delta' in the metadata. Files bigger than
+    communication.delta_max_size bytes are always sent whole.
+
     Parameters
     ----------
     name : str
@@ -374,18 +989,23 @@ def compress_files(name, list_path, cluster_control_json=None, max_zip_size=None
         KO files (path-metadata) to be compressed as a json.
     max_zip_size : int
         Maximum size from which no new files should be added to the zip.
+    codec : str
+        Compression codec. See negotiate_compression_codec().
 
     Returns
     -------
     compress_file_path : str
         Path where the compress file has been saved.
     result_logs: dict
-        Dict containing warning and debug messages emitted in the process.
+        Dict containing warning and debug messages emitted in the process, and the number of files sent as a delta
+        and the bytes saved by them under the 'delta' key.
     """
     zip_size = 0
     exceeded_size = False
     result_logs = {'warning': defaultdict(list), 'debug': defaultdict(list)}
     compress_level = get_cluster_items()['intervals']['communication']['compress_level']
+    pool_size = get_cluster_items()['intervals']['communication']['compress_pool_size']
+    codec_id = COMPRESSION_CODECS[codec]
     if max_zip_size is None:
         max_zip_size = get_cluster_items()['intervals']['communication']['max_zip_size']
     zip_file_path = path.join(common.WAZUH_PATH, 'queue', 'cluster', name,
@@ -394,50 +1014,152 @@ def compress_files(name, list_path, cluster_control_json=None, max_zip_size=None
     if not path.exists(path.dirname(zip_file_path)):
         mkdir_with_mode(path.dirname(zip_file_path))
 
-    with open(zip_file_path, 'ab') as wf:
-        for file in list_path:
-            if exceeded_size:
-                update_cluster_control(file, cluster_control_json)
-                continue
+    executor = ThreadPoolExecutor(max_workers=pool_size) if pool_size > 1 else None
+    signatures = {file_: metadata['signature'] for file_, metadata in
+                  (cluster_control_json or {}).get('shared', {}).items() if 'signature' in metadata}
+    delta_max_size = get_cluster_items()['intervals']['communication']['delta_max_size'] if signatures else 0
+    deltas = {}
 
+    def prepare(file_):
+        """Get the size of a file and its delta, if any, or start compressing it in the pool if it is small enough."""
+        delta = None
+        try:
+            file_size = stat(path.join(common.WAZUH_PATH, file_)).st_size
+        except Exception as exc:
+            return file_, exc, None, None
+        if file_ in signatures and file_size <= min(max_zip_size, delta_max_size):
             try:
-                with open(path.join(common.WAZUH_PATH, file), 'rb') as rf:
-                    new_file = rf.read()
-                    if len(new_file) > max_zip_size:
+                delta = get_file_delta(path.join(common.WAZUH_PATH, file_), signatures[file_])
+            except Exception as exc:
+                result_logs['debug'][file_].append(f"Sending whole file. Could not get its delta: {exc}")
+        if delta is None and executor and file_size <= min(max_zip_size, COMPRESS_STREAM_SIZE):
+            return file_, file_size, None, executor.submit(
+                lambda: list(compress_file(path.join(common.WAZUH_PATH, file_), codec, compress_level)))
+        return file_, file_size, delta, None
+
+    try:
+        with open(zip_file_path, 'wb') as wf:
+            files = iter(list_path)
+            queued = deque()
+            while True:
+                # Keep a few files compressing in the pool while the previous ones are written.
+                while not exceeded_size and len(queued) < 2 * pool_size and (file := next(files, None)) is not None:
+                    queued.append(prepare(file))
+                if not queued:
+                    break
+
+                file, size, delta, future = queued.popleft()
+                if exceeded_size:
+                    if future:
+                        future.cancel()
+                    update_cluster_control(file, cluster_control_json)
+                    continue
+
+                record_start = wf.tell()
+                try:
+                    if isinstance(size, Exception):
+                        raise size
+                    if size > max_zip_size:
                         result_logs['warning'][file].append(f'File too large to be synced: '
                                                             f'{path.join(common.WAZUH_PATH, file)}')
                         update_cluster_control(file, cluster_control_json)
                         continue
-                    # Compress the content of each file and surrounds it with separators.
-                    new_file = f'{file}{PATH_SEP}'.encode() + zlib.compress(new_file, level=compress_level) + \
-                               FILE_SEP.encode()
-
-                if (len(new_file) + zip_size) <= max_zip_size:
-                    # Append the new compressed file to previous ones only if total size is under max allowed.
-                    zip_size += len(new_file)
-                    wf.write(new_file)
-                else:
-                    # Otherwise, remove it from cluster_control_json.
-                    result_logs['warning'][file].append('Maximum zip size exceeded. '
-                                                        'Not all files will be compressed during this sync.')
-                    exceeded_size = True
-                    update_cluster_control(file, cluster_control_json)
-            except zlib.error as e:
-                raise WazuhError(3001, str(e))
-            except Exception as e:
-                result_logs['debug'][file].append("Exception raised: " + str(WazuhException(3001, str(e))))
-                update_cluster_control(file, cluster_control_json, exists=False)
 
-        try:
-            # Compress and save cluster_control data as a JSON.
-            wf.write(f'files_metadata.json{PATH_SEP}'.encode() +
-                     zlib.compress(json.dumps(cluster_control_json).encode(), level=compress_level))
-        except Exception as e:
-            raise WazuhError(3001, str(e))
+                    encoded_path = file.encode()
+                    wf.write(FILE_HEADER.pack(codec_id, len(encoded_path), 0) + encoded_path)
+                    compressed_size = 0
+                    if future:
+                        chunks = future.result()
+                    elif delta is not None:
+                        compressor = get_compressor(codec, compress_level)
+                        chunks = [compressor.compress(delta), compressor.flush()]
+                    else:
+                        chunks = compress_file(path.join(common.WAZUH_PATH, file), codec, compress_level)
+                    for chunk in chunks:
+                        compressed_size += len(chunk)
+                        if zip_size + wf.tell() - record_start + len(chunk) > max_zip_size:
+                            exceeded_size = True
+                            break
+                        wf.write(chunk)
+
+                    if exceeded_size:
+                        # Remove the file from the zip and from cluster_control_json.
+                        wf.seek(record_start)
+                        wf.truncate()
+                        result_logs['warning'][file].append('Maximum zip size exceeded. '
+                                                            'Not all files will be compressed during this sync.')
+                        update_cluster_control(file, cluster_control_json)
+                    else:
+                        record_end = wf.tell()
+                        wf.seek(record_start)
+                        wf.write(FILE_HEADER.pack(codec_id, len(encoded_path), compressed_size))
+                        wf.seek(record_end)
+                        zip_size += record_end - record_start
+                        if delta is not None:
+                            deltas[file] = size - len(delta)
+                except zlib.error as e:
+                    raise WazuhError(3001, str(e))
+                except Exception as e:
+                    wf.seek(record_start)
+                    wf.truncate()
+                    result_logs['debug'][file].append("Exception raised: " + str(WazuhException(3001, str(e))))
+                    update_cluster_control(file, cluster_control_json, exists=False)
+
+            if signatures:
+                # The signatures are only needed by this node. The receiving node must know which files are deltas.
+                cluster_control_json = {filetype: {
+                    file_: {**{key: value for key, value in metadata.items() if key != 'signature'},
+                            **({'delta': True} if file_ in deltas else {})}
+                    for file_, metadata in files.items()} for filetype, files in cluster_control_json.items()}
+                result_logs['delta'] = {'files': len(deltas), 'saved': sum(deltas.values())}
+
+            try:
+                # Compress and save cluster_control data as a JSON.
+                compressor = get_compressor(codec, compress_level)
+                content = compressor.compress(json.dumps(cluster_control_json).encode()) + compressor.flush()
+                encoded_path = b'files_metadata.json'
+                wf.write(FILE_HEADER.pack(codec_id, len(encoded_path), len(content)) + encoded_path + content)
+            except Exception as e:
+                raise WazuhError(3001, str(e))
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
 
     return zip_file_path, result_logs
 
 
+def get_sync_artifact_key(list_path, cluster_control_json, max_zip_size, codec):
+    """Get a key that identifies the content of the file created by compress_files with the same arguments.
+
+    The metadata contains the hash of every file, so two syncs get the same key only if they would send the same
+    version of the same files. The signatures of the copies in the receiving node, which deltas depend on, are
+    replaced by a digest of them, so nodes with the same copies get the same key.
+
+    Parameters
+    ----------
+    list_path : Iterable
+        File paths to be zipped.
+    cluster_control_json : dict
+        KO files (path-metadata) to be compressed as a json.
+    max_zip_size : int
+        Maximum size from which no new files should be added to the zip.
+    codec : str
+        Compression codec.
+
+    Returns
+    -------
+    str
+        Hexadecimal BLAKE2b hash of the arguments.
+    """
+    if any('signature' in metadata for metadata in cluster_control_json.get('shared', {}).values()):
+        cluster_control_json = {**cluster_control_json, 'shared': {
+            file_: {**metadata, 'signature': hashlib.blake2b(json.dumps(metadata['signature'], sort_keys=True).encode(),
+                                                             digest_size=16).hexdigest()}
+            if 'signature' in metadata else metadata for file_, metadata in cluster_control_json['shared'].items()}}
+    return hashlib.blake2b(json.dumps([sorted(list_path), cluster_control_json, max_zip_size, codec],
+                                      sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
 async def async_decompress_files(zip_path, ko_files_name="files_metadata.json"):
     """Async wrapper for decompress_files() function.
 
@@ -461,8 +1183,9 @@ async def async_decompress_files(zip_path, ko_files_name="files_metadata.json"):
 def decompress_files(compress_path, ko_files_name="files_metadata.json"):
     """Decompress files in a directory and load the files_metadata.json as a dict.
 
-    To avoid consuming too many memory resources, the compressed file is read in chunks
-    of 'windows_size' and split based on a file separator.
+    Each file inside the compressed file is preceded by a FILE_HEADER with its compression codec and the length of
+    its path and content. The compressed file is memory-mapped and each file is decompressed in chunks straight into
+    its destination, so memory usage does not depend on the size of the files.
 
     Parameters
     ----------
@@ -479,37 +1202,34 @@ def decompress_files(compress_path, ko_files_name="files_metadata.json"):
         Full path to decompressed directory.
     """
     ko_files = ''
-    compressed_data = b''
-    window_size = 1024 * 1024 * 10  # 10 MiB
     decompress_dir = compress_path + 'dir'
 
     try:
         mkdir_with_mode(decompress_dir)
 
         with open(compress_path, 'rb') as rf:
-            while True:
-                new_data = rf.read(window_size)
-                compressed_data += new_data
-                files = compressed_data.split(FILE_SEP.encode())
-                if new_data:
-                    # If 'files' list contains only 1 item, it is probably incomplete, so it is not used.
-                    compressed_data = files.pop(-1)
-
-                for file in files:
-                    filepath, content = file.split(PATH_SEP.encode(), 1)
-                    content = zlib.decompress(content)
-                    full_path = os.path.join(decompress_dir, filepath.decode())
-                    if not os.path.exists(os.path.dirname(full_path)):
-                        try:
-                            os.makedirs(os.path.dirname(full_path))
-                        except OSError as exc:  # Guard against race condition
-                            if exc.errno != errno.EEXIST:
-                                raise
-                    with open(full_path, 'wb') as f:
-                        f.write(content)
-
-                if not new_data:
-                    break
+            if os.fstat(rf.fileno()).st_size:
+                # Records are parsed in place, so no window of the compressed file is copied or scanned twice.
+                with mmap.mmap(rf.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    offset = 0
+                    while offset < len(view):
+                        if offset + FILE_HEADER.size > len(view):
+                            raise ValueError('Truncated compressed file')
+                        codec_id, path_len, content_len = FILE_HEADER.unpack_from(view, offset)
+                        path_end = offset + FILE_HEADER.size + path_len
+                        offset = path_end + content_len
+                        if offset > len(view):
+                            raise ValueError('Truncated compressed file')
+                        filepath = str(view[path_end - path_len:path_end], 'utf-8')
+                        full_path = os.path.join(decompress_dir, filepath)
+                        if not os.path.exists(os.path.dirname(full_path)):
+                            try:
+                                os.makedirs(os.path.dirname(full_path))
+                            except OSError as exc:  # Guard against race condition
+                                if exc.errno != errno.EEXIST:
+                                    raise
+                        with open(full_path, 'wb') as wf, view[path_end:offset] as content:
+                            decompress_file(content, codec_id, wf)
 
         if path.exists(path.join(decompress_dir, ko_files_name)):
             with open(path.join(decompress_dir, ko_files_name)) as ko:
@@ -525,6 +1245,94 @@ def decompress_files(compress_path, ko_files_name="files_metadata.json"):
     return ko_files, decompress_dir
 
 
+def _hash_entries(entries):
+    """Calculate a short BLAKE2b hash of a collection of strings, regardless of their order.
+
+    Parameters
+    ----------
+    entries : iterable
+        Strings to hash.
+
+    Returns
+    -------
+    str
+        Hexadecimal hash.
+    """
+    return hashlib.blake2b(''.join(sorted(entries)).encode(), digest_size=16).hexdigest()
+
+
+def get_integrity_tree(files_metadata):
+    """Build a tree of hashes from the metadata of the files.
+
+    Files are grouped by cluster_item_key and directory. The hash of each directory is calculated from the name and
+    BLAKE2b hash of its files, and the hash of each cluster_item_key from the name and hash of its directories. Two
+    nodes only need to exchange the subtrees whose hashes differ to find the files that differ.
+
+    Parameters
+    ----------
+    files_metadata : dict
+        Paths (keys) and metadata (values) of the files, as returned by get_files_status().
+
+    Returns
+    -------
+    tree : dict
+        Cluster item keys (keys) and dicts (values) with the hash of the whole subtree ('hash') and the hash of each
+        directory ('dirs').
+    """
+    entries = defaultdict(lambda: defaultdict(list))
+    for file_path, metadata in files_metadata.items():
+        dirname, filename = path.split(file_path)
+        entries[metadata['cluster_item_key']][dirname].append(f"{filename}\0{metadata['hash']}\n")
+
+    tree = {}
+    for cluster_item_key, dirs in entries.items():
+        dir_hashes = {dirname: _hash_entries(dir_entries) for dirname, dir_entries in dirs.items()}
+        tree[cluster_item_key] = {'hash': _hash_entries(f"{dirname}\0{dir_hash}\n"
+                                                        for dirname, dir_hash in dir_hashes.items()),
+                                  'dirs': dir_hashes}
+
+    return tree
+
+
+def compare_integrity_tree(local_hashes, remote_hashes):
+    """Get the subtrees whose hashes differ between two nodes, including the ones that only exist in one of them.
+
+    Parameters
+    ----------
+    local_hashes : dict
+        Names (keys) and hashes (values) of the local subtrees.
+    remote_hashes : dict
+        Names (keys) and hashes (values) of the remote subtrees.
+
+    Returns
+    -------
+    set
+        Names of the subtrees that differ.
+    """
+    return {name for name in local_hashes.keys() | remote_hashes.keys()
+            if local_hashes.get(name) != remote_hashes.get(name)}
+
+
+def filter_files_by_scope(files_metadata, scope):
+    """Get the metadata of the files inside the given directories.
+
+    Parameters
+    ----------
+    files_metadata : dict
+        Paths (keys) and metadata (values) of the files.
+    scope : dict
+        Cluster item keys (keys) and directories (values) whose files are kept.
+
+    Returns
+    -------
+    dict
+        Paths (keys) and metadata (values) of the files inside the given directories.
+    """
+    scope = {cluster_item_key: set(dirs) for cluster_item_key, dirs in scope.items()}
+    return {file_path: metadata for file_path, metadata in files_metadata.items()
+            if path.dirname(file_path) in scope.get(metadata['cluster_item_key'], ())}
+
+
 def compare_files(good_files, check_files, node_name):
     """Compare metadata of the master files with metadata of files sent by a worker node.
 
@@ -608,6 +1416,11 @@ def compare_files(good_files, check_files, node_name):
     else:
         shared_files = {key: good_files[key] for key in shared}
 
+    # Keep the signature of the worker's copy of the shared files, so only their differences are sent.
+    for key in shared_files.keys() & check_files.keys():
+        if 'signature' in check_files[key]:
+            shared_files[key] = {**shared_files[key], 'signature': check_files[key]['signature']}
+
     return {'missing': missing_files, 'extra': extra_files, 'shared': shared_files}
 
 
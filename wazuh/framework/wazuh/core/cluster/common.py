@@ -5,6 +5,7 @@
 import ast
 import asyncio
 import base64
+import collections
 import contextlib
 import datetime
 import hashlib
@@ -17,21 +18,54 @@ import struct
 import time
 import traceback
 from importlib import import_module
-from typing import Tuple, Dict, Callable, List, Iterable, Union, Any
+from typing import Tuple, Dict, Callable, List, Iterable, Union, Any, BinaryIO
 from uuid import uuid4
 
+import cryptography.exceptions
 import cryptography.fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 import wazuh.core.results as wresults
 from wazuh import Wazuh
 from wazuh.core import common, exception
 from wazuh.core import utils
 from wazuh.core.cluster import cluster, utils as cluster_utils
-from wazuh.core.wdb import AsyncWazuhDBConnection, WazuhDBConnection
+from wazuh.core.wdb import AsyncWazuhDBConnection
 from wazuh.core.wdb_http import get_wdb_http_client
 
 IGNORED_WDB_EXCEPTIONS = ['Cannot execute Global database query; FOREIGN KEY constraint failed']
 
+# Ciphers used to encrypt the messages between cluster nodes, from the most to the least preferred. Fernet is always
+# available and it is the only one known by older nodes.
+CIPHERS = ['aes-gcm', 'fernet']
+# First bytes of the AES-GCM nonces of each node type. AES-GCM payloads start with the nonce, so they can be told apart
+# from Fernet tokens, which always start with 'g'.
+MASTER_NONCE_PREFIX = b'\x00\x00\x00\x01'
+WORKER_NONCE_PREFIX = b'\x00\x00\x00\x02'
+NONCE_SIZE = 12
+
+
+def negotiate_cipher(preferred_cipher: str, peer_ciphers: List[str]) -> str:
+    """Choose the cipher used to encrypt the messages sent between this node and a peer.
+
+    Parameters
+    ----------
+    preferred_cipher : str
+        Cipher configured in cluster.json.
+    peer_ciphers : list
+        Ciphers available in the peer node.
+
+    Returns
+    -------
+    str
+        The preferred cipher if both nodes support it, 'fernet' otherwise.
+    """
+    if preferred_cipher in CIPHERS and preferred_cipher in peer_ciphers:
+        return preferred_cipher
+    return 'fernet'
+
 
 class Response:
     """
@@ -84,12 +118,13 @@ class InBuffer:
         self.flag_divided = b''  # request's command flag to indicate a msg division
         self.counter = 0  # request's counter in the box
 
-    def get_info_from_header(self, header: bytes, header_format: str, header_size: int) -> bytes:
+    def get_info_from_header(self, header: Union[bytes, memoryview], header_format: str,
+                             header_size: int) -> Union[bytes, memoryview]:
         """Get information contained in the request's header.
 
         Parameters
         ----------
-        header : bytes
+        header : bytes or memoryview
             Raw header to process.
         header_format : str
             Struct format of the header.
@@ -98,7 +133,7 @@ class InBuffer:
 
         Returns
         -------
-        header : bytes
+        header : bytes or memoryview
             Buffer without the content of the header.
         """
         self.counter, self.total, cmd = struct.unpack(header_format, header[:header_size])
@@ -111,20 +146,20 @@ class InBuffer:
         self.payload = bytearray(self.total)
         return header[header_size:]
 
-    def receive_data(self, data: bytes) -> bytes:
+    def receive_data(self, data: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
         """Add received data to payload bytearray.
 
         Parameters
         ----------
-        data : bytes
-            Received data.
+        data : bytes or memoryview
+            Received data. Using a memoryview avoids copying the data that does not belong to this payload.
 
         Returns
         -------
-            Extended data buffer.
+            Received data that does not belong to this payload.
         """
-        len_data = len(data[:self.total - self.received])
-        self.payload[self.received:len_data + self.received] = data[:self.total - self.received]
+        len_data = min(len(data), self.total - self.received)
+        self.payload[self.received:len_data + self.received] = data[:len_data]
         self.received += len_data
         return data[len_data:]
 
@@ -323,7 +358,7 @@ class Handler(asyncio.Protocol):
         self.counter = random.SystemRandom().randint(0, 2 ** 32 - 1)
         # The box stores all sent messages IDs.
         self.box = {}
-        # The div_msg_box stores all divided messages under its IDs.
+        # The div_msg_box stores the received parts of the divided messages under their IDs.
         self.div_msg_box = {}
         # Defines command length.
         self.cmd_len = 12
@@ -331,8 +366,10 @@ class Handler(asyncio.Protocol):
         self.header_len = self.cmd_len + 8  # 4 bytes of counter and 4 bytes of message size
         # Defines header format.
         self.header_format = f'!2I{self.cmd_len}s'
-        # Stores received data.
-        self.in_buffer = b''
+        # Received data that has not been parsed yet. It is a view of the data passed to data_received().
+        self.in_buffer = memoryview(b'')
+        # Stores the beginning of a header split between two reads.
+        self.header_buffer = bytearray()
         # Stores last received message.
         self.in_msg = InBuffer()
         # Stores incoming file information from file commands.
@@ -343,6 +380,16 @@ class Handler(asyncio.Protocol):
         self.request_chunk = 5242880
         # Object use to encrypt and decrypt requests.
         self.my_fernet = cryptography.fernet.Fernet(base64.b64encode(fernet_key.encode())) if fernet_key else None
+        # Key shared by the cluster nodes, used to derive the AES-GCM key of the connection.
+        self.cluster_key = fernet_key.encode() if fernet_key else None
+        # Cipher used to encrypt the sent messages. See negotiate_cipher().
+        self.cipher = 'fernet'
+        # AES-GCM object of the connection and prefixes of the nonces used by this node and the peer.
+        self.my_aesgcm = None
+        self.nonce_prefix = b''
+        self.peer_nonce_prefix = b''
+        # Number of messages encrypted with AES-GCM, used as the variable part of the nonce.
+        self.nonce_counter = 0
         # Logging.Logger object used to write logs.
         self.logger = logging.getLogger('wazuh') if not logger else logger
         # Logging tag.
@@ -359,15 +406,15 @@ class Handler(asyncio.Protocol):
         # Abstract server object.
         self.server = None
 
-    def push(self, message: bytes):
-        """Send a message to peer.
+    def push(self, messages: List[Union[bytes, memoryview]]):
+        """Send messages to peer.
 
         Parameters
         ----------
-        message : bytes
-            Message to send.
+        messages : list
+            Buffers to send, as returned by msg_build(). They are handed to the transport in a single call.
         """
-        self.transport.write(message)
+        self.transport.writelines(messages)
 
     def next_counter(self) -> int:
         """Increase the message ID counter.
@@ -380,11 +427,86 @@ class Handler(asyncio.Protocol):
         self.counter = (self.counter + 1) % (2 ** 32)
         return self.counter
 
-    def msg_build(self, command: bytes, counter: int, data: bytes) -> List[bytearray]:
+    def setup_cipher(self, salt: bytes, is_master: bool):
+        """Derive the AES-GCM key of the connection from the cluster key.
+
+        Once it is called, AES-GCM messages from the peer can be decrypted. The sent messages are encrypted with
+        AES-GCM when self.cipher is 'aes-gcm', which happens as soon as an AES-GCM message is received from the peer.
+
+        Parameters
+        ----------
+        salt : bytes
+            Random salts chosen by the worker and the master for this connection, in that order. As both nodes take
+            part in it, a replayed hello does not lead to a key used before.
+        is_master : bool
+            Whether this node is the master of the connection. The nonces of each side start with a different prefix,
+            so they are never reused with the same key.
+        """
+        key = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt,
+                   info=b'wazuh cluster aes-gcm').derive(self.cluster_key)
+        self.my_aesgcm = AESGCM(key)
+        self.nonce_prefix, self.peer_nonce_prefix = (MASTER_NONCE_PREFIX, WORKER_NONCE_PREFIX) if is_master \
+            else (WORKER_NONCE_PREFIX, MASTER_NONCE_PREFIX)
+        self.nonce_counter = 0
+
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypt a payload with the cipher of the connection.
+
+        AES-GCM payloads are made of the nonce followed by the ciphertext and the authentication tag.
+
+        Parameters
+        ----------
+        data : bytes
+            Data to encrypt.
+
+        Returns
+        -------
+        bytes
+            Encrypted data. It is not modified if there is no cluster key.
+        """
+        if self.cipher == 'aes-gcm' and self.my_aesgcm is not None:
+            self.nonce_counter += 1
+            nonce = self.nonce_prefix + self.nonce_counter.to_bytes(NONCE_SIZE - len(self.nonce_prefix), 'big')
+            return nonce + self.my_aesgcm.encrypt(nonce, data, None)
+        return self.my_fernet.encrypt(data) if self.my_fernet is not None else data
+
+    def decrypt(self, data: bytes) -> bytes:
+        """Decrypt a payload received from the peer.
+
+        Both AES-GCM and Fernet payloads are accepted, so the peer can switch its cipher at any time.
+
+        Parameters
+        ----------
+        data : bytes
+            Data to decrypt.
+
+        Raises
+        ------
+        WazuhClusterError(3025)
+            If the payload could not be decrypted or authenticated.
+
+        Returns
+        -------
+        bytes
+            Decrypted data. It is not modified if there is no cluster key.
+        """
+        try:
+            if self.my_aesgcm is not None and data[:len(self.peer_nonce_prefix)] == self.peer_nonce_prefix:
+                with memoryview(data) as view:
+                    decrypted = self.my_aesgcm.decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], None)
+                # The peer has derived the same key, so it can be used to send messages too.
+                self.cipher = 'aes-gcm'
+                return decrypted
+            return self.my_fernet.decrypt(bytes(data)) if self.my_fernet is not None else bytes(data)
+        except (cryptography.fernet.InvalidToken, cryptography.exceptions.InvalidTag):
+            raise exception.WazuhClusterError(3025)
+
+    def msg_build(self, command: bytes, counter: int, data: bytes) -> List[Union[bytes, memoryview]]:
         """Build messages with header + payload.
 
         Each message contains a header in self.header_format format that includes self.counter, the data size and the
-        command. The data is also encrypted and added to the bytearray starting from the position self.header_len.
+        command. The data is encrypted and the payload of each message is a view of the encrypted data, so it is not
+        copied before being sent.
 
         Parameters
         ----------
@@ -398,7 +520,7 @@ class Handler(asyncio.Protocol):
         Returns
         -------
         list
-            List of Bytes, built messages.
+            Header and payload of each message, one after the other.
         """
         cmd_len = len(command)
         # cmd_len must be 12 - 1 (Byte reserved for the flag used in message division)
@@ -407,41 +529,24 @@ class Handler(asyncio.Protocol):
 
         # Adds - to command until it reaches cmd length
         command = command + b' ' + b'-' * (self.cmd_len - cmd_len - 1)
-        encrypted_data = self.my_fernet.encrypt(data) if self.my_fernet is not None else data
-        encrypted_message_size = self.header_len + len(encrypted_data)
+        encrypted_data = self.encrypt(data)
 
         # Message size is <= request_chunk, send the message
         if len(data) <= self.request_chunk:
-            msg = bytearray(encrypted_message_size)
-            msg[:self.header_len] = struct.pack(self.header_format, counter, len(encrypted_data), command)
-            msg[self.header_len:encrypted_message_size] = encrypted_data
-            return [msg]
+            return [struct.pack(self.header_format, counter, len(encrypted_data), command), encrypted_data]
 
-        # Message size > request_chunk, send the message divided
-        else:
-            # Command with the flag d (divided)
-            command = command[:-len(InBuffer.divide_flag)] + InBuffer.divide_flag
-            msg_list = []
-            partial_data_size = 0
-            data_size = len(encrypted_data)
-            while partial_data_size < data_size:
-                message_size = self.request_chunk \
-                    if data_size - partial_data_size + self.header_len >= self.request_chunk \
-                    else data_size - partial_data_size + self.header_len
-
-                # Last divided message, remove the flag
-                if message_size == data_size - partial_data_size + self.header_len:
-                    command = command[:-len(InBuffer.divide_flag)] + b'-' * len(InBuffer.divide_flag)
-
-                msg = bytearray(message_size)
-                msg[:self.header_len] = struct.pack(self.header_format, counter, message_size - self.header_len,
-                                                    command)
-                msg[self.header_len:message_size] = encrypted_data[
-                                                    partial_data_size:partial_data_size + message_size - self.header_len]
-                partial_data_size += message_size - self.header_len
-                msg_list.append(msg)
-
-            return msg_list
+        # Message size > request_chunk, send the message divided. All the parts but the last one have the flag d.
+        divided_command = command[:-len(InBuffer.divide_flag)] + InBuffer.divide_flag
+        chunk_size = self.request_chunk - self.header_len
+        encrypted_view = memoryview(encrypted_data)
+        msg_list = []
+        for offset in range(0, len(encrypted_data), chunk_size):
+            payload = encrypted_view[offset:offset + chunk_size]
+            msg_list.append(struct.pack(self.header_format, counter, len(payload),
+                                        command if offset + chunk_size >= len(encrypted_data) else divided_command))
+            msg_list.append(payload)
+
+        return msg_list
 
     def msg_parse(self) -> bool:
         """Parse an incoming message.
@@ -452,15 +557,27 @@ class Handler(asyncio.Protocol):
             Whether a message was parsed or not.
         """
         if self.in_buffer:
-            # Check if a new message was received.
-            if self.in_msg.received == 0 and len(self.in_buffer) >= self.header_len:
+            # Check if a new message was received. A message whose header has already been parsed has a total size.
+            if self.in_msg.received == 0 and self.in_msg.total == 0:
+                # Wait for the rest of the header if it was split between two reads.
+                missing = self.header_len - len(self.header_buffer)
+                if len(self.in_buffer) < missing:
+                    self.header_buffer += self.in_buffer
+                    self.in_buffer = memoryview(b'')
+                    return False
+                if self.header_buffer:
+                    header = self.header_buffer + self.in_buffer[:missing]
+                    self.in_buffer = self.in_buffer[missing:]
+                    self.header_buffer = bytearray()
+                else:
+                    header, self.in_buffer = self.in_buffer[:self.header_len], self.in_buffer[self.header_len:]
+
                 # A new message has been received. Both header and payload must be processed.
-                self.in_buffer = self.in_msg.get_info_from_header(header=self.in_buffer,
-                                                                  header_format=self.header_format,
-                                                                  header_size=self.header_len)
+                self.in_msg.get_info_from_header(header=header, header_format=self.header_format,
+                                                 header_size=self.header_len)
                 self.in_buffer = self.in_msg.receive_data(data=self.in_buffer)
                 return True
-            elif self.in_msg.received != 0:
+            else:
                 # The previous message has not been completely received yet. No header to parse, just payload.
                 self.in_buffer = self.in_msg.receive_data(data=self.in_buffer)
                 return True
@@ -490,14 +607,10 @@ class Handler(asyncio.Protocol):
         while parsed:
             if self.in_msg.received == self.in_msg.total:
                 # Decrypt received message if it is not a part of a divided message
-                try:
-                    decrypted_payload = \
-                        self.my_fernet.decrypt(bytes(self.in_msg.payload)) \
-                            if self.my_fernet is not None and not self.in_msg.flag_divided and \
-                               self.in_msg.counter not in self.div_msg_box \
-                            else bytes(self.in_msg.payload)
-                except cryptography.fernet.InvalidToken:
-                    raise exception.WazuhClusterError(3025)
+                decrypted_payload = \
+                    self.decrypt(self.in_msg.payload) \
+                        if not self.in_msg.flag_divided and self.in_msg.counter not in self.div_msg_box \
+                        else self.in_msg.payload
                 yield self.in_msg.cmd, self.in_msg.counter, decrypted_payload, self.in_msg.flag_divided
                 self.in_msg = InBuffer()
             else:
@@ -523,9 +636,7 @@ class Handler(asyncio.Protocol):
         msg_counter = self.next_counter()
         self.box[msg_counter] = response
         try:
-            msgs = self.msg_build(command, msg_counter, data)
-            for msg in msgs:
-                self.push(msg)
+            self.push(self.msg_build(command, msg_counter, data))
         except MemoryError:
             self.request_chunk //= 2
             raise exception.WazuhClusterError(3026)
@@ -620,7 +731,7 @@ class Handler(asyncio.Protocol):
 
         return result
 
-    async def send_file(self, filename: str, task_id: bytes = None) -> int:
+    async def send_file(self, filename: str, task_id: bytes = None, destination: str = None) -> int:
         """Send a file to peer, slicing it into chunks.
 
         Parameters
@@ -629,6 +740,8 @@ class Handler(asyncio.Protocol):
             Full path of the file to send.
         task_id : bytes
             Task identifier to stop sending file if needed.
+        destination : str
+            Full path where the file is written in the destination node. By default, the same as filename.
 
         Returns
         -------
@@ -639,8 +752,7 @@ class Handler(asyncio.Protocol):
             raise exception.WazuhClusterError(3034, extra_message=filename)
 
         sent_size = 0
-        filename = filename.encode()
-        relative_path = filename.replace(common.WAZUH_PATH.encode(), b'')
+        relative_path = (destination or filename).encode().replace(common.WAZUH_PATH.encode(), b'')
 
         try:
             # Tell to the destination node where (inside wazuh_path) the file has to be written.
@@ -651,17 +763,21 @@ class Handler(asyncio.Protocol):
 
         # Send each chunk so it is updated in the destination.
         file_hash = hashlib.sha256()
+        window = self.cluster_items['intervals']['communication']['file_transfer_window']
         with open(filename, 'rb') as f:
-            for chunk in iter(lambda: f.read(self.request_chunk - len(relative_path) - 1), b''):
-                try:
-                    await self.send_request(command=b'file_upd', data=relative_path + b' ' + chunk)
-                except exception.WazuhClusterError as e:
-                    if e.code != 3020:
-                        raise e
-                file_hash.update(chunk)
-                sent_size += len(chunk)
-                if task_id in self.interrupted_tasks:
-                    break
+            if window > 1:
+                sent_size = await self.send_file_window(f, relative_path, file_hash, window, task_id)
+            else:
+                for chunk in iter(lambda: f.read(self.request_chunk - len(relative_path) - 1), b''):
+                    try:
+                        await self.send_request(command=b'file_upd', data=relative_path + b' ' + chunk)
+                    except exception.WazuhClusterError as e:
+                        if e.code != 3020:
+                            raise e
+                    file_hash.update(chunk)
+                    sent_size += len(chunk)
+                    if task_id in self.interrupted_tasks:
+                        break
 
         try:
             # Close the destination file descriptor so the file in memory is dumped to disk.
@@ -672,6 +788,69 @@ class Handler(asyncio.Protocol):
 
         return sent_size
 
+    async def send_file_window(self, f: BinaryIO, relative_path: bytes, file_hash, window: int,
+                               task_id: bytes = None) -> int:
+        """Send the content of a file to peer keeping up to `window` chunks in flight.
+
+        Instead of waiting for the response of each chunk before sending the next one, chunks are sent along with
+        their offset in the file (`file_upd_at` command). The peer answers each of them with the number of contiguous
+        bytes written so far, so the acknowledgements are cumulative: a chunk whose response timed out is confirmed
+        by the response of any later chunk.
+
+        Parameters
+        ----------
+        f : BinaryIO
+            File object opened in binary read mode.
+        relative_path : bytes
+            Path of the file inside the Wazuh path of the destination node.
+        file_hash : hashlib._Hash
+            Hash object updated with every chunk that is sent.
+        window : int
+            Maximum number of chunks sent and not acknowledged yet.
+        task_id : bytes
+            Task identifier to stop sending file if needed.
+
+        Returns
+        -------
+        sent_size : int
+            Number of bytes that were successfully sent.
+        """
+        # Space for the path, the offset (up to 20 digits) and the separators.
+        chunk_size = self.request_chunk - len(relative_path) - 22
+        in_flight = collections.deque()
+        sent_size = acknowledged = 0
+
+        async def wait_oldest_chunk() -> int:
+            """Wait for the response of the oldest chunk in flight and get the acknowledged bytes."""
+            try:
+                response = await in_flight.popleft()
+            except exception.WazuhClusterError as e:
+                if e.code != 3020:
+                    raise e
+                return acknowledged
+            return max(acknowledged, int(response)) if isinstance(response, bytes) and response.isdigit() \
+                else acknowledged
+
+        try:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                while in_flight and sent_size - acknowledged >= window * chunk_size:
+                    acknowledged = await wait_oldest_chunk()
+                in_flight.append(asyncio.create_task(
+                    self.send_request(command=b'file_upd_at',
+                                      data=b' '.join((relative_path, str(sent_size).encode(), chunk)))))
+                file_hash.update(chunk)
+                sent_size += len(chunk)
+                if task_id in self.interrupted_tasks:
+                    break
+
+            while in_flight:
+                acknowledged = await wait_oldest_chunk()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        return sent_size
+
     async def send_string(self, my_str: bytes) -> bytes:
         """Send a large string to peer, slicing it into chunks.
 
@@ -776,25 +955,21 @@ class Handler(asyncio.Protocol):
         message : bytes
             Received data.
         """
-        self.in_buffer += message
+        # The received data is parsed through a view, so the pending data is not copied after each message.
+        self.in_buffer = memoryview(message)
         for command, counter, payload, flag_divided in self.get_messages():
             # If the message is a divided one
             if flag_divided == InBuffer.divide_flag:
                 try:
-                    self.div_msg_box[counter] = self.div_msg_box[counter] + payload
+                    self.div_msg_box[counter].append(payload)
                 except KeyError:
-                    self.div_msg_box[counter] = payload
+                    self.div_msg_box[counter] = [payload]
             else:
-                # If the message is the last part of a division, join it.
+                # If the message is the last part of a division, join all the parts at once.
                 if counter in self.div_msg_box:
-                    payload = self.div_msg_box[counter] + payload
-                    del self.div_msg_box[counter]
+                    self.div_msg_box[counter].append(payload)
                     # Decrypt the joined payload
-                    try:
-                        payload = self.my_fernet.decrypt(bytes(payload)) if self.my_fernet is not \
-                                                                            None else bytes(payload)
-                    except cryptography.fernet.InvalidToken:
-                        raise exception.WazuhClusterError(3025)
+                    payload = self.decrypt(b''.join(self.div_msg_box.pop(counter)))
 
                 # If the message is the response of a previously sent request.
                 if counter in self.box:
@@ -829,9 +1004,7 @@ class Handler(asyncio.Protocol):
             command, payload = b'err', json.dumps(exception.WazuhInternalError(1000, extra_message=str(e)),
                                                   cls=WazuhJSONEncoder).encode()
         if command is not None:
-            msgs = self.msg_build(command, counter, payload)
-            for msg in msgs:
-                self.push(msg)
+            self.push(self.msg_build(command, counter, payload))
 
     def close(self):
         """Close the connection."""
@@ -862,6 +1035,8 @@ class Handler(asyncio.Protocol):
             return self.receive_str(data)
         elif command == b'file_upd':
             return self.update_file(data)
+        elif command == b'file_upd_at':
+            return self.update_file_at(data)
         elif command == b'str_upd':
             return self.str_upd(data)
         elif command == b'err_str':
@@ -955,7 +1130,8 @@ class Handler(asyncio.Protocol):
         bytes
             Response message.
         """
-        self.in_file[data] = {'fd': open(common.WAZUH_PATH + data.decode(), 'wb'), 'checksum': hashlib.sha256()}
+        self.in_file[data] = {'fd': open(common.WAZUH_PATH + data.decode(), 'wb'), 'checksum': hashlib.sha256(),
+                              'received': 0}
         return b"ok ", b"Ready to receive new file"
 
     def update_file(self, data: bytes) -> Tuple[bytes, bytes]:
@@ -978,6 +1154,37 @@ class Handler(asyncio.Protocol):
         self.in_file[name]['checksum'].update(file_content)
         return b"ok", b"File updated"
 
+    def update_file_at(self, data: bytes) -> Tuple[bytes, bytes]:
+        """Write a chunk of the file content at the given offset.
+
+        The checksum is updated while chunks are received in order. Otherwise, it is calculated from the file once it
+        is completely received.
+
+        Parameters
+        ----------
+        data : bytes
+            Bytes containing filepath, offset and data separated by ' '.
+
+        Returns
+        -------
+        bytes
+            Result.
+        bytes
+            Number of contiguous bytes received since the beginning of the file.
+        """
+        name, offset, file_content = data.split(b' ', 2)
+        in_file = self.in_file[name]
+        offset = int(offset)
+        in_file['fd'].seek(offset)
+        in_file['fd'].write(file_content)
+        if offset == in_file['received'] and in_file['checksum'] is not None:
+            in_file['checksum'].update(file_content)
+        else:
+            in_file['checksum'] = None
+        if offset <= in_file['received']:
+            in_file['received'] = max(in_file['received'], offset + len(file_content))
+        return b"ok", str(in_file['received']).encode()
+
     def end_file(self, data: bytes) -> Tuple[bytes, bytes]:
         """Close file descriptor (write file in disk) and check BLAKE2b.
 
@@ -995,6 +1202,12 @@ class Handler(asyncio.Protocol):
         """
         name, checksum = data.split(b' ', 1)
         self.in_file[name]['fd'].close()
+        if self.in_file[name]['checksum'] is None:
+            # Chunks were not received in order.
+            self.in_file[name]['checksum'] = hashlib.sha256()
+            with open(self.in_file[name]['fd'].name, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.request_chunk), b''):
+                    self.in_file[name]['checksum'].update(chunk)
         if self.in_file[name]['checksum'].digest() == checksum:
             del self.in_file[name]
             return b"ok", b"File received correctly"
@@ -1202,6 +1415,8 @@ class WazuhCommon:
     def __init__(self):
         """Class constructor."""
         self.sync_tasks = {}
+        # Codec used to compress the files sent to the peer. It is negotiated in the hello request.
+        self.compression_codec = 'zlib'
 
     @staticmethod
     async def recalculate_group_hash(logger) -> None:
@@ -1424,6 +1639,23 @@ class SyncFiles(SyncTask):
     Define methods to synchronize files with a remote node.
     """
 
+    def __init__(self, cmd: bytes, logger, manager, artifacts=None):
+        """Class constructor.
+
+        Parameters
+        ----------
+        cmd : bytes
+            Request command to send to the master/worker.
+        logger : Logger object
+            Logger to use during synchronization process.
+        manager : MasterHandler/WorkerHandler object
+            The MasterHandler/WorkerHandler object that creates this one.
+        artifacts : SyncArtifactCache object or None
+            Cache used to share the compressed files with other syncs. If None, a new compressed file is created.
+        """
+        super().__init__(cmd, logger, manager)
+        self.artifacts = artifacts
+
     async def sync(self, files: Iterable, files_metadata: Dict, metadata_len: int, task_pool=None,
                    zip_limit: int = None):
         """Send metadata and files to other node.
@@ -1457,10 +1689,18 @@ class SyncFiles(SyncTask):
 
         self.logger.debug(f"Compressing {'files and ' if files else ''}"
                           f"'files_metadata.json' of {metadata_len} files.")
-        compressed_data, logs = await cluster.run_in_pool(self.server.loop, task_pool, cluster.compress_files,
-                                                          self.server.name, files, files_metadata, zip_limit)
+        if self.artifacts is None:
+            compressed_data, logs = await cluster.run_in_pool(self.server.loop, task_pool, cluster.compress_files,
+                                                              self.server.name, files, files_metadata, zip_limit,
+                                                              self.server.compression_codec)
+        else:
+            compressed_data, logs = await self.artifacts.acquire(files, files_metadata, zip_limit,
+                                                                 self.server.compression_codec)
 
         cluster_utils.log_subprocess_execution(self.logger, logs)
+        if logs.get('delta'):
+            self.logger.info(f"Files sent as a delta: {logs['delta']['files']} | "
+                             f"Bytes saved: {logs['delta']['saved']}")
 
         try:
             # Start the synchronization process with peer node and get a taskID.
@@ -1470,17 +1710,20 @@ class SyncFiles(SyncTask):
                 task_id = b'None'
                 raise
 
-            # Send zip file to the master into chunks.
+            # Send zip file to the master into chunks. The compressed file could be shared with other nodes, so it is
+            # written in the directory of the peer node in the destination.
             self.logger.debug("Sending zip file.")
+            destination = os.path.join(common.WAZUH_PATH, 'queue', 'cluster', self.server.name,
+                                       os.path.basename(compressed_data))
             time_to_send = time.perf_counter()
-            sent_size = await self.server.send_file(compressed_data, task_id)
+            sent_size = await self.server.send_file(compressed_data, task_id, destination=destination)
             time_to_send = time.perf_counter() - time_to_send
             self.logger.debug("Zip file sent.")
 
             # Notify what is the zip path for the current taskID.
             await self.server.send_request(
                 command=self.cmd + b'_e',
-                data=task_id + b' ' + os.path.relpath(compressed_data, common.WAZUH_PATH).encode()
+                data=task_id + b' ' + os.path.relpath(destination, common.WAZUH_PATH).encode()
             )
         except Exception as e:
             self.logger.error(f"Error sending zip file: {e}")
@@ -1508,12 +1751,16 @@ class SyncFiles(SyncTask):
                     self.logger.debug(f"Increasing sync size limit to {self.server.current_zip_limit / (1024**2):.2f}"
                                       f" MB.")
 
-            try:
-                # Remove local file.
-                os.unlink(compressed_data)
-            except FileNotFoundError:
-                self.logger.error(f"File {compressed_data} could not be removed/not found. "
-                                  f"May be due to a lost connection.")
+            if self.artifacts is not None:
+                # The file is removed once no other sync is using it.
+                self.artifacts.release(compressed_data)
+            else:
+                try:
+                    # Remove local file.
+                    os.unlink(compressed_data)
+                except FileNotFoundError:
+                    self.logger.error(f"File {compressed_data} could not be removed/not found. "
+                                      f"May be due to a lost connection.")
 
 
 class SyncWazuhdb(SyncTask):
@@ -1538,7 +1785,8 @@ class SyncWazuhdb(SyncTask):
         logger : Logger object
             Logger to use during synchronization process.
         data_retriever : Callable
-            Function to be called to obtain chunks of data. It must return a list of chunks.
+            Function to be called to obtain chunks of data, like `AsyncWazuhDBConnection.iterate`. It must return an
+            asynchronous iterator of the status and payload of each page.
         get_payload : dict
             Payload to request information with "get" command.
         set_payload : dict
@@ -1571,27 +1819,17 @@ class SyncWazuhdb(SyncTask):
             List of results obtained from WDB.
         """
         pivoting = self.get_payload != {} and self.pivot_key != ''
-        status = ''
         chunks = []
-        last_pivot_value = 0
         if pivoting:
-            self.get_payload[self.pivot_key] = last_pivot_value
+            self.get_payload[self.pivot_key] = 0
 
         try:
-            # Retrieve information from local wazuh-db
+            # Retrieve information from local wazuh-db. Each page is requested while the previous one is processed
             start_time = time.perf_counter()
-            while status != 'ok':
-                command = self.get_data_command + json.dumps(self.get_payload)
-                result = await self.data_retriever(command=command)
-                status = result[0]
+            async for result in self.data_retriever(command=self.get_data_command, payload=self.get_payload,
+                                                    pivot_key=self.pivot_key if pivoting else None):
                 if result[1] not in ['[]', '[{"data":[]}]']:
                     chunks.append(result[1])
-                if pivoting:
-                    try:
-                        last_pivot_value = json.loads(result[1])[-1]['data'][-1]['id']
-                        self.get_payload[self.pivot_key] = last_pivot_value
-                    except (IndexError, KeyError):
-                        pass
         except exception.WazuhException as e:
             self.logger.error(f"Could not obtain data from wazuh-db: {e}")
             return []
@@ -1740,28 +1978,32 @@ async def send_data_to_wdb(data, timeout, info_type='agent-info'):
 
                 result['updated_chunks'] += len(agents_sync)
             elif info_type == 'agent-groups':
-                wdb_conn = WazuhDBConnection()
-
+                commands = []
                 for i, chunk in enumerate(data['chunks']):
                     try:
                         data['payload']['data'] = json.loads(chunk)[0]['data']
-                        wdb_conn.send(
-                            f"{data['set_data_command']} {json.dumps(data['payload'], separators=(',', ':'))}",
-                            raw=True
-                        )
-                        result['updated_chunks'] += 1
-                    except TimeoutError as e:
-                        wdb_conn.close()
-                        raise e
+                        commands.append(
+                            (i, f"{data['set_data_command']} {json.dumps(data['payload'], separators=(',', ':'))}"))
                     except Exception as e:
-                        error = str(e)
+                        result['error_messages']['chunks'].append((i, str(e)))
 
-                        if any(ignored_exception in error for ignored_exception in IGNORED_WDB_EXCEPTIONS):
-                            continue
+                # Chunks are independent, so they are sent without waiting for the previous response
+                wdb_conn = AsyncWazuhDBConnection()
+                try:
+                    responses = await wdb_conn.run_many((command for _, command in commands), return_exceptions=True)
+                finally:
+                    wdb_conn.close()
 
+                for (i, _), response in zip(commands, responses):
+                    if not isinstance(response, Exception):
+                        result['updated_chunks'] += 1
+                        continue
+
+                    error = str(response)
+                    if not any(ignored_exception in error for ignored_exception in IGNORED_WDB_EXCEPTIONS):
                         result['error_messages']['chunks'].append((i, error))
-                
-                wdb_conn.close()
+
+                result['error_messages']['chunks'].sort()
     except TimeoutError:
         result['error_messages']['others'].append(f'Timeout while processing {info_type} chunks.')
     except Exception as e:
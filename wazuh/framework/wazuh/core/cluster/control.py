@@ -102,6 +102,30 @@ async def get_node(lc: local_client.LocalClient, filter_node=None, select=None):
         return {}
 
 
+async def get_agent_nodes(lc: local_client.LocalClient, agent_ids: list) -> dict:
+    """Get the node that each agent reports to, as known by the master without querying wazuh-db.
+
+    Parameters
+    ----------
+    lc : LocalClient object
+        LocalClient with which to send the 'get_agent_nodes' request.
+    agent_ids : list
+        Agent IDs.
+
+    Returns
+    -------
+    result : dict
+        Agent IDs of each node ('nodes') and the ones whose node is unknown ('unknown').
+    """
+    response = await lc.execute(command=b'get_agent_nodes', data=json.dumps(agent_ids).encode())
+    result = json.loads(response, object_hook=as_wazuh_object)
+
+    if isinstance(result, Exception):
+        raise result
+
+    return result
+
+
 async def get_health(lc: local_client.LocalClient, filter_node=None):
     """Get nodes and synchronization information.
 
@@ -10,7 +10,7 @@ import logging
 import operator
 import os
 import time
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
 from concurrent.futures import process, ProcessPoolExecutor
 from copy import copy, deepcopy
 from functools import reduce, partial
@@ -29,6 +29,7 @@ from wazuh.cluster import get_node_wrapper, get_nodes_info
 from wazuh.core import common, exception
 from wazuh.core.cluster import local_client, common as c_common
 from wazuh.core.cluster.cluster import check_cluster_status
+from wazuh.core.cluster.control import get_agent_nodes
 from wazuh.core.exception import WazuhException, WazuhClusterError, WazuhError
 from wazuh.core.pyDaemonModule import spawn_process_pool_worker, API_AUTHENTICATION_PROCESS
 from wazuh.core.wazuh_socket import wazuh_sendsync
@@ -107,6 +108,8 @@ class DistributedAPI:
         self.wait_for_complete = wait_for_complete
         self.from_cluster = from_cluster
         self.is_async = is_async
+        # Native asyncio implementation of `f`, awaited on the event loop instead of using a process pool
+        self.async_variant = getattr(f, '__dict__', {}).get('async_variant')
         self.broadcasting = broadcasting
         self.rbac_permissions = rbac_permissions if rbac_permissions is not None else {'rbac_mode': 'black'}
         self.current_user = current_user
@@ -279,9 +282,9 @@ class DistributedAPI:
                 lc = local_client.LocalClient()
                 self.f_kwargs[self.local_client_arg] = lc
             try:
-                if self.is_async:
-                    task = self.run_local(self.f, self.f_kwargs, self.rbac_permissions, self.broadcasting,
-                                          self.nodes, self.current_user, self.origin_module)
+                if self.is_async or self.async_variant is not None:
+                    task = self.run_local(self.async_variant or self.f, self.f_kwargs, self.rbac_permissions,
+                                          self.broadcasting, self.nodes, self.current_user, self.origin_module)
 
                 else:
                     loop = asyncio.get_event_loop()
@@ -566,15 +569,27 @@ class DistributedAPI:
 
         cleaned_valid_nodes = await clean_valid_nodes(valid_nodes)
 
+        limit = self.f_kwargs.get('limit', common.DATABASE_LIMIT)
+        offset = self.f_kwargs.get('offset', 0)
+        # The pagination is applied after merging the results of every node, so each one must return all the items
+        # that could be in the requested page
+        paginate = len(cleaned_valid_nodes) > 1 and self.f_kwargs.get('limit') is not None
+        if paginate:
+            self.f_kwargs.update(offset=0, limit=offset + limit)
+
         response = await asyncio.shield(asyncio.gather(*[forward(node) for node in cleaned_valid_nodes]))
 
         if allowed_nodes.total_affected_items > 1:
-            response = reduce(or_, response)
-            if isinstance(response, wresults.AbstractWazuhResult):
-                response = response.limit(limit=self.f_kwargs.get('limit', common.DATABASE_LIMIT),
-                                          offset=self.f_kwargs.get('offset', 0)) \
-                    .sort(fields=self.f_kwargs.get('fields', []),
-                          order=self.f_kwargs.get('order', 'asc'))
+            if any(isinstance(result, wresults.AffectedItemsWazuhResult) for result in response):
+                # The items of each node are already sorted, so the page is taken merging them until it is full
+                response = wresults.AffectedItemsWazuhResult.merge_all(response, offset=offset if paginate else 0,
+                                                                       limit=limit if paginate else None)
+            else:
+                response = reduce(or_, response)
+                if isinstance(response, wresults.AbstractWazuhResult):
+                    response = response.limit(limit=limit, offset=offset if paginate else 0) \
+                        .sort(fields=self.f_kwargs.get('fields', []),
+                              order=self.f_kwargs.get('order', 'asc'))
         elif response:
             response = response[0]
         else:
@@ -606,19 +621,24 @@ class DistributedAPI:
         if 'agent_id' in self.f_kwargs or 'agent_list' in self.f_kwargs:
             # Group requested agents by node_name
             requested_agents = self.f_kwargs.get('agent_list', None) or [self.f_kwargs['agent_id']]
+            node_name = defaultdict(list)
             # Filter by node_name if we receive a node_id
             if 'node_id' in self.f_kwargs:
                 requested_nodes = self.f_kwargs.get('node_list', None) or [self.f_kwargs['node_id']]
                 filters = {'node_name': requested_nodes}
             elif requested_agents != '*':
+                # The master knows the node of the agents reporting to workers, so wazuh-db is only queried for the
+                # rest of them
+                agent_nodes = await get_agent_nodes(self.get_client(), requested_agents)
+                node_name.update(agent_nodes['nodes'])
+                requested_agents = agent_nodes['unknown']
                 filters = {'id': requested_agents}
             else:
                 filters = None
 
             system_agents = agent.Agent.get_agents_overview(select=select_node,
                                                             limit=None,
-                                                            filters=filters)['items']
-            node_name = defaultdict(list)
+                                                            filters=filters)['items'] if requested_agents else []
             for element in system_agents:
                 node_name[element.get('node_name', '')].append(element['id'])
 
@@ -655,11 +675,32 @@ class DistributedAPI:
 
 
 class WazuhRequestQueue:
-    """Represents a queue of Wazuh requests"""
+    """Represents a queue of Wazuh requests.
+
+    The requests are processed concurrently, up to distributed_api.max_in_flight_requests at a time and
+    distributed_api.max_in_flight_requests_per_node for each node they come from. When the limit is reached, the
+    pending requests are started taking one from each node in turns, so a node sending many or slow requests does not
+    delay the requests of the rest.
+    """
+
+    # Number of processed requests used to calculate the wait time metrics.
+    WAIT_TIMES_SIZE = 1000
 
     def __init__(self, server):
         self.request_queue = asyncio.Queue()
         self.server = server
+        dapi_items = wazuh.core.cluster.utils.get_cluster_items()['distributed_api']
+        self.max_in_flight = dapi_items['max_in_flight_requests']
+        self.max_in_flight_per_node = dapi_items['max_in_flight_requests_per_node']
+        # Requests waiting for a free slot, by the node they come from. Nodes are served in the order of this dict.
+        self.pending = OrderedDict()
+        # Number of requests being processed, by node.
+        self.in_flight = defaultdict(int)
+        # Seconds each processed request waited in the queue.
+        self.wait_times = deque(maxlen=self.WAIT_TIMES_SIZE)
+        # Due to a CPython bug in the asyncio library, tasks must be hard-referenced so that they are not deleted
+        # by the garbage collector (https://github.com/python/cpython/issues/91887).
+        self.tasks = set()
 
     def add_request(self, request: bytes):
         """Add a request to the queue.
@@ -670,7 +711,83 @@ class WazuhRequestQueue:
             Request to add.
         """
         self.logger.debug(f"Received request: {request}")
-        self.request_queue.put_nowait(request.decode())
+        self.request_queue.put_nowait((time.perf_counter(), request.decode()))
+
+    async def run(self):
+        """Take the requests from the queue and start processing them as soon as there is a free slot."""
+        while True:
+            arrival_time, item = await self.request_queue.get()
+            names, request = item.split(' ', 1)
+            # name    -> node name the request must be sent to. None if called from a worker node.
+            # id      -> id of the request.
+            # request -> JSON containing request's necessary information
+            names = names.split('*', 1)
+            self.pending.setdefault(names[0], deque()).append((arrival_time, names, request))
+            self.start_requests()
+
+    def start_requests(self):
+        """Start processing pending requests until there are no free slots."""
+        while self.pending and sum(self.in_flight.values()) < self.max_in_flight:
+            # First node in turn that has not reached its own limit.
+            node = next((node for node in self.pending if self.in_flight[node] < self.max_in_flight_per_node), None)
+            if node is None:
+                return
+
+            arrival_time, names, request = self.pending[node].popleft()
+            # The node goes to the end of the turns.
+            if self.pending[node]:
+                self.pending.move_to_end(node)
+            else:
+                del self.pending[node]
+
+            self.wait_times.append(time.perf_counter() - arrival_time)
+            self.in_flight[node] += 1
+            task = asyncio.create_task(self.process_request(names, request))
+            self.tasks.add(task)
+            task.add_done_callback(partial(self.request_done, node))
+
+    def request_done(self, node: str, task: asyncio.Task):
+        """Free the slot of a processed request and start the next pending one.
+
+        Parameters
+        ----------
+        node : str
+            Name of the node the request came from.
+        task : asyncio.Task
+            Task that processed the request.
+        """
+        self.tasks.discard(task)
+        self.in_flight[node] -= 1
+        if not self.in_flight[node]:
+            del self.in_flight[node]
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(f"Unhandled error processing request: {task.exception()}", exc_info=False)
+        self.start_requests()
+
+    async def process_request(self, names: List[str], request: str):
+        """Process a request and send its response to the node it came from.
+
+        Parameters
+        ----------
+        names : list
+            Name of the node the request came from and, if it was forwarded by it, name of the origin.
+        request : str
+            JSON containing the request's necessary information.
+        """
+        raise NotImplementedError
+
+    def get_metrics(self) -> Dict:
+        """Get the queue depth and the wait time of the last processed requests.
+
+        Returns
+        -------
+        dict
+            Number of queued and in flight requests and average and maximum wait time, in seconds.
+        """
+        return {'queued': self.request_queue.qsize() + sum(len(requests) for requests in self.pending.values()),
+                'in_flight': sum(self.in_flight.values()),
+                'wait_time': {'avg': round(sum(self.wait_times) / len(self.wait_times), 6) if self.wait_times else 0,
+                              'max': round(max(self.wait_times, default=0), 6)}}
 
 
 class APIRequestQueue(WazuhRequestQueue):
@@ -684,40 +801,43 @@ class APIRequestQueue(WazuhRequestQueue):
         self.logger = logging.getLogger('wazuh').getChild('dapi')
         self.logger.addFilter(wazuh.core.cluster.utils.ClusterFilter(tag='Cluster', subtag='D API'))
 
-    async def run(self):
-        while True:
-            names, request = (await self.request_queue.get()).split(' ', 1)
-            names = names.split('*', 1)
-            # name    -> node name the request must be sent to. None if called from a worker node.
-            # id      -> id of the request.
-            # request -> JSON containing request's necessary information
-            name_2 = '' if len(names) == 1 else names[1] + ' '
+    async def process_request(self, names: List[str], request: str):
+        """Run a distributed API request and send its response to the node it came from.
 
-            # Get reference to MasterHandler or WorkerHandler
-            try:
-                node = self.server.client if names[0] == 'master' else self.server.clients[names[0]]
-            except KeyError as e:
-                self.logger.error(
-                    f"Error in DAPI request. The destination node is not connected or does not exist: {e}.")
-                continue
+        Parameters
+        ----------
+        names : list
+            Name of the node the request came from and, if it was forwarded by it, name of the origin.
+        request : str
+            JSON containing the request's necessary information.
+        """
+        name_2 = '' if len(names) == 1 else names[1] + ' '
 
+        # Get reference to MasterHandler or WorkerHandler
+        try:
+            node = self.server.client if names[0] == 'master' else self.server.clients[names[0]]
+        except KeyError as e:
+            self.logger.error(
+                f"Error in DAPI request. The destination node is not connected or does not exist: {e}.")
+            return
+
+        try:
+            request = json.loads(request, object_hook=c_common.as_wazuh_object)
+            self.logger.info("Receiving request: {} from {}".format(
+                request['f'].__name__, names[0] if not name_2 else '{} ({})'.format(names[0], names[1])))
+            result = await DistributedAPI(**request,
+                                          logger=self.logger,
+                                          node=node).distribute_function()
+            task_id = await node.send_string(json.dumps(result, cls=c_common.WazuhJSONEncoder).encode())
+        except Exception as e:
+            self.logger.error(f"Error in distributed API: {e}", exc_info=True)
+            with contextlib.suppress(Exception):
+                await node.send_request(b"dapi_err", f"{name_2}{str(e)}".encode())
+        else:
             try:
-                request = json.loads(request, object_hook=c_common.as_wazuh_object)
-                self.logger.info("Receiving request: {} from {}".format(
-                    request['f'].__name__, names[0] if not name_2 else '{} ({})'.format(names[0], names[1])))
-                result = await DistributedAPI(**request,
-                                              logger=self.logger,
-                                              node=node).distribute_function()
-                task_id = await node.send_string(json.dumps(result, cls=c_common.WazuhJSONEncoder).encode())
-            except Exception as e:
-                self.logger.error(f"Error in distributed API: {e}", exc_info=True)
-                with contextlib.suppress(Exception):
-                    await node.send_request(b"dapi_err", f"{name_2}{str(e)}".encode())
-            else:
-                try:
-                    await node.send_request(b"dapi_res", name_2.encode() + task_id)
-                except WazuhException as e:
-                    self.logger.error(e.message, exc_info=False)
+                await node.send_request(b"dapi_res", name_2.encode() + task_id)
+            except WazuhException as e:
+                self.logger.error(e.message, exc_info=False)
 
 
 class SendSyncRequestQueue(WazuhRequestQueue):
@@ -731,32 +851,35 @@ class SendSyncRequestQueue(WazuhRequestQueue):
         self.logger = logging.getLogger('wazuh').getChild('sendsync')
         self.logger.addFilter(wazuh.core.cluster.utils.ClusterFilter(tag='Cluster', subtag='SendSync'))
 
-    async def run(self):
-        while True:
-            names, request = (await self.request_queue.get()).split(' ', 1)
-            names = names.split('*', 1)
-            # name    -> node name the request must be sent to. None if called from a worker node.
-            # id      -> id of the request.
-            # request -> JSON containing request's necessary information
-            name_2 = '' if len(names) == 1 else names[1] + ' '
+    async def process_request(self, names: List[str], request: str):
+        """Send a request to a daemon and send its response to the node it came from.
 
-            try:
-                node = self.server.clients[names[0]]
-            except KeyError as e:
-                self.logger.error(f"Error in Sendsync. The destination node is not connected or does not exist: {e}.")
-                continue
+        Parameters
+        ----------
+        names : list
+            Name of the node the request came from and name of the origin.
+        request : str
+            JSON containing the request's necessary information.
+        """
+        name_2 = '' if len(names) == 1 else names[1] + ' '
 
+        try:
+            node = self.server.clients[names[0]]
+        except KeyError as e:
+            self.logger.error(f"Error in Sendsync. The destination node is not connected or does not exist: {e}.")
+            return
+
+        try:
+            request = json.loads(request, object_hook=c_common.as_wazuh_object)
+            self.logger.debug(f"Receiving SendSync request ({request['daemon_name']}) from {names[0]} ({names[1]})")
+            result = await wazuh_sendsync(**request)
+            task_id = await node.send_string(result.encode())
+        except Exception as e:
+            self.logger.error(f"Error in SendSync (parameters {request}): {str(e)}", exc_info=False)
+            with contextlib.suppress(Exception):
+                await node.send_request(b"sendsyn_err", f"{name_2}{str(e)}".encode())
+        else:
             try:
-                request = json.loads(request, object_hook=c_common.as_wazuh_object)
-                self.logger.debug(f"Receiving SendSync request ({request['daemon_name']}) from {names[0]} ({names[1]})")
-                result = await wazuh_sendsync(**request)
-                task_id = await node.send_string(result.encode())
-            except Exception as e:
-                self.logger.error(f"Error in SendSync (parameters {request}): {str(e)}", exc_info=False)
-                with contextlib.suppress(Exception):
-                    await node.send_request(b"sendsyn_err", f"{name_2}{str(e)}".encode())
-            else:
-                try:
-                    await node.send_request(b"sendsyn_res", name_2.encode() + task_id)
-                except WazuhException as e:
-                    self.logger.error(e.message, exc_info=False)
+                await node.send_request(b"sendsyn_res", name_2.encode() + task_id)
+            except WazuhException as e:
+                self.logger.error(e.message, exc_info=False)
@@ -8,6 +8,7 @@ import logging
 import os
 import sys
 from asyncio import TimeoutError
+from collections import deque
 from unittest.mock import call, MagicMock, patch
 
 import pytest
@@ -36,6 +37,7 @@ with patch('wazuh.common.wazuh_uid'):
         from wazuh.core.exception import WazuhClusterError, WazuhException
         from api.util import raise_if_exc
         from wazuh.core.cluster import local_client
+        from wazuh.core.cluster.common import WazuhJSONEncoder, as_wazuh_object
 
 logger = logging.getLogger('wazuh')
 loop = asyncio.new_event_loop()
@@ -353,6 +355,29 @@ def test_DistributedAPI_local_request(mock_local_request):
                                                 call(f"{cluster_exc.message}", exc_info=False)])
 
 
+@patch('wazuh.core.cluster.dapi.dapi.DistributedAPI.check_wazuh_status', side_effect=None)
+def test_DistributedAPI_local_request_async_variant(mock_check_wazuh_status):
+    """Test that the native asyncio variant of a function is awaited instead of using a process pool."""
+    async def get_items_async(**kwargs):
+        return AffectedItemsWazuhResult(affected_items=['async'])
+
+    @common.async_variant(get_items_async)
+    def get_items(**kwargs):
+        return AffectedItemsWazuhResult(affected_items=['sync'])
+
+    dapi = DistributedAPI(f=get_items, logger=logger)
+    assert dapi.async_variant is get_items_async
+    with patch('wazuh.core.cluster.dapi.dapi.DistributedAPI.run_local',
+               side_effect=lambda f, *args: f()) as mock_run_local, \
+            patch('asyncio.get_event_loop') as mock_get_event_loop:
+        result = raise_if_exc(loop.run_until_complete(dapi.distribute_function()))
+
+    mock_run_local.assert_called_once()
+    assert mock_run_local.call_args.args[0] is get_items_async
+    mock_get_event_loop.return_value.run_in_executor.assert_not_called()
+    assert result.affected_items == ['async']
+
+
 @patch("asyncio.get_running_loop")
 def test_DistributedAPI_get_client(loop_mock):
     """Test get_client function from DistributedAPI."""
@@ -402,6 +427,40 @@ def test_DistributedAPI_forward_request_errors(mock_client_execute, mock_get_sol
     raise_if_exc_routine(dapi_kwargs=dapi_kwargs, expected_error=3036)
 
 
+@pytest.mark.parametrize('agent_nodes, offset, limit, expected_kwargs, expected_ids', [
+    ({'worker1': ['001', '004', '005', '008'], 'worker2': ['002', '003', '006', '007']}, 2, 3, (0, 5),
+     ['003', '004', '005']),
+    ({'worker1': ['001', '004', '005', '008'], 'worker2': ['002', '003', '006', '007']}, 6, 5, (0, 11),
+     ['007', '008']),
+    ({'worker1': ['001', '004', '005', '008']}, 1, 2, (1, 2), ['004', '005']),
+])
+def test_DistributedAPI_forward_request_pagination(agent_nodes, offset, limit, expected_kwargs, expected_ids):
+    """Check that the pagination is pushed down to the nodes and the page is taken after merging their results."""
+    sent_kwargs = []
+
+    async def execute(command, data):
+        node_name, request = data.decode().split(' ', 1)
+        f_kwargs = json.loads(request, object_hook=as_wazuh_object)['f_kwargs']
+        sent_kwargs.append((f_kwargs['offset'], f_kwargs['limit']))
+        items = [{'id': agent_id} for agent_id in agent_nodes[node_name]]
+        result = AffectedItemsWazuhResult(affected_items=items[f_kwargs['offset']:f_kwargs['offset'] + f_kwargs['limit']],
+                                          total_affected_items=len(items), sort_fields=['id'], sort_casting=['int'],
+                                          sort_ascending=[True])
+        return json.dumps(result, cls=WazuhJSONEncoder)
+
+    node = MagicMock(cluster_items={}, get_node=lambda: {'node': 'master-node', 'type': 'master'}, execute=execute)
+    dapi = DistributedAPI(f=agent.get_agents, logger=logger, node=node, request_type='distributed_master',
+                          f_kwargs={'agent_list': [agent_id for ids in agent_nodes.values() for agent_id in ids],
+                                    'offset': offset, 'limit': limit})
+
+    with patch('wazuh.core.cluster.dapi.dapi.DistributedAPI.get_solver_node', new=AsyncMock(return_value=agent_nodes)):
+        response = loop.run_until_complete(dapi.forward_request())
+
+    assert sent_kwargs == [expected_kwargs] * len(agent_nodes)
+    assert [item['id'] for item in response.affected_items] == expected_ids
+    assert response.total_affected_items == 8 if len(agent_nodes) > 1 else 4
+
+
 @patch('wazuh.core.cluster.dapi.dapi.DistributedAPI.execute_local_request',
        new=AsyncMock(side_effect=WazuhInternalError(1001)))
 def test_DistributedAPI_logger():
@@ -467,6 +526,8 @@ def test_DistributedAPI_tmp_file_cluster_error(mock_cluster_status):
 @patch('wazuh.agent.Agent.get_agents_overview', return_value={'items': [{'id': '001', 'node_name': 'master'},
                                                                         {'id': '002', 'node_name': 'master'},
                                                                         {'id': '003', 'node_name': 'unknown'}]})
+@patch('wazuh.core.cluster.dapi.dapi.get_agent_nodes',
+       new=AsyncMock(side_effect=lambda lc, agent_ids: {'nodes': {}, 'unknown': agent_ids}))
 @patch('wazuh.core.cluster.dapi.dapi.check_cluster_status', return_value=True)
 def test_DistributedAPI_get_solver_node(mock_cluster_status, mock_agents_overview):
     """Test `get_solver_node` function."""
@@ -514,6 +575,32 @@ def test_DistributedAPI_get_solver_node(mock_cluster_status, mock_agents_overvie
             raise_if_exc_routine(dapi_kwargs=dapi_kwargs)
 
 
+@pytest.mark.parametrize('agent_nodes, db_agents, expected', [
+    ({'nodes': {'worker1': ['001', '003'], 'worker2': ['002']}, 'unknown': []}, None,
+     {'worker1': ['001', '003'], 'worker2': ['002']}),
+    ({'nodes': {'worker1': ['001']}, 'unknown': ['002', '003', '004']},
+     [{'id': '002', 'node_name': 'master-node'}, {'id': '003', 'node_name': 'worker2'}],
+     {'worker1': ['001'], 'master-node': ['002', '004'], 'worker2': ['003']}),
+])
+def test_DistributedAPI_get_solver_node_agent_nodes(agent_nodes, db_agents, expected):
+    """Test that `get_solver_node` routes the agents known by the master without querying wazuh-db."""
+    dapi = DistributedAPI(f=agent.get_agents, f_kwargs={'agent_list': ['001', '002', '003', '004']}, logger=logger,
+                          request_type='distributed_master', node=MagicMock(cluster_items={},
+                                                                             get_node=lambda: {'node': 'master-node'}))
+    get_agent_nodes_mock = AsyncMock(return_value=agent_nodes)
+
+    with patch('wazuh.core.cluster.dapi.dapi.get_agent_nodes', new=get_agent_nodes_mock), \
+            patch('wazuh.core.agent.Agent.get_agents_overview', return_value={'items': db_agents}) as overview_mock:
+        assert loop.run_until_complete(dapi.get_solver_node()) == expected
+
+    get_agent_nodes_mock.mock.assert_called_once_with(dapi.node, ['001', '002', '003', '004'])
+    if db_agents is None:
+        overview_mock.assert_not_called()
+    else:
+        overview_mock.assert_called_once_with(select=['node_name'], limit=None,
+                                              filters={'id': agent_nodes['unknown']})
+
+
 @pytest.mark.parametrize('api_request', [
     agent.get_agents_summary_status,
     wazuh.core.manager.status
@@ -754,101 +841,141 @@ def test_APIRequestQueue_init(queue_mock):
     api_request_queue = APIRequestQueue(server=server)
     api_request_queue.add_request(b'testing')
     assert api_request_queue.server == server
+    assert api_request_queue.max_in_flight == 16
+    assert api_request_queue.max_in_flight_per_node == 4
     queue_mock.assert_called_once()
+    queue_mock.return_value.put_nowait.assert_called_once()
+    assert queue_mock.return_value.put_nowait.call_args[0][0][1] == 'testing'
 
 
-@patch("wazuh.core.cluster.common.import_module", return_value="os.path")
-@patch("asyncio.get_event_loop")
-async def test_APIRequestQueue_run(loop_mock, import_module_mock):
-    """Test `APIRequestQueue.run` function."""
+class RequestQueueMock(APIRequestQueue):
+    """Queue whose requests wait until they are released by the test."""
 
-    class DistributedAPI_mock:
-        def __init__(self):
-            pass
+    def __init__(self, max_in_flight, max_in_flight_per_node):
+        with patch('wazuh.core.cluster.utils.get_cluster_items',
+                   return_value={'distributed_api': {'max_in_flight_requests': max_in_flight,
+                                                     'max_in_flight_requests_per_node': max_in_flight_per_node}}):
+            super().__init__(server=None)
+        self.started = []
+        self.release = asyncio.Event()
 
-        async def distribute_function(self):
-            pass
+    async def process_request(self, names, request):
+        self.started.append(request)
+        await self.release.wait()
+        if request == 'fail':
+            raise Exception('unhandled')
 
-    class NodeMock:
-        async def send_request(self, command, data):
-            pass
 
-        async def send_string(self, command):
-            return command
+async def test_WazuhRequestQueue_run():
+    """Test that `WazuhRequestQueue.run` processes requests concurrently up to the configured limits, alternating
+    between nodes."""
+    request_queue = RequestQueueMock(max_in_flight=3, max_in_flight_per_node=2)
+    for request in [b'worker1*id a1', b'worker1*id a2', b'worker1*id a3', b'worker1*id a4', b'worker2*id b1',
+                    b'worker2*id b2']:
+        request_queue.add_request(request)
 
-    class ServerMock:
-        def __init__(self):
-            self.clients = {"names": ["w1", "w2"]}
-
-    class RequestQueueMock:
-        async def get(self):
-            return 'wazuh*request_queue*test ' \
-                   '{"f": {"__callable__": {"__name__": "join", "__qualname__": "join", "__module__": "join"}}}'
-
-    with patch.object(logger, "error", side_effect=Exception("break while true")) as logger_mock:
-        server = ServerMock()
-        apirequest = APIRequestQueue(server=server)
-        apirequest.logger = logger
-        apirequest.request_queue = RequestQueueMock()
-        with pytest.raises(Exception, match=".*break while true.*"):
-            await apirequest.run()
-        logger_mock.assert_called_once_with("Error in DAPI request. The destination node is "
-                                            "not connected or does not exist: 'wazuh'.")
-
-        node = NodeMock()
-        with patch.object(node, "send_request", side_effect=WazuhClusterError(3020, extra_message="test")):
-            with patch.object(node, "send_string", return_value=b"noerror"):
-                with patch("wazuh.core.cluster.dapi.dapi.DistributedAPI", return_value=DistributedAPI_mock()):
-                    server.clients = {"wazuh": node}
-                    with pytest.raises(Exception):
-                        await apirequest.run()
-
-            with patch.object(node, "send_string", Exception("break while true")):
-                with patch("wazuh.core.cluster.dapi.dapi.DistributedAPI", return_value=DistributedAPI_mock()):
-                    with patch("wazuh.core.cluster.dapi.dapi.contextlib.suppress", side_effect=Exception()):
-                        apirequest.logger = logging.getLogger("apirequest")
-                        with pytest.raises(Exception):
-                            await apirequest.run()
-
-
-@patch("wazuh.core.cluster.dapi.dapi.contextlib.suppress", side_effect=Exception())
-@patch("asyncio.get_event_loop")
-async def test_SendSyncRequestQueue_run(loop_mock, contexlib_mock):
-    """Test `SendSyncRequestQueue.run` function."""
-
-    class NodeMock:
-        async def send_request(self, command, data):
-            pass
+    run_task = asyncio.create_task(request_queue.run())
+    try:
+        await asyncio.sleep(0.01)
+        # worker1 is limited to two requests, so the third slot goes to worker2.
+        assert request_queue.started == ['a1', 'a2', 'b1']
+        assert request_queue.get_metrics()['queued'] == 3
+        assert request_queue.get_metrics()['in_flight'] == 3
+
+        # Pending nodes are served in turns: worker1 goes after worker2 because it got the last slot.
+        request_queue.release.set()
+        await asyncio.sleep(0.01)
+        assert request_queue.started == ['a1', 'a2', 'b1', 'a3', 'b2', 'a4']
+
+        # Unhandled errors are logged and do not stop the queue.
+        with patch.object(request_queue.logger, 'error') as logger_mock:
+            request_queue.add_request(b'worker3 fail')
+            await asyncio.sleep(0.01)
+            logger_mock.assert_called_once_with('Unhandled error processing request: unhandled', exc_info=False)
+        request_queue.add_request(b'worker3 c1')
+        await asyncio.sleep(0.01)
+        assert request_queue.started[-1] == 'c1'
+
+        metrics = request_queue.get_metrics()
+        assert metrics['queued'] == metrics['in_flight'] == 0
+        assert len(request_queue.wait_times) == 8
+        assert 0 < metrics['wait_time']['avg'] <= metrics['wait_time']['max']
+        assert not request_queue.in_flight and not request_queue.pending and not request_queue.tasks
+    finally:
+        run_task.cancel()
 
-        async def send_string(self, command):
-            return command
 
-    class ServerMock:
-        def __init__(self):
-            self.clients = {"names": ["w1", "w2"]}
-
-    class RequestQueueMock:
-        async def get(self):
-            return "wazuh*request_queue*test {\"daemon_name\": \"test\"}"
-
-    with patch.object(logger, "error", side_effect=Exception("break while true")) as logger_mock:
-        server = ServerMock()
-        sendsync = SendSyncRequestQueue(server=server)
-        sendsync.logger = logger
-        sendsync.request_queue = RequestQueueMock()
-        with pytest.raises(Exception, match=".*break while true.*"):
-            await sendsync.run()
+def test_WazuhRequestQueue_get_metrics():
+    """Test that `WazuhRequestQueue.get_metrics` returns the queue depth and the wait times."""
+    request_queue = RequestQueueMock(max_in_flight=1, max_in_flight_per_node=1)
+    assert request_queue.get_metrics() == {'queued': 0, 'in_flight': 0, 'wait_time': {'avg': 0, 'max': 0}}
+
+    request_queue.add_request(b'worker1 a1')
+    request_queue.pending['worker2'] = deque([(0, ['worker2'], 'b1'), (0, ['worker2'], 'b2')])
+    request_queue.in_flight['worker1'] = 1
+    request_queue.wait_times.extend([0.1, 0.3])
+    assert request_queue.get_metrics() == {'queued': 3, 'in_flight': 1, 'wait_time': {'avg': 0.2, 'max': 0.3}}
+
+
+async def test_APIRequestQueue_process_request():
+    """Test `APIRequestQueue.process_request` function."""
+    request = '{"f": {"__callable__": {"__name__": "join", "__qualname__": "join", "__module__": "join"}}}'
+    node = MagicMock()
+    node.send_string = AsyncMock(return_value=b'task_id')
+    node.send_request = AsyncMock()
+    server = MagicMock(clients={'worker1': node})
+    apirequest = APIRequestQueue(server=server)
+
+    with patch.object(apirequest.logger, 'error') as logger_mock:
+        await apirequest.process_request(['worker2'], request)
+        logger_mock.assert_called_once_with("Error in DAPI request. The destination node is "
+                                            "not connected or does not exist: 'worker2'.")
+
+    with patch('wazuh.core.cluster.common.import_module', return_value=os.path), \
+            patch('wazuh.core.cluster.dapi.dapi.DistributedAPI') as dapi_mock:
+        dapi_mock.return_value.distribute_function = AsyncMock(return_value={'result': 'ok'})
+        await apirequest.process_request(['worker1', 'origin'], request)
+        assert dapi_mock.call_args.kwargs['node'] == node
+        node.send_string.mock.assert_called_once_with(b'{"result": "ok"}')
+        node.send_request.mock.assert_called_once_with(b'dapi_res', b'origin task_id')
+
+        node.send_request.mock.reset_mock()
+        node.send_request.mock.side_effect = WazuhClusterError(3020)
+        with patch.object(apirequest.logger, 'error') as logger_mock:
+            await apirequest.process_request(['worker1'], request)
+            logger_mock.assert_called_once_with(WazuhClusterError(3020).message, exc_info=False)
+
+        node.send_request.mock.reset_mock(side_effect=True)
+        dapi_mock.return_value.distribute_function = AsyncMock(side_effect=Exception('dapi error'))
+        with patch.object(apirequest.logger, 'error') as logger_mock:
+            await apirequest.process_request(['worker1', 'origin'], request)
+            logger_mock.assert_called_once_with('Error in distributed API: dapi error', exc_info=True)
+        node.send_request.mock.assert_called_once_with(b'dapi_err', b'origin dapi error')
+
+
+async def test_SendSyncRequestQueue_process_request():
+    """Test `SendSyncRequestQueue.process_request` function."""
+    request = '{"daemon_name": "test"}'
+    node = MagicMock()
+    node.send_string = AsyncMock(return_value=b'task_id')
+    node.send_request = AsyncMock()
+    server = MagicMock(clients={'worker1': node})
+    sendsync = SendSyncRequestQueue(server=server)
+
+    with patch.object(sendsync.logger, 'error') as logger_mock:
+        await sendsync.process_request(['worker2', 'origin'], request)
         logger_mock.assert_called_once_with("Error in Sendsync. The destination node is "
-                                            "not connected or does not exist: 'wazuh'.")
-
-        node = NodeMock()
-        with patch.object(node, "send_request", Exception("break while true")):
-            with patch("wazuh.core.cluster.dapi.dapi.wazuh_sendsync", side_effect=Exception("break while true")):
-                server.clients = {"wazuh": node}
-                sendsync.logger = logging.getLogger("sendsync")
-                with pytest.raises(Exception):
-                    await sendsync.run()
-
-            with patch("wazuh.core.cluster.dapi.dapi.wazuh_sendsync", side_effect="noerror"):
-                with pytest.raises(Exception):
-                    await sendsync.run()
+                                            "not connected or does not exist: 'worker2'.")
+
+    with patch('wazuh.core.cluster.dapi.dapi.wazuh_sendsync', new=AsyncMock(return_value='result')):
+        await sendsync.process_request(['worker1', 'origin'], request)
+        node.send_string.mock.assert_called_once_with(b'result')
+        node.send_request.mock.assert_called_once_with(b'sendsyn_res', b'origin task_id')
+
+    node.send_request.mock.reset_mock()
+    with patch('wazuh.core.cluster.dapi.dapi.wazuh_sendsync', new=AsyncMock(side_effect=Exception('error'))), \
+            patch.object(sendsync.logger, 'error') as logger_mock:
+        await sendsync.process_request(['worker1', 'origin'], request)
+        logger_mock.assert_called_once_with("Error in SendSync (parameters {'daemon_name': 'test'}): error",
+                                            exc_info=False)
+    node.send_request.mock.assert_called_once_with(b'sendsyn_err', b'origin error')
@@ -0,0 +1,331 @@
+# Copyright (C) 2015, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+
+import ctypes
+import ctypes.util
+import os
+import struct
+from os import path
+from typing import Iterator, Set, Tuple
+
+from wazuh.core import common
+
+# Flags of inotify_init1 and inotify_add_watch, and event masks. See inotify(7).
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | \
+             IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 65536
+
+
+class Inotify:
+    """Minimal binding of the Linux inotify API, using the C library through ctypes."""
+
+    def __init__(self):
+        """Class constructor.
+
+        Raises
+        ------
+        OSError
+            If inotify is not available or the instance could not be created.
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init = libc.inotify_init1
+        except AttributeError as e:
+            raise OSError(f'inotify is not available: {e}')
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self._check(init(IN_NONBLOCK | IN_CLOEXEC))
+
+    @staticmethod
+    def _check(result: int) -> int:
+        """Raise the error of the last call to the C library if it failed."""
+        if result < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        return result
+
+    def add_watch(self, pathname: str, mask: int = WATCH_MASK) -> int:
+        """Watch a file or directory.
+
+        Parameters
+        ----------
+        pathname : str
+            Path to watch.
+        mask : int
+            Events to watch.
+
+        Returns
+        -------
+        int
+            Watch descriptor.
+        """
+        return self._check(self._add_watch(self.fd, os.fsencode(pathname), mask))
+
+    def rm_watch(self, wd: int):
+        """Stop watching a file or directory.
+
+        Parameters
+        ----------
+        wd : int
+            Watch descriptor.
+        """
+        self._check(self._rm_watch(self.fd, wd))
+
+    def read_events(self) -> Iterator[Tuple[int, int, int, str]]:
+        """Read every queued event without blocking.
+
+        Yields
+        ------
+        int
+            Watch descriptor.
+        int
+            Event mask.
+        int
+            Cookie that relates the events of a rename.
+        str
+            Name of the file inside the watched directory. Empty if the event refers to the directory itself.
+        """
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                yield wd, mask, cookie, name
+
+    def close(self):
+        """Close the inotify instance, removing all the watches."""
+        os.close(self.fd)
+
+
+class IntegrityWatcher:
+    """Track the files changed inside the directories listed in cluster.json['files'].
+
+    The paths returned by `get_changes` are meant to be passed to `cluster.update_files_status`, so only the metadata of
+    the changed files is calculated instead of walking every directory.
+    """
+
+    def __init__(self, cluster_items: dict):
+        """Class constructor.
+
+        Parameters
+        ----------
+        cluster_items : dict
+            Content of the cluster.json file.
+
+        Raises
+        ------
+        OSError
+            If inotify is not available or the directories could not be watched.
+        """
+        self.inotify = Inotify()
+        # Watch descriptors (keys) and absolute paths (values) of the watched directories, and vice versa.
+        self.watches = {}
+        self.watched_dirs = {}
+        # Absolute paths (keys) of the directories listed in cluster.json['files'] and whether they are recursive.
+        self.roots = {}
+        for file_path, item in cluster_items['files'].items():
+            if file_path == "excluded_files" or file_path == "excluded_extensions":
+                continue
+            root = path.normpath(path.join(common.WAZUH_PATH, file_path))
+            self.roots[root] = self.roots.get(root, False) or item['recursive']
+        # Directories listed in cluster.json['files'] that could not be watched because they do not exist.
+        self.missing_roots = set()
+        # Directories that could not be watched for other reasons, e.g. the limit of inotify watches was reached. While
+        # there are any, every directory must be walked, and watching them is retried in every call to `get_changes`.
+        self.unwatched_dirs = set()
+
+        try:
+            for root, recursive in self.roots.items():
+                self.watch_root(root, recursive)
+        except OSError:
+            self.close()
+            raise
+
+    def watch_root(self, root: str, recursive: bool) -> bool:
+        """Watch a directory listed in cluster.json['files'].
+
+        Parameters
+        ----------
+        root : str
+            Absolute path of the directory.
+        recursive : bool
+            Whether to watch its subdirectories too.
+
+        Returns
+        -------
+        bool
+            Whether the directory is being watched.
+        """
+        if not path.isdir(root):
+            self.missing_roots.add(root)
+            return False
+
+        self.missing_roots.discard(root)
+        self.add_watch(root)
+        if recursive:
+            self.watch_subdirectories(root)
+        return True
+
+    def watch_subdirectories(self, dirname: str):
+        """Watch every subdirectory of a directory, recursively.
+
+        Parameters
+        ----------
+        dirname : str
+            Absolute path of the directory.
+        """
+        for root_, dirs_, _ in os.walk(dirname):
+            for dir_ in dirs_:
+                self.add_watch(path.join(root_, dir_))
+
+    def add_watch(self, dirname: str):
+        """Watch a directory.
+
+        Parameters
+        ----------
+        dirname : str
+            Absolute path of the directory.
+        """
+        wd = self.inotify.add_watch(dirname)
+        self.watches[wd] = dirname
+        self.watched_dirs[dirname] = wd
+
+    def remove_watches(self, dirname: str):
+        """Stop watching a directory and its subdirectories.
+
+        The directories listed in cluster.json['files'] are watched again once they are created.
+
+        Parameters
+        ----------
+        dirname : str
+            Absolute path of the directory.
+        """
+        for watched_dir in [d for d in self.watched_dirs if d == dirname or d.startswith(dirname + path.sep)]:
+            wd = self.watched_dirs.pop(watched_dir)
+            del self.watches[wd]
+            if watched_dir in self.roots:
+                self.missing_roots.add(watched_dir)
+            try:
+                self.inotify.rm_watch(wd)
+            except OSError:
+                # The watch was already removed by the kernel.
+                pass
+
+    def is_recursive(self, dirname: str) -> bool:
+        """Check whether a directory is inside a recursive directory listed in cluster.json['files'].
+
+        Parameters
+        ----------
+        dirname : str
+            Absolute path of the directory.
+
+        Returns
+        -------
+        bool
+            Whether the directory has to be watched.
+        """
+        return any(recursive and dirname.startswith(root + path.sep) for root, recursive in self.roots.items())
+
+    def get_changes(self) -> Tuple[Set[str], bool]:
+        """Get the paths changed since the last call.
+
+        Returns
+        -------
+        changes : set
+            Paths, relative to the Wazuh path, of the files that were created, modified or removed. Directory paths
+            end with a path separator.
+        full_scan : bool
+            Whether some events were lost or some directories are not watched, so every directory must be walked.
+        """
+        changes = set()
+        # The changes made before the unwatched directories are watched are unknown, so they are walked once more.
+        full_scan = bool(self.unwatched_dirs)
+
+        for wd, mask, _, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                full_scan = True
+                continue
+            dirname = self.watches.get(wd)
+            if dirname is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                if dirname in self.roots:
+                    # A directory listed in cluster.json['files'] was removed.
+                    self.remove_watches(dirname)
+                    changes.add(path.relpath(dirname, common.WAZUH_PATH) + path.sep)
+                elif mask & IN_IGNORED:
+                    del self.watches[wd]
+                    self.watched_dirs.pop(dirname, None)
+                continue
+
+            full_path = path.join(dirname, name) if name else dirname
+            if mask & IN_ISDIR:
+                if not mask & (IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                    continue
+                if mask & (IN_MOVED_FROM | IN_DELETE):
+                    self.remove_watches(full_path)
+                elif self.is_recursive(full_path):
+                    try:
+                        self.add_watch(full_path)
+                        self.watch_subdirectories(full_path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        self.unwatched_dirs.add(full_path)
+                changes.add(path.relpath(full_path, common.WAZUH_PATH) + path.sep)
+            elif name:
+                changes.add(path.relpath(full_path, common.WAZUH_PATH))
+
+        for root in list(self.missing_roots):
+            try:
+                if self.watch_root(root, self.roots[root]):
+                    changes.add(path.relpath(root, common.WAZUH_PATH) + path.sep)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self.unwatched_dirs.add(root)
+
+        for dirname in list(self.unwatched_dirs):
+            self.unwatched_dirs.discard(dirname)
+            try:
+                if dirname in self.roots:
+                    self.watch_root(dirname, self.roots[dirname])
+                elif path.isdir(dirname):
+                    self.add_watch(dirname)
+                    self.watch_subdirectories(dirname)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self.unwatched_dirs.add(dirname)
+
+        return changes, full_scan or bool(self.unwatched_dirs)
+
+    def close(self):
+        """Stop watching every directory."""
+        self.inotify.close()
@@ -3,10 +3,11 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import collections
 import logging
 import os
 import time
-from typing import Tuple
+from typing import Optional, Tuple
 
 import uvloop
 
@@ -31,6 +32,8 @@ class LocalClientHandler(client.AbstractClient):
         super().__init__(**kwargs)
         self.response_available = asyncio.Event()
         self.response = b''
+        # Time when the connection was made, used to limit how long it can be reused.
+        self.connection_time = 0
 
     def connection_made(self, transport):
         """Define process of connecting to the server.
@@ -44,6 +47,7 @@ class LocalClientHandler(client.AbstractClient):
             Socket to write data on.
         """
         self.transport = transport
+        self.connection_time = time.monotonic()
 
     def _cancel_all_tasks(self):
         pass
@@ -123,6 +127,105 @@ class LocalClientHandler(client.AbstractClient):
         self.on_con_lost.set_result(True)
 
 
+class LocalClientPool:
+    """
+    Keep the connections with the cluster's local server open to reuse them in later requests.
+
+    Each connection carries one request at a time, as the asynchronous responses are sent by the local server to the
+    connection that made the request. Connections are closed once they are `max_age` seconds old, before the local
+    server disconnects them for not sending keepalives.
+    """
+
+    def __init__(self, size: int, max_age: float):
+        """Class constructor.
+
+        Parameters
+        ----------
+        size : int
+            Maximum number of idle connections kept open.
+        max_age : float
+            Seconds after which a connection is not reused anymore.
+        """
+        self.size = size
+        self.max_age = max_age
+        self.loop = asyncio.get_running_loop()
+        # Idle connections, from the least to the most recently used, and the handles of their expiration.
+        self.idle = collections.deque()
+
+    def get(self) -> Optional[Tuple[asyncio.Transport, LocalClientHandler]]:
+        """Get the most recently used idle connection that is still open.
+
+        Returns
+        -------
+        tuple or None
+            Transport and protocol of the connection. None if there is no idle connection.
+        """
+        while self.idle:
+            transport, protocol, expire_handle = self.idle.pop()
+            expire_handle.cancel()
+            if not transport.is_closing():
+                return transport, protocol
+        return None
+
+    def put(self, transport: asyncio.Transport, protocol: LocalClientHandler):
+        """Return a connection to the pool once its request has been answered.
+
+        The connection is closed if the pool is full or if it is too old to be reused.
+
+        Parameters
+        ----------
+        transport : asyncio.Transport
+            Transport of the connection.
+        protocol : LocalClientHandler
+            Protocol of the connection.
+        """
+        remaining_time = self.max_age - (time.monotonic() - protocol.connection_time)
+        if len(self.idle) >= self.size or remaining_time <= 0 or transport.is_closing():
+            transport.close()
+            return
+
+        protocol.response_available.clear()
+        protocol.response = b''
+        self.idle.append((transport, protocol, self.loop.call_later(remaining_time, self.expire, transport)))
+
+    def expire(self, transport: asyncio.Transport):
+        """Close an idle connection that is too old to be reused.
+
+        Parameters
+        ----------
+        transport : asyncio.Transport
+            Transport of the connection.
+        """
+        self.idle = collections.deque(connection for connection in self.idle if connection[0] is not transport)
+        transport.close()
+
+
+# Pool of connections of the running event loop. Each API worker process has its own one.
+_local_client_pool = None
+
+
+def get_local_client_pool(cluster_items: dict) -> Optional[LocalClientPool]:
+    """Get the pool of connections with the local server of the running event loop.
+
+    Parameters
+    ----------
+    cluster_items : dict
+        Cluster.json object containing cluster internal variables.
+
+    Returns
+    -------
+    LocalClientPool or None
+        Pool of connections. None if pooling is disabled.
+    """
+    global _local_client_pool
+    size = cluster_items['distributed_api']['local_client_pool_size']
+    if size <= 0:
+        return None
+    if _local_client_pool is None or _local_client_pool.loop is not asyncio.get_running_loop():
+        _local_client_pool = LocalClientPool(size=size, max_age=cluster_items['intervals']['worker']['keep_alive'])
+    return _local_client_pool
+
+
 class LocalClient(client.AbstractClientManager):
     """
     Initialize variables, connect to the server, send a request, wait for a response and disconnect.
@@ -234,8 +337,10 @@ class LocalClient(client.AbstractClientManager):
     async def execute(self, command: bytes, data: bytes) -> str:
         """Execute a command in the local client.
 
-        Manage the connection with the local_server by creating such connection. Then, after sending a request
-        and receiving the response, the connection is closed.
+        Manage the connection with the local_server, reusing an idle connection of the pool if there is one or
+        creating a new one otherwise. After sending a request and receiving the response, the connection is returned
+        to the pool. It is closed instead if pooling is disabled or if the request failed, as a late response could
+        be received in it.
 
         Parameters
         ----------
@@ -249,11 +354,23 @@ class LocalClient(client.AbstractClientManager):
         result : str
             Request response.
         """
-        await self.start()
+        pool = get_local_client_pool(self.cluster_items)
+        connection = pool.get() if pool is not None else None
+        if connection is not None:
+            self.transport, self.protocol = connection
+        else:
+            await self.start()
 
         try:
             result = await self.send_api_request(command, data)
-        finally:
+        except BaseException:
+            self.transport.close()
+            await self.protocol.on_con_lost
+            raise
+
+        if pool is not None:
+            pool.put(self.transport, self.protocol)
+        else:
             self.transport.close()
             await self.protocol.on_con_lost
 
@@ -267,6 +267,8 @@ class LocalServerHandlerMaster(LocalServerHandler):
                 return b'ok', b'Request forwarded to worker node'
             else:
                 raise WazuhClusterError(3022)
+        elif command == b'get_agent_nodes':
+            return self.get_agent_nodes(data)
         else:
             return super().process_request(command, data)
 
@@ -304,6 +306,23 @@ class LocalServerHandlerMaster(LocalServerHandler):
         """
         return b'ok', json.dumps(self.server.node.get_health(json.loads(filter_nodes))).encode()
 
+    def get_agent_nodes(self, agent_ids: bytes) -> Tuple[bytes, bytes]:
+        """Process 'get_agent_nodes' request.
+
+        Parameters
+        ----------
+        agent_ids : bytes
+            JSON list of agent IDs to group by node.
+
+        Returns
+        -------
+        bytes
+            Result.
+        bytes
+            JSON-like string containing the agent IDs of each node and the ones whose node is unknown.
+        """
+        return b'ok', json.dumps(self.server.node.agent_nodes.get_nodes(json.loads(agent_ids))).encode()
+
     def send_file_request(self, path, node_name):
         """Send a file from the API to the cluster.
 
@@ -13,13 +13,14 @@ from collections import defaultdict
 from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from time import perf_counter
-from typing import Tuple, Dict, Callable
+from typing import Tuple, Dict, Callable, List
 from uuid import uuid4
 
 from wazuh.core import cluster as metadata, common, exception, utils
 from wazuh.core.agent import Agent
 from wazuh.core.cluster import server, cluster, common as c_common
 from wazuh.core.cluster.dapi import dapi
+from wazuh.core.cluster.inotify import IntegrityWatcher
 from wazuh.core.cluster.utils import context_tag, log_subprocess_execution
 from wazuh.core.common import DECIMALS_DATE_FORMAT
 from wazuh.core.utils import get_utc_now
@@ -166,6 +167,187 @@ class SendEntireAgentGroupsTask(c_common.SendStringTask):
         return self.wazuh_common.send_entire_agent_groups_information
 
 
+class SyncArtifactCache:
+    """
+    Share the compressed files sent in the integrity sync between the workers that need the same files.
+
+    Each compressed file is identified by its content (see cluster.get_sync_artifact_key), so it is created once and
+    removed when the last worker that uses it has finished sending it.
+    """
+
+    def __init__(self, server):
+        """Class constructor.
+
+        Parameters
+        ----------
+        server : Master object
+            Master server whose node directory and process pool are used to create the compressed files.
+        """
+        self.server = server
+        # Key (keys) and future with the result of compress_files and number of syncs using it (values).
+        self.artifacts = {}
+        # Path of each compressed file (keys) and its key (values).
+        self.paths = {}
+
+    async def acquire(self, files, files_metadata, zip_limit, codec):
+        """Get the compressed file with the given files and metadata, creating it if no other sync is using it.
+
+        Parameters
+        ----------
+        files : Iterable
+            File paths which will be zipped.
+        files_metadata : dict
+            Paths (keys) and metadata (values) of the files to be sent.
+        zip_limit : int
+            Maximum size in the zip.
+        codec : str
+            Compression codec.
+
+        Returns
+        -------
+        compressed_data : str
+            Full path to the compressed file. It must be released with release() once sent.
+        logs : dict
+            Logs of the compression.
+        """
+        key = cluster.get_sync_artifact_key(files, files_metadata, zip_limit, codec)
+        if key not in self.artifacts:
+            self.artifacts[key] = {'future': asyncio.ensure_future(cluster.run_in_pool(
+                self.server.loop, self.server.task_pool, cluster.compress_files,
+                self.server.configuration['node_name'], files, files_metadata, zip_limit, codec)), 'references': 0}
+        artifact = self.artifacts[key]
+        artifact['references'] += 1
+
+        try:
+            compressed_data, logs = await asyncio.shield(artifact['future'])
+        except BaseException:
+            self._release(key)
+            raise
+        self.paths[compressed_data] = key
+        return compressed_data, logs
+
+    def release(self, compressed_data):
+        """Stop using a compressed file obtained with acquire(), removing it if no other sync is using it.
+
+        Parameters
+        ----------
+        compressed_data : str
+            Full path to the compressed file.
+        """
+        self._release(self.paths[compressed_data])
+
+    def _release(self, key):
+        """Decrease the references of a compressed file and remove it when there are none left.
+
+        Parameters
+        ----------
+        key : str
+            Key of the compressed file.
+        """
+        artifact = self.artifacts[key]
+        artifact['references'] -= 1
+        if artifact['references'] == 0:
+            del self.artifacts[key]
+            # The compression could still be running if every sync waiting for it was cancelled.
+            artifact['future'].add_done_callback(self._remove)
+
+    def _remove(self, future):
+        """Remove the compressed file created by a finished compression.
+
+        Parameters
+        ----------
+        future : asyncio.Future
+            Future with the result of compress_files.
+        """
+        if future.cancelled() or future.exception():
+            return
+        compressed_data = future.result()[0]
+        self.paths.pop(compressed_data, None)
+        try:
+            os.unlink(compressed_data)
+        except FileNotFoundError:
+            self.server.logger.error(f"File {compressed_data} could not be removed/not found.")
+
+
+class AgentNodeCache:
+    """
+    Keep the node that each agent reports to, as received in the agent-info sync of the workers.
+
+    It is used to route the distributed API requests without querying wazuh-db. Only agents reporting to a worker are
+    known. An entry is removed when the agent disconnects from the worker or the worker reconnects, and it expires if
+    it is not updated in `ttl` seconds, e.g. because the agent moved to the master node.
+    """
+
+    def __init__(self, ttl: int):
+        """Class constructor.
+
+        Parameters
+        ----------
+        ttl : int
+            Seconds an entry is valid since its last update.
+        """
+        self.ttl = ttl
+        # Agent ID (keys) and node name and time of its last update (values).
+        self.agents = {}
+
+    def update(self, node_name: str, agents_sync: Dict):
+        """Update the entries of the agents included in the agent-info sync of a worker.
+
+        Parameters
+        ----------
+        node_name : str
+            Name of the worker that sent the information.
+        agents_sync : dict
+            Agents synchronization information, as obtained from the worker's wazuh-db.
+        """
+        now = perf_counter()
+        for agent in agents_sync.get('syncreq', []):
+            self.agents[str(agent['id']).zfill(3)] = (node_name, now)
+        for agent_id in agents_sync.get('syncreq_keepalive', []):
+            self.agents[str(agent_id).zfill(3)] = (node_name, now)
+        for agent in agents_sync.get('syncreq_status', []):
+            agent_id = str(agent['id']).zfill(3)
+            if agent.get('connection_status') == 'active':
+                self.agents[agent_id] = (node_name, now)
+            elif self.agents.get(agent_id, (None,))[0] == node_name:
+                del self.agents[agent_id]
+
+    def remove_node(self, node_name: str):
+        """Remove the entries of the agents reporting to a node.
+
+        Parameters
+        ----------
+        node_name : str
+            Node name.
+        """
+        self.agents = {agent_id: entry for agent_id, entry in self.agents.items() if entry[0] != node_name}
+
+    def get_nodes(self, agent_ids: List[str]) -> Dict:
+        """Group the given agents by the node they report to.
+
+        Parameters
+        ----------
+        agent_ids : list
+            Agent IDs.
+
+        Returns
+        -------
+        dict
+            Agent IDs of each node ('nodes') and the ones not found in the cache ('unknown').
+        """
+        nodes = defaultdict(list)
+        unknown = []
+        oldest = perf_counter() - self.ttl
+        for agent_id in agent_ids:
+            node_name, update_time = self.agents.get(agent_id, (None, 0))
+            if update_time > oldest:
+                nodes[node_name].append(agent_id)
+            else:
+                unknown.append(agent_id)
+
+        return {'nodes': nodes, 'unknown': unknown}
+
+
 class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
     """
     Handle incoming requests and sync processes with a worker.
@@ -186,6 +368,9 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
 
         # Variable used to check whether integrity sync process includes extra_valid files.
         self.extra_valid_requested = False
+        # Cluster item keys (keys) and directories (values) whose files are compared in the next Integrity check.
+        # If None, every file is compared.
+        self.integrity_scope = None
 
         # Sync status variables. Used in cluster_control -i and GET/cluster/healthcheck.
         self.integrity_check_status = {'date_start_master': DEFAULT_DATE, 'date_end_master': DEFAULT_DATE}
@@ -258,6 +443,8 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
             return self.get_permission(command)
         elif command == b'syn_i_w_m' or command == b'syn_e_w_m' or command == b'syn_a_w_m':
             return self.setup_sync_integrity(command, data)
+        elif command == b'syn_i_w_m_t':
+            return self.compare_integrity_tree(data)
         elif command == b'syn_w_g_c':
             return self.setup_send_info(command)
         elif command == b'syn_i_w_m_e' or command == b'syn_e_w_m_e':
@@ -289,6 +476,9 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         elif command == b'get_health':
             cmd, res = self.get_health(json.loads(data))
             return cmd, json.dumps(res).encode()
+        elif command == b'get_agent_nodes':
+            cmd, res = self.get_agent_nodes(json.loads(data))
+            return cmd, json.dumps(res).encode()
         elif command == b'sendsync':
             self.server.sendsync.add_request(self.name.encode() + b'*' + data)
             return b'ok', b'Added request to SendSync requests queue'
@@ -361,16 +551,18 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         Parameters
         ----------
         data : bytes
-            Node name, cluster name, node type and wazuh version all separated by spaces.
+            Node name, cluster name, node type, wazuh version, compression codecs and ciphers available in the worker,
+            separated by commas, and the hex salt of the connection's AES-GCM key, all separated by spaces.
 
         Returns
         -------
         cmd : bytes
             Result.
         payload : bytes
-            Response message.
+            JSON with the response message, the compression codec and cipher to use with this worker and the hex salt
+            of the master for the AES-GCM key.
         """
-        name, cluster_name, node_type, version = data.split(b' ')
+        name, cluster_name, node_type, version, *capabilities = data.split(b' ')
         # Add client to global clients dictionary.
         cmd, payload = super().hello(name)
 
@@ -388,22 +580,41 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         elif self.version != metadata.__version__:
             raise exception.WazuhClusterError(3031)
 
+        self.compression_codec = cluster.negotiate_compression_codec(
+            self.cluster_items['intervals']['communication']['compress_codec'],
+            capabilities[0].decode().split(',') if capabilities else [])
+
+        # The AES-GCM key is derived from the salts of both nodes. The worker derives it once it receives this
+        # response, so it is sent with Fernet and AES-GCM is used after the first AES-GCM message of the worker.
+        cipher = c_common.negotiate_cipher(self.cluster_items['intervals']['communication']['cipher'],
+                                           capabilities[1].decode().split(',') if len(capabilities) > 2 else [])
+        cipher_salt = b''
+        if cipher == 'aes-gcm':
+            cipher_salt = os.urandom(16)
+            self.setup_cipher(bytes.fromhex(capabilities[2].decode()) + cipher_salt, is_master=True)
+
+        # Agents may have moved to other nodes while the worker was disconnected.
+        if cmd == b'ok':
+            self.server.agent_nodes.remove_node(self.name)
+
         # Create directory where zips and other files coming from or going to the worker will be managed.
         worker_dir = os.path.join(common.WAZUH_PATH, 'queue', 'cluster', self.name)
         if cmd == b'ok' and not os.path.exists(worker_dir):
             utils.mkdir_with_mode(worker_dir)
 
         # SyncFiles instance used to zip and send integrity files to worker.
-        self.integrity = c_common.SyncFiles(cmd=b'syn_m_c', logger=self.task_loggers['Integrity sync'], manager=self)
+        self.integrity = c_common.SyncFiles(cmd=b'syn_m_c', logger=self.task_loggers['Integrity sync'], manager=self,
+                                            artifacts=self.server.sync_artifacts)
 
         # SyncWazuhdb instance to send agent-groups data to the worker.
         wdb_conn = AsyncWazuhDBConnection()
         self.agent_groups = c_common.SyncWazuhdb(manager=self, logger=self.task_loggers['Agent-groups send'],
-                                                 cmd=b'syn_g_m_w', data_retriever=wdb_conn.run_wdb_command,
+                                                 cmd=b'syn_g_m_w', data_retriever=wdb_conn.iterate,
                                                  set_data_command='global set-agent-groups',
                                                  set_payload={'mode': 'override', 'sync_status': 'synced'})
 
-        return cmd, payload
+        return cmd, json.dumps({'message': payload.decode(), 'compression_codec': self.compression_codec,
+                                 'cipher': cipher, 'cipher_salt': cipher_salt.hex()}).encode()
 
     def get_manager(self) -> server.AbstractServer:
         """Get the Master object that created this MasterHandler. Used in the class WazuhCommon.
@@ -467,6 +678,23 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         """
         return b'ok', self.server.get_connected_nodes(**arguments)
 
+    def get_agent_nodes(self, agent_ids: List[str]) -> Tuple[bytes, Dict]:
+        """Process 'get_agent_nodes' request.
+
+        Parameters
+        ----------
+        agent_ids : list
+            Agent IDs to group by node.
+
+        Returns
+        -------
+        bytes
+            Result.
+        dict
+            Agent IDs of each node and the ones whose node is unknown.
+        """
+        return b'ok', self.server.agent_nodes.get_nodes(agent_ids)
+
     def get_health(self, filter_nodes: Dict) -> Tuple[bytes, Dict]:
         """Process 'get_health' request.
 
@@ -555,6 +783,50 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
 
         return super().setup_receive_file(receive_task_class=sync_function, data=data, logger_tag=logger_tag)
 
+    def compare_integrity_tree(self, data: bytes) -> Tuple[bytes, bytes]:
+        """Compare the hashes of the worker's integrity tree with the master's ones.
+
+        The worker sends the hash of each cluster item first ('keys'). Only if some of them differ, it sends the hashes
+        of the directories of those cluster items ('dirs'). The directories whose hashes differ are the scope of the
+        next Integrity check, so only the metadata of their files is sent and compared.
+
+        Parameters
+        ----------
+        data : bytes
+            JSON with the hashes of the worker's cluster items or directories.
+
+        Returns
+        -------
+        bytes
+            Result.
+        bytes
+            JSON with the cluster items, or the directories of each cluster item, whose hashes differ.
+        """
+        date_start_master = utils.get_utc_now()
+        tree = self.server.integrity_tree
+        hashes = json.loads(data)
+
+        if 'keys' in hashes:
+            self.integrity_scope = None
+            differences = sorted(cluster.compare_integrity_tree(
+                {cluster_item_key: item['hash'] for cluster_item_key, item in tree.items()}, hashes['keys']))
+            if not differences:
+                date_end_master = utils.get_utc_now()
+                self.integrity_check_status.update({
+                    'date_start_master': date_start_master.strftime(DECIMALS_DATE_FORMAT),
+                    'date_end_master': date_end_master.strftime(DECIMALS_DATE_FORMAT)})
+                self.task_loggers['Integrity check'].info(
+                    f"Finished in {(date_end_master - date_start_master).total_seconds():.3f}s. Received hashes of "
+                    f"{len(hashes['keys'])} cluster items. Sync not required.")
+        else:
+            self.integrity_scope = {
+                cluster_item_key: sorted(cluster.compare_integrity_tree(tree.get(cluster_item_key, {}).get('dirs', {}),
+                                                                        dirs))
+                for cluster_item_key, dirs in hashes['dirs'].items()}
+            differences = self.integrity_scope
+
+        return b'ok', json.dumps(differences).encode()
+
     def setup_send_info(self, sync_type: bytes) -> Tuple[bytes, bytes]:
         """Start synchronization process.
 
@@ -638,6 +910,7 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         data = await self.get_chunks_in_task_id(task_id, b'syn_m_a_err')
         result = await self.update_chunks_wdb(data, 'agent-info', logger, b'syn_m_a_err',
                                               self.cluster_items['intervals']['master']['timeout_agent_info'])
+        self.server.agent_nodes.update(self.name, data['chunks'])
 
         # Send result to worker.
         response = await self.send_request(command=b'syn_m_a_e', data=json.dumps(result).encode())
@@ -663,7 +936,7 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         await self.recalculate_group_hash(logger)
 
         sync_object = c_common.SyncWazuhdb(manager=self, logger=logger, cmd=b'syn_g_m_w_c',
-                                           data_retriever=AsyncWazuhDBConnection().run_wdb_command,
+                                           data_retriever=AsyncWazuhDBConnection().iterate,
                                            get_data_command='global sync-agent-groups-get ',
                                            get_payload={"condition": "all", "set_synced": False,
                                                         "get_global_hash": False, "last_id": 0},
@@ -745,8 +1018,15 @@ class MasterHandler(server.AbstractServerHandler, c_common.WazuhCommon):
         # There are no files inside decompressed_files_path, only files_metadata.json which has already been loaded.
         shutil.rmtree(decompressed_files_path)
 
+        # Only the files inside the directories that differ are compared if the integrity trees were exchanged.
+        integrity_control = self.server.integrity_control
+        if self.integrity_scope is not None:
+            integrity_control = cluster.filter_files_by_scope(integrity_control, self.integrity_scope)
+            files_metadata = cluster.filter_files_by_scope(files_metadata, self.integrity_scope)
+            self.integrity_scope = None
+
         # Classify files in shared, missing, extra and extra valid.
-        files_classif = cluster.compare_files(self.server.integrity_control, files_metadata, self.name)
+        files_classif = cluster.compare_files(integrity_control, files_metadata, self.name)
 
         total_time = (utils.get_utc_now() - date_start_master).total_seconds()
         self.extra_valid_requested = False
@@ -995,10 +1275,16 @@ class Master(server.AbstractServer):
         """
         super().__init__(**kwargs, tag="Master")
         self.integrity_control = {}
+        # Tree of hashes of the integrity_control files, compared with the ones of the workers.
+        self.integrity_tree = {}
+        # Compressed files shared by the integrity syncs of the workers.
+        self.sync_artifacts = SyncArtifactCache(self)
+        # Node of each agent reporting to a worker, used to route the distributed API requests.
+        self.agent_nodes = AgentNodeCache(ttl=self.cluster_items['intervals']['master']['agent_nodes_ttl'])
         self.handler_class = MasterHandler
         try:
             self.task_pool = ProcessPoolExecutor(
-                max_workers=min(os.cpu_count(), self.cluster_items['intervals']['master']['process_pool_size']))
+                max_workers=min(os.cpu_count() or 1, self.cluster_items['intervals']['master']['process_pool_size']))
         # Handle exception when the user running Wazuh cannot access /dev/shm
         except (FileNotFoundError, PermissionError):
             self.logger.warning(
@@ -1024,7 +1310,9 @@ class Master(server.AbstractServer):
             Healthcheck and basic information from master node.
         """
         return {'info': {'name': self.configuration['node_name'], 'type': self.configuration['node_type'],
-                         'version': metadata.__version__, 'ip': self.configuration['nodes'][0]}}
+                         'version': metadata.__version__, 'ip': self.configuration['nodes'][0]},
+                'status': {'request_queues': {'dapi': self.dapi.get_metrics(),
+                                              'sendsync': self.sendsync.get_metrics()}}}
 
     async def agent_groups_update(self):
         """Obtain and broadcast agent-groups data periodically.
@@ -1035,7 +1323,7 @@ class Master(server.AbstractServer):
         logger = self.setup_task_logger('Local agent-groups')
         wdb_conn = AsyncWazuhDBConnection()
         sync_object = c_common.SyncWazuhdb(manager=self, logger=logger, cmd=b'syn_g_m_w',
-                                           data_retriever=wdb_conn.run_wdb_command,
+                                           data_retriever=wdb_conn.iterate,
                                            get_data_command='global sync-agent-groups-get ',
                                            get_payload={"condition": "sync_status", "set_synced": True,
                                                         "get_global_hash": True})
@@ -1070,17 +1358,44 @@ class Master(server.AbstractServer):
 
         A dictionary like {'file_path': {<BLAKE2b, merged, merged_name, etc>}, ...} is created and later
         compared with the one received from the workers to find out which files are different, missing or removed.
+
+        If the integrity watcher is enabled, only the metadata of the files changed since the last iteration is
+        updated. Every directory is walked in the first iteration and whenever inotify events are lost.
         """
         file_integrity_logger = self.setup_task_logger("Local integrity")
+        integrity_watcher = None
+        if self.cluster_items['intervals']['master']['integrity_watcher']:
+            try:
+                integrity_watcher = IntegrityWatcher(self.cluster_items)
+            except OSError as e:
+                file_integrity_logger.warning(f"Could not watch the cluster files, every directory will be walked "
+                                              f"periodically instead: {e}")
+        hash_pool_size = min(os.cpu_count() or 1, self.cluster_items['intervals']['master']['hash_pool_size'])
         while True:
             before = perf_counter()
+            hash_log = ''
             file_integrity_logger.info("Starting.")
             try:
-                self.integrity_control, logs = await cluster.run_in_pool(self.loop,
-                                                                         self.task_pool,
-                                                                         cluster.get_files_status,
-                                                                         self.integrity_control)
+                changes, full_scan = integrity_watcher.get_changes() if integrity_watcher else (set(), True)
+                if full_scan or not self.integrity_control:
+                    self.integrity_control, logs = await cluster.run_in_pool(self.loop,
+                                                                             self.task_pool,
+                                                                             cluster.get_files_status,
+                                                                             self.integrity_control,
+                                                                             hash_pool_size=hash_pool_size)
+                elif changes:
+                    file_integrity_logger.debug(f"Updating metadata of {len(changes)} changed paths.")
+                    self.integrity_control, logs = await cluster.run_in_pool(self.loop,
+                                                                             self.task_pool,
+                                                                             cluster.update_files_status,
+                                                                             self.integrity_control, changes)
+                else:
+                    logs = {}
+                if full_scan or changes or not self.integrity_tree:
+                    self.integrity_tree = cluster.get_integrity_tree(self.integrity_control)
                 log_subprocess_execution(file_integrity_logger, logs)
+                if hashing := logs.get('hashing'):
+                    hash_log = f" Hashed {hashing['files']} files in {hashing['time']:.3f}s."
             except Exception as e:
                 file_integrity_logger.error(f"Error calculating local file integrity: {e}")
             finally:
@@ -1088,7 +1403,7 @@ class Master(server.AbstractServer):
                 self.integrity_already_executed.clear()
             after = perf_counter()
             file_integrity_logger.info(f"Finished in {(after - before):.3f}s. Calculated "
-                                       f"metadata of {len(self.integrity_control)} files.")
+                                       f"metadata of {len(self.integrity_control)} files.{hash_log}")
 
             await asyncio.sleep(self.cluster_items['intervals']['master']['recalculate_integrity'])
 
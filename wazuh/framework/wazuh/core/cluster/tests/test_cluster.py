@@ -2,11 +2,13 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import base64
+import hashlib
 import os
 import sys
 import zlib
 from collections import defaultdict
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from time import time
 from unittest.mock import ANY, MagicMock, call, mock_open, patch
 
@@ -243,7 +245,7 @@ def test_walk_dir_ko(mock_path_join, mock_walk):
 def test_get_files_status(mock_get_cluster_items):
     """Check the different outputs of the get_files_status function."""
 
-    test_dict = {"path": "metadata"}
+    test_dict = {"path": {"mod_time": 1, "hash": "hash"}}
 
     with patch('wazuh.core.cluster.cluster.walk_dir', return_value=(test_dict, {})):
         assert isinstance(cluster.get_files_status(), tuple) and \
@@ -256,6 +258,123 @@ def test_get_files_status(mock_get_cluster_items):
         assert logs['warning']['etc/'] == ["Error getting file status: ."]
 
 
+files_cluster_items = {
+    'files': {
+        'etc/': {'files': ['client.keys'], 'recursive': False},
+        'etc/shared/': {'files': ['all'], 'recursive': True},
+        'var/multigroups/': {'files': ['merged.mg'], 'recursive': True},
+        'excluded_files': ['ar.conf', 'ossec.conf'],
+        'excluded_extensions': ['~', '.tmp', '.lock', '.swp']
+    }
+}
+
+
+@pytest.mark.parametrize('relative_path, directory, expected_key', [
+    ('etc/client.keys', False, 'etc/'),
+    ('etc/internal_options.conf', False, None),
+    ('etc/shared/default/agent.conf', False, 'etc/shared/'),
+    ('etc/shared/default/ar.conf', False, None),
+    ('etc/shared/default/agent.conf.swp', False, None),
+    ('var/multigroups/a1b2c3/merged.mg', False, 'var/multigroups/'),
+    ('var/multigroups/a1b2c3/agent.conf', False, None),
+    ('etc/shared', True, 'etc/shared/'),
+    ('etc/shared/default', True, 'etc/shared/'),
+    ('etc/sharedfiles', True, None),
+    ('etc', True, 'etc/'),
+    ('etc/rules', True, None),
+])
+def test_get_cluster_item_key(relative_path, directory, expected_key):
+    """Check that files and directories are related to the right cluster.json['files'] item."""
+    assert cluster.get_cluster_item_key(relative_path, files_cluster_items, directory) == expected_key
+
+
+@patch('wazuh.core.cluster.cluster.blake2b', side_effect=lambda file_path: f'hash of {file_path}')
+def test_update_files_status(blake2b_mock, tmp_path):
+    """Check that updating the changed paths gives the same metadata as walking every directory."""
+    def write_file(relative_path, content='content'):
+        (tmp_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative_path).write_text(content)
+
+    for relative_path in ['etc/client.keys', 'etc/ossec.conf', 'etc/shared/default/agent.conf',
+                          'etc/shared/group1/agent.conf', 'etc/shared/group1/merged.mg',
+                          'var/multigroups/a1b2c3/merged.mg']:
+        write_file(relative_path)
+
+    with patch('wazuh.core.common.WAZUH_PATH', new=str(tmp_path)), \
+            patch('wazuh.core.cluster.cluster.get_cluster_items', return_value=files_cluster_items):
+        previous_status, _ = cluster.get_files_status()
+        assert set(previous_status) == {'etc/client.keys', 'etc/shared/default/agent.conf',
+                                        'etc/shared/group1/agent.conf', 'etc/shared/group1/merged.mg',
+                                        'var/multigroups/a1b2c3/merged.mg'}
+
+        os.utime(tmp_path / 'etc/client.keys', (0, 0))
+        write_file('etc/shared/default/new.conf')
+        write_file('etc/shared/group2/agent.conf')
+        write_file('etc/shared/group2/nested/file.txt')
+        write_file('etc/shared/default/agent.conf.swp')
+        (tmp_path / 'var/multigroups/a1b2c3/merged.mg').unlink()
+        for file in (tmp_path / 'etc/shared/group1').iterdir():
+            file.unlink()
+        (tmp_path / 'etc/shared/group1').rmdir()
+        blake2b_mock.reset_mock()
+
+        status, logs = cluster.update_files_status(previous_status, {
+            'etc/client.keys', 'etc/shared/default/new.conf', 'etc/shared/group2/', 'etc/shared/group1/',
+            'etc/shared/default/agent.conf.swp', 'var/multigroups/a1b2c3/merged.mg', 'etc/ossec.conf'})
+
+        assert blake2b_mock.call_count == 4
+        assert status == cluster.get_files_status()[0]
+        assert status['etc/shared/default/agent.conf'] is previous_status['etc/shared/default/agent.conf']
+        assert logs.pop('hashing')['files'] == 4
+        assert logs == {'debug': {}, 'warning': {}, 'error': {}}
+
+
+@pytest.mark.parametrize('pool_size', [1, 4])
+@patch('wazuh.core.cluster.cluster.HASH_BATCH_SIZE', new=100)
+def test_hash_files(tmp_path, pool_size):
+    """Check that files are hashed in batches and their hashes are reused while they do not change."""
+    contents = {tmp_path / f'file{i}': os.urandom(i * 20) for i in range(10)}
+    for file_path, content in contents.items():
+        file_path.write_bytes(content)
+    file_paths = [str(file_path) for file_path in contents] + [str(tmp_path / 'unknown')]
+    expected = {str(file_path): hashlib.blake2b(content).hexdigest() for file_path, content in contents.items()}
+
+    with patch('wazuh.core.cluster.cluster.hash_cache', new={}), \
+            patch('wazuh.core.cluster.cluster.blake2b', side_effect=cluster.blake2b) as blake2b_mock, \
+            patch('wazuh.core.cluster.cluster.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor_mock:
+        hashes, errors = cluster.hash_files(file_paths, pool_size)
+        assert hashes == expected
+        assert list(errors) == [str(tmp_path / 'unknown')] and isinstance(errors[file_paths[-1]], FileNotFoundError)
+        assert blake2b_mock.call_count == 10
+        assert executor_mock.call_count == (pool_size > 1)
+
+        # Unchanged files are not read again, even if they are renamed
+        os.rename(tmp_path / 'file1', tmp_path / 'renamed')
+        (tmp_path / 'file2').write_bytes(b'new content')
+        blake2b_mock.reset_mock()
+        hashes, _ = cluster.hash_files([str(tmp_path / 'renamed'), str(tmp_path / 'file2')], pool_size)
+        assert hashes == {str(tmp_path / 'renamed'): expected[str(tmp_path / 'file1')],
+                          str(tmp_path / 'file2'): hashlib.blake2b(b'new content').hexdigest()}
+        blake2b_mock.assert_called_once_with(str(tmp_path / 'file2'))
+
+
+@patch('wazuh.core.cluster.cluster.hash_files', return_value=({'/wazuh/etc/file1': 'hash1'}, {
+    '/wazuh/etc/file2': FileNotFoundError('not found'), '/wazuh/etc/file3': PermissionError('denied')}))
+def test_hash_files_status(hash_files_mock):
+    """Check that hashes are added to the metadata and the files that cannot be read are removed."""
+    files_status = {'etc/file0': {'hash': 'hash0'}, 'etc/file1': {'cluster_item_key': 'etc/'},
+                    'etc/file2': {'cluster_item_key': 'etc/'}, 'etc/file3': {'cluster_item_key': 'etc/'}}
+    result_logs = {'debug': defaultdict(dict), 'error': defaultdict(dict)}
+
+    with patch('wazuh.core.common.WAZUH_PATH', new='/wazuh'):
+        assert cluster.hash_files_status(files_status, result_logs, 2) == 3
+
+    hash_files_mock.assert_called_once_with(['/wazuh/etc/file1', '/wazuh/etc/file2', '/wazuh/etc/file3'], 2)
+    assert files_status == {'etc/file0': {'hash': 'hash0'}, 'etc/file1': {'cluster_item_key': 'etc/', 'hash': 'hash1'}}
+    assert result_logs == {'debug': {'etc/': {'/wazuh/etc': ['File file2 was deleted in previous iteration: not found']}},
+                           'error': {'etc/': {'/wazuh/etc': ["Can't read metadata from file file3: denied"]}}}
+
+
 @patch('wazuh.core.cluster.cluster.get_cluster_items', return_value={
     'files': {
         'etc/': {'permissions': 416, 'source': 'master', 'files': ['client.keys'], 'recursive': False, 'restart': False,
@@ -325,59 +444,233 @@ def test_update_cluster_control(failed_item, exists, expected_result):
     assert ko_files == expected_result
 
 
-@patch('zlib.compress', return_value=b'compressed_test_content')
-@patch('wazuh.core.cluster.cluster.get_cluster_items')
-@patch('wazuh.core.cluster.cluster.mkdir_with_mode')
-@patch('wazuh.core.cluster.cluster.path.dirname', return_value='/some/path')
-@patch('wazuh.core.cluster.cluster.path.exists', return_value=False)
-def test_compress_files_ok(mock_path_exists, mock_path_dirname, mock_mkdir_with_mode, mock_get_cluster_items,
-                           mock_zlib):
-    """Check if the compressing function is working properly."""
-    mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 10000, 'compress_level': 0}}}
-
-    with patch('builtins.open', mock_open(read_data='test_content')) as open_mock:
-        assert isinstance(cluster.compress_files('some_name', ['some/path', 'another/path'], {'ko_file': 'file'}),
-                          tuple)
-        assert open_mock.call_args_list == [call(ANY, 'ab'), call(os.path.join(common.WAZUH_PATH, 'some/path'), 'rb'),
-                                            call(os.path.join(common.WAZUH_PATH, 'another/path'), 'rb')]
-        assert open_mock.return_value.write.call_args_list == [
-            call(f'some/path{cluster.PATH_SEP}compressed_test_content{cluster.FILE_SEP}'.encode()),
-            call(f'another/path{cluster.PATH_SEP}compressed_test_content{cluster.FILE_SEP}'.encode()),
-            call(f'files_metadata.json{cluster.PATH_SEP}compressed_test_content'.encode())
-        ]
+def test_negotiate_compression_codec():
+    """Check that zlib is used unless both nodes support the preferred codec."""
+    with patch('wazuh.core.cluster.cluster.get_compression_codecs', return_value=['zstd', 'zlib']):
+        assert cluster.negotiate_compression_codec('zstd', ['zstd', 'zlib']) == 'zstd'
+        assert cluster.negotiate_compression_codec('zstd', ['zlib']) == 'zlib'
+        assert cluster.negotiate_compression_codec('zstd', []) == 'zlib'
+        assert cluster.negotiate_compression_codec('zlib', ['zstd', 'zlib']) == 'zlib'
+    with patch('wazuh.core.cluster.cluster.get_compression_codecs', return_value=['zlib']):
+        assert cluster.negotiate_compression_codec('zstd', ['zstd', 'zlib']) == 'zlib'
+
+
+def test_get_decompressor_ko():
+    """Check that unknown or unavailable codecs are rejected."""
+    with pytest.raises(ValueError, match='Unsupported compression codec: 7'):
+        cluster.get_decompressor(7)
+    with patch('wazuh.core.cluster.cluster.zstandard', new=None):
+        with pytest.raises(ValueError, match='Unsupported compression codec: 1'):
+            cluster.get_decompressor(cluster.COMPRESSION_CODECS['zstd'])
+
+
+@pytest.fixture
+def compress_path(tmp_path):
+    """Create some files to compress in a temporary Wazuh path."""
+    (tmp_path / 'etc' / 'shared' / 'default').mkdir(parents=True)
+    (tmp_path / 'etc' / 'client.keys').write_bytes(b'keys' * 100)
+    (tmp_path / 'etc' / 'shared' / 'default' / 'agent.conf').write_bytes(os.urandom(50))
+    (tmp_path / 'etc' / 'shared' / 'default' / 'merged.mg').write_bytes(b'')
+    (tmp_path / 'etc' / 'shared' / 'default' / 'big.txt').write_bytes(os.urandom(20000))
+    with patch('wazuh.core.common.WAZUH_PATH', new=str(tmp_path)):
+        yield tmp_path
+
+
+DELTA_LINES = [f'{i:03d} agent-{i} any {i:064x}\n'.encode() for i in range(500)]
+
+
+@pytest.mark.parametrize('new_content', [
+    b''.join(DELTA_LINES),
+    b''.join(DELTA_LINES[:200] + [b'200 changed any key\n'] + DELTA_LINES[201:]),
+    b'inserted line\n' + b''.join(DELTA_LINES),
+    b''.join(DELTA_LINES[:100] + DELTA_LINES[150:]),
+    b''.join(DELTA_LINES) + b'appended line\n',
+    b''.join(DELTA_LINES)[:-1000],
+    b''.join(DELTA_LINES[250:] + DELTA_LINES[:250]),
+])
+def test_file_delta(new_content, tmp_path):
+    """Check that the file built from a delta is the same as the original one and that the delta is smaller."""
+    (tmp_path / 'old').write_bytes(b''.join(DELTA_LINES))
+    (tmp_path / 'new').write_bytes(new_content)
+
+    signature = cluster.get_file_signature(str(tmp_path / 'old'), 256)
+    assert signature['block_size'] == 256
+    assert len(base64.b64decode(signature['blocks'])) == \
+           len(b''.join(DELTA_LINES)) // 256 * cluster.SIGNATURE_BLOCK.size
+
+    delta = cluster.get_file_delta(str(tmp_path / 'new'), signature)
+    assert len(delta) < len(new_content) // 4
+    (tmp_path / 'delta').write_bytes(delta)
+    cluster.apply_file_delta(str(tmp_path / 'old'), str(tmp_path / 'delta'), cluster.blake2b(str(tmp_path / 'new')))
+    assert (tmp_path / 'delta').read_bytes() == new_content
+
+
+def test_file_delta_ko(tmp_path):
+    """Check that unrelated files have no delta and that invalid deltas are detected."""
+    (tmp_path / 'old').write_bytes(b''.join(DELTA_LINES))
+    (tmp_path / 'new').write_bytes(os.urandom(len(b''.join(DELTA_LINES))))
+    signature = cluster.get_file_signature(str(tmp_path / 'old'), 256)
+    assert cluster.get_file_delta(str(tmp_path / 'new'), signature) is None
+
+    # The beginning of the file is unrelated too
+    (tmp_path / 'new').write_bytes(os.urandom(len(b''.join(DELTA_LINES)) // 4) + b''.join(DELTA_LINES))
+    assert cluster.get_file_delta(str(tmp_path / 'new'), signature) is None
+
+    # Files smaller than a block, including empty ones, cannot be mapped or copied from the other one
+    for content in (b'', DELTA_LINES[0]):
+        (tmp_path / 'new').write_bytes(content)
+        assert cluster.get_file_delta(str(tmp_path / 'new'), signature) is None
+
+    (tmp_path / 'delta').write_bytes(cluster.DELTA_OP.pack(cluster.DELTA_COPY, 0, 256))
+    with pytest.raises(ValueError, match='does not match the expected hash'):
+        cluster.apply_file_delta(str(tmp_path / 'old'), str(tmp_path / 'delta'), 'hash')
+    (tmp_path / 'delta').write_bytes(cluster.DELTA_OP.pack(cluster.DELTA_COPY, 100000, 256))
+    with pytest.raises(ValueError, match='Invalid file delta'):
+        cluster.apply_file_delta(str(tmp_path / 'old'), str(tmp_path / 'delta'), 'hash')
+    (tmp_path / 'delta').write_bytes(cluster.DELTA_OP.pack(cluster.DELTA_LITERAL, 0, 256)[:-1])
+    with pytest.raises(ValueError, match='Truncated file delta'):
+        cluster.apply_file_delta(str(tmp_path / 'old'), str(tmp_path / 'delta'), 'hash')
 
 
 @patch('wazuh.core.cluster.cluster.get_cluster_items')
-@patch('wazuh.core.cluster.cluster.mkdir_with_mode')
-@patch('wazuh.core.cluster.cluster.path.dirname', return_value='/some/path')
-@patch('wazuh.core.cluster.cluster.path.exists', return_value=False)
-def test_compress_files_ko(mock_path_exists, mock_path_dirname, mock_mkdir_with_mode, mock_get_cluster_items):
-    """Check if the compressing function is raising every exception."""
-    with patch('builtins.open', mock_open(read_data='test_content')):
-        mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 5,'compress_level': 0}}}
-        _, logs = cluster.compress_files('some_name', ['some/path'], {'missing': {}, 'shared': {}})
-        assert logs['warning']['some/path'] == [f'File too large to be synced: '
-                                                f'{os.path.join(common.WAZUH_PATH, "some/path")}']
-
-        mock_get_cluster_items.return_value = {'intervals': {'communication': {'max_zip_size': 15, 'compress_level': 0}}
-                                               }
-        with patch('zlib.compress', side_effect=zlib.error):
-            with pytest.raises(WazuhError, match=r'.* 3001 .*'):
-                cluster.compress_files('some_name', ['some/path'], {'ko_file': 'file'})
-
-        with patch('zlib.compress', return_value=b'compressed_test_content'):
-            _, logs = cluster.compress_files('some_name', ['some/path', 'another/path'], {'ko_file': 'file'})
-            assert logs['warning']['some/path'] == ['Maximum zip size exceeded. '
-                                                    'Not all files will be compressed during this sync.']
-
-        with patch('zlib.compress', return_value='compressed_test_content'):
-            with pytest.raises(WazuhError, match=r'.* 3001 .*'):
-                cluster.compress_files('some_name', ['some/path', 'another/path'], {'ko_file': 'file'})
-
-        with patch("json.dumps", side_effect=Exception):
-            with patch('zlib.compress', return_value=b'test_content'):
-                with pytest.raises(WazuhError, match=r'.* 3001 .*'):
-                    cluster.compress_files('some_name', ['some/path'], {'ko_file': 'file'})
+def test_add_files_signatures(get_cluster_items_mock, compress_path):
+    """Check that only regular files of a supported size get a signature, without modifying the given metadata."""
+    get_cluster_items_mock.return_value = {'intervals': {'communication': {
+        'delta_min_size': 400, 'delta_max_size': 400, 'delta_block_size': 64}}}
+    files_metadata = {'etc/client.keys': {'merged': False}, 'etc/shared/default/agent.conf': {'merged': False},
+                      'etc/shared/default/big.txt': {'merged': True}, 'etc/missing': {'merged': False}}
+    result = cluster.add_files_signatures(files_metadata)
+    assert result == {**files_metadata, 'etc/client.keys': {
+        'merged': False, 'signature': cluster.get_file_signature(str(compress_path / 'etc' / 'client.keys'), 64)}}
+    assert 'signature' not in files_metadata['etc/client.keys']
+
+    # Files bigger than delta_max_size are sent whole, so they need no signature
+    get_cluster_items_mock.return_value['intervals']['communication']['delta_max_size'] = 399
+    assert cluster.add_files_signatures(files_metadata) == files_metadata
+
+
+@pytest.mark.parametrize('pool_size', [1, 4])
+@patch('wazuh.core.cluster.cluster.get_cluster_items')
+def test_compress_files_delta(get_cluster_items_mock, pool_size, compress_path):
+    """Check that the files with a signature are sent as a delta only if it is smaller than the whole file."""
+    get_cluster_items_mock.return_value = {'intervals': {'communication': {
+        'max_zip_size': 100000, 'delta_max_size': 100000, 'compress_level': 1, 'compress_pool_size': pool_size}}}
+    old_keys = b''.join(DELTA_LINES)
+    (compress_path / 'old.keys').write_bytes(old_keys)
+    (compress_path / 'etc' / 'client.keys').write_bytes(old_keys.replace(b'100 agent-100', b'100 agent-XYZ'))
+    keys_signature = cluster.get_file_signature(str(compress_path / 'old.keys'), 256)
+    big_signature = cluster.get_file_signature(str(compress_path / 'etc' / 'shared' / 'default' / 'big.txt'), 256)
+    (compress_path / 'etc' / 'shared' / 'default' / 'big.txt').write_bytes(os.urandom(20000))
+    files = ['etc/client.keys', 'etc/shared/default/agent.conf', 'etc/shared/default/big.txt']
+    metadata = {'shared': {'etc/client.keys': {'hash': 'a', 'signature': keys_signature},
+                           'etc/shared/default/big.txt': {'hash': 'b', 'signature': big_signature}},
+                'missing': {'etc/shared/default/agent.conf': {'hash': 'c'}}, 'extra': {}}
+
+    zip_path, logs = cluster.compress_files('worker1', files, metadata)
+    assert logs['delta']['files'] == 1
+    assert logs['delta']['saved'] > len(old_keys) * 0.9
+    assert 'signature' in metadata['shared']['etc/client.keys']
+
+    files_metadata, decompress_dir = cluster.decompress_files(zip_path)
+    assert files_metadata == {'shared': {'etc/client.keys': {'hash': 'a', 'delta': True},
+                                         'etc/shared/default/big.txt': {'hash': 'b'}},
+                              'missing': {'etc/shared/default/agent.conf': {'hash': 'c'}}, 'extra': {}}
+    for file in files[1:]:
+        assert (compress_path / decompress_dir / file).read_bytes() == (compress_path / file).read_bytes()
+    cluster.apply_file_delta(str(compress_path / 'old.keys'), os.path.join(decompress_dir, 'etc/client.keys'),
+                             cluster.blake2b(str(compress_path / 'etc' / 'client.keys')))
+
+    # The whole file is sent if it is bigger than delta_max_size
+    get_cluster_items_mock.return_value['intervals']['communication']['delta_max_size'] = len(old_keys) - 1
+    zip_path, logs = cluster.compress_files('worker1', files, metadata)
+    assert logs['delta'] == {'files': 0, 'saved': 0}
+    files_metadata, decompress_dir = cluster.decompress_files(zip_path)
+    assert files_metadata['shared']['etc/client.keys'] == {'hash': 'a'}
+    assert (compress_path / decompress_dir / 'etc/client.keys').read_bytes() == \
+           (compress_path / 'etc' / 'client.keys').read_bytes()
+    get_cluster_items_mock.return_value['intervals']['communication']['delta_max_size'] = 100000
+
+    # The whole file is sent if the signature is not valid
+    metadata['shared']['etc/client.keys']['signature'] = {'block_size': 256}
+    zip_path, logs = cluster.compress_files('worker1', files, metadata)
+    assert logs['delta'] == {'files': 0, 'saved': 0}
+    assert logs['debug']['etc/client.keys'][0].startswith('Sending whole file. Could not get its delta: ')
+    files_metadata, decompress_dir = cluster.decompress_files(zip_path)
+    assert files_metadata['shared']['etc/client.keys'] == {'hash': 'a'}
+    assert (compress_path / decompress_dir / 'etc/client.keys').read_bytes() == \
+           (compress_path / 'etc' / 'client.keys').read_bytes()
+
+
+@pytest.mark.parametrize('codec', [
+    'zlib',
+    pytest.param('zstd', marks=pytest.mark.skipif(cluster.zstandard is None, reason='zstandard is not installed'))
+])
+@pytest.mark.parametrize('pool_size', [1, 4])
+@patch('wazuh.core.cluster.cluster.COMPRESS_CHUNK_SIZE', new=64)
+@patch('wazuh.core.cluster.cluster.COMPRESS_STREAM_SIZE', new=1000)
+@patch('wazuh.core.cluster.cluster.get_cluster_items')
+def test_compress_files_ok(get_cluster_items_mock, pool_size, codec, compress_path):
+    """Check that the compressed files and metadata are the same after decompressing them."""
+    get_cluster_items_mock.return_value = {'intervals': {'communication': {
+        'max_zip_size': 100000, 'compress_level': 1, 'compress_pool_size': pool_size}}}
+    files = ['etc/client.keys', 'etc/shared/default/agent.conf', 'etc/shared/default/merged.mg',
+             'etc/shared/default/big.txt']
+    metadata = {'shared': {file: {'hash': file} for file in files}, 'missing': {}, 'extra': {}}
+
+    zip_path, logs = cluster.compress_files('worker1', files, metadata, codec=codec)
+    assert zip_path.startswith(str(compress_path / 'queue' / 'cluster' / 'worker1' / 'worker1-'))
+    assert logs == {'warning': {}, 'debug': {}}
+    with open(zip_path, 'rb') as f:
+        assert f.read(1)[0] == cluster.COMPRESSION_CODECS[codec]
+
+    files_metadata, decompress_dir = cluster.decompress_files(zip_path)
+    assert files_metadata == metadata
+    assert not os.path.exists(zip_path)
+    for file in files:
+        with open(os.path.join(decompress_dir, file), 'rb') as f:
+            assert f.read() == (compress_path / file).read_bytes()
+
+
+@patch('wazuh.core.cluster.cluster.COMPRESS_STREAM_SIZE', new=1000)
+@patch('wazuh.core.cluster.cluster.get_cluster_items')
+def test_compress_files_ko(get_cluster_items_mock, compress_path):
+    """Check that the files that cannot be compressed are removed from the metadata."""
+    def compress_files(max_zip_size, files, pool_size=1):
+        get_cluster_items_mock.return_value = {'intervals': {'communication': {
+            'max_zip_size': max_zip_size, 'compress_level': 1, 'compress_pool_size': pool_size}}}
+        metadata = {'shared': {file: {} for file in files}, 'missing': {}, 'extra': {}}
+        zip_path, logs = cluster.compress_files('worker1', files, metadata)
+        return cluster.decompress_files(zip_path)[0], logs
+
+    # File too large
+    metadata, logs = compress_files(100, ['etc/client.keys'])
+    assert metadata['shared'] == {}
+    assert logs['warning']['etc/client.keys'] == [f'File too large to be synced: '
+                                                  f'{os.path.join(common.WAZUH_PATH, "etc/client.keys")}']
+
+    # Maximum zip size exceeded, both with files compressed while they are written and in the pool
+    for pool_size, stream_size in [(1, 1000), (4, 1000), (4, 100000)]:
+        with patch('wazuh.core.cluster.cluster.COMPRESS_STREAM_SIZE', new=stream_size):
+            metadata, logs = compress_files(
+                20050, ['etc/shared/default/agent.conf', 'etc/shared/default/big.txt', 'etc/client.keys'], pool_size)
+        assert list(metadata['shared']) == ['etc/shared/default/agent.conf']
+        assert logs['warning']['etc/shared/default/big.txt'] == ['Maximum zip size exceeded. '
+                                                                 'Not all files will be compressed during this sync.']
+
+    # Missing files
+    metadata, logs = compress_files(100000, ['etc/client.keys', 'etc/missing'], 4)
+    assert metadata['shared'] == {'etc/client.keys': {}}
+    assert metadata['extra'] == {'etc/missing': {}}
+    assert logs['debug']['etc/missing'][0].startswith('Exception raised: Error 3001 - Error creating zip file:')
+
+    with patch('wazuh.core.cluster.cluster.get_compressor', return_value=MagicMock(compress=MagicMock(
+            side_effect=zlib.error))):
+        with pytest.raises(WazuhError, match=r'.* 3001 .*'):
+            compress_files(100000, ['etc/client.keys'])
+
+    with patch("json.dumps", side_effect=Exception):
+        with pytest.raises(WazuhError, match=r'.* 3001 .*'):
+            compress_files(100000, ['etc/client.keys'])
 
 
 @pytest.mark.asyncio
@@ -390,60 +683,136 @@ async def test_async_decompress_files(decompress_files_mock):
     decompress_files_mock.assert_called_once_with(zip_path, 'files_metadata.json')
 
 
-@pytest.mark.asyncio
-@patch('zlib.decompress')
-@patch('os.makedirs')
-@patch('os.path.exists', side_effect=[False, True, True])
-@patch('wazuh.core.cluster.cluster.remove')
-@patch('wazuh.core.cluster.cluster.mkdir_with_mode')
-@patch('json.loads', return_value="some string with files")
-async def test_decompress_files_ok(json_loads_mock, mkdir_with_mode_mock, remove_mock, os_path_exists_mock,
-                                   mock_makedirs, zlib_mock):
+def test_decompress_files_ok(tmp_path):
     """Check if the decompressing function is working properly."""
-    zip_path = '/foo/bar/'
-    compress_data = f'path{cluster.PATH_SEP}content{cluster.FILE_SEP}path2{cluster.PATH_SEP}content2'.encode()
-
-    with patch('builtins.open', new_callable=mock_open, read_data=compress_data) as open_mock:
-        handlers = [open_mock.return_value]*4
-        open_mock.side_effect = handlers
-
-        ko_files, zip_dir = cluster.decompress_files(compress_path=zip_path)
-        assert ko_files == "some string with files"
-        assert zip_dir == zip_path + 'dir'
-        zlib_mock.assert_has_calls([call(b'content'), call(b'content2')])
-        mock_makedirs.assert_called_once_with(zip_path + 'dir')
-        json_loads_mock.assert_called_once()
-        mkdir_with_mode_mock.assert_called_once_with(zip_dir)
-        remove_mock.assert_called_once_with(zip_path)
-        assert open_mock.call_args_list == [call('/foo/bar/', 'rb'), call('/foo/bar/dir/path', 'wb'),
-                                            call('/foo/bar/dir/path2', 'wb'), call('/foo/bar/dir/files_metadata.json')]
-
-
-@pytest.mark.asyncio
-@patch('shutil.rmtree')
-@patch('zlib.decompress', return_value=Exception)
-@patch('wazuh.core.cluster.cluster.mkdir_with_mode')
-async def test_decompress_files_ko(mkdir_with_mode_mock, zlib_mock, rmtree_mock):
-    """Check if the decompressing function is raising the necessary exceptions."""
-
-    # Raising the expected Exception
-    zip_dir = '/foo/bar/'
-
-    with pytest.raises(Exception):
-        with patch('os.path.exists', return_value=True) as os_path_exists_mock:
-            assert cluster.decompress_files(zip_dir) == "some string with files", zip_dir + "dir"
-            mkdir_with_mode_mock.assert_called_once_with(zip_dir)
-            zlib_mock.assert_called_once()
-            os_path_exists_mock.assert_called_once()
-            rmtree_mock.assert_called_once()
-
-    with pytest.raises(OSError):
-        with patch('builtins.open', mock_open(read_data=f'path{cluster.PATH_SEP}content'.encode())):
-            with patch('os.path.exists', return_value=False):
-                with patch('os.makedirs', side_effect=PermissionError) as mock_makedirs:
-                    with patch('wazuh.core.cluster.cluster.remove'):
-                        mock_makedirs.errno = 13  # Errno 13: Permission denied
-                        cluster.decompress_files(zip_dir)
+    zip_path = str(tmp_path / 'file.zip')
+    with open(zip_path, 'wb') as f:
+        for name, content in [(b'etc/client.keys', b'keys'), (b'files_metadata.json', b'{"missing": {}}')]:
+            compressed = zlib.compress(content)
+            f.write(cluster.FILE_HEADER.pack(cluster.COMPRESSION_CODECS['zlib'], len(name), len(compressed)) + name +
+                    compressed)
+
+    ko_files, zip_dir = cluster.decompress_files(compress_path=zip_path)
+    assert ko_files == {'missing': {}}
+    assert zip_dir == zip_path + 'dir'
+    assert (tmp_path / 'file.zipdir' / 'etc' / 'client.keys').read_bytes() == b'keys'
+    assert not os.path.exists(zip_path)
+
+    # The metadata file is optional
+    with open(zip_path, 'wb') as f:
+        pass
+    assert cluster.decompress_files(compress_path=zip_path, ko_files_name='missing.json') == ('', zip_path + 'dir')
+
+
+def test_get_sync_artifact_key():
+    """Check that the key only depends on the content of the compressed file."""
+    files_metadata = {'missing': {'etc/a': {'hash': '1'}, 'etc/b': {'hash': '2'}}, 'extra': {}}
+    key = cluster.get_sync_artifact_key({'etc/a', 'etc/b'}, files_metadata, 10, 'zlib')
+    assert key == cluster.get_sync_artifact_key(['etc/b', 'etc/a'], dict(reversed(files_metadata.items())), 10, 'zlib')
+    assert key != cluster.get_sync_artifact_key({'etc/a', 'etc/b'}, files_metadata, 10, 'zstd')
+    assert key != cluster.get_sync_artifact_key({'etc/a', 'etc/b'}, files_metadata, 20, 'zlib')
+    assert key != cluster.get_sync_artifact_key({'etc/a'}, files_metadata, 10, 'zlib')
+    files_metadata['missing']['etc/b']['hash'] = '3'
+    assert key != cluster.get_sync_artifact_key({'etc/a', 'etc/b'}, files_metadata, 10, 'zlib')
+
+    # Deltas depend on the copy in the receiving node, so only nodes with the same copy share the key
+    signature = {'block_size': 64, 'blocks': 'AAAA'}
+    files_metadata = {'shared': {'etc/a': {'hash': '1', 'signature': signature}, 'etc/b': {'hash': '2'}}}
+    key = cluster.get_sync_artifact_key({'etc/a', 'etc/b'}, files_metadata, 10, 'zlib')
+    assert key == cluster.get_sync_artifact_key(
+        {'etc/a', 'etc/b'}, {'shared': {**files_metadata['shared'], 'etc/a': {'hash': '1', 'signature': {**signature}}}},
+        10, 'zlib')
+    assert key != cluster.get_sync_artifact_key(
+        {'etc/a', 'etc/b'}, {'shared': {**files_metadata['shared'], 'etc/a': {'hash': '1', 'signature': {
+            **signature, 'blocks': 'BBBB'}}}}, 10, 'zlib')
+    assert files_metadata['shared']['etc/a']['signature'] is signature
+
+
+def test_decompress_file():
+    """Check that files spanning several chunks are decompressed and written incrementally."""
+    content = os.urandom(cluster.DECOMPRESS_CHUNK_SIZE * 3) + bytes(cluster.DECOMPRESS_CHUNK_SIZE)
+    compressed = zlib.compress(content)
+    wf = MagicMock()
+
+    cluster.decompress_file(memoryview(compressed), cluster.COMPRESSION_CODECS['zlib'], wf)
+    assert b''.join(c.args[0] for c in wf.write.call_args_list) == content
+    assert wf.write.call_count == len(range(0, len(compressed), cluster.DECOMPRESS_CHUNK_SIZE)) + 1
+
+
+@pytest.mark.parametrize('content, exception', [
+    (cluster.FILE_HEADER.pack(0, 4, 3)[:-1], 'Truncated compressed file'),
+    (cluster.FILE_HEADER.pack(0, 4, 30) + b'pathabc', 'Truncated compressed file'),
+    (cluster.FILE_HEADER.pack(0, 4, 3) + b'pathabc', 'Error -3 while decompressing data'),
+    (cluster.FILE_HEADER.pack(9, 4, 3) + b'pathabc', 'Unsupported compression codec: 9'),
+])
+def test_decompress_files_ko(tmp_path, content, exception):
+    """Check that invalid compressed files raise an exception and are removed with their decompressed files."""
+    zip_path = str(tmp_path / 'file.zip')
+    with open(zip_path, 'wb') as f:
+        f.write(content)
+
+    with pytest.raises(Exception, match=exception):
+        cluster.decompress_files(zip_path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_get_integrity_tree():
+    """Check that the hashes of the tree only depend on the names and hashes of the files inside each subtree."""
+    files_metadata = {'etc/client.keys': {'cluster_item_key': 'etc/', 'hash': 'a', 'mod_time': 1},
+                      'etc/shared/default/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'b'},
+                      'etc/shared/default/merged.mg': {'cluster_item_key': 'etc/shared/', 'hash': 'c'},
+                      'etc/shared/group1/merged.mg': {'cluster_item_key': 'etc/shared/', 'hash': 'd'}}
+    tree = cluster.get_integrity_tree(files_metadata)
+    assert set(tree) == {'etc/', 'etc/shared/'}
+    assert set(tree['etc/shared/']['dirs']) == {'etc/shared/default', 'etc/shared/group1'}
+    assert tree == cluster.get_integrity_tree(dict(reversed(files_metadata.items())))
+    assert cluster.get_integrity_tree({}) == {}
+
+    # Changing a file only changes the hashes of its directory and cluster item
+    files_metadata['etc/shared/group1/merged.mg'] = {'cluster_item_key': 'etc/shared/', 'hash': 'e'}
+    new_tree = cluster.get_integrity_tree(files_metadata)
+    assert new_tree['etc/'] == tree['etc/']
+    assert new_tree['etc/shared/']['hash'] != tree['etc/shared/']['hash']
+    assert cluster.compare_integrity_tree(new_tree['etc/shared/']['dirs'],
+                                          tree['etc/shared/']['dirs']) == {'etc/shared/group1'}
+
+    # Moving a file to another directory changes the hashes even if its name and content are the same
+    files_metadata['etc/shared/group2/merged.mg'] = files_metadata.pop('etc/shared/group1/merged.mg')
+    assert cluster.get_integrity_tree(files_metadata)['etc/shared/']['hash'] != new_tree['etc/shared/']['hash']
+
+
+def test_compare_integrity_tree():
+    """Check that the subtrees that differ or only exist in one node are returned."""
+    assert cluster.compare_integrity_tree({'a': '1', 'b': '2', 'c': '3'}, {'a': '1', 'b': '0', 'd': '4'}) == \
+           {'b', 'c', 'd'}
+    assert cluster.compare_integrity_tree({'a': '1'}, {'a': '1'}) == set()
+
+
+@patch('wazuh.core.cluster.cluster.get_cluster_items',
+       return_value={'files': {'etc/': {'extra_valid': False}, 'etc/shared/': {'extra_valid': False}}})
+def test_filter_files_by_scope(get_cluster_items_mock):
+    """Check that comparing the files inside the directories that differ gives the same result as comparing all."""
+    master_files = {'etc/client.keys': {'cluster_item_key': 'etc/', 'hash': 'a'},
+                    'etc/shared/default/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'b'},
+                    'etc/shared/group1/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'c'},
+                    'etc/shared/group2/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'd'}}
+    worker_files = {'etc/client.keys': {'cluster_item_key': 'etc/', 'hash': 'a'},
+                    'etc/shared/default/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'b'},
+                    'etc/shared/group1/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'old'},
+                    'etc/shared/group3/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'e'}}
+    master_tree, worker_tree = cluster.get_integrity_tree(master_files), cluster.get_integrity_tree(worker_files)
+
+    keys = cluster.compare_integrity_tree({key: item['hash'] for key, item in master_tree.items()},
+                                          {key: item['hash'] for key, item in worker_tree.items()})
+    assert keys == {'etc/shared/'}
+    scope = {key: cluster.compare_integrity_tree(master_tree[key]['dirs'], worker_tree[key]['dirs']) for key in keys}
+    assert scope == {'etc/shared/': {'etc/shared/group1', 'etc/shared/group2', 'etc/shared/group3'}}
+
+    worker_scope_files = cluster.filter_files_by_scope(worker_files, scope)
+    assert set(worker_scope_files) == {'etc/shared/group1/agent.conf', 'etc/shared/group3/agent.conf'}
+    assert cluster.compare_files(cluster.filter_files_by_scope(master_files, scope), worker_scope_files, 'worker1') \
+           == cluster.compare_files(master_files, worker_files, 'worker1')
+    assert cluster.filter_files_by_scope(master_files, {}) == {}
 
 
 @patch('wazuh.core.cluster.cluster.get_cluster_items')
@@ -463,6 +832,14 @@ def test_compare_files(mock_get_cluster_items):
         assert len(files["extra"]) == 0
         assert len(files["shared"]) == 1
 
+    # The signature of the worker's copy of the shared files is kept
+    mock_get_cluster_items.return_value = {'files': {'key': {'extra_valid': False}}}
+    condition['some/path2/']['signature'] = 'signature'
+    files = cluster.compare_files(seq, condition, 'worker1')
+    assert files['shared'] == {'some/path2/': {**seq['some/path2/'], 'signature': 'signature'}}
+    assert 'signature' not in seq['some/path2/']
+    mock_get_cluster_items.return_value = {'files': {'key': {'extra_valid': True}}}
+
     # Second condition
     condition = {'some/path5/': {'cluster_item_key': 'key', 'hash': 'blake2_hash def value'},
                  'some/path4/': {'cluster_item_key': "key", 'hash': 'blake2_hash value'},
@@ -10,6 +10,7 @@ import hashlib
 import json
 import logging
 import os
+import struct
 import sys
 from contextvars import ContextVar
 from datetime import datetime
@@ -47,7 +48,8 @@ cluster_items = {"etc/": {"permissions": "0o640", "source": "master", "files": [
                                           "max_allowed_time_without_keepalive": 120},
                                "communication": {"timeout_cluster_request": 20, "timeout_dapi_request": 200,
                                                  "timeout_receiving_file": 120, "max_zip_size": 1073741824,
-                                                 "min_zip_size": 31457280, "zip_limit_tolerance": 0.2}
+                                                 "min_zip_size": 31457280, "zip_limit_tolerance": 0.2,
+                                                 "file_transfer_window": 1}
                                }
                  }
 
@@ -447,14 +449,62 @@ def test_handler_init():
     assert isinstance(cluster_common.Handler(None, cluster_items, logger=LoggerMock()).logger, LoggerMock)
 
 
+def test_negotiate_cipher():
+    """Check that the configured cipher is only used if the peer supports it."""
+    assert cluster_common.negotiate_cipher('aes-gcm', ['aes-gcm', 'fernet']) == 'aes-gcm'
+    assert cluster_common.negotiate_cipher('aes-gcm', []) == 'fernet'
+    assert cluster_common.negotiate_cipher('unknown', ['unknown', 'fernet']) == 'fernet'
+    assert cluster_common.negotiate_cipher('fernet', ['aes-gcm', 'fernet']) == 'fernet'
+
+
+def test_handler_encrypt_decrypt():
+    """Check that the messages encrypted by one node can be decrypted by its peer with both ciphers."""
+    master_handler = cluster_common.Handler(fernet_key, cluster_items)
+    worker_handler = cluster_common.Handler(fernet_key, cluster_items)
+    assert master_handler.cipher == worker_handler.cipher == 'fernet'
+
+    # Fernet is used until the cipher is changed, even if the AES-GCM key has been derived
+    worker_handler.setup_cipher(b'salt', is_master=False)
+    fernet_token = master_handler.encrypt(b'data')
+    assert fernet_token.startswith(b'g')
+    assert worker_handler.decrypt(fernet_token) == b'data'
+    assert worker_handler.encrypt(b'data').startswith(b'g')
+
+    # The cipher is changed when an AES-GCM message is received
+    master_handler.setup_cipher(b'salt', is_master=True)
+    worker_handler.cipher = 'aes-gcm'
+    assert master_handler.decrypt(worker_handler.encrypt(b'data')) == b'data'
+    assert master_handler.cipher == 'aes-gcm'
+    for handler, peer in ((master_handler, worker_handler), (worker_handler, master_handler)):
+        first, second = handler.encrypt(b'data'), handler.encrypt(bytearray(b'data'))
+        assert first[:cluster_common.NONCE_SIZE] != second[:cluster_common.NONCE_SIZE]
+        assert first.startswith(handler.nonce_prefix)
+        assert len(first) == cluster_common.NONCE_SIZE + len(b'data') + 16
+        assert peer.decrypt(first) == peer.decrypt(bytearray(second)) == b'data'
+        # Fernet messages are still accepted
+        assert peer.decrypt(cluster_common.Handler(fernet_key, cluster_items).encrypt(b'data')) == b'data'
+
+    # Messages cannot be tampered with or sent back to the node that encrypted them
+    message = bytearray(master_handler.encrypt(b'data'))
+    for invalid_message in (master_handler.encrypt(b'data'), message[:-1] + bytes([message[-1] ^ 1])):
+        with pytest.raises(exception.WazuhClusterError, match=r'.* 3025 .*'):
+            master_handler.decrypt(invalid_message)
+        with pytest.raises(exception.WazuhClusterError, match=r'.* 3025 .*'):
+            worker_handler.decrypt(invalid_message[:-1])
+
+    # Messages are not modified if there is no key
+    handler = cluster_common.Handler(None, cluster_items)
+    assert handler.encrypt(b'data') == handler.decrypt(bytearray(b'data')) == b'data'
+
+
 def test_handler_push():
     """Test if a message is being properly sent to peer."""
     handler = cluster_common.Handler(fernet_key, cluster_items)
 
     handler.transport = asyncio.WriteTransport
-    with patch('asyncio.WriteTransport.write') as write_mock:
-        handler.push(b"message")
-        write_mock.assert_called_once_with(b"message")
+    with patch('asyncio.WriteTransport.writelines') as writelines_mock:
+        handler.push([b"header", b"message"])
+        writelines_mock.assert_called_once_with([b"header", b"message"])
 
 
 def test_handler_next_counter():
@@ -464,23 +514,24 @@ def test_handler_next_counter():
     assert handler.next_counter() == (handler.counter + 1) % (2 ** 32) - 1
 
 
-@patch('struct.pack', return_value=b"v1")
-def test_handler_msg_build_ok(pack_mock):
+def test_handler_msg_build_ok():
     """Test if a message is being built with the right header and payload."""
     handler = cluster_common.Handler(fernet_key, cluster_items)
 
     # Test first if
-    assert isinstance(handler.msg_build(b"command", 12345, b"data"), list)
-    assert isinstance(handler.msg_build(b"command", 12345, b"data")[0], bytearray)
-
-    # Test first else
-    handler.header_len = 1
-    handler.request_chunk = 20
-
-    assert isinstance(handler.msg_build(b"command", 12345, b"000000000000000000000"), list)
-    assert isinstance(handler.msg_build(b"command", 12345, b"data")[0], bytearray)
+    header, payload = handler.msg_build(b"command", 12345, b"data")
+    assert struct.unpack(handler.header_format, header) == (12345, len(payload), b"command ----")
+    assert handler.decrypt(payload) == b"data"
 
-    assert pack_mock.call_count == 10
+    # Test first else. The payloads are views of the encrypted data
+    handler = cluster_common.Handler(None, cluster_items)
+    handler.request_chunk = handler.header_len + 8
+    msgs = handler.msg_build(b"command", 12345, b"0123456789" * 3)
+    assert len(msgs) == 8
+    assert [struct.unpack(handler.header_format, header) for header in msgs[::2]] == \
+           [(12345, 8, b"command ---d")] * 3 + [(12345, 6, b"command ----")]
+    assert all(isinstance(payload, memoryview) for payload in msgs[1::2])
+    assert b"".join(msgs[1::2]) == b"0123456789" * 3
 
 
 def test_handler_msg_build_ko():
@@ -509,6 +560,35 @@ def test_handler_msg_parse():
     assert len(handler.in_buffer) < handler.header_len
     assert handler.msg_parse() is True
 
+    # Test a header split between two reads
+    handler = cluster_common.Handler(fernet_key, cluster_items)
+    message = struct.pack(handler.header_format, 1, 4, b"command ----") + b"data"
+    handler.in_buffer = memoryview(message[:5])
+    assert handler.msg_parse() is False
+    assert handler.header_buffer == message[:5] and not handler.in_buffer
+    handler.in_buffer = memoryview(message[5:])
+    assert handler.msg_parse() is True
+    assert (handler.in_msg.counter, handler.in_msg.cmd, handler.in_msg.payload) == (1, b"command", b"data")
+    assert handler.header_buffer == b"" and not handler.in_buffer
+
+
+def test_handler_data_received_framing():
+    """Check that the messages built by a node are received by its peer whatever the reads they are split into."""
+    handler = cluster_common.Handler(fernet_key, cluster_items)
+    handler.request_chunk = 1000
+    peer = cluster_common.Handler(fernet_key, cluster_items)
+    payloads = [b"", b"small", os.urandom(999), os.urandom(5000)]
+    data = b"".join(b"".join(handler.msg_build(b"command", counter, payload))
+                    for counter, payload in enumerate(payloads))
+
+    for read_size in (len(data), 4096, 7, 1):
+        with patch('wazuh.core.cluster.common.Handler.dispatch') as dispatch_mock:
+            for offset in range(0, len(data), read_size):
+                peer.data_received(data[offset:offset + read_size])
+            assert dispatch_mock.call_args_list == [call(b"command", counter, payload)
+                                                    for counter, payload in enumerate(payloads)]
+        assert peer.div_msg_box == {} and not peer.in_buffer and not peer.header_buffer
+
 
 def test_handler_get_messages_ok():
     """Test the proper decryption of the received data and returns it in separate yields."""
@@ -571,7 +651,7 @@ async def test_handler_send_request_ok(msg_build_mock, next_counter_mock, push_m
     msg_build_mock.assert_called_with(b'some bytes', 30, b'some data')
     next_counter_mock.assert_called_with()
 
-    push_mock.assert_called_with("messages")
+    push_mock.assert_called_with(["some", "messages"])
 
 
 @pytest.mark.asyncio
@@ -716,6 +796,53 @@ async def test_handler_send_file_ok(send_request_mock, os_path_exists_mock):
         os_path_exists_mock.assert_called_once_with('some_file.txt')
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('window, timeouts', [
+    (2, set()),
+    (4, set()),
+    (4, {1, 2})
+])
+async def test_handler_send_file_window(tmp_path, window, timeouts):
+    """Test if a file is sent to peer with several chunks in flight and cumulative acknowledgements."""
+    content = os.urandom(100)
+    (tmp_path / 'file.txt').write_bytes(content)
+    handler = cluster_common.Handler(fernet_key, cluster_items)
+    receiver = cluster_common.Handler(fernet_key, cluster_items)
+    handler.cluster_items = {'intervals': {'communication': {'file_transfer_window': window}}}
+    handler.request_chunk = 16 + 22 + len(b'/file.txt')
+    in_flight = []
+    max_in_flight = 0
+
+    async def send_request(command, data):
+        nonlocal max_in_flight
+        if command == b'new_file':
+            receiver.in_file[data] = {'fd': open(tmp_path / 'received.txt', 'wb'), 'checksum': hashlib.sha256(),
+                                      'received': 0}
+            return b'ok'
+        elif command == b'file_end':
+            return receiver.end_file(data)[1]
+
+        in_flight.append(data)
+        max_in_flight = max(max_in_flight, len(in_flight))
+        await asyncio.sleep(0)
+        in_flight.remove(data)
+        response = receiver.update_file_at(data)[1]
+        if int(data.split(b' ')[1]) // 16 in timeouts:
+            raise exception.WazuhClusterError(3020)
+        return response
+
+    with patch('wazuh.core.common.WAZUH_PATH', new=str(tmp_path)), \
+            patch('wazuh.core.cluster.common.Handler.send_request', side_effect=send_request) as send_request_mock:
+        assert await handler.send_file(str(tmp_path / 'file.txt')) == len(content)
+
+    assert 1 < max_in_flight <= window
+    assert send_request_mock.call_count == 9
+    assert send_request_mock.call_args == call(command=b'file_end',
+                                               data=b'/file.txt ' + hashlib.sha256(content).digest())
+    assert (tmp_path / 'received.txt').read_bytes() == content
+    assert receiver.in_file == {}
+
+
 @pytest.mark.asyncio
 async def test_handler_send_file_ko():
     """Test the 'send_file' method exception raise."""
@@ -894,12 +1021,12 @@ def test_handler_data_received_ok():
     with patch('wazuh.core.cluster.common.Handler.get_messages', return_value=[(b"bytes1", 123, b"bytes2", b"d")]):
         # Test try
         handler.data_received(b"message")
-        assert handler.div_msg_box[123] == b'bytes2'
+        assert handler.div_msg_box[123] == [b'bytes2']
 
         # Test except
-        handler.div_msg_box = {123: b"bytes"}
+        handler.div_msg_box = {123: [b"bytes"]}
         handler.data_received(b"message")
-        assert handler.div_msg_box[123] == b'bytesbytes2'
+        assert handler.div_msg_box[123] == [b'bytes', b'bytes2']
 
     # Test first else and first nested if
     with patch('wazuh.core.cluster.common.Handler.get_messages', return_value=[(b"bytes1", 123, b"bytes2", b"bytes3")]):
@@ -928,7 +1055,7 @@ def test_handler_data_received_ko():
     with patch('wazuh.core.cluster.common.Handler.get_messages', return_value=[(b"bytes1", 123, b"bytes2", b"bytes3")]):
         with patch('cryptography.fernet.Fernet.decrypt', side_effect=cryptography.fernet.InvalidToken):
             with pytest.raises(exception.WazuhClusterError, match=r'.* 3025 .*'):
-                handler.div_msg_box = {123: b"bytes"}
+                handler.div_msg_box = {123: [b"bytes"]}
                 handler.data_received(b"message")
 
 
@@ -942,7 +1069,7 @@ def test_handler_dispatch(process_request_mock, push_mock, msg_build_mock):
     # Test the first try and if
     handler.dispatch(b"command", 123, b"payload")
     process_request_mock.assert_called_once_with(b"command", b"payload")
-    push_mock.assert_called_once_with("msg")
+    push_mock.assert_called_once_with(["msg"])
     msg_build_mock.assert_called_once_with(b"command", 123, b"payload")
 
     # Test the first except
@@ -1053,6 +1180,19 @@ def test_handler_update_file():
             assert handler.update_file(b"filepath data") == (b"ok", b"File updated")
 
 
+def test_handler_update_file_at(tmp_path):
+    """Test if chunks are written at their offset and the contiguous received bytes are acknowledged."""
+    handler = cluster_common.Handler(fernet_key, cluster_items)
+    handler.in_file = {b'name': {'fd': open(tmp_path / 'file', 'wb'), 'checksum': hashlib.sha256(), 'received': 0}}
+
+    assert handler.update_file_at(b'name 0 abc') == (b'ok', b'3')
+    assert handler.update_file_at(b'name 6 ghi') == (b'ok', b'3')
+    assert handler.in_file[b'name']['checksum'] is None
+    assert handler.update_file_at(b'name 3 def') == (b'ok', b'6')
+    assert handler.end_file(b'name ' + hashlib.sha256(b'abcdefghi').digest()) == (b'ok', b'File received correctly')
+    assert (tmp_path / 'file').read_bytes() == b'abcdefghi'
+
+
 def test_handler_end_file():
     """Test if a file descriptor is closed and MD5 checked."""
     handler = cluster_common.Handler(fernet_key, cluster_items)
@@ -1467,47 +1607,47 @@ def test_sync_wazuh_db_init():
 async def test_sync_wazuh_db_retrieve_information(socket_mock):
     """Check the proper functionality of the function in charge of
     obtaining the information from the database of the manager nodes."""
-    counter = 0
+    def data_generator(pages):
+        async def iterate(command, payload, pivot_key):
+            iterate_mock(command=command, payload=dict(payload), pivot_key=pivot_key)
+            for page in pages:
+                if isinstance(page, Exception):
+                    raise page
+                yield page
 
-    def data_generator(command):
-        nonlocal counter
-        counter += 1
-        if counter < 3:
-            return 'due', {'id': counter}
-        else:
-            return 'ok', {'id': counter}
+        iterate_mock = MagicMock()
+        return iterate, iterate_mock
 
     wdb_conn = AsyncWazuhDBConnection()
     logger = logging.getLogger("wazuh")
     handler = cluster_common.Handler(fernet_key, cluster_items)
     sync_object = cluster_common.SyncWazuhdb(manager=handler, logger=logger, cmd=b'syn_a_w_m',
-                                             data_retriever=wdb_conn.run_wdb_command,
+                                             data_retriever=wdb_conn.iterate,
                                              get_data_command='global sync-agent-info-get ',
                                              set_data_command='global sync-agent-info-set')
 
-    with patch.object(sync_object, 'data_retriever', side_effect=data_generator):
-        assert await sync_object.retrieve_information() == [{'id': 1}, {'id': 2}, {'id': 3}]
+    sync_object.data_retriever, iterate_mock = data_generator([('due', '[{"data":[{"id":1}]}]'), ('due', '[]'),
+                                                               ('ok', '[{"data":[{"id":3}]}]')])
+    assert await sync_object.retrieve_information() == ['[{"data":[{"id":1}]}]', '[{"data":[{"id":3}]}]']
+    iterate_mock.assert_called_once_with(command='global sync-agent-info-get ', payload={}, pivot_key=None)
 
     sync_object = cluster_common.SyncWazuhdb(manager=handler, logger=logger, cmd=b'syn_a_w_m',
-                                             data_retriever=wdb_conn.run_wdb_command,
-                                             get_data_command='global sync-agent-info-get ', get_payload={'last_id': 0},
+                                             data_retriever=wdb_conn.iterate,
+                                             get_data_command='global sync-agent-info-get ', get_payload={'last_id': 45},
                                              set_data_command='global sync-agent-info-set', pivot_key='last_id')
 
-    with patch.object(sync_object, 'data_retriever', return_value=('ok', '[{"data": [{"id": 45}]}]')):
-        assert await sync_object.retrieve_information() == ['[{"data": [{"id": 45}]}]']
-        assert sync_object.get_payload == {'last_id': 45}
-
-    # data_retriever returns a JSON that does not follow the pivoting scheme
-    with patch.object(sync_object, 'data_retriever', return_value=('ok', '[{"data": {"id": 45}}]')):
-        assert await sync_object.retrieve_information() == ['[{"data": {"id": 45}}]']
-        assert sync_object.get_payload == {'last_id': 0}
+    # The pivot is reset on each retrieval
+    sync_object.data_retriever, iterate_mock = data_generator([('ok', '[{"data": [{"id": 45}]}]')])
+    assert await sync_object.retrieve_information() == ['[{"data": [{"id": 45}]}]']
+    iterate_mock.assert_called_once_with(command='global sync-agent-info-get ', payload={'last_id': 0},
+                                         pivot_key='last_id')
 
-    # data_retriever returns a JSON that does not follow the pivoting scheme
-    with patch.object(sync_object, 'data_retriever', side_effect=exception.WazuhException(1000)):
-        with patch.object(sync_object.logger, 'error') as logger_error_mock:
-            assert await sync_object.retrieve_information() == []
-            logger_error_mock.assert_called_with(
-                'Could not obtain data from wazuh-db: Error 1000 - Wazuh Internal Error')
+    # data_retriever fails while obtaining a page
+    sync_object.data_retriever, _ = data_generator([('due', '[{"data": [{"id": 45}]}]'),
+                                                    exception.WazuhException(1000)])
+    with patch.object(sync_object.logger, 'error') as logger_error_mock:
+        assert await sync_object.retrieve_information() == []
+        logger_error_mock.assert_called_with('Could not obtain data from wazuh-db: Error 1000 - Wazuh Internal Error')
 
 
 @patch('wazuh.core.wdb_http.WazuhDBHTTPClient')
@@ -1624,57 +1764,47 @@ def test_error_receiving_agent_information():
         logger_error_mock.assert_called_once_with("There was an error while processing info on the peer: response")
 
 
-@patch("wazuh.core.cluster.common.WazuhDBConnection")
-async def test_send_data_to_wdb(WazuhDBConnection_mock):
+@patch("wazuh.core.cluster.common.AsyncWazuhDBConnection")
+async def test_send_data_to_wdb(AsyncWazuhDBConnection_mock):
     """Check if the data chunks are being properly forward to the Wazuh-db socket."""
-
-    class MockWazuhDBConnection:
-        """Auxiliary class."""
-
-        def __init__(self):
-            self.exceptions = 0
-
-        def send(self, data, raw):
-            """Auxiliary method."""
-            if self.exceptions == 0:
-                raise TimeoutError
-            elif self.exceptions == 1:
-                return ''
-            elif self.exceptions == 2:
-                raise Exception('Cannot execute Global database query; FOREIGN KEY constraint failed')
-            else:
-                raise Exception
-
-        def close(self):
-            """Auxiliary method."""
-            pass
-
-    WazuhDBConnection_mock.return_value = MockWazuhDBConnection()
+    run_many_mock = AsyncWazuhDBConnection_mock.return_value.run_many = AsyncMock()
     chunks = ['[{"data": "1chunk"}]', '[{"data": "2chunk"}]']
 
-    result = await cluster_common.send_data_to_wdb(data={'chunks': ['[{"data": ""}]'], 'payload': {}, 
+    run_many_mock.side_effect = TimeoutError
+    result = await cluster_common.send_data_to_wdb(data={'chunks': ['[{"data": ""}]'], 'payload': {},
                                                          'set_data_command': ''}, timeout=15, info_type='agent-groups')
     assert result['error_messages']['others'] == ['Timeout while processing agent-groups chunks.']
+    AsyncWazuhDBConnection_mock.return_value.close.assert_called_once()
 
-    WazuhDBConnection_mock.return_value.exceptions += 1
-    result = await cluster_common.send_data_to_wdb(data={'chunks': chunks, 
-                                                         'payload': {}, 'set_data_command': ''}, 
-                                                         timeout=15, info_type='agent-groups')
+    run_many_mock.side_effect = None
+    run_many_mock.return_value = [['ok'], ['ok']]
+    result = await cluster_common.send_data_to_wdb(data={'chunks': chunks, 'payload': {'mode': 'override'},
+                                                         'set_data_command': 'global set-agent-groups'},
+                                                   timeout=15, info_type='agent-groups')
     assert result['updated_chunks'] == 2
+    assert list(run_many_mock.call_args.args[0]) == [
+        'global set-agent-groups {"mode":"override","data":"1chunk"}',
+        'global set-agent-groups {"mode":"override","data":"2chunk"}']
+    assert run_many_mock.call_args.kwargs == {'return_exceptions': True}
 
-    WazuhDBConnection_mock.return_value.exceptions += 1
+    run_many_mock.return_value = []
     result = await cluster_common.send_data_to_wdb(data={'chunks': chunks, 'set_data_command': ''},
-                                             timeout=15, info_type='agent-groups')
+                                                   timeout=15, info_type='agent-groups')
     assert result['updated_chunks'] == 0
+    assert result['error_messages']['chunks'] == [(0, "'payload'"), (1, "'payload'")]
 
-    WazuhDBConnection_mock.return_value.exceptions += 1
+    run_many_mock.return_value = [
+        exception.WazuhInternalError(2007, extra_message='Cannot execute Global database query; FOREIGN KEY '
+                                                         'constraint failed'),
+        exception.WazuhInternalError(2007, extra_message='Error')]
     result = await cluster_common.send_data_to_wdb(data={'chunks': chunks, 'payload': {}, 'set_data_command': ''},
-                                             timeout=15, info_type='agent-groups')
-    assert result['error_messages']['chunks'] == [(0, ''), (1, '')]
+                                                   timeout=15, info_type='agent-groups')
+    assert result['updated_chunks'] == 0
+    assert result['error_messages']['chunks'] == [(1, str(run_many_mock.return_value[1]))]
 
     with patch('wazuh.core.cluster.master.utils.Timeout', side_effect=Exception):
         result = await cluster_common.send_data_to_wdb(data={'chunks': chunks, 'set_data_command': ''},
-                                                 timeout=15, info_type='agent-groups')
+                                                       timeout=15, info_type='agent-groups')
         assert result['error_messages']['others'] == ['Error while processing agent-groups chunks: ']
 
 
@@ -1898,6 +2028,7 @@ async def test_sync_files_sync_ok(log_subprocess_mock, compress_files_mock, unli
             self.current_zip_limit = cluster_items['intervals']['communication']['max_zip_size']
             self.interrupted_tasks = {b'OK', b'abcd'}
             self.cluster_items = cluster_items
+            self.compression_codec = 'zlib'
 
         async def send_request(self, command, data):
             """Decide with will be the right output depending on the scenario."""
@@ -1916,12 +2047,13 @@ async def test_sync_files_sync_ok(log_subprocess_mock, compress_files_mock, unli
             elif command == b"cmd_e" and b"OK path" and self.count == 4:
                 return b"OK"
 
-        async def send_file(self, filename, task_id):
+        async def send_file(self, filename, task_id, destination=None):
             """Auxiliary method."""
             pass
 
     worker_mock = WorkerMock()
     sync_files = cluster_common.SyncFiles(b"cmd", logging.getLogger("wazuh"), worker_mock)
+    destination = os.path.join(common.WAZUH_PATH, "queue", "cluster", "Testing", "")
 
     # Test second condition
     with patch.object(logging.getLogger("wazuh"), "error") as logger_mock:
@@ -1938,16 +2070,16 @@ async def test_sync_files_sync_ok(log_subprocess_mock, compress_files_mock, unli
         with patch.object(logging.getLogger("wazuh"), "debug") as logger_debug_mock:
             with patch.object(logging.getLogger("wazuh"), "error") as logger_error_mock:
                 await sync_files.sync(files_to_sync, files_metadata, 1, task_pool=None)
-                send_file_mock.assert_called_once_with('files/path/', b'OK')
+                send_file_mock.assert_called_once_with('files/path/', b'OK', destination=destination)
                 logger_debug_mock.assert_has_calls([call(
                     f"Compressing {'files and ' if files_to_sync else ''}'files_metadata.json' of 1 files."),
                     call("Sending zip file."), call("Zip file sent."), call("Decreasing sync size limit to 30.00 MB.")])
                 log_subprocess_mock.assert_called()
                 logger_error_mock.assert_called_once_with("Error sending zip file: ")
                 compress_files_mock.assert_has_calls([call('Testing', {'path1': 'metadata1'},
-                                                           {'path2': 'metadata2'}, None)] * 2)
+                                                           {'path2': 'metadata2'}, None, 'zlib')] * 2)
                 unlink_mock.assert_called_with("files/path/")
-                relpath_mock.assert_called_once_with('files/path/', common.WAZUH_PATH)
+                relpath_mock.assert_called_once_with(destination, common.WAZUH_PATH)
                 assert json_dumps_mock.call_count == 2
 
                 # Reset all mocks
@@ -1959,7 +2091,7 @@ async def test_sync_files_sync_ok(log_subprocess_mock, compress_files_mock, unli
                 # Test elif present in try and first exception
                 worker_mock.count = 3
                 await sync_files.sync(files_to_sync, files_metadata, 1, task_pool=None)
-                send_file_mock.assert_called_once_with('files/path/', b'OK')
+                send_file_mock.assert_called_once_with('files/path/', b'OK', destination=destination)
                 logger_debug_mock.assert_has_calls([call(
                     f"Compressing {'files and ' if files_to_sync else ''}'files_metadata.json' of 1 files."),
                     call("Sending zip file."), call("Zip file sent."), call('Increasing sync size limit to 37.50 MB.')])
@@ -1967,9 +2099,9 @@ async def test_sync_files_sync_ok(log_subprocess_mock, compress_files_mock, unli
                 logger_error_mock.assert_called_once_with(
                     f"Error sending zip file: {exception.WazuhException(3016, 'cmd_e')}")
                 compress_files_mock.assert_called_once_with('Testing', {'path1': 'metadata1'},
-                                                            {'path2': 'metadata2'}, None)
+                                                            {'path2': 'metadata2'}, None, 'zlib')
                 unlink_mock.assert_called_once_with("files/path/")
-                relpath_mock.assert_called_once_with('files/path/', common.WAZUH_PATH)
+                relpath_mock.assert_called_once_with(destination, common.WAZUH_PATH)
                 json_dumps_mock.assert_called_once()
 
                 # Reset all mocks
@@ -1981,14 +2113,15 @@ async def test_sync_files_sync_ok(log_subprocess_mock, compress_files_mock, unli
             # Test return
             worker_mock.count = 4
             await sync_files.sync(files_to_sync, files_metadata, 1, task_pool=None)
-            send_file_mock.assert_called_once_with('files/path/', b'OK')
+            send_file_mock.assert_called_once_with('files/path/', b'OK', destination=destination)
             logger_debug_mock.assert_has_calls([call(
                 f"Compressing {'files and ' if files_to_sync else ''}'files_metadata.json' of 1 files."),
                 call("Sending zip file."), call("Zip file sent."), call("Increasing sync size limit to 46.88 MB.")])
             log_subprocess_mock.assert_called()
-            compress_files_mock.assert_called_once_with('Testing', {'path1': 'metadata1'}, {'path2': 'metadata2'}, None)
+            compress_files_mock.assert_called_once_with('Testing', {'path1': 'metadata1'}, {'path2': 'metadata2'}, None,
+                                                        'zlib')
             unlink_mock.assert_called_once_with("files/path/")
-            relpath_mock.assert_called_once_with('files/path/', common.WAZUH_PATH)
+            relpath_mock.assert_called_once_with(destination, common.WAZUH_PATH)
 
             assert worker_mock.interrupted_tasks == {b'abcd'}
 
@@ -2003,6 +2136,7 @@ async def test_sync_files_sync_ko(send_request_mock):
     handler.loop = None
     handler.name = "Test"
     handler.current_zip_limit = 1000
+    handler.compression_codec = 'zlib'
 
     sync_files = cluster_common.SyncFiles(b"cmd", logging.getLogger("wazuh"), handler)
 
@@ -2020,3 +2154,63 @@ async def test_sync_files_sync_ko(send_request_mock):
                 await sync_files.sync(files_to_sync, files_metadata, 1, task_pool=None)
                 logger_mock.assert_called_with(f"File {compressed_data} could not be removed/not found. "
                                                f"May be due to a lost connection.")
+
+
+@pytest.mark.asyncio
+@patch("os.unlink")
+@patch("wazuh.core.cluster.cluster.compress_files")
+@patch("wazuh.core.cluster.common.Handler.send_file", return_value=100)
+@patch("wazuh.core.cluster.common.Handler.send_request", return_value=b"OK")
+async def test_sync_files_sync_artifacts(send_request_mock, send_file_mock, compress_files_mock, unlink_mock):
+    """Check that the compressed file is taken from the cache and released instead of removed when it is given."""
+    handler = get_handler()
+    handler.name = "Test"
+    handler.current_zip_limit = 1000
+    handler.compression_codec = 'zlib'
+    artifacts = MagicMock(acquire=AsyncMock(return_value=(os.path.join(common.WAZUH_PATH, "file.zip"),
+                                                          {'delta': {'files': 1, 'saved': 1000}})))
+
+    sync_files = cluster_common.SyncFiles(b"cmd", logging.getLogger("wazuh"), handler, artifacts=artifacts)
+    with patch.object(logging.getLogger("wazuh"), "info") as logger_info_mock:
+        await sync_files.sync({"path1"}, {"missing": {"path1": "metadata1"}}, 1, task_pool=None, zip_limit=1000)
+    logger_info_mock.assert_called_once_with("Files sent as a delta: 1 | Bytes saved: 1000")
+    artifacts.acquire.assert_awaited_once_with({"path1"}, {"missing": {"path1": "metadata1"}}, 1000, 'zlib')
+    send_file_mock.assert_called_once_with(os.path.join(common.WAZUH_PATH, "file.zip"), b"OK",
+                                           destination=os.path.join(common.WAZUH_PATH, "queue", "cluster", "Test",
+                                                                    "file.zip"))
+    artifacts.release.assert_called_once_with(os.path.join(common.WAZUH_PATH, "file.zip"))
+    compress_files_mock.assert_not_called()
+    unlink_mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_sync_files_sync_artifacts_received(tmp_path):
+    """Check that a compressed file shared by several workers is received in the directory of the worker."""
+    content = os.urandom(1000)
+    master_dir = tmp_path / "queue" / "cluster" / "master-node"
+    master_dir.mkdir(parents=True)
+    (tmp_path / "queue" / "cluster" / "worker1").mkdir()
+    (master_dir / "master-node-1.zip").write_bytes(content)
+    handler = get_handler()
+    handler.name = "worker1"
+    handler.current_zip_limit = 1000
+    handler.compression_codec = 'zlib'
+    receiver = get_handler()
+    requests = {}
+
+    async def send_request(command, data):
+        requests[command] = data
+        if command in (b'new_file', b'file_upd', b'file_upd_at', b'file_end'):
+            return receiver.process_request(command, data)[1]
+        return b"task_id"
+
+    artifacts = MagicMock(acquire=AsyncMock(return_value=(str(master_dir / "master-node-1.zip"), {})))
+    sync_files = cluster_common.SyncFiles(b"syn_m_c", logging.getLogger("wazuh"), handler, artifacts=artifacts)
+    with patch("wazuh.core.common.WAZUH_PATH", new=str(tmp_path)), \
+            patch.object(handler, "send_request", side_effect=send_request):
+        await sync_files.sync({"path1"}, {}, 1, task_pool=None, zip_limit=1000)
+
+    assert (tmp_path / "queue" / "cluster" / "worker1" / "master-node-1.zip").read_bytes() == content
+    assert requests[b"syn_m_c_e"] == b"task_id queue/cluster/worker1/master-node-1.zip"
+    assert b"syn_m_c_r" not in requests
+    assert receiver.in_file == {}
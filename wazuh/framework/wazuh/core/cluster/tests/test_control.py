@@ -76,6 +76,22 @@ async def test_get_node():
             await control.get_node(lc=local_client)
 
 
+@pytest.mark.asyncio
+async def test_get_agent_nodes():
+    """Verify that get_agent_nodes function returns the node of the agents known by the master."""
+    local_client = LocalClient()
+    with patch('wazuh.core.cluster.local_client.LocalClient.execute',
+               side_effect=async_local_client) as execute_mock:
+        with patch('json.loads', return_value={'nodes': {'worker1': ['001']}, 'unknown': []}):
+            assert await control.get_agent_nodes(lc=local_client, agent_ids=['001']) == \
+                   {'nodes': {'worker1': ['001']}, 'unknown': []}
+        execute_mock.assert_called_once_with(command=b'get_agent_nodes', data=b'["001"]')
+
+        with patch('json.loads', return_value=WazuhClusterError(3020)):
+            with pytest.raises(WazuhClusterError):
+                await control.get_agent_nodes(lc=local_client, agent_ids=['001'])
+
+
 @pytest.mark.asyncio
 async def test_get_health():
     """Verify that get_health function returns the current node health."""
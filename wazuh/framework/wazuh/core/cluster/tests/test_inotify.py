@@ -0,0 +1,158 @@
+# Copyright (C) 2015, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+with patch('wazuh.common.wazuh_uid'):
+    with patch('wazuh.common.wazuh_gid'):
+        sys.modules['wazuh.rbac.orm'] = MagicMock()
+        import wazuh.rbac.decorators
+
+        del sys.modules['wazuh.rbac.orm']
+
+        from wazuh.tests.util import RBAC_bypasser
+
+        wazuh.rbac.decorators.expose_resources = RBAC_bypasser
+        from wazuh.core.cluster import cluster, inotify
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is only available in Linux')
+
+cluster_items = {
+    'files': {
+        'etc/': {'files': ['client.keys'], 'recursive': False},
+        'etc/shared/': {'files': ['all'], 'recursive': True},
+        'var/multigroups/': {'files': ['merged.mg'], 'recursive': True},
+        'excluded_files': ['ar.conf', 'ossec.conf'],
+        'excluded_extensions': ['~', '.tmp', '.lock', '.swp']
+    }
+}
+
+
+@pytest.fixture
+def wazuh_path(tmp_path):
+    """Create the directories listed in `cluster_items` inside a temporary Wazuh path."""
+    (tmp_path / 'etc' / 'shared' / 'default').mkdir(parents=True)
+    (tmp_path / 'etc' / 'client.keys').write_text('keys')
+    (tmp_path / 'etc' / 'shared' / 'default' / 'agent.conf').write_text('conf')
+    with patch('wazuh.core.common.WAZUH_PATH', new=str(tmp_path)), \
+            patch('wazuh.core.cluster.cluster.get_cluster_items', return_value=cluster_items):
+        yield tmp_path
+
+
+@pytest.fixture
+def watcher(wazuh_path):
+    """Get an IntegrityWatcher of the temporary Wazuh path."""
+    integrity_watcher = inotify.IntegrityWatcher(cluster_items)
+    yield integrity_watcher
+    integrity_watcher.close()
+
+
+def test_inotify_read_events(tmp_path):
+    """Check that the events of a watched directory are read without blocking."""
+    inotify_instance = inotify.Inotify()
+    try:
+        wd = inotify_instance.add_watch(str(tmp_path))
+        assert list(inotify_instance.read_events()) == []
+
+        (tmp_path / 'file').write_text('content')
+        (tmp_path / 'dir').mkdir()
+        events = list(inotify_instance.read_events())
+        assert (wd, inotify.IN_CREATE, 0, 'file') in events
+        assert (wd, inotify.IN_CLOSE_WRITE, 0, 'file') in events
+        assert (wd, inotify.IN_CREATE | inotify.IN_ISDIR, 0, 'dir') in events
+
+        inotify_instance.rm_watch(wd)
+        with pytest.raises(OSError):
+            inotify_instance.rm_watch(wd)
+        with pytest.raises(OSError):
+            inotify_instance.add_watch(str(tmp_path / 'file'))
+    finally:
+        inotify_instance.close()
+
+
+def test_integrity_watcher_get_changes(wazuh_path, watcher):
+    """Check that the changed files and directories are reported and the metadata can be updated from them."""
+    previous_status, _ = cluster.get_files_status()
+    assert set(watcher.roots) == {str(wazuh_path / 'etc'), str(wazuh_path / 'etc' / 'shared'),
+                                  str(wazuh_path / 'var' / 'multigroups')}
+    assert watcher.missing_roots == {str(wazuh_path / 'var' / 'multigroups')}
+    assert watcher.get_changes() == (set(), False)
+
+    (wazuh_path / 'etc' / 'client.keys').write_text('new keys')
+    (wazuh_path / 'etc' / 'ossec.conf').write_text('conf')
+    (wazuh_path / 'etc' / 'shared' / 'group1' / 'nested').mkdir(parents=True)
+    (wazuh_path / 'etc' / 'shared' / 'group1' / 'nested' / 'file').write_text('file')
+    (wazuh_path / 'var' / 'multigroups' / 'a1b2c3').mkdir(parents=True)
+    (wazuh_path / 'var' / 'multigroups' / 'a1b2c3' / 'merged.mg').write_text('merged')
+
+    changes, full_scan = watcher.get_changes()
+    assert not full_scan
+    assert changes == {'etc/client.keys', 'etc/ossec.conf', 'etc/shared/group1/', 'var/multigroups/'}
+    assert str(wazuh_path / 'etc' / 'shared' / 'group1' / 'nested') in watcher.watched_dirs
+    assert watcher.missing_roots == set()
+    status, _ = cluster.update_files_status(previous_status, changes)
+    assert status == cluster.get_files_status()[0]
+
+    # Changes inside the new directories are watched too
+    (wazuh_path / 'etc' / 'shared' / 'group1' / 'nested' / 'file').write_text('new content')
+    (wazuh_path / 'var' / 'multigroups' / 'a1b2c3' / 'merged.mg').unlink()
+    (wazuh_path / 'etc' / 'shared' / 'default').rename(wazuh_path / 'etc' / 'shared' / 'renamed')
+    changes, full_scan = watcher.get_changes()
+    assert changes == {'etc/shared/group1/nested/file', 'var/multigroups/a1b2c3/merged.mg', 'etc/shared/default/',
+                       'etc/shared/renamed/'}
+    status, _ = cluster.update_files_status(status, changes)
+    assert status == cluster.get_files_status()[0]
+    assert str(wazuh_path / 'etc' / 'shared' / 'default') not in watcher.watched_dirs
+
+
+def test_integrity_watcher_get_changes_root_removed(wazuh_path, watcher):
+    """Check that a removed directory listed in cluster.json['files'] is watched again once it is created."""
+    os.rename(wazuh_path / 'etc' / 'shared', wazuh_path / 'shared')
+    assert watcher.get_changes() == ({'etc/shared/'}, False)
+    assert str(wazuh_path / 'etc' / 'shared') in watcher.missing_roots
+
+    (wazuh_path / 'etc' / 'shared').mkdir()
+    changes, _ = watcher.get_changes()
+    assert changes == {'etc/shared/'}
+    assert str(wazuh_path / 'etc' / 'shared') in watcher.watched_dirs
+
+    (wazuh_path / 'etc' / 'shared' / 'file').write_text('file')
+    assert watcher.get_changes() == ({'etc/shared/file'}, False)
+
+
+def test_integrity_watcher_get_changes_overflow(watcher):
+    """Check that a full scan is requested when the inotify queue overflows."""
+    with patch.object(watcher.inotify, 'read_events', return_value=[(-1, inotify.IN_Q_OVERFLOW, 0, '')]):
+        assert watcher.get_changes() == (set(), True)
+
+
+def test_integrity_watcher_get_changes_unwatched(wazuh_path, watcher):
+    """Check that every directory is walked while some of them cannot be watched, and watching them is retried."""
+    with patch.object(watcher.inotify, 'add_watch', side_effect=OSError(28, 'No space left on device')):
+        (wazuh_path / 'etc' / 'shared' / 'group1').mkdir()
+        assert watcher.get_changes() == ({'etc/shared/group1/'}, True)
+        (wazuh_path / 'etc' / 'shared' / 'group1' / 'file').write_text('file')
+        assert watcher.get_changes() == (set(), True)
+        assert watcher.unwatched_dirs == {str(wazuh_path / 'etc' / 'shared' / 'group1')}
+
+    # The walk is requested once more after the directory is watched
+    assert watcher.get_changes() == (set(), True)
+    assert watcher.unwatched_dirs == set()
+    assert str(wazuh_path / 'etc' / 'shared' / 'group1') in watcher.watched_dirs
+
+    (wazuh_path / 'etc' / 'shared' / 'group1' / 'file').write_text('new content')
+    assert watcher.get_changes() == ({'etc/shared/group1/file'}, False)
+
+
+def test_integrity_watcher_ko(wazuh_path):
+    """Check that the inotify instance is closed if the directories cannot be watched."""
+    with patch('wazuh.core.cluster.inotify.Inotify.add_watch', side_effect=OSError(28, 'No space left on device')), \
+            patch('wazuh.core.cluster.inotify.Inotify.close') as close_mock:
+        with pytest.raises(OSError):
+            inotify.IntegrityWatcher(cluster_items)
+        close_mock.assert_called_once()
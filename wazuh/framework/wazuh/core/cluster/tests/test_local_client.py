@@ -5,7 +5,7 @@
 from asyncio import Event, Transport
 from asyncio.transports import BaseTransport
 from collections.abc import Callable
-from unittest.mock import patch, AsyncMock, call
+from unittest.mock import patch, AsyncMock, MagicMock, call
 
 import pytest
 from uvloop import EventLoopPolicy, new_event_loop
@@ -248,10 +248,107 @@ async def test_localclient_execute():
     with patch("wazuh.core.cluster.local_client.LocalClient.start"):
         with patch("wazuh.core.cluster.local_client.LocalClient.send_api_request", return_value="Test"):
             with patch("asyncio.transports.BaseTransport.close"):
-                lc = LocalClient()
-                lc.transport = BaseTransport()
-                lc.protocol = Protocol()
-                assert await lc.execute(command=b"0", data=b"1") == "Test"
+                with patch("wazuh.core.cluster.local_client.get_local_client_pool", return_value=None):
+                    lc = LocalClient()
+                    lc.transport = BaseTransport()
+                    lc.protocol = Protocol()
+                    assert await lc.execute(command=b"0", data=b"1") == "Test"
+
+
+@pytest.mark.asyncio
+async def test_localclient_execute_pool():
+    """Check that the connections of the pool are reused and returned to it after a successful request."""
+    transport, protocol = MagicMock(), MagicMock()
+    protocol.on_con_lost = asyncio.get_running_loop().create_future()
+    protocol.on_con_lost.set_result(True)
+    pool = MagicMock()
+
+    async def start(lc):
+        lc.transport, lc.protocol = transport, protocol
+
+    with patch("wazuh.core.cluster.local_client.get_local_client_pool", return_value=pool), \
+            patch("wazuh.core.cluster.local_client.LocalClient.start", side_effect=start, autospec=True) as start_mock, \
+            patch("wazuh.core.cluster.local_client.LocalClient.send_api_request",
+                  side_effect=["Test", WazuhInternalError(3020)]):
+        # A new connection is created if there is no idle one
+        pool.get.return_value = None
+        assert await LocalClient().execute(command=b"0", data=b"1") == "Test"
+        start_mock.assert_called_once()
+        pool.put.assert_called_once_with(transport, protocol)
+        transport.close.assert_not_called()
+
+        # Idle connections are reused and closed if the request fails
+        pool.reset_mock()
+        pool.get.return_value = (transport, protocol)
+        with pytest.raises(WazuhInternalError, match=r'.* 3020 .*'):
+            await LocalClient().execute(command=b"0", data=b"1")
+        start_mock.assert_called_once()
+        pool.put.assert_not_called()
+        transport.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_local_client_pool():
+    """Check that the idle connections are reused until they are too old."""
+
+    def get_connection(connection_time):
+        transport = MagicMock()
+        transport.is_closing.return_value = False
+        protocol = LocalClientHandler(loop=None, on_con_lost=None, name="Unittest", logger=None, fernet_key='',
+                                      manager=None, cluster_items={})
+        protocol.connection_time = connection_time
+        return transport, protocol
+
+    pool = LocalClientPool(size=2, max_age=60)
+    assert pool.get() is None
+
+    # Connections are reused from the most recently used one
+    now = time.monotonic()
+    first, second, third = get_connection(now), get_connection(now), get_connection(now)
+    first[1].response_available.set()
+    first[1].response = b"response"
+    pool.put(*first)
+    pool.put(*second)
+    assert not first[1].response_available.is_set() and first[1].response == b""
+    # The pool is full
+    pool.put(*third)
+    third[0].close.assert_called_once()
+    assert pool.get() == second
+    second[0].is_closing.return_value = True
+    pool.put(*second)
+    second[0].close.assert_called_once()
+    assert pool.get() == first
+    assert pool.get() is None
+
+    # Old connections are not reused
+    old = get_connection(now - 60)
+    pool.put(*old)
+    old[0].close.assert_called_once()
+    assert pool.get() is None
+
+    # Idle connections are closed once they are too old
+    pool.max_age = 0.01
+    pool.put(*get_connection(time.monotonic()))
+    await asyncio.sleep(0.05)
+    assert not pool.idle
+    # Closed connections are skipped
+    pool.max_age = 60
+    pool.put(*first)
+    first[0].is_closing.return_value = True
+    assert pool.get() is None
+
+
+@pytest.mark.asyncio
+async def test_get_local_client_pool():
+    """Check that the pool is created once per event loop and that it can be disabled."""
+    cluster_items = {'distributed_api': {'local_client_pool_size': 4}, 'intervals': {'worker': {'keep_alive': 60}}}
+    with patch("wazuh.core.cluster.local_client._local_client_pool", None):
+        pool = get_local_client_pool(cluster_items)
+        assert (pool.size, pool.max_age) == (4, 60)
+        assert get_local_client_pool(cluster_items) is pool
+
+        cluster_items['distributed_api']['local_client_pool_size'] = 0
+        assert get_local_client_pool(cluster_items) is None
 
 
 @pytest.mark.asyncio
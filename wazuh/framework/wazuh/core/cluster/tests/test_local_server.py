@@ -300,6 +300,10 @@ async def test_LocalServerHandlerMaster_process_request(process_request_mock, ev
     with pytest.raises(WazuhClusterError, match=".* 3022 .*"):
         lshm.process_request(command=b"dapi_fwd", data=b"no fwd")
 
+    with patch.object(lshm, "get_agent_nodes") as get_agent_nodes_mock:
+        lshm.process_request(command=b"get_agent_nodes", data=b'["001"]')
+        get_agent_nodes_mock.assert_called_once_with(b'["001"]')
+
 
 @pytest.mark.asyncio
 async def test_LocalServerHandlerMaster_get_nodes(event_loop):
@@ -333,6 +337,18 @@ async def test_LocalServerHandlerMaster_get_health(event_loop):
     assert lshm.get_health(filter_nodes=b"{\"get_health\": \"a\"}") == (b'ok', b'{"get_health": {"get_health": "a"}}')
 
 
+@pytest.mark.asyncio
+async def test_LocalServerHandlerMaster_get_agent_nodes(event_loop):
+    """Set the behavior of the get_agent_nodes function of the LocalServerHandlerMaster class."""
+    server_mock = MagicMock()
+    server_mock.node.agent_nodes.get_nodes.return_value = {'nodes': {'worker1': ['001']}, 'unknown': ['002']}
+
+    lshm = LocalServerHandlerMaster(server=server_mock, loop=event_loop, fernet_key=None, cluster_items={})
+    assert lshm.get_agent_nodes(agent_ids=b'["001", "002"]') == \
+           (b'ok', b'{"nodes": {"worker1": ["001"]}, "unknown": ["002"]}')
+    server_mock.node.agent_nodes.get_nodes.assert_called_once_with(['001', '002'])
+
+
 @pytest.mark.asyncio
 async def test_LocalServerHandlerMaster_send_file_request(event_loop):
     """Check that the task for sending files is created."""
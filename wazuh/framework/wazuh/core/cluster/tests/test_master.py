@@ -3,6 +3,7 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio
+import json
 import logging
 import sys
 from collections import defaultdict
@@ -26,7 +27,7 @@ with patch('wazuh.core.common.wazuh_uid'):
         from wazuh.tests.util import RBAC_bypasser
 
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
-        from wazuh.core.cluster import common as cluster_common, client, master
+        from wazuh.core.cluster import common as cluster_common, client, cluster, master
         from wazuh.core.cluster.master import DEFAULT_DATE
         from wazuh.core import common
         from wazuh.core.cluster.dapi import dapi
@@ -38,11 +39,13 @@ cluster_items = {'node': 'master-node',
                  'intervals': {'worker': {'connection_retry': 1, "sync_integrity": 2, "sync_agent_info": 5},
                                "communication": {"timeout_receiving_file": 1, "timeout_dapi_request": 1,
                                                  "max_zip_size": 1073741824, "min_zip_size": 31457280,
-                                                 "zip_limit_tolerance": 0.2},
+                                                 "zip_limit_tolerance": 0.2, "compress_codec": "zstd",
+                                                 "cipher": "aes-gcm"},
                                'master': {'max_locked_integrity_time': 0, 'timeout_agent_info': 0,
                                           'timeout_extra_valid': 0, 'process_pool_size': 10,
                                           'recalculate_integrity': 0, 'sync_agent_groups': 1,
-                                          'agent_group_start_delay': 1}},
+                                          'agent_group_start_delay': 1, 'integrity_watcher': False,
+                                          'hash_pool_size': 1, 'agent_nodes_ttl': 60}},
                  "files": {"cluster_item_key": {"remove_subdirs_if_empty": True, "permissions": "value"}}}
 
 fernet_key = "0" * 32
@@ -274,6 +277,93 @@ def test_rait_done_callback(set_up_coro_mock, super_callback_mock, create_task_m
     assert wazuh_common_mock.sync_agent_info_free is True
 
 
+def test_agent_node_cache():
+    """Check that the node of the agents is updated from the agent-info sync of the workers and expires."""
+    agent_nodes = master.AgentNodeCache(ttl=60)
+    with patch('wazuh.core.cluster.master.perf_counter', return_value=100):
+        agent_nodes.update('worker1', {'syncreq': [{'id': 1, 'node_name': 'worker1'}, {'id': 2, 'node_name': 'worker1'}],
+                                       'syncreq_keepalive': [3], 'syncreq_status': []})
+        agent_nodes.update('worker2', {'syncreq': [{'id': 2, 'node_name': 'worker2'}],
+                                       'syncreq_status': [{'id': 4, 'connection_status': 'active'}]})
+        assert agent_nodes.get_nodes(['001', '002', '003', '004', '005']) == \
+               {'nodes': {'worker1': ['001', '003'], 'worker2': ['002', '004']}, 'unknown': ['005']}
+
+        # Agents disconnected from their worker are removed, but not if they reported to another one.
+        agent_nodes.update('worker1', {'syncreq_status': [{'id': 1, 'connection_status': 'disconnected'},
+                                                          {'id': 2, 'connection_status': 'disconnected'}]})
+        assert agent_nodes.get_nodes(['001', '002']) == {'nodes': {'worker2': ['002']}, 'unknown': ['001']}
+
+        agent_nodes.remove_node('worker2')
+        assert agent_nodes.get_nodes(['002', '003', '004']) == {'nodes': {'worker1': ['003']},
+                                                                'unknown': ['002', '004']}
+
+    with patch('wazuh.core.cluster.master.perf_counter', return_value=160):
+        assert agent_nodes.get_nodes(['003']) == {'nodes': {}, 'unknown': ['003']}
+
+
+@pytest.mark.asyncio
+@patch('os.unlink')
+async def test_sync_artifact_cache(unlink_mock):
+    """Check that the syncs with the same files share a compressed file, removed when none of them uses it."""
+    compressed = asyncio.Event()
+    zips = iter(range(10))
+
+    async def run_in_pool(loop, pool, f, name, files, files_metadata, zip_limit, codec):
+        await compressed.wait()
+        if not files:
+            raise Exception('Compression error')
+        return f"{name}-{next(zips)}.zip", {'debug': {}}
+
+    server = MagicMock(configuration={'node_name': 'master'}, task_pool=None)
+    artifacts = master.SyncArtifactCache(server)
+    with patch('wazuh.core.cluster.cluster.run_in_pool', side_effect=run_in_pool) as run_in_pool_mock:
+        syncs = [asyncio.create_task(artifacts.acquire({'etc/a'}, {'missing': {'etc/a': {'hash': '1'}}}, 10, 'zlib'))
+                 for _ in range(3)]
+        syncs.append(asyncio.create_task(artifacts.acquire({'etc/a'}, {'missing': {'etc/a': {'hash': '2'}}}, 10,
+                                                           'zlib')))
+        await asyncio.sleep(0)
+        compressed.set()
+        results = await asyncio.gather(*syncs)
+        assert results[:3] == [('master-0.zip', {'debug': {}})] * 3
+        assert results[3] == ('master-1.zip', {'debug': {}})
+        assert run_in_pool_mock.call_count == 2
+        run_in_pool_mock.assert_called_with(server.loop, None, cluster.compress_files, 'master', {'etc/a'},
+                                            {'missing': {'etc/a': {'hash': '2'}}}, 10, 'zlib')
+
+        # The file is removed when the last sync releases it
+        for _ in range(3):
+            await asyncio.sleep(0)
+            unlink_mock.assert_not_called()
+            artifacts.release('master-0.zip')
+        await asyncio.sleep(0)
+        unlink_mock.assert_called_once_with('master-0.zip')
+        assert len(artifacts.artifacts) == 1
+        assert list(artifacts.paths) == ['master-1.zip']
+        artifacts.release('master-1.zip')
+
+        # A cancelled sync releases the file, which is removed once compressed
+        compressed.clear()
+        sync = asyncio.create_task(artifacts.acquire({'etc/b'}, {}, 10, 'zlib'))
+        await asyncio.sleep(0)
+        sync.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await sync
+        assert len(artifacts.artifacts) == 0
+        compressed.set()
+        for _ in range(3):
+            await asyncio.sleep(0)
+        unlink_mock.assert_called_with('master-2.zip')
+
+        # Errors are raised to every sync and nothing is removed
+        unlink_mock.reset_mock()
+        syncs = [asyncio.create_task(artifacts.acquire(set(), {}, 10, 'zlib')) for _ in range(2)]
+        for result in await asyncio.gather(*syncs, return_exceptions=True):
+            assert str(result) == 'Compression error'
+        await asyncio.sleep(0)
+        unlink_mock.assert_not_called()
+        assert len(artifacts.artifacts) == 0
+
+
 # Test MasterHandler class
 
 def test_master_handler_init():
@@ -393,6 +483,11 @@ def test_master_handler_process_request(logger_mock):
         setup_sync_integrity_mock.assert_has_calls(
             [call(b'syn_i_w_m', b"data"), call(b'syn_e_w_m', b"data"), call(b'syn_a_w_m', b"data")])
 
+    with patch("wazuh.core.cluster.master.MasterHandler.compare_integrity_tree",
+               return_value=b"ok") as compare_integrity_tree_mock:
+        assert master_handler.process_request(command=b'syn_i_w_m_t', data=b"data") == b"ok"
+        compare_integrity_tree_mock.assert_called_once_with(b"data")
+
     # Test the third condition
     with patch("wazuh.core.cluster.master.MasterHandler.end_receiving_integrity_checksums",
                return_value=b"ok") as end_receiving_integrity_checksums_mock:
@@ -475,6 +570,12 @@ def test_master_handler_process_request(logger_mock):
                 get_health_mock.assert_called_once_with(b"ok")
                 json_dumps_mock.assert_called_once()
 
+    with patch("wazuh.core.cluster.master.MasterHandler.get_agent_nodes",
+               return_value=(b"ok", {"nodes": {}, "unknown": ["001"]})) as get_agent_nodes_mock:
+        assert master_handler.process_request(command=b'get_agent_nodes', data=b'["001"]') == \
+               (b"ok", b'{"nodes": {}, "unknown": ["001"]}')
+        get_agent_nodes_mock.assert_called_once_with(["001"])
+
     # Test the thirteenth condition
     with patch.object(DapiMock, "add_request") as add_request_mock:
         assert master_handler.process_request(command=b'sendsync', data=b"data") == (b'ok',
@@ -490,13 +591,15 @@ def test_master_handler_process_request(logger_mock):
 
     logger_mock.assert_has_calls([call("Command received: b'syn_i_w_m_p'"), call("Command received: b'syn_a_w_m_p'"),
                                   call("Command received: b'syn_i_w_m'"), call("Command received: b'syn_e_w_m'"),
-                                  call("Command received: b'syn_a_w_m'"), call("Command received: b'syn_i_w_m_e'"),
+                                  call("Command received: b'syn_a_w_m'"), call("Command received: b'syn_i_w_m_t'"),
+                                  call("Command received: b'syn_i_w_m_e'"),
                                   call("Command received: b'syn_e_w_m_e'"), call("Command received: b'syn_i_w_m_r'"),
                                   call("Command received: b'syn_w_g_e'"), call("Command received: b'syn_wgc_e'"),
                                   call("Command received: b'syn_w_g_err'"), call("Command received: b'syn_wgc_err'"),
                                   call("Command received: b'dapi'"), call("Command received: b'dapi_res'"),
                                   call("Command received: b'get_nodes'"),
-                                  call("Command received: b'get_health'"), call("Command received: b'sendsync'"),
+                                  call("Command received: b'get_health'"), call("Command received: b'get_agent_nodes'"),
+                                  call("Command received: b'sendsync'"),
                                   call("Command received: b'random'")])
 
 
@@ -608,7 +711,7 @@ async def test_master_handler_execute_ko(uuid4_mock):
 @patch("os.path.join", return_value="/some/path")
 @patch("wazuh.core.cluster.master.utils.mkdir_with_mode")
 @patch("wazuh.core.cluster.master.metadata.__version__", "version")
-@patch("wazuh.core.cluster.server.AbstractServerHandler.hello", return_value=(b"ok", "payload"))
+@patch("wazuh.core.cluster.server.AbstractServerHandler.hello", return_value=(b"ok", b"payload"))
 def test_master_handler_hello_ok(super_hello_mock, mkdir_with_mode_mock, join_mock, path_exists_mock, sync_files_mock,
                                  sync_db_mock, mock_db_conn):
     """Check if the 'hello' command received from worker is being correctly processed."""
@@ -620,17 +723,24 @@ def test_master_handler_hello_ok(super_hello_mock, mkdir_with_mode_mock, join_mo
 
         def __init__(self):
             self.configuration = {}
+            self.sync_artifacts = "SyncArtifactCacheMock"
+            self.agent_nodes = MagicMock()
 
     master_handler.server = Server()
     master_handler.server.configuration["name"] = "cluster_name"
 
-    assert master_handler.hello(b"name cluster_name node_type version") == (b"ok", "payload")
+    assert master_handler.hello(b"name cluster_name node_type version") == \
+           (b"ok", b'{"message": "payload", "compression_codec": "zlib", "cipher": "fernet", "cipher_salt": ""}')
+    assert master_handler.compression_codec == 'zlib'
+    assert master_handler.cipher == 'fernet'
+    assert master_handler.my_aesgcm is None
 
     super_hello_mock.assert_called_once_with(b"name")
+    master_handler.server.agent_nodes.remove_node.assert_called_once_with(master_handler.name)
     mkdir_with_mode_mock.assert_called_once_with("/some/path")
     join_mock.assert_called_once_with(common.WAZUH_PATH, "queue", "cluster", None)
     path_exists_mock.assert_called_once_with("/some/path")
-    sync_files_mock.assert_called_once_with(cmd=b"syn_m_c", logger=ANY, manager=ANY)
+    sync_files_mock.assert_called_once_with(cmd=b"syn_m_c", logger=ANY, manager=ANY, artifacts="SyncArtifactCacheMock")
     sync_db_mock.assert_called_once_with(manager=ANY, logger=ANY, cmd=b"syn_g_m_w", data_retriever=ANY,
                                          set_data_command="global set-agent-groups",
                                          set_payload={"mode": "override", "sync_status": "synced"})
@@ -649,6 +759,56 @@ def test_master_handler_hello_ok(super_hello_mock, mkdir_with_mode_mock, join_mo
     assert master_handler.integrity == "SyncFilesMock"
     assert master_handler.agent_groups == "SyncWazuhdbMock"
 
+    # The preferred codec is used if the worker supports it
+    with patch('wazuh.core.cluster.cluster.get_compression_codecs', return_value=['zstd', 'zlib']):
+        assert master_handler.hello(b"name cluster_name node_type version zstd,zlib") == \
+               (b"ok", b'{"message": "payload", "compression_codec": "zstd", "cipher": "fernet", '
+                       b'"cipher_salt": ""}')
+        assert master_handler.compression_codec == 'zstd'
+
+    # AES-GCM is used if the worker supports it, with the key derived from its salt and the one of the master. The
+    # master keeps using Fernet until the worker sends an AES-GCM message.
+    with patch('os.urandom', return_value=b'\x02' * 16):
+        assert master_handler.hello(b"name cluster_name node_type version zlib aes-gcm,fernet " + b"01" * 16) == \
+               (b"ok", b'{"message": "payload", "compression_codec": "zlib", "cipher": "aes-gcm", '
+                       b'"cipher_salt": "' + b"02" * 16 + b'"}')
+    assert master_handler.cipher == 'fernet'
+    assert master_handler.my_aesgcm is not None
+    assert master_handler.nonce_prefix == cluster_common.MASTER_NONCE_PREFIX
+
+    worker_handler = cluster_common.Handler(fernet_key, cluster_items)
+    worker_handler.setup_cipher(b'\x01' * 16 + b'\x02' * 16, is_master=False)
+    worker_handler.cipher = 'aes-gcm'
+    assert master_handler.decrypt(worker_handler.encrypt(b'data')) == b'data'
+    assert master_handler.cipher == 'aes-gcm'
+    assert worker_handler.decrypt(master_handler.encrypt(b'data')) == b'data'
+
+
+@patch("wazuh.core.cluster.master.AsyncWazuhDBConnection")
+@patch("wazuh.core.cluster.common.SyncWazuhdb")
+@patch("wazuh.core.cluster.common.SyncFiles")
+@patch("wazuh.core.cluster.master.utils.mkdir_with_mode")
+@patch("wazuh.core.cluster.master.metadata.__version__", "version")
+@patch("wazuh.core.cluster.server.AbstractServerHandler.hello", return_value=(b"ok", b"payload"))
+def test_master_handler_hello_replayed(super_hello_mock, mkdir_with_mode_mock, sync_files_mock, sync_db_mock,
+                                       mock_db_conn):
+    """Check that two hellos with the same salt of the worker lead to different AES-GCM keys."""
+    handlers = []
+    for _ in range(2):
+        master_handler = get_master_handler()
+        master_handler.name = "name"
+        master_handler.server = MagicMock(configuration={"name": "cluster_name"})
+        master_handler.hello(b"name cluster_name node_type version zlib aes-gcm,fernet " + b"01" * 16)
+        master_handler.cipher = 'aes-gcm'
+        handlers.append(master_handler)
+
+    # The same nonce is used with both keys
+    first, second = handlers[0].encrypt(b'data'), handlers[1].encrypt(b'data')
+    assert first[:cluster_common.NONCE_SIZE] == second[:cluster_common.NONCE_SIZE]
+    assert first != second
+    with pytest.raises(exception.WazuhClusterError, match=r".* 3025 .*"):
+        handlers[0].decrypt(cluster_common.WORKER_NONCE_PREFIX + second[len(cluster_common.MASTER_NONCE_PREFIX):])
+
 
 @patch("wazuh.core.cluster.master.metadata.__version__", "random")
 @patch("wazuh.core.cluster.server.AbstractServerHandler.hello", return_value=(b"ok", "payload"))
@@ -802,6 +962,16 @@ def test_master_handler_get_health():
     assert master_handler.server.get_health_flag is True
 
 
+def test_master_handler_get_agent_nodes():
+    """Check if the 'get_agent_nodes' request is being properly processed."""
+    master_handler = get_master_handler()
+    master_handler.server = MagicMock()
+    master_handler.server.agent_nodes.get_nodes.return_value = {'nodes': {'worker1': ['001']}, 'unknown': []}
+
+    assert master_handler.get_agent_nodes(['001']) == (b'ok', {'nodes': {'worker1': ['001']}, 'unknown': []})
+    master_handler.server.agent_nodes.get_nodes.assert_called_once_with(['001'])
+
+
 def test_master_handler_get_permission():
     """Check the right response to whether a sync process is in progress or not."""
 
@@ -895,7 +1065,7 @@ def test_master_handler_end_receiving_integrity_checksums(end_receiving_file_moc
 @freeze_time('1970-01-01')
 @patch('wazuh.core.cluster.common.Handler.send_request', return_value='some_data')
 @patch('wazuh.core.cluster.common.Handler.update_chunks_wdb', return_value={'updated_chunks': 1})
-@patch('wazuh.core.cluster.common.Handler.get_chunks_in_task_id', return_value='chunks')
+@patch('wazuh.core.cluster.common.Handler.get_chunks_in_task_id', return_value={'chunks': 'agents_sync'})
 async def test_master_handler_sync_wazuh_db_info(get_chunks_mock, update_chunks_mock, send_request_mock):
     """Check that the wazuh-db data reception task is created and chunks are obtained and updated in DB."""
     class LoggerMock:
@@ -911,10 +1081,12 @@ async def test_master_handler_sync_wazuh_db_info(get_chunks_mock, update_chunks_
     logger = LoggerMock()
     master_handler.task_loggers['Agent-info sync'] = logger
     master_handler.sync_agent_info_status = {'n_synced_chunks': 0}
+    master_handler.server.agent_nodes = MagicMock()
 
     assert await master_handler.sync_wazuh_db_info(task_id=b'17', info_type='agent-groups') == 'some_data'
     get_chunks_mock.assert_called_once_with(b'17', b'syn_m_a_err')
-    update_chunks_mock.assert_called_once_with('chunks', 'agent-info', logger, b'syn_m_a_err', 0)
+    update_chunks_mock.assert_called_once_with({'chunks': 'agents_sync'}, 'agent-info', logger, b'syn_m_a_err', 0)
+    master_handler.server.agent_nodes.update.assert_called_once_with(master_handler.name, 'agents_sync')
     send_request_mock.assert_called_once_with(command=b'syn_m_a_e', data=b'{"updated_chunks": 1}')
     assert logger._info == ['Starting.', 'Finished in 0.000s. Updated 1 chunks.']
     assert master_handler.sync_agent_info_status == {'n_synced_chunks': 1,
@@ -1105,6 +1277,41 @@ def test_set_date_end_master(info_mock):
     info_mock.assert_called_once()
 
 
+@freeze_time("2021-11-02")
+def test_master_handler_compare_integrity_tree():
+    """Check that the subtrees whose hashes differ are returned and kept as the scope of the Integrity check."""
+    master_handler = get_master_handler()
+    master_handler.server.integrity_tree = {'etc/': {'hash': 'a', 'dirs': {'etc': 'a'}},
+                                            'etc/shared/': {'hash': 'b', 'dirs': {'etc/shared/default': 'c',
+                                                                                  'etc/shared/group1': 'd'}}}
+    master_handler.task_loggers['Integrity check'] = MagicMock()
+
+    # The hashes of every cluster item are equal
+    master_handler.integrity_scope = {'etc/': ['etc']}
+    assert master_handler.compare_integrity_tree(
+        json.dumps({'keys': {'etc/': 'a', 'etc/shared/': 'b'}}).encode()) == (b'ok', b'[]')
+    assert master_handler.integrity_scope is None
+    assert master_handler.integrity_check_status == {'date_start_master': '2021-11-02T00:00:00.000000Z',
+                                                     'date_end_master': '2021-11-02T00:00:00.000000Z'}
+    master_handler.task_loggers['Integrity check'].info.assert_called_once_with(
+        'Finished in 0.000s. Received hashes of 2 cluster items. Sync not required.')
+
+    # Some cluster items differ or only exist in one node
+    assert master_handler.compare_integrity_tree(
+        json.dumps({'keys': {'etc/': 'a', 'etc/shared/': 'x', 'var/multigroups/': 'y'}}).encode()) == \
+           (b'ok', b'["etc/shared/", "var/multigroups/"]')
+    assert master_handler.integrity_scope is None
+    master_handler.task_loggers['Integrity check'].info.assert_called_once()
+
+    assert master_handler.compare_integrity_tree(json.dumps({'dirs': {
+        'etc/shared/': {'etc/shared/default': 'c', 'etc/shared/group1': 'x', 'etc/shared/group2': 'y'},
+        'var/multigroups/': {'var/multigroups/a1b2': 'z'}}}).encode()) == \
+           (b'ok', json.dumps({'etc/shared/': ['etc/shared/group1', 'etc/shared/group2'],
+                               'var/multigroups/': ['var/multigroups/a1b2']}).encode())
+    assert master_handler.integrity_scope == {'etc/shared/': ['etc/shared/group1', 'etc/shared/group2'],
+                                              'var/multigroups/': ['var/multigroups/a1b2']}
+
+
 @pytest.mark.parametrize('compare_result', [
     {}, {'test': 'test'}
 ])
@@ -1169,6 +1376,33 @@ async def test_master_handler_integrity_check(decompress_files_mock, send_reques
                                                                          'of 14 files. Sync not required.')]
 
 
+@pytest.mark.asyncio
+@patch("shutil.rmtree")
+@patch("wazuh.core.cluster.master.MasterHandler.send_request", return_value=b"ok")
+@patch("wazuh.core.cluster.master.MasterHandler.wait_for_file")
+async def test_master_handler_integrity_check_scope(wait_for_file_mock, send_request_mock, rmtree_mock):
+    """Check that only the files inside the scope of the integrity trees exchange are compared."""
+    master_handler = get_master_handler()
+    master_handler.server = MagicMock(integrity_control={
+        'etc/client.keys': {'cluster_item_key': 'etc/', 'hash': 'a'},
+        'etc/shared/group1/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'b'}})
+    master_handler.sync_tasks = {'task_id': MagicMock(filename='filename')}
+    master_handler.task_loggers['Integrity check'] = MagicMock()
+    master_handler.integrity_scope = {'etc/shared/': ['etc/shared/group1']}
+    worker_files = {'etc/shared/group1/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'b'}}
+
+    with patch('wazuh.core.cluster.cluster.decompress_files', return_value=(worker_files, 'path')), \
+            patch('wazuh.core.cluster.cluster.compare_files',
+                  return_value={'missing': {}, 'shared': {}, 'extra': {}}) as compare_files_mock:
+        await master_handler.integrity_check('task_id', MagicMock())
+
+    compare_files_mock.assert_called_once_with(
+        {'etc/shared/group1/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'b'}}, worker_files,
+        master_handler.name)
+    send_request_mock.assert_called_once_with(command=b'syn_m_c_ok', data=b'')
+    assert master_handler.integrity_scope is None
+
+
 @pytest.mark.asyncio
 @patch("wazuh.core.cluster.master.MasterHandler.wait_for_file", return_value=Exception())
 async def test_master_handler_integrity_check_ko(wait_for_file_mock):
@@ -1482,6 +1716,8 @@ def test_master_init(pool_executor_mock, get_running_loop_mock, warning_mock):
                                  enable_ssl=False)
 
     assert master_class.integrity_control == {}
+    assert isinstance(master_class.sync_artifacts, master.SyncArtifactCache)
+    assert master_class.sync_artifacts.server == master_class
     assert master_class.handler_class == master.MasterHandler
     assert master_class.integrity_already_executed == []
     assert master_class.task_pool == PoolExecutorMock
@@ -1534,7 +1770,10 @@ def test_master_to_dict(get_running_loop_mock):
 
     assert master_class.to_dict() == {
         'info': {'name': master_class.configuration['node_name'], 'type': master_class.configuration['node_type'],
-                 'version': "1.0.0", 'ip': master_class.configuration['nodes'][0]}}
+                 'version': "1.0.0", 'ip': master_class.configuration['nodes'][0]},
+        'status': {'request_queues': {
+            'dapi': {'queued': 0, 'in_flight': 0, 'wait_time': {'avg': 0, 'max': 0}},
+            'sendsync': {'queued': 0, 'in_flight': 0, 'wait_time': {'avg': 0, 'max': 0}}}}}
 
 
 @pytest.mark.asyncio
@@ -1570,8 +1809,8 @@ async def test_agent_groups_update(sleep_mock, perf_counter_mock):
         def __init__(self):
             pass
 
-        async def run_wdb_command(self):
-            pass
+        async def iterate(self):
+            yield
 
     class SyncWazuhdbMock:
         """Auxiliary class."""
@@ -1724,6 +1963,59 @@ async def test_master_file_status_update_ok(run_in_pool_mock, asyncio_sleep_mock
             assert "Error calculating local file integrity: " in logger_mock._error
 
 
+@pytest.mark.asyncio
+@patch('asyncio.sleep')
+@patch('wazuh.core.cluster.master.os.cpu_count', return_value=None)
+@patch('wazuh.core.cluster.master.IntegrityWatcher')
+async def test_master_file_status_update_watcher(integrity_watcher_mock, cpu_count_mock, asyncio_sleep_mock):
+    """Check if only the changed files are updated when the integrity watcher is enabled and that the files are
+    hashed in a single process if the number of CPUs cannot be determined."""
+    master_class = master.Master(performance_test=False, concurrency_test=False,
+                                 configuration={'node_name': 'master', 'nodes': ['master'], 'port': 1111,
+                                                "node_type": "master"},
+                                 cluster_items=cluster_items,
+                                 enable_ssl=False)
+    master_class.cluster_items = {'intervals': {'master': {'integrity_watcher': True, 'recalculate_integrity': 0,
+                                                           'hash_pool_size': 4}}}
+    integrity_watcher_mock.return_value.get_changes.side_effect = [(set(), False), ({'etc/file'}, False),
+                                                                   (set(), False), ({'etc/file'}, True)]
+    asyncio_sleep_mock.side_effect = [None, None, None, Exception('Stop while true')]
+
+    async def run_in_pool(loop, pool, f, *args, **kwargs):
+        return {'etc/file': {'f': f}}, {'hashing': {'files': 1, 'time': 0.5}}
+
+    with patch('wazuh.core.cluster.master.cluster.run_in_pool', side_effect=run_in_pool) as run_in_pool_mock, \
+            patch('wazuh.core.cluster.master.cluster.get_integrity_tree',
+                  side_effect=lambda files: {'tree of': files}) as get_integrity_tree_mock, \
+            patch.object(master_class, 'setup_task_logger') as setup_task_logger_mock:
+        with pytest.raises(Exception, match='Stop while true'):
+            await master_class.file_status_update()
+
+    integrity_watcher_mock.assert_called_once_with(master_class.cluster_items)
+    assert run_in_pool_mock.call_args_list == [
+        call(master_class.loop, master_class.task_pool, cluster.get_files_status, {}, hash_pool_size=1),
+        call(master_class.loop, master_class.task_pool, cluster.update_files_status,
+             {'etc/file': {'f': cluster.get_files_status}}, {'etc/file'}),
+        call(master_class.loop, master_class.task_pool, cluster.get_files_status,
+             {'etc/file': {'f': cluster.update_files_status}}, hash_pool_size=1)
+    ]
+    setup_task_logger_mock.return_value.info.assert_any_call(
+        'Finished in 0.000s. Calculated metadata of 1 files. Hashed 1 files in 0.500s.')
+    # The integrity tree is only calculated again if the metadata changed
+    assert get_integrity_tree_mock.call_count == 3
+    assert master_class.integrity_tree == {'tree of': master_class.integrity_control}
+
+    # The directories are walked periodically if inotify is not available
+    integrity_watcher_mock.side_effect = OSError('inotify is not available')
+    asyncio_sleep_mock.side_effect = Exception('Stop while true')
+    with patch('wazuh.core.cluster.master.cluster.run_in_pool', side_effect=run_in_pool) as run_in_pool_mock:
+        with pytest.raises(Exception, match='Stop while true'):
+            await master_class.file_status_update()
+
+    run_in_pool_mock.assert_called_once_with(master_class.loop, master_class.task_pool, cluster.get_files_status,
+                                             {'etc/file': {'f': cluster.get_files_status}}, hash_pool_size=1)
+
+
 @patch('asyncio.get_running_loop', return_value=loop)
 @patch("wazuh.core.agent.Agent.get_agents_overview", return_value={'totalItems': 5})
 def test_master_get_health(get_running_loop_mock, get_agent_overview_mock):
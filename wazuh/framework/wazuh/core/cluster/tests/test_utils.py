@@ -303,12 +303,19 @@ def test_get_cluster_items():
                                               'check_worker_lastkeepalive': 60,
                                               'max_allowed_time_without_keepalive': 120, 'process_pool_size': 2,
                                               'sync_agent_groups': 10, 'timeout_agent_info': 40,
-                                              'max_locked_integrity_time': 1000, 'agent_group_start_delay': 30},
+                                              'max_locked_integrity_time': 1000, 'agent_group_start_delay': 30,
+                                              'integrity_watcher': True, 'hash_pool_size': 4,
+                                              'agent_nodes_ttl': 60},
                                    'communication': {'timeout_cluster_request': 20, 'timeout_dapi_request': 200,
                                                      'timeout_receiving_file': 120, 'min_zip_size': 31457280,
                                                      'max_zip_size': 1073741824, 'compress_level': 1,
-                                                     'zip_limit_tolerance': 0.2}},
-                     'distributed_api': {'enabled': True}}
+                                                     'compress_codec': 'zstd', 'compress_pool_size': 4,
+                                                     'cipher': 'aes-gcm', 'delta_min_size': 65536,
+                                                     'delta_max_size': 16777216,
+                                                     'delta_block_size': 2048,
+                                                     'zip_limit_tolerance': 0.2, 'file_transfer_window': 8}},
+                     'distributed_api': {'enabled': True, 'local_client_pool_size': 8,
+                                         'max_in_flight_requests': 16, 'max_in_flight_requests_per_node': 4}}
 
 
 def test_ClusterFilter():
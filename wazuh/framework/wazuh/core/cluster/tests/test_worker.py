@@ -27,7 +27,7 @@ with patch('wazuh.core.common.wazuh_uid'):
 
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
 
-        from wazuh.core.cluster import client, worker, common as cluster_common
+        from wazuh.core.cluster import client, cluster, worker, common as cluster_common
         from wazuh.core import common as core_common
         from wazuh.core.wdb import AsyncWazuhDBConnection
 
@@ -248,9 +248,16 @@ async def test_sync_wazuh_db_sync_ko(send_string_mock, json_dumps_mock, event_lo
 async def test_worker_handler_init(event_loop):
     """Test '__init__' method from WorkerHandler class."""
 
-    worker_handler = get_worker_handler(event_loop)
+    with patch('os.urandom', return_value=b'\x01' * 16):
+        worker_handler = get_worker_handler(event_loop)
     worker_handler.logger = None
-    assert worker_handler.client_data == "Testing Testing master 4.0.0".encode()
+    assert worker_handler.client_data == \
+           f"Testing Testing master 4.0.0 {','.join(cluster.get_compression_codecs())} aes-gcm,fernet " \
+           f"{'01' * 16}".encode()
+    assert worker_handler.compression_codec == 'zlib'
+    assert worker_handler.cipher == 'fernet'
+    assert worker_handler.cipher_salt == b'\x01' * 16
+    assert worker_handler.my_aesgcm is None
     assert "Agent-info sync" in worker_handler.task_loggers
     assert isinstance(worker_handler.task_loggers["Agent-info sync"], logging.Logger)
     assert "Integrity check" in worker_handler.task_loggers
@@ -273,7 +280,14 @@ async def test_worker_handler_connection_result(connection_result_mock, join_moc
 
     worker_handler = get_worker_handler(event_loop)
     worker_handler.connected = True
-    worker_handler.connection_result("something")
+    future_result = MagicMock()
+    future_result.result.return_value = [b'{"message": "Client Testing added", "compression_codec": "zstd", '
+                                         b'"cipher": "aes-gcm", "cipher_salt": "' + b'02' * 16 + b'"}']
+    with patch.object(worker_handler, 'setup_cipher') as setup_cipher_mock:
+        worker_handler.connection_result(future_result)
+    setup_cipher_mock.assert_called_once_with(worker_handler.cipher_salt + b'\x02' * 16, is_master=False)
+    assert worker_handler.compression_codec == 'zstd'
+    assert worker_handler.cipher == 'aes-gcm'
     join_mock.assert_called_once_with(core_common.WAZUH_PATH, "queue", "cluster", "Testing")
     exists_mock.assert_called_once_with("/some/path")
     mkdir_with_mode_mock.assert_called_once_with("/some/path")
@@ -566,7 +580,7 @@ async def test_worker_compare_agent_groups_checksums(socket_mock, event_loop):
     w_handler = get_worker_handler(event_loop)
     w_handler.connected = True
     sync_object = cluster_common.SyncWazuhdb(manager=w_handler, logger=logger, cmd=b'syn_g_m_w',
-                                             data_retriever=wdb_conn.run_wdb_command,
+                                             data_retriever=wdb_conn.iterate,
                                              get_data_command='global sync-agent-groups-get ',
                                              get_payload={"condition": "sync_status", "get_global_hash": True})
 
@@ -726,6 +740,8 @@ async def test_worker_handler_sync_integrity(request_permission_mock,
             self.integrity_control = {}
 
     async def cluster_run_in_pool_mock(loop, pool, f, *args, **kwargs):
+        if f == cluster.add_files_signatures:
+            return {path: {**metadata, 'signature': {}} for path, metadata in args[0].items()}
         partial(f, *args, **kwargs)()
         return {'path': 'test'}, {}
 
@@ -735,8 +751,9 @@ async def test_worker_handler_sync_integrity(request_permission_mock,
     worker_handler.server = ManagerMock()
 
     # Test the try
-    with (patch('wazuh.core.cluster.worker.cluster.run_in_pool', side_effect=cluster_run_in_pool_mock) as
-          run_in_pool_mock):
+    with patch('wazuh.core.cluster.worker.cluster.run_in_pool', side_effect=cluster_run_in_pool_mock) as \
+            run_in_pool_mock, patch.object(worker_handler, 'compare_integrity_tree',
+                                           return_value={'path': {'merged': False}}) as compare_integrity_tree_mock:
         try:
             await asyncio.wait_for(worker_handler.sync_integrity(), 0.2)
         except asyncio.exceptions.TimeoutError:
@@ -745,11 +762,26 @@ async def test_worker_handler_sync_integrity(request_permission_mock,
         request_permission_mock.assert_awaited()
         get_files_status.assert_called()
         run_in_pool_mock.assert_awaited()
+        compare_integrity_tree_mock.assert_awaited()
 
-        sync_mock.assert_awaited_with(files={}, files_metadata={'path': 'test'}, metadata_len=1, task_pool=None)
+        run_in_pool_mock.assert_any_await(worker_handler.loop, None, cluster.add_files_signatures,
+                                          {'path': {'merged': False}})
+        sync_mock.assert_awaited_with(files={}, files_metadata={'path': {'merged': False, 'signature': {}}},
+                                      metadata_len=1, task_pool=None)
         logger_info_mock.assert_called_with("Starting.")
         assert worker_handler.integrity_check_status["date_start"] == 0.0
 
+        # The metadata is not sent if the integrity trees are equal
+        sync_mock.reset_mock()
+        compare_integrity_tree_mock.return_value = None
+        try:
+            await asyncio.wait_for(worker_handler.sync_integrity(), 0.2)
+        except asyncio.exceptions.TimeoutError:
+            pass
+
+        sync_mock.assert_not_called()
+        logger_info_mock.assert_called_with("Finished in 0.000s. Sync not required.")
+
         run_in_pool_mock.side_effect = exception.WazuhException(1001)
         try:
             await asyncio.wait_for(worker_handler.sync_integrity(), 0.2)
@@ -772,6 +804,41 @@ async def test_worker_handler_sync_integrity(request_permission_mock,
         send_request_mock.assert_called_with(command=b'syn_i_w_m_r', data=b'None ' + "".encode())
 
 
+@pytest.mark.asyncio
+async def test_worker_handler_compare_integrity_tree(event_loop):
+    """Check that only the hashes of the cluster items that differ are sent, and the files of the scope returned."""
+    worker_handler = get_worker_handler(event_loop)
+    worker_handler.server = MagicMock(integrity_control={
+        'etc/client.keys': {'cluster_item_key': 'etc/', 'hash': 'a'},
+        'etc/shared/default/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'b'},
+        'etc/shared/group1/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'c'}})
+    tree = cluster.get_integrity_tree(worker_handler.server.integrity_control)
+    keys = {'keys': {key: item['hash'] for key, item in tree.items()}}
+
+    # The integrity trees are equal
+    with patch.object(worker_handler, 'send_request', return_value=b'[]') as send_request_mock:
+        assert await worker_handler.compare_integrity_tree() is None
+        send_request_mock.assert_called_once_with(command=b'syn_i_w_m_t', data=json.dumps(keys).encode())
+
+    # Some directories differ, including cluster items that the worker does not have
+    with patch.object(worker_handler, 'send_request',
+                      side_effect=[b'["etc/shared/", "var/multigroups/"]',
+                                   json.dumps({'etc/shared/': ['etc/shared/group1', 'etc/shared/group2'],
+                                               'var/multigroups/': ['var/multigroups/a1b2']}).encode()]
+                      ) as send_request_mock:
+        assert await worker_handler.compare_integrity_tree() == {
+            'etc/shared/group1/agent.conf': {'cluster_item_key': 'etc/shared/', 'hash': 'c'}}
+        assert send_request_mock.call_args_list == [
+            call(command=b'syn_i_w_m_t', data=json.dumps(keys).encode()),
+            call(command=b'syn_i_w_m_t', data=json.dumps(
+                {'dirs': {'etc/shared/': tree['etc/shared/']['dirs'], 'var/multigroups/': {}}}).encode())]
+
+    # The master returns an error
+    with patch.object(worker_handler, 'send_request', return_value=exception.WazuhClusterError(3020)):
+        with pytest.raises(exception.WazuhClusterError, match='3020'):
+            await worker_handler.compare_integrity_tree()
+
+
 @pytest.mark.asyncio
 @freeze_time('1970-01-01')
 @patch('asyncio.sleep', side_effect=Exception())
@@ -1279,6 +1346,37 @@ async def test_worker_handler_update_master_files_in_worker_ok(mock_reload, mock
     path_exists_mock.assert_not_called()
 
 
+@pytest.mark.asyncio
+@patch("wazuh.core.cluster.worker.safe_move")
+@patch("wazuh.core.common.wazuh_uid", return_value="wazuh_uid")
+@patch("wazuh.core.common.wazuh_gid", return_value="wazuh_gid")
+@patch('wazuh.core.analysis.is_ruleset_file', return_value=False)
+async def test_worker_handler_update_master_files_in_worker_delta(mock_is_ruleset, wazuh_gid_mock, wazuh_uid_mock,
+                                                                  safe_move_mock, tmp_path, event_loop):
+    """Check that the files received as a delta are built from the local copy before being moved."""
+    worker_handler = get_worker_handler(event_loop)
+    (tmp_path / 'etc').mkdir()
+    (tmp_path / 'zip' / 'etc').mkdir(parents=True)
+    (tmp_path / 'etc' / 'client.keys').write_bytes(b'001 agent-1 any key1\n' * 100)
+    (tmp_path / 'new.keys').write_bytes(b'001 agent-1 any key1\n' * 100 + b'002 agent-2 any key2\n')
+    signature = cluster.get_file_signature(str(tmp_path / 'etc' / 'client.keys'), 64)
+    (tmp_path / 'zip' / 'etc' / 'client.keys').write_bytes(cluster.get_file_delta(str(tmp_path / 'new.keys'),
+                                                                                 signature))
+
+    with patch('wazuh.core.common.WAZUH_PATH', new=str(tmp_path)):
+        result_logs = worker_handler.update_master_files_in_worker(
+            ko_files={'shared': {'etc/client.keys': {'merged': False, 'cluster_item_key': 'cluster_item_key',
+                                                     'hash': cluster.blake2b(str(tmp_path / 'new.keys')),
+                                                     'delta': True}},
+                      'missing': {}, 'extra': {}}, zip_path=str(tmp_path / 'zip'), cluster_items=cluster_items)
+
+    assert result_logs['error'] == {}
+    safe_move_mock.assert_called_once_with(str(tmp_path / 'zip' / 'etc' / 'client.keys'),
+                                           str(tmp_path / 'etc' / 'client.keys'), permissions=ANY,
+                                           ownership=('wazuh_uid', 'wazuh_gid'))
+    assert (tmp_path / 'zip' / 'etc' / 'client.keys').read_bytes() == (tmp_path / 'new.keys').read_bytes()
+
+
 @pytest.mark.asyncio
 async def test_worker_handler_get_logger(event_loop):
     """Check if the method 'get_logger' is properly returning the given Logger object."""
@@ -12,7 +12,7 @@ import shutil
 from collections import defaultdict
 from datetime import datetime, timezone
 from time import perf_counter
-from typing import Tuple, Dict, Callable, List
+from typing import Tuple, Dict, Callable, List, Optional
 from typing import Union
 
 from wazuh.core import cluster as metadata, common, exception, utils, analysis
@@ -137,8 +137,12 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
             Arguments for the parent class constructor.
         """
         super().__init__(**kwargs, tag="Worker")
+        # Salt of the worker for the AES-GCM key, which is derived along with the salt of the master.
+        self.cipher_salt = os.urandom(16)
         # The self.client_data will be sent to the master when doing a hello request.
-        self.client_data = f"{self.name} {cluster_name} {node_type} {version}".encode()
+        self.client_data = f"{self.name} {cluster_name} {node_type} {version} " \
+                           f"{','.join(cluster.get_compression_codecs())} {','.join(c_common.CIPHERS)} " \
+                           f"{self.cipher_salt.hex()}".encode()
 
         # Flag to prevent a new Integrity check if Integrity sync is in progress.
         self.check_integrity_free = True
@@ -174,6 +178,11 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
         """
         super().connection_result(future_result)
         if self.connected:
+            response = json.loads(future_result.result()[0])
+            self.compression_codec = response['compression_codec']
+            if response['cipher'] == 'aes-gcm':
+                self.setup_cipher(self.cipher_salt + bytes.fromhex(response['cipher_salt']), is_master=False)
+            self.cipher = response['cipher']
             # create directory for temporary files
             worker_tmp_files = os.path.join(common.WAZUH_PATH, 'queue', 'cluster', self.name)
             if not os.path.exists(worker_tmp_files):
@@ -373,7 +382,7 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
         """
         wdb_conn = AsyncWazuhDBConnection()
         sync_object = c_common.SyncWazuhdb(manager=self, logger=logger, cmd=b'syn_g_m_w',
-                                           data_retriever=wdb_conn.run_wdb_command,
+                                           data_retriever=wdb_conn.iterate,
                                            get_data_command='global sync-agent-groups-get ',
                                            get_payload={"get_global_hash": True})
 
@@ -518,9 +527,10 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
         Asynchronous task that is started when the worker connects to the master. It starts an integrity synchronization
         process every self.cluster_items['intervals']['worker']['sync_integrity'] seconds.
 
-        A dictionary like {'file_path': {<BLAKE2b, merged, merged_name, etc>}, ...} is created and sent to the master,
-        containing the information of all the files inside the directories specified in cluster.json. The master
-        compares it with its own information.
+        A dictionary like {'file_path': {<BLAKE2b, merged, merged_name, etc>}, ...} is created with the information
+        of all the files inside the directories specified in cluster.json. The hashes of its integrity tree are
+        compared with the master's ones first, and only the metadata of the files inside the directories that differ
+        is sent to the master, which compares it with its own information.
         """
         logger = self.task_loggers["Integrity check"]
         integrity_check = c_common.SyncFiles(cmd=b'syn_i_w_m', logger=logger, manager=self)
@@ -537,9 +547,17 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
                                                                                     cluster.get_files_status,
                                                                                     self.server.integrity_control)
                         log_subprocess_execution(logger, logs)
-                        await integrity_check.sync(files={}, files_metadata=self.server.integrity_control,
-                                                   metadata_len=len(self.server.integrity_control),
-                                                   task_pool=self.server.task_pool)
+                        files_metadata = await self.compare_integrity_tree()
+                        if files_metadata is None:
+                            self.sync_integrity_ok_from_master()
+                        else:
+                            files_metadata = await cluster.run_in_pool(self.loop, self.server.task_pool,
+                                                                       cluster.add_files_signatures, files_metadata)
+                            logger.debug(f"Sending metadata of {len(files_metadata)} of "
+                                         f"{len(self.server.integrity_control)} files.")
+                            await integrity_check.sync(files={}, files_metadata=files_metadata,
+                                                       metadata_len=len(files_metadata),
+                                                       task_pool=self.server.task_pool)
             # If exception is raised during sync process, notify the master so it removes the file if received.
             except Exception as e:
                 logger.error(f"Error synchronizing integrity: {e}")
@@ -553,6 +571,35 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
 
             await asyncio.sleep(self.cluster_items['intervals']['worker']['sync_integrity'])
 
+    async def compare_integrity_tree(self) -> Optional[Dict]:
+        """Compare the integrity tree of the worker with the master's one to find the files that may differ.
+
+        The hash of each cluster item is sent first. Only if some of them differ, the hashes of the directories of
+        those cluster items are sent and the master answers with the directories whose hashes differ.
+
+        Returns
+        -------
+        dict or None
+            Paths (keys) and metadata (values) of the files inside the directories that differ. None if the integrity
+            trees of both nodes are equal.
+        """
+        tree = cluster.get_integrity_tree(self.server.integrity_control)
+
+        async def send_hashes(hashes: Dict) -> Union[Dict, List]:
+            response = await self.send_request(command=b'syn_i_w_m_t', data=json.dumps(hashes).encode())
+            if isinstance(response, Exception):
+                raise response
+            return json.loads(response)
+
+        different_keys = await send_hashes({'keys': {cluster_item_key: item['hash']
+                                                     for cluster_item_key, item in tree.items()}})
+        if not different_keys:
+            return None
+
+        scope = await send_hashes({'dirs': {cluster_item_key: tree.get(cluster_item_key, {}).get('dirs', {})
+                                            for cluster_item_key in different_keys}})
+        return cluster.filter_files_by_scope(self.server.integrity_control, scope)
+
     async def sync_agent_info(self):
         """Obtain information from agents reporting this worker and send it to the master.
 
@@ -744,6 +791,9 @@ class WorkerHandler(client.AbstractClient, c_common.WazuhCommon):
                               ownership=(common.wazuh_uid(), common.wazuh_gid())
                               )
             else:
+                if data_.get('delta'):
+                    # Only the differences with the local copy of the file were received.
+                    cluster.apply_file_delta(full_filename_path, os.path.join(zip_path, filename_), data_['hash'])
                 # Create destination dir if it doesn't exist.
                 if not os.path.exists(os.path.dirname(full_filename_path)):
                     utils.mkdir_with_mode(os.path.dirname(full_filename_path))
@@ -0,0 +1,481 @@
+# Copyright (C) 2015, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
+
+from copy import deepcopy
+from threading import Lock
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Tuple
+
+from wazuh.core import utils
+from wazuh.core.exception import WazuhError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MISSING_CODE = -1
+
+
+class UnsupportedOperation(Exception):
+    """The operation cannot be performed with the columnar representation. The dict path must be used instead."""
+
+
+class Column:
+    """Dictionary-encoded column. Each row stores the code of its value in `categories`, or `MISSING_CODE` when the
+    row does not have the field. Equal values (including lists and dictionaries) are stored only once."""
+
+    def __init__(self, codes: 'np.ndarray', categories: list):
+        self.codes = codes
+        self.categories = categories
+        self.present = codes != MISSING_CODE
+        self._sort_key = None
+        self._lowercase = None
+
+    @classmethod
+    def from_values(cls, values: list, missing: object) -> 'Column':
+        """Build a column from a list of values.
+
+        Parameters
+        ----------
+        values : list
+            Value of each row. Rows without the field contain the `missing` sentinel.
+        missing : object
+            Sentinel used for missing values.
+
+        Returns
+        -------
+        Column
+            Dictionary-encoded column, or `IntegerColumn` if every value is an integer.
+        """
+        present = [value for value in values if value is not missing]
+        if present and all(type(value) is int and -2 ** 63 < value < 2 ** 63 for value in present):
+            data = np.fromiter((0 if value is missing else value for value in values), dtype=np.int64,
+                               count=len(values))
+            return IntegerColumn(data, np.fromiter((value is not missing for value in values), dtype=bool,
+                                                   count=len(values)))
+
+        codes_by_value = {}
+        categories = []
+        codes = np.empty(len(values), dtype=np.int32)
+        for row, value in enumerate(values):
+            if value is missing:
+                codes[row] = MISSING_CODE
+                continue
+            key = utils.freeze_value(value)
+            code = codes_by_value.get(key)
+            if code is None:
+                code = codes_by_value[key] = len(categories)
+                categories.append(value)
+            codes[row] = code
+
+        return cls(codes, categories)
+
+    def value(self, row: int) -> Any:
+        """Get the value of a row."""
+        return self.categories[self.codes[row]]
+
+    def evaluate(self, function: Callable[[Any], bool]) -> 'np.ndarray':
+        """Evaluate a function once per distinct value and broadcast the result to every row.
+
+        Parameters
+        ----------
+        function : callable
+            Function that receives a value and returns a bool.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean mask. Rows without the field are always False.
+        """
+        lookup = np.fromiter((function(value) for value in self.categories), dtype=bool, count=len(self.categories))
+        return np.append(lookup, False)[self.codes]
+
+    def contains(self, text: str) -> 'np.ndarray':
+        """Check whether the lowercase text values of each row contain a text, like `utils.get_values` does.
+
+        Parameters
+        ----------
+        text : str
+            Lowercase text to look for.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean mask. Rows without the field are always False.
+        """
+        if self._lowercase is None:
+            if not all(isinstance(value, str) for value in self.categories):
+                return self.evaluate(lambda value: any(text in v for v in utils.get_values(value)))
+            self._lowercase = np.array([value.lower() for value in self.categories] + [''], dtype=str)
+
+        lookup = np.char.find(self._lowercase, text) >= 0
+        lookup[-1] = False
+        return lookup[self.codes]
+
+    def sort_key(self) -> 'np.ndarray':
+        """Get an integer array whose order is the one `utils.sort_array` uses for this field. Strings are compared in
+        lowercase and equal keys get the same rank.
+
+        Raises
+        ------
+        UnsupportedOperation
+            The values of the column cannot be compared with each other.
+
+        Returns
+        -------
+        np.ndarray
+            Rank of each row.
+        """
+        if self._sort_key is None:
+            keys = [value.lower() if isinstance(value, str) else value for value in self.categories]
+            try:
+                order = sorted(range(len(keys)), key=keys.__getitem__)
+            except TypeError:
+                raise UnsupportedOperation
+            ranks = np.empty(len(keys), dtype=np.int64)
+            rank = -1
+            for position, code in enumerate(order):
+                if position == 0 or keys[code] != keys[order[position - 1]]:
+                    rank += 1
+                ranks[code] = rank
+            self._sort_key = ranks[self.codes]
+
+        return self._sort_key
+
+    def distinct_key(self) -> 'np.ndarray':
+        """Get an integer array where two rows have the same number only if they have the same value."""
+        return self.codes.astype(np.int64)
+
+    def take(self, rows: 'np.ndarray') -> 'Column':
+        """Get a column with the given rows. The categories are shared with this column."""
+        return Column(self.codes[rows], self.categories)
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+class IntegerColumn(Column):
+    """Column of integers stored in a NumPy array."""
+
+    def __init__(self, data: 'np.ndarray', present: 'np.ndarray'):
+        self.data = data
+        self.present = present
+        self._uniques = self._inverse = self._strings = None
+
+    def value(self, row: int) -> int:
+        return int(self.data[row])
+
+    def _factorize(self):
+        if self._uniques is None:
+            self._uniques, self._inverse = np.unique(self.data, return_inverse=True)
+
+    def contains(self, text: str) -> 'np.ndarray':
+        self._factorize()
+        if self._strings is None:
+            self._strings = self._uniques.astype(str)
+        return (np.char.find(self._strings, text) >= 0)[self._inverse] & self.present
+
+    def evaluate(self, function: Callable[[Any], bool]) -> 'np.ndarray':
+        self._factorize()
+        lookup = np.fromiter((function(int(value)) for value in self._uniques), dtype=bool, count=len(self._uniques))
+        return lookup[self._inverse] & self.present
+
+    def sort_key(self) -> 'np.ndarray':
+        return self.data
+
+    def distinct_key(self) -> 'np.ndarray':
+        return np.where(self.present, self.data, np.iinfo(np.int64).min)
+
+    def take(self, rows: 'np.ndarray') -> 'IntegerColumn':
+        return IntegerColumn(self.data[rows], self.present[rows])
+
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.present.nbytes
+
+
+class ColumnarTable:
+    """In-memory table that stores a list of dictionaries column by column.
+
+    Search, filters, `q`, sort and distinct are calculated with NumPy arrays and the rows are only turned back into
+    dictionaries for the requested page. Every operation that cannot be done this way falls back to
+    `utils.process_array` over the original dictionaries, so the result is always the same.
+    """
+
+    def __init__(self, columns: dict, length: int):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_dicts(cls, rows: Iterable[dict]) -> 'ColumnarTable':
+        """Build a table from a list of dictionaries.
+
+        Parameters
+        ----------
+        rows : iterable
+            Dictionaries to store. The fields of each dictionary may differ.
+
+        Raises
+        ------
+        WazuhError(1000)
+            NumPy is not available.
+
+        Returns
+        -------
+        ColumnarTable
+            Table with one column per field.
+        """
+        if np is None:
+            raise WazuhError(1000, extra_message='NumPy is required to use the columnar representation')
+
+        rows = list(rows)
+        missing = object()
+        values = {}
+        for row_number, row in enumerate(rows):
+            for field, value in row.items():
+                if field not in values:
+                    values[field] = [missing] * row_number
+                values[field].append(value)
+            for field, field_values in values.items():
+                if len(field_values) == row_number:
+                    field_values.append(missing)
+
+        return cls({field: Column.from_values(field_values, missing) for field, field_values in values.items()},
+                   len(rows))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def nbytes(self) -> int:
+        """Get the size of the NumPy arrays of the table, in bytes."""
+        return sum(column.nbytes() for column in self.columns.values())
+
+    def row(self, row: int, fields: Iterable[str] = None) -> dict:
+        """Turn a row back into a dictionary.
+
+        Parameters
+        ----------
+        row : int
+            Row number.
+        fields : iterable
+            Fields to include. All by default.
+
+        Returns
+        -------
+        dict
+            Row. Mutable values are copied since they are shared by every row with the same value.
+        """
+        result = {}
+        for field in self.columns if fields is None else fields:
+            column = self.columns.get(field)
+            if column is not None and column.present[row]:
+                value = column.value(row)
+                result[field] = deepcopy(value) if isinstance(value, (list, dict, set)) else value
+
+        return result
+
+    def to_dicts(self) -> List[dict]:
+        """Get every row as a dictionary."""
+        return [self.row(row) for row in range(self.length)]
+
+    def take(self, rows: Iterable[int]) -> 'ColumnarTable':
+        """Get a table with the given rows, in the same order. The distinct values are shared with this table, so it is
+        much faster than building a new one.
+
+        Parameters
+        ----------
+        rows : iterable
+            Row numbers.
+
+        Returns
+        -------
+        ColumnarTable
+            Table with the given rows.
+        """
+        rows = np.fromiter(rows, dtype=np.intp)
+        return ColumnarTable({field: column.take(rows) for field, column in self.columns.items()}, len(rows))
+
+    def _filters_mask(self, filters: dict) -> 'np.ndarray':
+        mask = np.zeros(self.length, dtype=bool)
+        for field, value in filters.items():
+            column = self.columns.get(field)
+            if column is None or not column.present.all():
+                # The dict path raises a KeyError in this case
+                raise UnsupportedOperation
+            try:
+                mask |= column.evaluate(lambda field_value: field_value in value)
+            except TypeError:
+                # The dict path may not check every value, so it decides whether the exception is raised
+                raise UnsupportedOperation
+
+        return mask
+
+    def _search_mask(self, search_text: str, complementary_search: bool, search_in_fields: list) -> 'np.ndarray':
+        search_text = search_text.lower()
+        mask = np.zeros(self.length, dtype=bool)
+        for field, column in self.columns.items():
+            if not search_in_fields or field in search_in_fields:
+                mask |= column.contains(search_text)
+
+        return ~mask if complementary_search else mask
+
+    def _query_mask(self, q: str) -> 'np.ndarray':
+        mask = np.zeros(self.length, dtype=bool)
+        for and_clauses in utils.parse_query(q):
+            and_mask = np.ones(self.length, dtype=bool)
+            for clause in and_clauses:
+                column = self.columns.get(clause.field_name)
+                if column is None:
+                    and_mask[:] = False
+                    break
+                predicate = utils.compile_query_clause(clause)
+                try:
+                    and_mask &= column.evaluate(lambda value: predicate({clause.field_name: value}))
+                except (TypeError, ValueError):
+                    # The dict path may not check every value, so it decides whether the exception is raised
+                    raise UnsupportedOperation
+            mask |= and_mask
+
+        return mask
+
+    def _sort(self, rows: 'np.ndarray', sort_by: list, sort_ascending: bool,
+              allowed_sort_fields: list) -> 'np.ndarray':
+        if allowed_sort_fields:
+            fields_to_check = set(allowed_sort_fields)
+        else:
+            fields_to_check = {field for field, column in self.columns.items() if column.present[rows[0]]}
+        if not set(sort_by).issubset(fields_to_check):
+            # Let `utils.sort_array` raise the same exception
+            raise UnsupportedOperation
+
+        keys = []
+        for field in reversed(sort_by):
+            column = self.columns.get(field)
+            if column is None or not column.present[rows].all():
+                # Missing values are compared as None by the dict path
+                raise UnsupportedOperation
+            key = column.sort_key()[rows]
+            keys.append(key if sort_ascending else -key)
+
+        # np.lexsort is stable, like sorted()
+        return rows[np.lexsort(keys)]
+
+    def _distinct(self, rows: 'np.ndarray', fields: list) -> 'np.ndarray':
+        if not fields:
+            return rows[:1]
+        keys = np.stack([self.columns[field].distinct_key()[rows] if field in self.columns
+                         else np.full(len(rows), MISSING_CODE, dtype=np.int64) for field in fields], axis=1)
+        _, first_occurrences = np.unique(keys, axis=0, return_index=True)
+        return rows[np.sort(first_occurrences)]
+
+    def process(self, search_text: str = None, complementary_search: bool = False, search_in_fields: list = None,
+                select: list = None, sort_by: list = None, sort_ascending: bool = True,
+                allowed_sort_fields: list = None, offset: int = 0, limit: int = None, q: str = '',
+                required_fields: list = None, allowed_select_fields: list = None, filters: dict = None,
+                distinct: bool = False) -> dict:
+        """Equivalent to `utils.process_array` for the rows of the table. See its documentation for the parameters.
+
+        Returns
+        -------
+        dict
+            Dictionary: {'items': Processed array, 'totalItems': Number of items, before applying offset and limit)}
+        """
+        kwargs = dict(search_text=search_text, complementary_search=complementary_search,
+                      search_in_fields=search_in_fields, select=select, sort_by=sort_by,
+                      sort_ascending=sort_ascending, allowed_sort_fields=allowed_sort_fields, offset=offset,
+                      limit=limit, q=q, required_fields=required_fields, allowed_select_fields=allowed_select_fields,
+                      filters=filters, distinct=distinct)
+        if not self.length:
+            return {'items': [], 'totalItems': 0}
+
+        try:
+            return self._process(**kwargs)
+        except UnsupportedOperation:
+            return utils.process_array(self.to_dicts(), **kwargs)
+
+    def _process(self, search_text: str, complementary_search: bool, search_in_fields: list, select: list,
+                 sort_by: list, sort_ascending: bool, allowed_sort_fields: list, offset: int, limit: int, q: str,
+                 required_fields: list, allowed_select_fields: list, filters: dict, distinct: bool) -> dict:
+        if select and not allowed_select_fields:
+            # Every row would need to be selected to check that none of them lacks the selected fields
+            raise UnsupportedOperation
+
+        utils.check_sort_parameters(sort_by=sort_by, sort_ascending=sort_ascending,
+                                    allowed_sort_fields=allowed_sort_fields)
+
+        mask = np.ones(self.length, dtype=bool)
+        if isinstance(filters, dict) and len(filters.keys()) > 0:
+            mask &= self._filters_mask(filters)
+        if search_text:
+            mask &= self._search_mask(search_text, complementary_search, search_in_fields)
+        if q:
+            mask &= self._query_mask(q)
+        rows = np.flatnonzero(mask)
+
+        if sort_by and sort_by != [""] and len(rows):
+            rows = self._sort(rows, sort_by, sort_ascending, allowed_sort_fields)
+
+        if distinct and len(rows):
+            if select and any('.' in field for field in select):
+                raise UnsupportedOperation
+            # Validate the selected fields before calculating the distinct values
+            utils.select_array([], select=select, allowed_select_fields=allowed_select_fields) if select else None
+            rows = self._distinct(rows, sorted(set(select)) if select else list(self.columns))
+
+        page = utils.cut_array(range(len(rows)), offset=offset, limit=limit)
+        items = [self.row(row) for row in rows[page.start:page.stop]]
+        if select:
+            items = utils.select_array(items, select=select, required_fields=set() if distinct else required_fields,
+                                       allowed_select_fields=allowed_select_fields)
+
+        return {'items': items, 'totalItems': len(rows)}
+
+
+class TableCache:
+    """Cache of the rows loaded from a set of files and of their `ColumnarTable`.
+
+    Only the rows of the last key are kept. They are loaded and the table is built again as soon as the key changes, so
+    the key must change whenever the files do.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._key = None
+        self._rows = None
+        self._table = None
+
+    def get(self, key: Hashable, load: Callable[[], list]) -> Tuple[list, Optional[ColumnarTable]]:
+        """Get the rows of a key and their table, loading them if they are not cached.
+
+        Parameters
+        ----------
+        key : hashable
+            State of the files the rows are loaded from.
+        load : callable
+            Function that loads the rows.
+
+        Returns
+        -------
+        list
+            Rows. They are shared by every call with the same key, so they must not be modified.
+        ColumnarTable or None
+            Table of the rows. None if NumPy is not available, in which case the rows are not cached.
+        """
+        if np is None:
+            return load(), None
+
+        with self._lock:
+            if key == self._key:
+                return self._rows, self._table
+
+        rows = load()
+        table = ColumnarTable.from_dicts(rows)
+        with self._lock:
+            self._key, self._rows, self._table = key, rows, table
+
+        return rows, table
+
+    def clear(self):
+        """Remove the cached rows."""
+        with self._lock:
+            self._key = self._rows = self._table = None
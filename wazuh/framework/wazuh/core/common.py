@@ -11,7 +11,7 @@ from functools import lru_cache, wraps
 from grp import getgrnam
 from multiprocessing import Event
 from pwd import getpwnam
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 
 # ===================================================== Functions ======================================================
@@ -107,6 +107,30 @@ def context_cached(key: str = '') -> Any:
     return decorator
 
 
+def async_variant(coroutine_function: Callable) -> Callable:
+    """Register a native asyncio implementation of the decorated framework function.
+
+    The distributed API awaits the registered coroutine function on the event loop instead of running the decorated
+    function in a process pool. Both functions must accept the same parameters and return the same result.
+
+    Parameters
+    ----------
+    coroutine_function : callable
+        Coroutine function equivalent to the decorated one.
+
+    Returns
+    -------
+    callable
+        The decorated function, with the coroutine function in its `async_variant` attribute.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func.async_variant = coroutine_function
+        return func
+
+    return decorator
+
+
 def reset_context_cache() -> None:
     """Reset context cache."""
 
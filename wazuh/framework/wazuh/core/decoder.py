@@ -6,6 +6,7 @@ import os
 from enum import Enum
 
 from wazuh.core import common
+from wazuh.core.columnar import TableCache
 from wazuh.core.exception import WazuhError, WazuhInternalError
 from wazuh.core.utils import load_wazuh_xml, add_dynamic_detail
 
@@ -16,6 +17,9 @@ DECODER_FIELDS = ['filename', 'relative_dirname', 'name', 'position', 'status',
 DECODER_FILES_FIELDS = ['filename', 'relative_dirname', 'status']
 DECODER_FILES_REQUIRED_FIELDS = ['filename']
 
+# Decoders loaded from the ruleset files. See `wazuh.core.rule.get_ruleset_files_key`
+decoders_cache = TableCache()
+
 
 class Status(Enum):
     S_ENABLED = 'enabled'
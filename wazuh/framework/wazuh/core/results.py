@@ -4,10 +4,14 @@
 
 import builtins
 import collections
+import heapq
+import itertools
 import re
 import sys
 from copy import deepcopy
+from functools import cmp_to_key, reduce
 from numbers import Number
+from operator import or_
 from typing import Union, Iterable
 
 import wazuh.core.exception as wexception
@@ -100,21 +104,29 @@ class AbstractWazuhResult(collections.abc.MutableMapping):
             raise wexception.WazuhInternalError(1000, extra_message=f"Cannot be merged with {type(other)} object")
 
         result = deepcopy(self)
+        result._merge_fields(other)
 
+        return result
+
+    def _merge_fields(self, other):
+        """Merge the fields of other into self, in place.
+
+        Parameters
+        ----------
+        other : AbstractWazuhResult or dict
+            Fields to merge.
+        """
         for key, field in other.items():
-            if key not in result:
-                result[key] = field
+            if key not in self:
+                self[key] = field
             elif isinstance(field, dict):
-                result[key] = self._merge_dict(result[key], field, key=key)
+                self[key] = self._merge_dict(self[key], field, key=key)
             elif isinstance(field, list):
-                self_field = result[key]
-                result[key] = self._merge_list(self_field, field, key=key)
+                self[key] = self._merge_list(self[key], field, key=key)
             elif isinstance(field, Number):
-                result[key] = self._merge_number(result[key], field, key=key)
+                self[key] = self._merge_number(self[key], field, key=key)
             elif isinstance(field, str):  # str
-                result[key] = self._merge_str(result[key], field, key=key)
-
-        return result
+                self[key] = self._merge_str(self[key], field, key=key)
 
     def _merge_dict(self, self_field: dict, other_field: dict, key: str = None) -> dict:
         """Merge two dict objects when merging two results recursively converting each of them to the specific
@@ -480,6 +492,68 @@ class AffectedItemsWazuhResult(AbstractWazuhResult):
 
         return result
 
+    @classmethod
+    def merge_all(cls, results: Iterable, offset: int = 0, limit: int = None):
+        """Merge several results at once.
+
+        The result is the same as merging them one by one with `|`, but the affected items are merged in a single
+        pass (see `merge`) instead of merging the growing result with each one. Only the page of affected items
+        from `offset` to `offset + limit` is kept.
+
+        Parameters
+        ----------
+        results : Iterable
+            AffectedItemsWazuhResult or WazuhException objects to merge.
+        offset : int
+            First affected item to keep.
+        limit : int
+            Maximum number of affected items to keep. If None, all of them are kept.
+
+        Raises
+        ------
+        wexception.WazuhInternalError(1000)
+            If any result is of a wrong type.
+
+        Returns
+        -------
+        AffectedItemsWazuhResult or wexception.WazuhException
+            Merged result.
+        """
+        results = list(results)
+        for i, result in enumerate(results):
+            if isinstance(result, wexception.WazuhException) and \
+                    not (isinstance(result, wexception.WazuhError) and len(result.ids) > 0):
+                # As with `|`, an error not related to any item is the result of the merge
+                return reduce(or_, [error for error in results[i:] if isinstance(error, wexception.WazuhException)])
+            elif not isinstance(result, (AffectedItemsWazuhResult, wexception.WazuhError)):
+                raise wexception.WazuhInternalError(1000, extra_message=f"Cannot be merged with {type(result)} object")
+
+        affected_results = [result for result in results if isinstance(result, AffectedItemsWazuhResult)]
+        if not affected_results:
+            return reduce(or_, results)
+
+        first = affected_results[0]
+        merged = cls(dikt=dict(first.dikt), sort_fields=first.sort_fields, sort_casting=first.sort_casting,
+                     sort_ascending=first.sort_ascending, all_msg=first.all_msg, some_msg=first.some_msg,
+                     none_msg=first.none_msg)
+        for result in affected_results[1:]:
+            merged._merge_fields(result)
+
+        merged.affected_items = merge(*[result.affected_items for result in affected_results],
+                                      criteria=first.sort_fields, ascending=first.sort_ascending,
+                                      types=first.sort_casting,
+                                      limit=None if limit is None else offset + limit)[offset:]
+        merged.total_affected_items = sum(result.total_affected_items for result in affected_results)
+
+        for result in results:
+            failed_items = result.failed_items.items() if isinstance(result, AffectedItemsWazuhResult) \
+                else [(result, result.ids)]
+            for error, ids in failed_items:
+                merged._failed_items.setdefault(error, set()).update(ids)
+        merged._recalculate_failed_items()
+
+        return merged
+
     def to_dict(self) -> dict:
         """Return the AffectedItemsWazuhResult as a dict.
 
@@ -807,8 +881,10 @@ def _goes_before_than(a: Union[tuple, list], b: Union[tuple, list], ascending: U
 
 
 def merge(*iterables, criteria: Union[tuple, list] = None, ascending: Union[tuple, list] = None,
-          types: Union[tuple, list] = None) -> Iterable:
-    """Merge iterables in a single one assuming they are already ordered according to criteria, ascending and types
+          types: Union[tuple, list] = None, limit: int = None) -> Iterable:
+    """Merge iterables in a single one assuming they are already ordered according to criteria, ascending and types.
+
+    The iterables are merged with a heap, so only the items needed to fill `limit` are compared.
 
     Parameters
     ----------
@@ -821,30 +897,55 @@ def merge(*iterables, criteria: Union[tuple, list] = None, ascending: Union[tupl
     types : tuple or list
         List or tuple of strings. Should have the same length as criteria. Must fit a class in builtins
         (int, float, str, ...).
+    limit : int
+        Maximum number of items to return. If None, all of them are returned.
 
     Returns
     -------
     Iterable
         A new sorted iterable.
     """
-    result = list()
-    final_len = sum([len(iterable) for iterable in iterables])
     if criteria is None:
         getters = [lambda x: x]  # Init dummy itemgetter
     else:
         getters = [nested_itemgetter(criterion) for criterion in criteria]
     casters = [getattr(builtins, type_) for type_ in types]
-    while len(result) < final_len:
-        selected = None
-        for i, iterable in enumerate(iterables):
-            if len(iterable) > 0:
-                if selected is None:
-                    selected = i
-                else:
-                    candidate = [getter(iterable[0]) for getter in getters]
-                    selected_candidate = [getter(iterables[selected][0]) for getter in getters]
-                    if _goes_before_than(candidate, selected_candidate, ascending=ascending, casters=casters):
-                        selected = i
-        result.append(iterables[selected].pop(0))
-
-    return result
+
+    if ascending is None:
+        ascending = [True] * len(getters)
+
+    def compare(a: list, b: list) -> int:
+        # Same order as _goes_before_than, with the values already casted
+        for item_a, item_b, asc in zip(a, b, ascending):
+            if item_a is None or item_b is None:
+                return (item_b is None) - (item_a is None)
+            elif item_a < item_b:
+                return -1 if asc else 1
+            elif item_a > item_b:
+                return 1 if asc else -1
+        return 0
+
+    def cast_values(item) -> list:
+        values = [getter(item) for getter in getters]
+        return [cast(value) if value is not None else value for value, cast in zip(values, casters)]
+
+    if all(ascending):
+        # Lists are compared natively in the same order: a None value goes first and ends the comparison
+        def item_key(item):
+            key = []
+            for value, _ in zip(cast_values(item), ascending):
+                if value is None:
+                    key.append((0,))
+                    break
+                key.append((1, value))
+            return key
+    else:
+        sort_key = cmp_to_key(compare)
+
+        def item_key(item):
+            return sort_key(cast_values(item))
+
+    # heapq.merge is stable: items that compare equal are taken in the order of the iterables
+    merged = heapq.merge(*iterables, key=item_key)
+
+    return list(itertools.islice(merged, limit))
@@ -8,6 +8,7 @@ from enum import Enum
 from glob import glob
 
 from wazuh.core import common
+from wazuh.core.columnar import TableCache
 from wazuh.core.exception import WazuhError
 from wazuh.core.utils import load_wazuh_xml, add_dynamic_detail
 
@@ -22,6 +23,9 @@ RULE_FIELDS = ['description', 'details', 'filename', 'gdpr', 'groups', 'id', 'le
 RULE_FILES_FIELDS = ['filename', 'relative_dirname', 'status']
 RULE_FILES_REQUIRED_FIELDS = ['filename']
 
+# Rules loaded from the ruleset files. See `get_ruleset_files_key`
+rules_cache = TableCache()
+
 
 class Status(Enum):
     S_ENABLED = 'enabled'
@@ -204,6 +208,33 @@ def load_rules_from_file(rule_filename: str, rule_relative_path: str, rule_statu
     return rules
 
 
+def get_ruleset_files_key(files: list) -> tuple:
+    """Get the state of a list of rule or decoder files, which changes whenever any of them is modified.
+
+    Parameters
+    ----------
+    files : list
+        Files as returned by `format_rule_decoder_file`.
+
+    Returns
+    -------
+    tuple
+        Path, status, modification time and size of every file. The modification time and size are None if the file
+        cannot be accessed.
+    """
+    key = []
+    for file in files:
+        path = os.path.join(common.WAZUH_PATH, file['relative_dirname'], file['filename'])
+        try:
+            stat = os.stat(path)
+            state = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state = (None, None)
+        key.append((path, file['status'], *state))
+
+    return tuple(key)
+
+
 def _remove_files(tmp_data, parameters):
     data = list(tmp_data)
     for d in tmp_data:
@@ -4,7 +4,7 @@
 
 from json import loads, JSONDecodeError
 
-from wazuh.core.utils import WazuhDBQuery, WazuhDBBackend, get_fields_to_nest, plain_dict_to_nested_dict, \
+from wazuh.core.utils import WazuhDBQuery, AsyncWazuhDBQuery, get_fields_to_nest, plain_dict_to_nested_dict, \
     get_date_from_timestamp
 from wazuh.core.wdb import WazuhDBConnection
 
@@ -12,12 +12,13 @@ from wazuh.core.wdb import WazuhDBConnection
 class WazuhDBQuerySyscheck(WazuhDBQuery):
     nested_fields = ['value']
     date_fields = {'start', 'end', 'mtime', 'date'}
+    date_schema = {'start', 'end', 'mtime', 'date'}
 
     def __init__(self, agent_id, nested=False, default_sort_field='mtime', min_select_fields=None, *args,
                  **kwargs):
         if min_select_fields is None:
             min_select_fields = set()
-        super().__init__(backend=WazuhDBBackend(agent_id), default_sort_field=default_sort_field,
+        super().__init__(backend=self.backend_class(agent_id), default_sort_field=default_sort_field,
                          min_select_fields=min_select_fields, count=True, get_data=True, date_fields=self.date_fields,
                          *args, **kwargs)
         self.nested = nested
@@ -44,5 +45,9 @@ class WazuhDBQuerySyscheck(WazuhDBQuery):
         return super()._format_data_into_dictionary()
 
 
+class AsyncWazuhDBQuerySyscheck(AsyncWazuhDBQuery, WazuhDBQuerySyscheck):
+    """Query the syscheck database of an agent without blocking the event loop."""
+
+
 def syscheck_delete_agent(agent: str, wdb_conn: WazuhDBConnection) -> None:
     wdb_conn.execute(f"agent {agent} sql delete from fim_entry", delete=True)
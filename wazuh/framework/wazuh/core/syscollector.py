@@ -4,8 +4,9 @@
 
 from enum import Enum
 
-from wazuh.core.agent import Agent
-from wazuh.core.utils import plain_dict_to_nested_dict, get_fields_to_nest, WazuhDBQuery, WazuhDBBackend
+from wazuh.core.agent import Agent, AsyncWazuhDBQueryAgents
+from wazuh.core.exception import WazuhResourceNotFound
+from wazuh.core.utils import plain_dict_to_nested_dict, get_fields_to_nest, WazuhDBQuery, AsyncWazuhDBQuery
 
 
 class Type(Enum):
@@ -23,6 +24,23 @@ class Type(Enum):
     GROUPS = 'groups'
 
 
+# Response fields of each table that may contain dates
+DATE_SCHEMA = {
+    'sys_osinfo': {'scan.time'},
+    'sys_hwinfo': {'scan.time'},
+    'sys_programs': {'scan.time', 'install_time'},
+    'sys_processes': {'scan.time', 'start_time'},
+    'sys_ports': {'scan.time'},
+    'sys_netaddr': set(),
+    'sys_netproto': set(),
+    'sys_netiface': {'scan.time'},
+    'sys_hotfixes': {'scan_time'},
+    'sys_users': {'scan.time', 'user.created', 'user.last_login', 'user.auth_failed_timestamp',
+                  'user.password_expiration_date', 'user.password_last_change'},
+    'sys_groups': {'scan.time'}
+}
+
+
 def get_valid_fields(element_type: Type, agent_id: str = None) -> dict:
     """Provide a data structure for each element.
 
@@ -33,6 +51,61 @@ def get_valid_fields(element_type: Type, agent_id: str = None) -> dict:
     agent_id : str
         This parameter allows us to know if the agent is Windows or Linux.
 
+    Returns
+    -------
+    dict
+        Valid fields for requested item.
+    """
+    os_name = None
+    if element_type == Type.OS:
+        agent_obj = Agent(agent_id)
+        agent_obj.get_basic_information()
+        os_name = agent_obj.get_agent_os_name()
+
+    return _get_valid_fields(element_type, os_name)
+
+
+async def get_valid_fields_async(element_type: Type, agent_id: str = None) -> dict:
+    """Provide a data structure for each element, without blocking the event loop. Same as `get_valid_fields`.
+
+    Parameters
+    ----------
+    element_type : Type
+        This is the type of resource we are requesting.
+    agent_id : str
+        This parameter allows us to know if the agent is Windows or Linux.
+
+    Raises
+    ------
+    WazuhResourceNotFound(1701)
+        Agent does not exist.
+
+    Returns
+    -------
+    dict
+        Valid fields for requested item.
+    """
+    os_name = None
+    if element_type == Type.OS:
+        async with AsyncWazuhDBQueryAgents(select=['os.name'], query=f'id={agent_id}', count=False) as db_query:
+            items = (await db_query.run())['items']
+        if not items:
+            raise WazuhResourceNotFound(1701)
+        os_name = items[0].get('os', {}).get('name', 'null')
+
+    return _get_valid_fields(element_type, os_name)
+
+
+def _get_valid_fields(element_type: Type, os_name: str = None) -> dict:
+    """Provide a data structure for each element.
+
+    Parameters
+    ----------
+    element_type : Type
+        This is the type of resource we are requesting.
+    os_name : str
+        OS name of the agent. Only used with Type.OS.
+
     Returns
     -------
     dict
@@ -107,12 +180,9 @@ def get_valid_fields(element_type: Type, agent_id: str = None) -> dict:
     }
 
     if element_type == Type.OS:
-        agent_obj = Agent(agent_id)
-        agent_obj.get_basic_information()
         valid_select_fields[Type.OS] = list(valid_select_fields[Type.OS])
 
         # The osinfo fields in database are different in Windows and Linux
-        os_name = agent_obj.get_agent_os_name()
         valid_select_fields[Type.OS][1] = valid_select_fields[Type.OS][1]['Windows'] if 'Windows' in os_name else \
             valid_select_fields[Type.OS][1]['Linux']
         valid_select_fields[Type.OS] = tuple(valid_select_fields[Type.OS])
@@ -129,11 +199,12 @@ class WazuhDBQuerySyscollector(WazuhDBQuery):
     nested_fields = ['scan', 'os', 'ram', 'cpu', 'local', 'remote', 'tx', 'rx']
 
     def __init__(self, array, nested, agent_id, *args, **kwargs):
-        super().__init__(backend=WazuhDBBackend(agent_id), default_sort_field='scan_id', get_data=True, count=True,
+        super().__init__(backend=self.backend_class(agent_id), default_sort_field='scan_id', get_data=True, count=True,
                          *args, **kwargs)
         self.array = array
         self.nested = nested
         self.date_fields = {'scan.time', 'install_time'}
+        self.date_schema = DATE_SCHEMA.get(self.table)
 
     def _format_data_into_dictionary(self):
         if self.nested:
@@ -142,3 +213,7 @@ class WazuhDBQuerySyscollector(WazuhDBQuery):
                           self._data]
 
         return super()._format_data_into_dictionary() if self.array else next(iter(self._data), {})
+
+
+class AsyncWazuhDBQuerySyscollector(AsyncWazuhDBQuery, WazuhDBQuerySyscollector):
+    """Class responsible for obtaining resources from agents without blocking the event loop."""
@@ -127,7 +127,7 @@ def check_agent(test_data, agent):
     True,
     OSError
 ])
-@patch("wazuh.core.agent.WazuhDBBackend")
+@patch("wazuh.core.agent.WazuhDBQueryAgents.backend_class")
 @patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
 @patch('socket.socket.connect')
 def test_WazuhDBQueryAgents__init__(socket_mock, send_mock, backend_mock, value):
@@ -277,6 +277,37 @@ def test_WazuhDBQueryAgents_process_filter(mock_socket_conn, field_name, field_f
             'Query returned does not match the expected one'
 
 
+@pytest.mark.parametrize('rbac_ids, negate', [
+    ([str(i).zfill(3) for i in range(1, 1000) if i not in {4, 6}], False),
+    ([str(i).zfill(3) for i in range(1, 1000) if i not in {4, 6}], True),
+    ([str(i).zfill(3) for i in range(0, 60, 2)], True),
+])
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+def test_WazuhDBQueryAgents_compress_rbac_filter(mock_socket_conn, send_mock, rbac_ids, negate):
+    """Check that oversized RBAC filters are compressed in ranges of IDs and return the same result as the list."""
+    kwargs = {'select': ['id'], 'filters': {'rbac_ids': rbac_ids}, 'rbac_negate': negate}
+    expected_result = WazuhDBQueryAgents(**kwargs).run()
+
+    with patch('wazuh.core.common.MAX_QUERY_FILTERS_RESERVED_SIZE', new=100), \
+            patch('wazuh.core.utils.WazuhDBQuery.oversized_run') as oversized_run_mock:
+        query_agent = WazuhDBQueryAgents(**kwargs)
+        assert query_agent.run() == expected_result
+
+    oversized_run_mock.assert_not_called()
+    assert 'rbac_id' not in query_agent.request
+
+
+@patch('socket.socket.connect')
+def test_WazuhDBQueryAgents_compress_rbac_filter_ko(mock_socket_conn):
+    """Check that RBAC filters that cannot be compressed are not replaced."""
+    query_agent = WazuhDBQueryAgents()
+    assert not query_agent._compress_rbac_filter({'001', 'invalid'})
+    with patch('wazuh.core.common.MAX_QUERY_FILTERS_RESERVED_SIZE', new=10):
+        assert not query_agent._compress_rbac_filter({'001', '003', '005'})
+    assert query_agent.rbac_filter is None
+
+
 @pytest.mark.parametrize('value', [
     True,
     OSError
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# Copyright (C) 2015, Wazuh Inc.
+# Created by Wazuh, Inc. <info@wazuh.com>.
+# This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
+
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+with patch('wazuh.core.common.wazuh_uid'):
+    with patch('wazuh.core.common.wazuh_gid'):
+        from wazuh.core import utils
+        from wazuh.core.columnar import ColumnarTable, Column, IntegerColumn, TableCache, MISSING_CODE
+        from wazuh.core.exception import WazuhError
+
+ROWS = [
+    {'id': 1, 'level': 3, 'status': 'enabled', 'description': 'SSHD authentication failed', 'groups': ['sshd', 'pci']},
+    {'id': 2, 'level': 0, 'status': 'disabled', 'description': 'Apache error', 'groups': ['web']},
+    {'id': 3, 'level': 3, 'status': 'enabled', 'description': 'sshd brute force', 'groups': ['sshd', 'pci'],
+     'details': {'frequency': 8}},
+    {'id': 4, 'level': 12, 'status': 'Enabled', 'description': 'Apache attack', 'groups': ['web', 'attack']},
+    {'id': 5, 'level': 7, 'status': 'enabled', 'description': 'Web scan', 'groups': ['web'],
+     'details': {'frequency': 4}},
+]
+
+
+@pytest.fixture
+def table():
+    return ColumnarTable.from_dicts(ROWS)
+
+
+def test_columnar_table_from_dicts(table):
+    """Test that integer fields are stored as NumPy arrays and the rest of fields are dictionary-encoded."""
+    assert len(table) == len(ROWS)
+    assert isinstance(table.columns['id'], IntegerColumn)
+    assert table.columns['id'].data.dtype == np.int64
+    assert isinstance(table.columns['groups'], Column)
+    assert table.columns['groups'].categories == [['sshd', 'pci'], ['web'], ['web', 'attack']]
+    assert table.columns['details'].codes.tolist() == [MISSING_CODE, MISSING_CODE, 0, MISSING_CODE, 1]
+    assert table.to_dicts() == ROWS
+
+
+def test_columnar_table_row(table):
+    """Test that rows are turned back into dictionaries without sharing mutable values."""
+    row = table.row(0)
+    row['groups'].append('new')
+
+    assert table.row(0) == ROWS[0]
+    assert table.row(2, fields=['id', 'details', 'unknown']) == {'id': 3, 'details': {'frequency': 8}}
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'offset': 1, 'limit': 2},
+    {'sort_by': ['level', 'description'], 'sort_ascending': False, 'limit': 3},
+    {'sort_by': ['status', 'id']},
+    {'sort_by': ['groups'], 'limit': 2},
+    {'q': 'details.frequency>0', 'sort_by': ['details']},
+    {'sort_by': ['']},
+    {'search_text': 'SSHD'},
+    {'search_text': 'web', 'complementary_search': True, 'search_in_fields': ['groups']},
+    {'search_text': '1', 'search_in_fields': ['level']},
+    {'q': 'level>2;groups=web,status=disabled', 'sort_by': ['id'], 'sort_ascending': False},
+    {'q': 'details.frequency>5'},
+    {'q': 'unknown=1,description~apache'},
+    {'filters': {'status': ['enabled', 'Enabled']}, 'select': ['id', 'groups'], 'required_fields': ['status'],
+     'allowed_select_fields': ['id', 'groups', 'status']},
+    {'select': ['groups'], 'distinct': True, 'allowed_select_fields': ['groups']},
+    {'select': ['level', 'details'], 'distinct': True, 'sort_by': ['level'], 'offset': 1,
+     'allowed_select_fields': ['level', 'details']},
+    {'select': ['id'], 'limit': 2},
+])
+def test_columnar_table_process(table, kwargs):
+    """Test that processing a table returns the same result as processing the list of dictionaries."""
+    assert utils.process_array(table, **kwargs) == utils.process_array(list(ROWS), **kwargs)
+
+
+@pytest.mark.parametrize('kwargs, error_code', [
+    ({'q': 'nameGfirewall'}, 1407),
+    ({'sort_by': ['unknown']}, 1403),
+    ({'sort_by': ['id'], 'sort_ascending': 'yes'}, 1402),
+    ({'select': ['unknown'], 'allowed_select_fields': ['id']}, 1724),
+    ({'limit': 0}, 1406),
+    ({'offset': -1, 'limit': 1}, 1400),
+])
+def test_columnar_table_process_ko(table, kwargs, error_code):
+    """Test that processing a table raises the same exceptions as processing the list of dictionaries."""
+    with pytest.raises(WazuhError, match=f'.* {error_code} .*'):
+        utils.process_array(table, **kwargs)
+
+
+@patch('wazuh.core.utils.process_array', side_effect=utils.process_array)
+def test_columnar_table_process_fallback(mock_process_array, table):
+    """Test that the dict path is used when an operation is not supported by the columnar representation."""
+    # Some rows do not have the 'details' field
+    with pytest.raises(KeyError):
+        table.process(filters={'details': [{'frequency': 8}]})
+    mock_process_array.assert_called_once()
+    assert mock_process_array.call_args.args[0] == ROWS
+
+
+@patch('wazuh.core.utils.process_array')
+def test_columnar_table_process_error(mock_process_array, table):
+    """Test that the errors raised by the columnar representation are not hidden by the dict path."""
+    with patch.object(ColumnarTable, '_process', side_effect=IndexError):
+        with pytest.raises(IndexError):
+            table.process(sort_by=['level'])
+    mock_process_array.assert_not_called()
+
+
+@pytest.mark.parametrize('rows', [
+    [4, 0, 2],
+    [],
+    range(len(ROWS))
+])
+def test_columnar_table_take(table, rows):
+    """Test that the tables returned by `take` have the given rows and share the distinct values of the original."""
+    taken = table.take(rows)
+
+    assert len(taken) == len(rows)
+    assert taken.to_dicts() == [ROWS[row] for row in rows]
+    assert taken.columns['status'].categories is table.columns['status'].categories
+    assert utils.process_array(taken, sort_by=['level'], sort_ascending=False) == \
+           utils.process_array([ROWS[row] for row in rows], sort_by=['level'], sort_ascending=False)
+
+
+def test_table_cache():
+    """Test that the rows are only loaded again when the key changes."""
+    cache = TableCache()
+    load = MagicMock(side_effect=lambda: list(ROWS))
+
+    rows, table = cache.get('key', load)
+    assert rows == ROWS and table.to_dicts() == ROWS
+    assert cache.get('key', load) == (rows, table)
+    load.assert_called_once()
+
+    assert cache.get('other_key', load)[0] is not rows
+    assert load.call_count == 2
+
+    cache.clear()
+    cache.get('other_key', load)
+    assert load.call_count == 3
+
+
+@patch('wazuh.core.columnar.np', new=None)
+def test_table_cache_no_numpy():
+    """Test that the rows are neither cached nor turned into a table when NumPy is not available."""
+    cache = TableCache()
+    load = MagicMock(side_effect=lambda: list(ROWS))
+
+    assert cache.get('key', load) == (ROWS, None)
+    assert cache.get('key', load) == (ROWS, None)
+    assert load.call_count == 2
+
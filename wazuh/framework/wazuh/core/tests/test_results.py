@@ -4,6 +4,8 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 from copy import deepcopy
+from functools import reduce
+from operator import or_
 from unittest.mock import patch
 
 import pytest
@@ -175,6 +177,47 @@ def test_results_AffectedItemsWazuhResult___or___exceptions(or_item, expected_re
             raise e
 
 
+def test_results_AffectedItemsWazuhResult_merge_all():
+    """Test that method `merge_all` from class `AffectedItemsWazuhResult` returns the same as merging with `|`."""
+    def get_results():
+        results = []
+        for node, agents in enumerate([['001', '004'], ['002', '003', '005'], []]):
+            result = AffectedItemsWazuhResult(sort_fields=['id'], sort_ascending=[True])
+            result.affected_items = [{'id': agent_id, 'node_name': f'node{node}'} for agent_id in agents]
+            result.total_affected_items = len(agents)
+            result.add_failed_item(id_=f'10{node}', error=WazuhError(WAZUH_EXCEPTION_CODE))
+            results.append(result)
+        return results + [WazuhError(WAZUH_EXCEPTION_CODE, ids=['200'])]
+
+    expected_result = reduce(or_, get_results())
+    results = get_results()
+    merged = AffectedItemsWazuhResult.merge_all(results)
+    assert merged.render() == expected_result.render()
+    assert merged.total_failed_items == 4
+    assert [item['id'] for item in results[1].affected_items] == ['002', '003', '005']
+
+    merged = AffectedItemsWazuhResult.merge_all(get_results(), offset=1, limit=2)
+    assert [item['id'] for item in merged.affected_items] == ['002', '003']
+    assert merged.total_affected_items == 5
+
+
+@pytest.mark.parametrize('results, expected_result', [
+    ([AffectedItemsWazuhResult(), WazuhError(WAZUH_EXCEPTION_CODE), WazuhError(1000, ids=['001'])], WazuhError),
+    ([WazuhException(WAZUH_EXCEPTION_CODE), AffectedItemsWazuhResult()], WazuhException),
+    ([WazuhError(WAZUH_EXCEPTION_CODE, ids=['001']), WazuhError(1000, ids=['002'])], WazuhError),
+    ([AffectedItemsWazuhResult(), {'Invalid type': None}], None)
+])
+def test_results_AffectedItemsWazuhResult_merge_all_exceptions(results, expected_result):
+    """Test that method `merge_all` from class `AffectedItemsWazuhResult` handles exceptions as `|` does."""
+    if expected_result is None:
+        with pytest.raises(WazuhException, match='.* 1000 .*'):
+            AffectedItemsWazuhResult.merge_all(results)
+    else:
+        merged = AffectedItemsWazuhResult.merge_all(results)
+        assert type(merged) is expected_result
+        assert merged.to_dict() == reduce(or_, results).to_dict()
+
+
 def test_results_AffectedItemsWazuhResult_to_dict():
     """Test method `to_dict` from class `AffectedItemsWazuhResult`."""
     affected_result = AffectedItemsWazuhResult()
@@ -315,6 +358,14 @@ def test_results__goes_before_than(a, b, ascending, casters, expected_result):
     ((['001', '002'], ['003', '004']), None, [True], ['int'], ['001', '002', '003', '004']),
     ((['001', '002'], ['003', '004']), None, [False], ['int'], ['003', '004', '001', '002']),
     ((['001', '002'], ['003', '004']), ['1'], [True], ['int'], ['001', '002', '003', '004']),
+    (([{'a': 1, 'b': 'x'}, {'a': 3, 'b': 'x'}], [{'a': 1, 'b': 'y'}, {'a': 2}], [{'a': 0}]), ['a'], [True], ['int'],
+     [{'a': 0}, {'a': 1, 'b': 'x'}, {'a': 1, 'b': 'y'}, {'a': 2}, {'a': 3, 'b': 'x'}]),
+    (([{'a': 1, 'b': 'z'}, {'a': 2, 'b': 'y'}], [{'a': 1, 'b': 'x'}]), ['a', 'b'], [True, False], ['int', 'str'],
+     [{'a': 1, 'b': 'z'}, {'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}]),
+    (([{'a': None}, {'a': 2}], [{'a': 1}]), ['a'], [True], ['int'], [{'a': None}, {'a': 1}, {'a': 2}]),
+    (([{'a': None}, {'a': 2}], [{'a': 1}]), ['a'], [False], ['int'], [{'a': None}, {'a': 2}, {'a': 1}]),
+    (([{'a': None, 'b': 2}], [{'a': None, 'b': 1}]), ['a', 'b'], [True, True], ['int', 'int'],
+     [{'a': None, 'b': 2}, {'a': None, 'b': 1}]),
 ])
 def test_results_merge(iterables, criteria, ascending, types, expected_result):
     """Test function `merge` from module results.
@@ -333,3 +384,16 @@ def test_results_merge(iterables, criteria, ascending, types, expected_result):
         Expected results after merge.
     """
     assert merge(*iterables, criteria=criteria, ascending=ascending, types=types) == expected_result
+
+
+def test_results_merge_limit():
+    """Test that function `merge` from module results stops when `limit` items are merged."""
+    def items(values):
+        for value in values:
+            compared.append(value)
+            yield value
+
+    compared = []
+    assert merge(items([1, 4, 5, 8]), items([2, 3, 6, 7]), criteria=None, ascending=[True], types=['int'],
+                 limit=3) == [1, 2, 3]
+    assert 7 not in compared and 8 not in compared
@@ -195,3 +195,20 @@ def test_set_groups_names_format(groups, general_groups, expected_groups):
     rule.set_groups(groups, general_groups, result)
 
     assert result['groups'] == expected_groups
+
+
+def test_get_ruleset_files_key(tmp_path):
+    """Test that the key of the ruleset files changes when any of them is modified."""
+    (tmp_path / 'rules').mkdir()
+    (tmp_path / 'rules' / 'test_rules.xml').write_text('<group></group>')
+    files = [{'filename': 'test_rules.xml', 'relative_dirname': 'rules', 'status': 'enabled'},
+             {'filename': 'missing_rules.xml', 'relative_dirname': 'rules', 'status': 'enabled'}]
+
+    with patch('wazuh.core.common.WAZUH_PATH', new=str(tmp_path)):
+        key = rule.get_ruleset_files_key(files)
+        assert key == rule.get_ruleset_files_key(files)
+        assert key[1] == (str(tmp_path / 'rules' / 'missing_rules.xml'), 'enabled', None, None)
+        assert key != rule.get_ruleset_files_key([{**files[0], 'status': 'disabled'}, files[1]])
+
+        (tmp_path / 'rules' / 'test_rules.xml').write_text('<group name="test"></group>')
+        assert key != rule.get_ruleset_files_key(files)
@@ -15,7 +15,7 @@ with patch('wazuh.core.common.wazuh_uid'):
 
 
 @pytest.mark.parametrize('agent', ['002', '080'])
-@patch("wazuh.core.syscheck.WazuhDBBackend")
+@patch("wazuh.core.syscheck.WazuhDBQuerySyscheck.backend_class")
 @patch("wazuh.core.syscheck.WazuhDBQuery.__init__")
 def test_wazuh_db_query_syscheck__init__(mock_wdbquery, mock_backend, agent):
     """Test if WazuhDBQuery and WazuhDBBackend are called with the expected parameters.
@@ -40,7 +40,7 @@ def test_wazuh_db_query_syscheck__init__(mock_wdbquery, mock_backend, agent):
              '"read_data", "write_data", "append_data", "read_ea", "write_ea", "execute"]}}'},
      True)
 ])
-@patch("wazuh.core.syscheck.WazuhDBBackend")
+@patch("wazuh.core.syscheck.WazuhDBQuerySyscheck.backend_class")
 def test_wazuh_db_syscheck_format_data_into_dictionary(mock_backend, data, is_json):
     """Test if _format_data_into_dictionary() returns the expected element."""
     test = syscheck.WazuhDBQuerySyscheck('002', offset=0, limit=1000, sort=None, search='test',
@@ -3,7 +3,7 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
@@ -13,6 +13,7 @@ with patch('wazuh.core.common.wazuh_uid'):
     with patch('wazuh.core.common.wazuh_gid'):
         from wazuh.core.syscollector import *
         from wazuh.core import common
+        from wazuh.core.wdb import WazuhDBConnection
 
 
 # Tests
@@ -36,6 +37,34 @@ def test_get_valid_fields(mock_info, os_name):
         assert 'sys_osinfo' in response[0], f'"sys_osinfo" not contained in {response}'
 
 
+@pytest.mark.parametrize("items, os_name", [
+    ([{'id': '001', 'os': {'name': 'Windows'}}], 'Windows'),
+    ([{'id': '001', 'os': {'name': 'Ubuntu'}}], 'Ubuntu'),
+    ([{'id': '001'}], 'null')
+])
+async def test_get_valid_fields_async(items, os_name):
+    """Check that get_valid_fields_async looks for the OS of the agent without the blocking `Agent` queries."""
+    agents_query = MagicMock()
+    agents_query.return_value.__aenter__.return_value.run = AsyncMock(return_value={'items': items})
+    with patch('wazuh.core.syscollector.AsyncWazuhDBQueryAgents', agents_query), \
+            patch('wazuh.core.agent.Agent.get_basic_information') as mock_info:
+        response = await get_valid_fields_async(Type.OS, '001')
+
+    mock_info.assert_not_called()
+    agents_query.assert_called_once_with(select=['os.name'], query='id=001', count=False)
+    assert response[0] == 'sys_osinfo'
+    assert ('os.codename' in response[1]) == (os_name != 'Windows')
+
+
+async def test_get_valid_fields_async_ko():
+    """Check that get_valid_fields_async raises an error when the agent does not exist."""
+    agents_query = MagicMock()
+    agents_query.return_value.__aenter__.return_value.run = AsyncMock(return_value={'items': []})
+    with patch('wazuh.core.syscollector.AsyncWazuhDBQueryAgents', agents_query):
+        with pytest.raises(WazuhResourceNotFound, match='.* 1701 .*'):
+            await get_valid_fields_async(Type.OS, '999')
+
+
 @patch('wazuh.core.utils.path.exists', return_value=True)
 @patch('wazuh.core.agent.Agent.get_basic_information', return_value=None)
 @patch('wazuh.core.agent.Agent.get_agent_os_name', return_value='Linux')
@@ -50,3 +79,23 @@ def test_WazuhDBQuerySyscollector(mock_basic_info, mock_agents_info, mock_exists
         db_query._filter_status(None)
         data = db_query.run()
         assert isinstance(db_query, WazuhDBQuerySyscollector) and isinstance(data, dict)
+
+
+@pytest.mark.parametrize('element_type, response', [
+    (Type.HOTFIXES, '[{"scan_id": 1, "scan_time": "2023/01/02 10:11:12", "hotfix": "KB1"}]'),
+    (Type.PACKAGES, '[{"scan.id": 1, "scan.time": "2023/01/02 10:11:12", "name": "test", "install_time": "(null)"}]')
+])
+@patch('wazuh.core.utils.path.exists', return_value=True)
+def test_WazuhDBQuerySyscollector_dates(mock_exists, element_type, response):
+    """Check that the date fields of every table are decoded as they are without schema."""
+    table, fields = get_valid_fields(element_type)
+    with patch('wazuh.core.utils.WazuhDBConnection') as mock_wdb:
+        mock_wdb.return_value.execute.side_effect = \
+            lambda query, count=False, date_fields=None: 1 if count else WazuhDBConnection.loads(response,
+                                                                                                 date_fields)
+        data = WazuhDBQuerySyscollector(agent_id='001', offset=0, limit=common.DATABASE_LIMIT, select=None,
+                                        search=None, sort=None, filters=None, fields=fields, table=table,
+                                        array=True, nested=False, query='').run()
+
+    assert mock_wdb.return_value.execute.call_args.kwargs['date_fields'] == DATE_SCHEMA[table]
+    assert data['items'] == WazuhDBConnection.loads(response)
@@ -4,6 +4,7 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import datetime
+import hashlib
 import os
 from collections.abc import KeysView
 from io import StringIO
@@ -21,8 +22,9 @@ from freezegun import freeze_time
 with patch('wazuh.core.common.wazuh_uid'):
     with patch('wazuh.core.common.wazuh_gid'):
         from wazuh import WazuhException
-        from wazuh.core.agent import WazuhDBQueryAgents
+        from wazuh.core.agent import AsyncWazuhDBQueryAgents, WazuhDBQueryAgents
         from wazuh.core import utils, exception
+        from wazuh.core.columnar import ColumnarTable
         from wazuh.core.common import WAZUH_PATH, AGENT_NAME_LEN_LIMIT
         from wazuh.core.results import WazuhResult
 
@@ -279,6 +281,11 @@ def test_cut_array_ko(limit, offset, expected_exception):
          None, None, None, None, None, ['item'], False,
          [{'item': 'value_1'}, {'item': 'value_2'}, {'item': 'value_3'}], 3),
 
+        # An element lacks the sort field, so the whole elements are compared as strings
+        ([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'name': 'c'}],
+         None, None, None, None, ['name'], ['id'], False,
+         [{'name': 'c'}, {'name': 'a'}, {'name': 'b'}], 3),
+
         # Test cases with distinct
         ([{'item': 'value_1', 'component': 'framework'},
            {'item': 'value_2', 'component': 'API'},
@@ -339,36 +346,79 @@ def test_process_array(array, q, filters, limit, search_text, sort_by, select, d
     assert result == {'items': expected_items, 'totalItems': expected_total_items}
 
 
-@patch('wazuh.core.utils.len', return_value=1)
-@patch('wazuh.core.utils.cut_array')
+@patch('wazuh.core.utils.cut_array', return_value=ANY)
 @patch('wazuh.core.utils.select_array', return_value=ANY)
-@patch('wazuh.core.utils.filter_array_by_query', return_value=ANY)
-@patch('wazuh.core.utils.search_array', return_value=ANY)
+@patch('wazuh.core.utils.compile_query', return_value=lambda element: True)
+@patch('wazuh.core.utils.get_search_predicate', return_value=lambda element: True)
 @patch('wazuh.core.utils.sort_array', return_value=ANY)
-def test_process_array_ops_order(mock_sort_array, mock_search_array, mock_filter_array_by_query, mock_select_array,
-                                 mock_cut_array, mock_len):
-    """Test that the process_array function calls the sort, search, filter by query, select and cut operations in the
-    expected order and with the expected parameters."""
+def test_process_array_ops_order(mock_sort_array, mock_get_search_predicate, mock_compile_query, mock_select_array,
+                                 mock_cut_array):
+    """Test that the process_array function filters the array in a single pass before calling the sort, cut and select
+    operations in the expected order and with the expected parameters."""
     manager_mock = Mock()
+    manager_mock.attach_mock(mock_get_search_predicate, 'mock_get_search_predicate')
+    manager_mock.attach_mock(mock_compile_query, 'mock_compile_query')
     manager_mock.attach_mock(mock_sort_array, 'mock_sort_array')
-    manager_mock.attach_mock(mock_search_array, 'mock_search_array')
-    manager_mock.attach_mock(mock_filter_array_by_query, 'mock_filter_array_by_query')
     manager_mock.attach_mock(mock_select_array, 'mock_select_array')
     manager_mock.attach_mock(mock_cut_array, 'mock_cut_array')
 
-    utils.process_array(array=[{'item': 'value_1'}, {'item': 'value_2'}, {'item': 'value_3'}],
-                        filters={'item': 'value_1'}, limit=1, offset=0, search_text='e_1', select=['item'],
-                        sort_by=['item'], q='item~value')
+    result = utils.process_array(array=[{'item': 'value_1'}, {'item': 'value_2'}, {'item': 'value_3'}],
+                                 filters={'item': 'value_1'}, limit=1, offset=0, search_text='e_1', select=['item'],
+                                 sort_by=['item'], q='item~value', allowed_select_fields=['item'])
 
     # The array in the sort_array function parameter is the initial one after the filters
-    # The array parameter of the other functions is ANY
+    # Only the elements of the requested page are selected
     assert manager_mock.mock_calls == [
-        call.mock_sort_array([{'item': 'value_1'}], sort_by=['item'], sort_ascending=True, allowed_sort_fields=None),
-        call.mock_search_array(ANY, search_text='e_1', complementary_search=False, search_in_fields=None),
-        call.mock_filter_array_by_query('item~value', ANY),
-        call.mock_select_array(ANY, select=['item'], required_fields=None, allowed_select_fields=None),
-        call.mock_cut_array(ANY, offset=0, limit=1)
+        call.mock_get_search_predicate(search_text='e_1', complementary_search=False, search_in_fields=None),
+        call.mock_compile_query('item~value'),
+        call.mock_sort_array([{'item': 'value_1'}], sort_by=['item'], sort_ascending=True, allowed_sort_fields=None,
+                             top_k=1),
+        call.mock_cut_array(ANY, offset=0, limit=1),
+        call.mock_select_array(ANY, select=['item'], required_fields=None, allowed_select_fields=['item'])
     ]
+    assert result['totalItems'] == 1
+
+
+@pytest.mark.parametrize('array, distinct_expected', [
+    ([{'a': 1, 'b': [1, 2]}, {'b': [1, 2], 'a': 1}, {'a': 1, 'b': [2, 1]}],
+     [{'a': 1, 'b': [1, 2]}, {'a': 1, 'b': [2, 1]}]),
+    (['framework', 'API', 'API'], ['framework', 'API']),
+    ([{'a': {'b': {1, 2}}}, {'a': {'b': {2, 1}}}], [{'a': {'b': {1, 2}}}]),
+    ([{'a': 1}, {'a': 1}, {'a': (1, [2])}, {'a': (1, [2])}], [{'a': 1}, {'a': (1, [2])}])
+])
+def test_distinct_array(array, distinct_expected):
+    """Test that distinct_array removes duplicates keeping the first occurrence, even with unhashable elements."""
+    assert utils.distinct_array(array) == distinct_expected
+
+
+@pytest.mark.parametrize('sort_ascending', [True, False])
+@pytest.mark.parametrize('offset, limit', [(0, 1), (3, 5), (10, 10), (0, None)])
+def test_process_array_top_k(sort_ascending, offset, limit):
+    """Test that selecting the sorted page with a heap returns the same result as sorting the whole array."""
+    array = [{'id': i, 'level': i % 7, 'name': f'Name{i % 13}'} for i in range(200)]
+    expected = sorted(array, key=lambda o: (o['level'], o['name'].lower()), reverse=not sort_ascending)
+
+    result = utils.process_array(array, sort_by=['level', 'name'], sort_ascending=sort_ascending, offset=offset,
+                                 limit=limit, q='id>5')
+    expected = [item for item in expected if item['id'] > 5]
+
+    assert result == {'items': expected[offset:offset + limit] if limit else expected, 'totalItems': len(expected)}
+
+
+@pytest.mark.parametrize('kwargs, expected_exception', [
+    # The element without any of the selected fields is not in the requested page
+    ({'select': ['name'], 'sort_by': ['id'], 'limit': 1}, 1724),
+    # No element is left after filtering the array
+    ({'search_text': 'nothing', 'sort_by': ['test'], 'allowed_sort_fields': ['id']}, 1403),
+    ({'q': 'id=9', 'sort_by': ['id'], 'sort_ascending': 'random'}, 1402)
+])
+@pytest.mark.parametrize('columnar_table', [False, True])
+def test_process_array_ko(kwargs, expected_exception, columnar_table):
+    """Test that process_array checks every element and the sort parameters regardless of the requested page and
+    the filtered elements."""
+    array = [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 3}]
+    with pytest.raises(exception.WazuhError, match=rf'\b{expected_exception}\b'):
+        utils.process_array(ColumnarTable.from_dicts(array) if columnar_table else array, **kwargs)
 
 
 def test_sort_array_type():
@@ -589,17 +639,15 @@ def test_md5(mock_iter, mock_open):
         mock_open.assert_called_once_with('test', 'rb')
 
 
-@patch('wazuh.core.utils.open')
-@patch('wazuh.core.utils.iter', return_value=['1', '2'])
-def test_blake2b(mock_iter, mock_open):
-    """Test md5 function."""
-    with patch('wazuh.core.utils.hashlib.blake2b') as blake2b_mock:
-        blake2b_mock.return_value.update.side_effect = None
-        result = utils.blake2b('test')
+@pytest.mark.parametrize('size', [0, 10, utils.HASH_BUFFER_SIZE, utils.HASH_BUFFER_SIZE * 2 + 10])
+def test_blake2b(tmp_path, size):
+    """Test blake2b function."""
+    content = os.urandom(size)
+    (tmp_path / 'test').write_bytes(content)
 
-        assert isinstance(result, MagicMock)
-        assert isinstance(result.return_value, MagicMock)
-        mock_open.assert_called_once_with('test', 'rb')
+    assert utils.blake2b(str(tmp_path / 'test')) == hashlib.blake2b(content).hexdigest()
+    with pytest.raises(FileNotFoundError):
+        utils.blake2b(str(tmp_path / 'unknown'))
 
 
 def test_protected_get_hashing_algorithm_ko():
@@ -1381,6 +1429,67 @@ def test_WazuhDBQuery_protected_get_total_items_mitre(mock_socket_conn, mock_con
     mock_conn_db.assert_called_once_with()
 
 
+@pytest.mark.parametrize('query, request_params, expected_query', [
+    ('SELECT id FROM agent', {}, 'SELECT id FROM agent'),
+    ('SELECT id FROM agent WHERE name = :name$0 COLLATE NOCASE LIMIT :limit OFFSET :offset',
+     {'name$0': "wazuh\\agent", 'limit': 10, 'offset': 0},
+     "SELECT id FROM agent WHERE name = 'wazuh\\agent' COLLATE NOCASE LIMIT 10 OFFSET 0"),
+    ('SELECT id FROM agent WHERE (id = :id) OR (id = :id$0) OR id IN (:rbac_ids)',
+     {'id': 1, 'id$0': 2.5, 'rbac_ids': ['001', 'a']},
+     "SELECT id FROM agent WHERE (id = 1) OR (id = 2.5) OR id IN (001,'a')"),
+    ('SELECT id FROM agent WHERE name LIKE :search AND name != ":search_2"', {'search': '%:search_2%'},
+     "SELECT id FROM agent WHERE name LIKE '%:search_2%' AND name != \":search_2\""),
+])
+@patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
+def test_WazuhDBBackend_substitute_params(mock_conn_db, query, request_params, expected_query):
+    """Test that utils.WazuhDBBackend._substitute_params binds every parameter using a cached plan."""
+    backend = utils.WazuhDBBackend(query_format='global')
+    utils.compile_substitution_plan.cache_clear()
+
+    assert backend._substitute_params(query, request_params) == expected_query
+    assert backend._substitute_params(query, request_params) == expected_query
+    assert utils.get_query_cache_stats()['sql_templates'] == {'hits': 1, 'misses': 1, 'size': 1,
+                                                             'max_size': utils.QUERY_CACHE_SIZE, 'hit_rate': 0.5}
+
+
+@patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
+def test_WazuhDBBackend_substitute_params_ko(mock_conn_db):
+    """Test that utils.WazuhDBBackend._substitute_params raises an exception with invalid parameter types."""
+    with pytest.raises(TypeError):
+        utils.WazuhDBBackend(query_format='global')._substitute_params('SELECT :a', {'a': {'b': 1}})
+
+
+@patch('wazuh.core.utils.connection_pool')
+@patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
+def test_WazuhDBBackend_close_connection(mock_conn_db, mock_pool):
+    """Test that utils.WazuhDBBackend.close_connection releases the connection and logs the pool and cache
+    statistics."""
+    mock_pool.stats.return_value = {'max_size': 10, 'in_use': 0}
+    backend = utils.WazuhDBBackend(query_format='global')
+    with patch.object(utils.logger, 'isEnabledFor', return_value=False), patch.object(utils.logger, 'debug') as debug:
+        backend.close_connection()
+        debug.assert_not_called()
+        mock_pool.stats.assert_not_called()
+
+    with patch.object(utils.logger, 'isEnabledFor', return_value=True), patch.object(utils.logger, 'debug') as debug:
+        backend.close_connection()
+        assert "wazuh-db connection pool: {'max_size': 10, 'in_use': 0}" in debug.call_args.args[0]
+        assert f"Query caches: {utils.get_query_cache_stats()}" in debug.call_args.args[0]
+
+    mock_pool.release.assert_called_with(mock_conn_db.return_value)
+
+
+@pytest.mark.parametrize('ids, expected_ranges, expected_singles', [
+    ([], [], []),
+    ([5, 1, 2, 3, 3], [(1, 3)], [5]),
+    (range(1, 50001), [(1, 50000)], []),
+    ([1, 2, 4, 5, 6, 7, 9], [(4, 7)], [1, 2, 9]),
+])
+def test_get_id_ranges(ids, expected_ranges, expected_singles):
+    """Test that utils.get_id_ranges groups consecutive IDs in ranges."""
+    assert utils.get_id_ranges(ids) == (expected_ranges, expected_singles)
+
+
 @patch('wazuh.core.utils.path.exists', return_value=True)
 @patch('wazuh.core.utils.glob.glob', return_value=True)
 @patch('wazuh.core.utils.WazuhDBBackend.connect_to_db')
@@ -1488,6 +1597,80 @@ def test_WazuhDBQuery_general_run(mock_socket_conn, execute_value, expected_resu
         assert query.general_run() == expected_result
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('count, rbac_ids, execute_values, expected_result', [
+    (True, None, [2, [{'id': 1}, {'id': 2}]], {'items': [{'id': '001'}, {'id': '002'}], 'totalItems': 2}),
+    (False, None, [[{'id': 1}]], {'items': [{'id': '001'}], 'totalItems': 0}),
+    (True, [str(i).zfill(3) for i in range(0, 40000, 2)], [[{'id': i} for i in range(4)], [{'id': 1}, {'id': 3}]],
+     {'items': [{'id': '001'}, {'id': '003'}], 'totalItems': 2}),
+])
+@patch('socket.socket.connect')
+async def test_AsyncWazuhDBQuery_run(mock_socket_conn, count, rbac_ids, execute_values, expected_result):
+    """Test that utils.AsyncWazuhDBQuery.run awaits the queries sent to the AsyncWazuhDBBackend."""
+    with patch('wazuh.core.utils.AsyncWazuhDBBackend.execute', side_effect=execute_values) as mock_execute:
+        async with AsyncWazuhDBQueryAgents(offset=0, limit=None, sort=None, search=None, select={'id'}, query=None,
+                                           count=count, get_data=True, remove_extra_fields=False,
+                                           filters={'rbac_ids': rbac_ids} if rbac_ids else None) as query:
+            assert isinstance(query.backend, utils.AsyncWazuhDBBackend)
+            assert await query.run() == expected_result
+
+    assert mock_execute.await_count == len(execute_values)
+
+
+@patch('socket.socket.connect')
+def test_AsyncWazuhDBQuery_stream(mock_socket_conn):
+    """Test that utils.AsyncWazuhDBQuery.stream raises an explicit error, since streaming is not supported."""
+    query = AsyncWazuhDBQueryAgents(offset=0, limit=None, sort=None, search=None, select={'id'}, query=None,
+                                    count=False, get_data=True, remove_extra_fields=False)
+    with pytest.raises(exception.WazuhInternalError, match=r'\b1000\b.*synchronous query classes'):
+        query.stream(key='id')
+
+
+@pytest.mark.parametrize('key', [None, 'id'])
+@patch('socket.socket.connect')
+def test_WazuhDBQuery_stream(mock_socket_conn, key):
+    """Test utils.WazuhDBQuery.stream function."""
+    pages = [[{'id': 1}, {'id': 2}], [{'id': 3}]]
+    with patch('wazuh.core.utils.WazuhDBBackend.stream', return_value=iter(pages)) as mock_stream:
+        query = WazuhDBQueryAgents(offset=0, limit=None, sort=None, search=None, select={'id'},
+                                   query=None, count=True, get_data=True, remove_extra_fields=False)
+
+        assert list(query.stream(key=key)) == [{'id': '001'}, {'id': '002'}, {'id': '003'}]
+        assert mock_stream.call_args.kwargs['key'] == key
+        assert ('ORDER BY' in mock_stream.call_args.args[0]) is (key is None)
+
+
+@pytest.mark.parametrize('rbac_negate, offset, limit, expected_ids', [
+    (False, 0, None, ['002', '004']),
+    (False, 1, 1, ['004']),
+    (True, 0, None, ['001', '003', '005']),
+    (True, 1, 1, ['003']),
+])
+@patch('wazuh.core.utils.common.MAX_QUERY_FILTERS_RESERVED_SIZE', new=5)
+@patch('wazuh.core.agent.WazuhDBQueryAgents._compress_rbac_filter', return_value=False)
+@patch('socket.socket.connect')
+def test_WazuhDBQuery_stream_oversized(mock_socket_conn, mock_compress, rbac_negate, offset, limit, expected_ids):
+    """Test utils.WazuhDBQuery.stream function discards the not allowed resources when the RBAC filter is too long."""
+    pages = [[{'id': 1}, {'id': 2}, {'id': 3}], [{'id': 4}, {'id': 5}]]
+    with patch('wazuh.core.utils.WazuhDBBackend.stream', return_value=iter(pages)) as mock_stream:
+        query = WazuhDBQueryAgents(offset=offset, limit=limit, sort=None, search=None, select={'id'}, query=None,
+                                   count=True, get_data=True, remove_extra_fields=False, rbac_negate=rbac_negate,
+                                   filters={'rbac_ids': ['002', '004']})
+
+        assert [item['id'] for item in query.stream(key='id')] == expected_ids
+        assert 'rbac_id' not in mock_stream.call_args.args[1]
+        assert 'LIMIT' not in mock_stream.call_args.args[0]
+
+
+@patch('socket.socket.connect')
+def test_WazuhDBQuery_stream_ko(mock_socket_conn):
+    """Test utils.WazuhDBQuery.stream function raises an exception when the key is not selected."""
+    query = WazuhDBQueryAgents(offset=0, limit=None, sort=None, search=None, select={'id'},
+                               query=None, count=True, get_data=True, remove_extra_fields=False)
+    with pytest.raises(exception.WazuhError, match=".* 1724 .*"):
+        next(query.stream(key='name'))
+
+
 @pytest.mark.parametrize('execute_value, rbac_ids, negate, final_rbac_ids, expected_result', [
     ([{'id': 99}, {'id': 100}], ['001', '099', '101'], False, [{'id': 99}],
      {'items': [{'id': '099'}], 'totalItems': 1}),
@@ -1831,6 +2014,34 @@ def test_filter_array_by_query(q, return_length):
     assert (len(result) == return_length)
 
 
+@pytest.mark.parametrize('q, expected_clauses', [
+    ('name=dmz', ((utils.QueryClause('name', (), '=', 'dmz', None, None),),)),
+    ('count>2;name~test,configSum.nested=1',
+     ((utils.QueryClause('count', (), '>', '2', None, 2), utils.QueryClause('name', (), '~', 'test', None, None)),
+      (utils.QueryClause('configSum', ('nested',), '=', '1', None, 1),))),
+    ('date<2017-10-26', ((utils.QueryClause('date', (), '<', '2017-10-26',
+                                            datetime.datetime(2017, 10, 26, tzinfo=datetime.timezone.utc),
+                                            None),),))
+])
+def test_parse_query(q, expected_clauses):
+    """Test that the parse_query function splits the query and converts the literal operands only once."""
+    assert utils.parse_query(q) == expected_clauses
+
+
+def test_compile_query():
+    """Test that compile_query returns a cached predicate equivalent to filter_array_by_query."""
+    utils.compile_query.cache_clear()
+    predicate = utils.compile_query('name~test;count=0,name=dmz')
+
+    assert utils.compile_query('name~test;count=0,name=dmz') is predicate
+    assert utils.compile_query.cache_info().hits == 1
+    assert [item for item in input_array if predicate(item)] == \
+           utils.filter_array_by_query('name~test;count=0,name=dmz', input_array)
+
+    with pytest.raises(exception.WazuhError, match='.* 1407 .*'):
+        utils.compile_query('nameGfirewall')
+
+
 @pytest.mark.parametrize('select, required_fields, expected_result', [
     (['single_select', 'nested1.nested12.nested121'], {'required'}, {'required': None,
                                                                      'single_select': None,
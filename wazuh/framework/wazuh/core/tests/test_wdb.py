@@ -3,6 +3,8 @@
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import asyncio  # noqa
+import contextlib
+import datetime
 import struct
 from unittest.mock import patch, AsyncMock, MagicMock, call
 
@@ -11,13 +13,26 @@ import pytest
 from wazuh.core import common
 from wazuh.core import exception
 from wazuh.core.common import MAX_SOCKET_BUFFER_SIZE
-from wazuh.core.wdb import AsyncWazuhDBConnection, WazuhDBConnection
+from wazuh.core.wdb import AsyncWazuhDBConnection, WazuhDBConnection, WazuhDBConnectionPool
 
 
 def format_msg(msg):
     return struct.pack('<I', len(bytes(msg)))
 
 
+def recv_into_mock(*messages):
+    """Simulate the responses of the wdb socket read with `socket.recv_into`."""
+    data = bytearray(b''.join(format_msg(msg) + msg for msg in messages))
+
+    def recv_into(buffer, nbytes=0):
+        size = min(nbytes or len(buffer), len(data))
+        buffer[:size] = data[:size]
+        del data[:size]
+        return size
+
+    return recv_into
+
+
 def test_async_init():
     """Verify that AsyncWazuhDBConnection attributes are correct."""
     async_wdb = AsyncWazuhDBConnection('test')
@@ -124,6 +139,161 @@ async def test_run_wdb_command_ko(wdb_response):
             assert wdb_response[1] in expected_exc.value.message, 'Extra message was not added to exception'
 
 
+class PipelinedWDBMock:
+    """Simulate a wazuh-db socket that answers the commands of a connection in order."""
+
+    def __init__(self, responder):
+        self.responder = responder
+        self.commands = []
+        self.pending = []
+        self.max_in_flight = 0
+        self.buffer = b''
+        self.writer = MagicMock(write=self.write, drain=AsyncMock())
+        self.reader = MagicMock(readexactly=self.readexactly)
+
+    def write(self, data):
+        command = data[4:].decode()
+        self.commands.append(command)
+        self.pending.append(command)
+        self.max_in_flight = max(self.max_in_flight, len(self.pending))
+
+    async def readexactly(self, n):
+        if not self.buffer:
+            response = self.responder(self.pending.pop(0)).encode()
+            self.buffer = struct.pack('<I', len(response)) + response
+        data, self.buffer = self.buffer[:n], self.buffer[n:]
+        return data
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('return_exceptions', [True, False])
+async def test_run_many(return_exceptions):
+    """Test that `run_many` sends every command before reading the responses and keeps their order."""
+    wdb_mock = PipelinedWDBMock(lambda command: 'err Error' if command == 'command 3' else f'ok {command}')
+    wdb_con = AsyncWazuhDBConnection()
+    wdb_con._reader, wdb_con._writer = wdb_mock.reader, wdb_mock.writer
+    commands = [f'command {i}' for i in range(10)]
+
+    if return_exceptions:
+        result = await wdb_con.run_many(commands, max_in_flight=4, return_exceptions=True)
+        assert [r for i, r in enumerate(result) if i != 3] == [['ok', c] for i, c in enumerate(commands) if i != 3]
+        assert isinstance(result[3], exception.WazuhInternalError)
+    else:
+        with pytest.raises(exception.WazuhInternalError, match=".* 2007 .*"):
+            await wdb_con.run_many(commands, max_in_flight=4)
+
+    # Every response was read, so the connection can still be used
+    assert wdb_mock.commands == commands
+    assert not wdb_mock.pending
+    assert wdb_mock.max_in_flight == 4
+    assert await wdb_con.run_wdb_command('command 10') == ['ok', 'command 10']
+
+
+@pytest.mark.asyncio
+async def test_run_many_ko():
+    """Test that the connection is discarded when the responses cannot be read."""
+    wdb_con = AsyncWazuhDBConnection()
+    with patch('asyncio.open_unix_connection', side_effect=FileNotFoundError):
+        with pytest.raises(exception.WazuhInternalError, match=".* 2005 .*"):
+            await wdb_con.run_many(['command'])
+
+    wdb_con._writer = MagicMock(drain=AsyncMock())
+    wdb_con._reader = AsyncMock()
+    wdb_con._reader.readexactly.side_effect = asyncio.IncompleteReadError(b'', 4)
+    with pytest.raises(exception.WazuhInternalError, match=".* 2010 .*"):
+        await wdb_con.run_many(['command'])
+    assert wdb_con._reader is None and wdb_con._writer is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('payload, pivot_key, expected_commands', [
+    ({'set_synced': True}, None, ['get {"set_synced": true}'] * 3),
+    ({'last_id': 0}, 'last_id', ['get {"last_id": 0}', 'get {"last_id": 2}', 'get {"last_id": 4}']),
+])
+async def test_iterate(payload, pivot_key, expected_commands):
+    """Test that `iterate` requests the next page before yielding the current one."""
+    pages = iter(['due [{"data":[{"id":1},{"id":2}]}]', 'due [{"data":[{"id":3},{"id":4}]}]', 'ok []'])
+    wdb_mock = PipelinedWDBMock(lambda command: next(pages))
+    wdb_con = AsyncWazuhDBConnection()
+    wdb_con._reader, wdb_con._writer = wdb_mock.reader, wdb_mock.writer
+
+    statuses = []
+    async for status, _ in wdb_con.iterate('get ', payload=payload, pivot_key=pivot_key):
+        # The next page has already been requested
+        assert len(wdb_mock.pending) == (status == 'due')
+        statuses.append(status)
+
+    assert statuses == ['due', 'due', 'ok']
+    assert wdb_mock.commands == expected_commands
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('page, pivot_key', [
+    ('err Error', None),
+    ('due [{"data":{"id":1}}]', 'last_id'),
+    ('due [{"data":[]}]', 'last_id'),
+])
+async def test_iterate_ko(page, pivot_key):
+    """Test that `iterate` raises an exception and discards the connection when a page is not valid."""
+    wdb_mock = PipelinedWDBMock(lambda command: page)
+    wdb_con = AsyncWazuhDBConnection()
+    wdb_con._reader, wdb_con._writer = wdb_mock.reader, wdb_mock.writer
+
+    with pytest.raises(exception.WazuhInternalError, match=".* 2007 .*"):
+        async for _ in wdb_con.iterate('get ', pivot_key=pivot_key):
+            pass
+    assert wdb_con._reader is None and wdb_con._writer is None
+    # The same page is not requested again
+    assert len(wdb_mock.commands) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('query, count, total, pages, expected_requests, expected_result', [
+    ("global sql select id from agent", False, 3, ['[{"id": 1}, {"id": 2}]', '[{"id": 3}]'],
+     ["global sql select count(*) from agent", "global sql select id from agent limit 2 offset 0",
+      "global sql select id from agent limit 1 offset 2"], [{'id': 1}, {'id': 2}, {'id': 3}]),
+    ("global sql select id from agent limit 1 offset 1", True, 3, ['[{"id": 2}]'],
+     ["global sql select count(*) from agent", "global sql select id from agent limit 1 offset 1"],
+     ([{'id': 2}], 3)),
+    ("global sql select count(*) from agent", False, 3, [],
+     ["global sql select count(*) from agent"], 3),
+])
+async def test_async_execute(query, count, total, pages, expected_requests, expected_result):
+    """Test that `AsyncWazuhDBConnection.execute` counts the items and requests them page by page."""
+    requests = []
+
+    async def send_mock(msg, raw=False):
+        requests.append(msg)
+        return ['ok', pages.pop(0)] if raw else [{'count(*)': total}]
+
+    wdb_con = AsyncWazuhDBConnection(request_slice=2)
+    with patch.object(wdb_con, '_send', side_effect=send_mock):
+        assert await wdb_con.execute(query, count=count) == expected_result
+
+    assert [' '.join(request.split()) for request in requests] == expected_requests
+
+
+@pytest.mark.asyncio
+async def test_async_execute_ko():
+    """Test that `AsyncWazuhDBConnection.execute` splits oversized pages and raises the errors of wazuh-db."""
+    wdb_con = AsyncWazuhDBConnection(request_slice=2)
+    big_row = '{"id": "' + 'a' * (MAX_SOCKET_BUFFER_SIZE // 2) + '"}'
+    with patch.object(wdb_con, '_send', side_effect=[[{'count(*)': 2}], ['ok', f'[{big_row}, {big_row}]'],
+                                                      ['ok', '[{"id": 1}]'], ['ok', '[{"id": 2}]']]):
+        assert await wdb_con.execute('global sql select id from agent') == [{'id': 1}, {'id': 2}]
+
+    with patch.object(wdb_con, '_send', side_effect=[[{'count(*)': 1}], ['ok', f'[{big_row}, {big_row}]']]):
+        with pytest.raises(exception.WazuhInternalError, match='.* 2009 .*'):
+            await wdb_con.execute('global sql select id from agent')
+
+    with patch.object(wdb_con, '_send', side_effect=[[{'count(*)': 1}], ['err', 'Error']]):
+        with pytest.raises(exception.WazuhError, match='.* 2003 .*'):
+            await wdb_con.execute('global sql select id from agent')
+
+    with pytest.raises(exception.WazuhError, match='.* 2004 .*'):
+        await wdb_con.execute('global sql drop table agent')
+
+
 def test_failed_connection():
     """
     Tests an exception is properly raised when it's not possible to connect to wdb
@@ -145,11 +315,9 @@ def test_wrong_character_encodings_wdb(send_mock, connect_mock):
     """
     Tests receiving a text with a bad character encoding from wazuh db
     """
-    def recv_mock(size_to_receive):
-        bad_string = b' {"bad": "\x96bad"}'
-        return format_msg(bad_string) if size_to_receive == 4 else bad_string
+    bad_string = b' {"bad": "\x96bad"}'
 
-    with patch('socket.socket.recv', side_effect=recv_mock):
+    with patch('socket.socket.recv_into', side_effect=recv_into_mock(bad_string)):
         mywdb = WazuhDBConnection()
         received = mywdb._send("test")
         assert received == {"bad": "bad"}
@@ -161,11 +329,9 @@ def test_null_values_are_removed(send_mock, connect_mock):
     """
     Tests '(null)' values are removed from the resulting dictionary
     """
-    def recv_mock(size_to_receive):
-        nulls_string = b' [{"a": "a", "b": "(null)", "c": [1, 2, 3], "d": {"e": "(null)"}}]'
-        return format_msg(nulls_string) if size_to_receive == 4 else nulls_string
+    nulls_string = b' [{"a": "a", "b": "(null)", "c": [1, 2, 3], "d": {"e": "(null)"}}]'
 
-    with patch('socket.socket.recv', side_effect=recv_mock):
+    with patch('socket.socket.recv_into', side_effect=recv_into_mock(nulls_string)):
         mywdb = WazuhDBConnection()
         received = mywdb._send("test")
         assert received == [{"a": "a", "c": [1, 2, 3], "d": {}}]
@@ -177,19 +343,20 @@ def test_failed_send_private(send_mock, connect_mock):
     """
         Tests an exception is properly raised when it's not possible to send a msg to the wdb socket
     """
-    def recv_mock(size_to_receive):
-        error_string = b'err {"agents": {"001": "Error"}}'
-        return format_msg(error_string) if size_to_receive == 4 else error_string
+    error_string = b'err {"agents": {"001": "Error"}}'
 
-    with patch('socket.socket.recv', side_effect=recv_mock):
+    with patch('socket.socket.recv_into', side_effect=recv_into_mock(error_string)):
         mywdb = WazuhDBConnection()
         with pytest.raises(exception.WazuhException, match=".* 2003 .*"):
             mywdb._send('test_msg')
 
-    with patch('socket.socket.recv', return_value=b'a' * (MAX_SOCKET_BUFFER_SIZE + 1)):
+    oversized_string = b'ok ' + b'a' * (2 * MAX_SOCKET_BUFFER_SIZE + 1)
+    with patch('socket.socket.recv_into', side_effect=recv_into_mock(oversized_string, b'ok []')):
         mywdb = WazuhDBConnection()
         with pytest.raises(exception.WazuhException, match=".* 2009 .*"):
             mywdb._send('test_msg')
+        # The oversized response is discarded and the connection can still be used
+        assert mywdb._send('test_msg') == []
 
 
 @pytest.mark.parametrize('content', [
@@ -204,10 +371,7 @@ def test_remove_agents_database(send_mock, connect_mock, content):
     """
     Tests delete_agents_db method handle exceptions properly
     """
-    def recv_mock(size_to_receive):
-        return format_msg(content) if size_to_receive == 4 else content
-
-    with patch('socket.socket.recv', side_effect=recv_mock):
+    with patch('socket.socket.recv_into', side_effect=recv_into_mock(content)):
         mywdb = WazuhDBConnection()
         received = mywdb.delete_agents_db(['001', '002'])
         assert(isinstance(received, dict))
@@ -271,6 +435,47 @@ def test_execute_pagination(socket_send_mock, connect_mock):
             mywdb.execute("agent 000 sql select test from test offset 1 limit 1")
 
 
+@pytest.mark.parametrize('query, key, responses, expected_requests', [
+    ("agent 000 sql select id from test", None,
+     ['[{"id": 1}, {"id": 2}]', '[{"id": 3}]'],
+     ["agent 000 sql select id from test limit 2 offset 0", "agent 000 sql select id from test limit 4 offset 2"]),
+    ("agent 000 sql select id from test limit 3 offset 5", None,
+     ['[{"id": 1}, {"id": 2}]', '[{"id": 3}]'],
+     ["agent 000 sql select id from test limit 2 offset 5", "agent 000 sql select id from test limit 1 offset 7"]),
+    ("global sql select id from test where name = 'A'", 'id',
+     ['[{"id": 1}, {"id": 2}]', '[{"id": 3}]'],
+     ["global sql select * from (select id from test where name = 'A') order by id limit 2 offset 0",
+      "global sql select * from (select id from test where name = 'A') where id > 2 order by id limit 4 offset 0"]),
+    ("global sql select name from test limit 5 offset 1", 'name',
+     ['[{"name": "a"}, {"name": "b\'c"}]', '[]'],
+     ["global sql select * from (select name from test) order by name limit 2 offset 1",
+      "global sql select * from (select name from test) where name > 'b''c' order by name limit 3 offset 0"]),
+])
+@patch("socket.socket.connect")
+def test_stream(connect_mock, query, key, responses, expected_requests):
+    """Test that `stream` yields every page without counting the rows first."""
+    mywdb = WazuhDBConnection(request_slice=2)
+    with patch("wazuh.core.wdb.WazuhDBConnection._send",
+               side_effect=[['ok', response] for response in responses]) as send_mock:
+        pages = list(mywdb.stream(query, key=key))
+
+    assert pages == [page for page in map(WazuhDBConnection.loads, responses) if page]
+    assert mywdb.request_slice == 2
+    assert [call_args.args[0] for call_args in send_mock.call_args_list] == expected_requests
+
+
+@patch("socket.socket.connect")
+def test_stream_ko(connect_mock):
+    """Test that `stream` raises the same exceptions as `execute`."""
+    mywdb = WazuhDBConnection()
+    with pytest.raises(exception.WazuhException, match=".* 2004 .*"):
+        next(mywdb.stream("Agent sql select 'test'"))
+
+    with patch("wazuh.core.wdb.WazuhDBConnection._send", side_effect=ValueError):
+        with pytest.raises(exception.WazuhException, match=".* 2006 .*"):
+            next(mywdb.stream("agent 000 sql select id from test"))
+
+
 @pytest.mark.parametrize('error_query, error_type, expected_exception, delete, update', [
     ('agent 000 sql delete test', None, 2004, True, False),
     ('agent 000 sql update test', None, 2004, False, True),
@@ -300,3 +505,102 @@ def test_WazuhDBConnection_loads(string):
     result = WazuhDBConnection.loads(string)
     assert len(result) == 1
     assert result[0] == {"key1": "value1"}
+
+
+@patch("socket.socket.connect")
+def test_WazuhDBConnection_is_alive(connect_mock):
+    """Test that `is_alive` detects closed connections and connections with pending data."""
+    mywdb = WazuhDBConnection()
+    with patch('socket.socket.recv', side_effect=BlockingIOError):
+        assert mywdb.is_alive()
+    with patch('socket.socket.recv', return_value=b''):
+        assert not mywdb.is_alive()
+    with patch('socket.socket.recv', return_value=b'o'):
+        assert not mywdb.is_alive()
+    with patch('socket.socket.recv', side_effect=ConnectionResetError):
+        assert not mywdb.is_alive()
+
+
+@patch("socket.socket.connect")
+def test_WazuhDBConnectionPool_acquire_release(connect_mock):
+    """Test that released connections are reused and reconnected when wazuh-db closed them."""
+    pool = WazuhDBConnectionPool(max_size=2)
+    with patch.object(WazuhDBConnection, 'is_alive', return_value=True):
+        conn = pool.acquire(request_slice=10)
+        assert conn.request_slice == 10
+        pool.release(conn)
+        assert pool.acquire() is conn
+        assert conn.request_slice == 500
+        pool.release(conn)
+
+    with patch.object(WazuhDBConnection, 'is_alive', return_value=False), \
+            patch.object(WazuhDBConnection, 'reconnect') as reconnect_mock:
+        with pool.connection() as pooled_conn:
+            assert pooled_conn is conn
+            assert pool.stats()['in_use'] == 1
+        reconnect_mock.assert_called_once()
+
+    assert pool.stats() == {'max_size': 2, 'in_use': 0, 'idle': 1, 'created': 1, 'reused': 2, 'reconnects': 1,
+                            'waits': 0, 'discarded': 0}
+
+
+@patch("socket.socket.connect")
+@patch.object(WazuhDBConnection, 'is_alive', return_value=True)
+def test_WazuhDBConnectionPool_discard(is_alive_mock, connect_mock):
+    """Test that connections are discarded after unexpected errors and kept after wazuh-db errors."""
+    pool = WazuhDBConnectionPool()
+    with pytest.raises(exception.WazuhError):
+        with pool.connection():
+            raise exception.WazuhError(2003)
+    assert pool.stats()['idle'] == 1
+
+    with pytest.raises(ConnectionResetError):
+        with pool.connection():
+            raise ConnectionResetError
+    assert pool.stats()['idle'] == 0
+    assert pool.stats()['discarded'] == 1
+
+    conn = pool.acquire()
+    pool.clear()
+    assert pool.stats()['in_use'] == 1
+    pool.release(conn)
+
+
+@patch("socket.socket.connect")
+@patch.object(WazuhDBConnection, 'is_alive', return_value=True)
+def test_WazuhDBConnectionPool_exhausted(is_alive_mock, connect_mock):
+    """Test that the pool waits for a free connection and raises an exception after the timeout."""
+    pool = WazuhDBConnectionPool(max_size=1, timeout=0.2)
+    conn = pool.acquire()
+    with pytest.raises(exception.WazuhInternalError, match=".* 2005 .*"):
+        pool.acquire()
+    assert pool.stats()['waits'] == 1
+
+    # Connections that are not released do not count once they are garbage collected
+    del conn
+    assert pool.acquire()
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+@pytest.mark.parametrize('string, expected_result', [
+    ('[{"id": 1, "date": "2023/01/02 10:11:12", "name": "2023/01/02 10:11:12"}]',
+     [{"id": 1, "date": datetime.datetime(2023, 1, 2, 10, 11, 12, tzinfo=datetime.timezone.utc),
+       "name": "2023/01/02 10:11:12"}]),
+    ('[{"id": "(null)", "date": "(null)"}, {"id": 2, "date": "(null)", "name": "test"}, {}]',
+     [{"id": 2, "name": "test"}]),
+    ('[{"id": 1}, {}]', [{"id": 1}, {}]),
+    ('[{"id": 1, "data": {"name": "(null)", "time": "2023/01/02 10:11:12"}}]',
+     [{"id": 1, "data": {"time": datetime.datetime(2023, 1, 2, 10, 11, 12, tzinfo=datetime.timezone.utc)}}]),
+    ('{"total": 5, "date": "never"}', {"total": 5, "date": "never"}),
+    ('[1, 2, 3]', [1, 2, 3]),
+])
+def test_WazuhDBConnection_loads_date_fields(string, expected_result, use_orjson):
+    """Test that the `loads` method only converts the fields of the schema and removes `"(null)"` values."""
+    with patch('wazuh.core.wdb.orjson', None) if not use_orjson else contextlib.nullcontext():
+        assert WazuhDBConnection.loads(string, date_fields={'date'}) == expected_result
+
+
+def test_WazuhDBConnection_loads_date_fields_fallback():
+    """Test that the standard JSON decoder is used with the values that orjson does not support."""
+    assert WazuhDBConnection.loads('[{"value": NaN, "big": 123456789012345678901234567890}]', date_fields=set()) == \
+           [{"value": pytest.approx(float('nan'), nan_ok=True), "big": 123456789012345678901234567890}]
@@ -5,18 +5,21 @@
 import errno
 import glob
 import hashlib
+import heapq
 import json
+import logging
 import operator
 import os
 import re
 import stat
 import sys
 import tempfile
+import threading
 import typing
 from copy import deepcopy
 from datetime import datetime, timedelta, timezone
-from functools import wraps
-from itertools import groupby, chain
+from functools import lru_cache, wraps
+from itertools import groupby, chain, islice
 from os import chmod, chown, listdir, mkdir, curdir, rename, utime, remove, walk, path
 import psutil
 from pyexpat import ExpatError
@@ -28,19 +31,25 @@ from cachetools import cached, TTLCache
 from defusedxml.ElementTree import fromstring
 from defusedxml.minidom import parseString
 
+import wazuh.core.columnar as columnar
 import wazuh.core.results as results
 from api import configuration
 from wazuh.core import common
 from wazuh.core.exception import WazuhError, WazuhInternalError
-from wazuh.core.wdb import WazuhDBConnection
+from wazuh.core.wdb import AsyncWazuhDBConnection, WazuhDBConnection, connection_pool
 
 # Python 2/3 compatibility
 if sys.version_info[0] == 3:
     unicode = str
 
+logger = logging.getLogger('wazuh')
+
 # Temporary cache
 t_cache = TTLCache(maxsize=4500, ttl=60)
 
+# Use a heap instead of a full sort when the requested elements are less than 1/TOP_K_RATIO of the array
+TOP_K_RATIO = 8
+
 
 def clean_pid_files(daemon: str) -> None:
     """Check the existence of '.pid' files for a specified daemon.
@@ -126,8 +135,8 @@ def process_array(array: list, search_text: str = None, complementary_search: bo
 
     Parameters
     ----------
-    array : list
-        Array to process.
+    array : list or ColumnarTable
+        Array to process. `ColumnarTable` instances are processed using their columnar representation.
     search_text : str
         Text to search and search type.
     complementary_search : bool
@@ -162,47 +171,126 @@ def process_array(array: list, search_text: str = None, complementary_search: bo
     dict
         Dictionary: {'items': Processed array, 'totalItems': Number of items, before applying offset and limit)}
     """
+    if isinstance(array, columnar.ColumnarTable):
+        return array.process(search_text=search_text, complementary_search=complementary_search,
+                             search_in_fields=search_in_fields, select=select, sort_by=sort_by,
+                             sort_ascending=sort_ascending, allowed_sort_fields=allowed_sort_fields, offset=offset,
+                             limit=limit, q=q, required_fields=required_fields,
+                             allowed_select_fields=allowed_select_fields, filters=filters, distinct=distinct)
+
     if not array:
         return {'items': [], 'totalItems': 0}
-    
-    if isinstance(filters, dict) and len(filters.keys()) > 0:
-        new_array = []
-        for element in array:
-            for key, value in filters.items():
-                if element[key] in value:
-                    new_array.append(element)
-                    break
-
-        array = new_array
 
-    if sort_by == [""]:
-        array = sort_array(array, sort_ascending=sort_ascending)
-    elif sort_by:
-        array = sort_array(array, sort_by=sort_by, sort_ascending=sort_ascending,
-                           allowed_sort_fields=allowed_sort_fields)
+    # The sort parameters are checked even if no element is left after filtering the array
+    check_sort_parameters(sort_by=sort_by, sort_ascending=sort_ascending, allowed_sort_fields=allowed_sort_fields)
 
+    # Apply every filter in a single pass over the array
+    predicates = []
+    if isinstance(filters, dict) and len(filters.keys()) > 0:
+        predicates.append(lambda element: any(element[key] in value for key, value in filters.items()))
     if search_text:
-        array = search_array(array, search_text=search_text, complementary_search=complementary_search,
-                             search_in_fields=search_in_fields)
-
+        predicates.append(get_search_predicate(search_text=search_text, complementary_search=complementary_search,
+                                               search_in_fields=search_in_fields))
     if q:
-        array = filter_array_by_query(q, array)
+        predicates.append(compile_query(q))
+
+    if len(predicates) == 1:
+        array = list(filter(predicates[0], array))
+    elif predicates:
+        array = [element for element in array if all(predicate(element) for predicate in predicates)]
+
+    def sort(array_to_sort: list, top_k: int = None) -> list:
+        if sort_by == [""]:
+            return sort_array(array_to_sort, sort_ascending=sort_ascending)
+        elif sort_by:
+            return sort_array(array_to_sort, sort_by=sort_by, sort_ascending=sort_ascending,
+                              allowed_sort_fields=allowed_sort_fields, top_k=top_k)
+        return array_to_sort
 
+    if distinct:
+        # Distinct values can only be calculated once every element has been selected
+        array = sort(array)
+        if select:
+            # Do not force the inclusion of any fields when we are looking for distinct values
+            array = select_array(array, select=select, required_fields=set(),
+                                 allowed_select_fields=allowed_select_fields)
+        array = distinct_array(array)
+        return {'items': cut_array(array, offset=offset, limit=limit), 'totalItems': len(array)}
+
+    total_items = len(array)
+    if select and not allowed_select_fields:
+        # Every element must be selected before cutting the page to check that none of them lacks the selected fields
+        select_array(array, select=select, required_fields=required_fields)
+
+    # Only the elements up to the last one of the requested page need to be sorted
+    array = sort(array, top_k=int(offset) + int(limit) if limit and int(limit) > 0 and int(offset) >= 0 else None)
+
+    items = cut_array(array, offset=offset, limit=limit)
     if select:
-        # Do not force the inclusion of any fields when we are looking for distinct values
-        required_fields = set() if distinct else required_fields
-        array = select_array(array, select=select, required_fields=required_fields,
+        items = select_array(items, select=select, required_fields=required_fields,
                              allowed_select_fields=allowed_select_fields)
 
-    if distinct:
-        distinct_array = []
-        for element in array:
-            if element not in distinct_array:
-                distinct_array.append(element)
+    return {'items': items, 'totalItems': total_items}
+
+
+def freeze_value(value: typing.Any) -> typing.Hashable:
+    """Get a hashable representation of a value. Two values are equal if their frozen representations are equal.
+
+    Parameters
+    ----------
+    value : any
+        Value to freeze. Dictionaries, lists and sets can be nested.
+
+    Raises
+    ------
+    TypeError
+        The value contains objects that cannot be hashed.
+
+    Returns
+    -------
+    Hashable
+        Frozen representation of the value.
+    """
+    if isinstance(value, dict):
+        return dict, frozenset((key, freeze_value(item)) for key, item in value.items())
+    elif isinstance(value, list):
+        return list, tuple(freeze_value(item) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset, frozenset(freeze_value(item) for item in value)
+
+    hash(value)
+    return value
+
+
+def distinct_array(array: list) -> list:
+    """Remove duplicated elements from an array keeping the first occurrence of each one.
 
-        array = distinct_array
+    Parameters
+    ----------
+    array : list
+        Array of elements.
 
-    return {'items': cut_array(array, offset=offset, limit=limit), 'totalItems': len(array)}
+    Returns
+    -------
+    list
+        Array without duplicated elements.
+    """
+    seen = set()
+    result = []
+    try:
+        for element in array:
+            frozen = freeze_value(element)
+            if frozen not in seen:
+                seen.add(frozen)
+                result.append(element)
+    except TypeError:
+        # Some element cannot be hashed, compare them one by one
+        result = []
+        for element in array:
+            if element not in result:
+                result.append(element)
+
+    return result
 
 
 def cut_array(array: list, offset: int = 0, limit: int = common.DATABASE_LIMIT) -> list:
@@ -254,8 +342,85 @@ def cut_array(array: list, offset: int = 0, limit: int = common.DATABASE_LIMIT)
         return array[offset:offset + limit]
 
 
+def _sorted(array: list, key: typing.Callable, reverse: bool, top_k: int = None) -> list:
+    """Sort an array. If only the first `top_k` elements are needed and they are a small part of the array, select
+    them with a heap. The result is the same as `sorted(array, key=key, reverse=reverse)[:top_k]`.
+
+    Parameters
+    ----------
+    array : list
+        Array to sort.
+    key : callable
+        Function used to get the comparison key of each element.
+    reverse : bool
+        Sort in descending order.
+    top_k : int
+        Number of sorted elements needed.
+
+    Returns
+    -------
+    list
+        Sorted array.
+    """
+    if top_k is not None and top_k * TOP_K_RATIO < len(array):
+        return (heapq.nlargest if reverse else heapq.nsmallest)(top_k, array, key=key)
+
+    return sorted(array, key=key, reverse=reverse)
+
+
+def check_sort_fields(allowed_sort_fields: set, sort_by: set):
+    """Check that every sort field is allowed.
+
+    Parameters
+    ----------
+    allowed_sort_fields : set
+        Allowed fields to sort by.
+    sort_by : set
+        Fields to sort by.
+
+    Raises
+    ------
+    WazuhError(1403)
+        At least one of the sort fields is not allowed.
+    """
+    if not sort_by.issubset(allowed_sort_fields):
+        incorrect_fields = ', '.join(sort_by - allowed_sort_fields)
+        raise WazuhError(1403, extra_remediation='Allowed sort fields: {0}. '
+                                                 'Wrong fields: {1}'.format(', '.join(allowed_sort_fields),
+                                                                            incorrect_fields))
+
+
+def check_sort_parameters(sort_by: list = None, sort_ascending: bool = True, allowed_sort_fields: list = None):
+    """Check the sort parameters of `process_array` as `sort_array` does, without any array.
+
+    Parameters
+    ----------
+    sort_by : list
+        Fields to sort by. The array is sorted directly if [''] is received.
+    sort_ascending : bool
+        Sort order ascending or descending.
+    allowed_sort_fields : list
+        Allowed fields to sort by.
+
+    Raises
+    ------
+    WazuhError(1402)
+        The sort order is not a boolean.
+    WazuhError(1403)
+        At least one of the sort fields is not allowed.
+    """
+    if not sort_by:
+        return
+
+    if not isinstance(sort_ascending, bool):
+        raise WazuhError(1402)
+
+    if sort_by != [""] and allowed_sort_fields:
+        check_sort_fields(set(allowed_sort_fields), set(sort_by))
+
+
 def sort_array(array: list, sort_by: list = None, sort_ascending: bool = True,
-               allowed_sort_fields: list = None) -> list:
+               allowed_sort_fields: list = None, top_k: int = None) -> list:
     """Sort an array.
 
     Parameters
@@ -268,6 +433,9 @@ def sort_array(array: list, sort_by: list = None, sort_ascending: bool = True,
         Ascending if true and descending if false.
     allowed_sort_fields : list
         Check sort_by with allowed_sort_fields (array).
+    top_k : int
+        Number of sorted elements needed. When it is much smaller than the array length, only the first `top_k`
+        elements are returned, selected with a heap instead of sorting the whole array.
 
     Raises
     ------
@@ -281,15 +449,6 @@ def sort_array(array: list, sort_by: list = None, sort_ascending: bool = True,
     list
         Sorted array.
     """
-
-    def check_sort_fields(allowed_sort_fields, sort_by):
-        # Check if every element in sort['fields'] is in allowed_sort_fields
-        if not sort_by.issubset(allowed_sort_fields):
-            incorrect_fields = ', '.join(sort_by - allowed_sort_fields)
-            raise WazuhError(1403, extra_remediation='Allowed sort fields: {0}. '
-                                                     'Wrong fields: {1}'.format(', '.join(allowed_sort_fields),
-                                                                                incorrect_fields))
-
     if not array:
         return array
 
@@ -305,10 +464,10 @@ def sort_array(array: list, sort_by: list = None, sort_ascending: bool = True,
         if type(array[0]) is dict:
             not is_sort_valid and check_sort_fields(set(array[0].keys()), set(sort_by))
             try:
-                return sorted(array,
-                              key=lambda o: tuple(
-                                  o.get(a).lower() if type(o.get(a)) in (str, unicode) else o.get(a) for a in sort_by),
-                              reverse=not sort_ascending)
+                return _sorted(array,
+                               key=lambda o: tuple(
+                                   o.get(a).lower() if type(o.get(a)) in (str, unicode) else o.get(a) for a in sort_by),
+                               reverse=not sort_ascending, top_k=top_k)
             except TypeError:
                 items_with_missing_keys = list()
                 copy_array = deepcopy(array)
@@ -328,11 +487,11 @@ def sort_array(array: list, sort_by: list = None, sort_ascending: bool = True,
                     return sorted_array
 
         else:
-            return sorted(array,
-                          key=lambda o: tuple(
-                              getattr(o, a).lower() if type(getattr(o, a)) in (str, unicode) else getattr(o, a)
-                              for a in sort_by),
-                          reverse=not sort_ascending)
+            return _sorted(array,
+                           key=lambda o: tuple(
+                               getattr(o, a).lower() if type(getattr(o, a)) in (str, unicode) else getattr(o, a)
+                               for a in sort_by),
+                           reverse=not sort_ascending, top_k=top_k)
     else:
         if type(array) is set or (type(array[0]) is not dict and 'class \'wazuh' not in str(type(array[0]))):
             return sorted(array, reverse=not sort_ascending)
@@ -375,6 +534,33 @@ def get_values(o: object, fields: list = None) -> list:
     return strings
 
 
+def get_search_predicate(search_text: str, complementary_search: bool = False,
+                         search_in_fields: list = None) -> typing.Callable[[typing.Any], bool]:
+    """Build a function that checks whether the string 'text' is in an element.
+
+    Parameters
+    ----------
+    search_text : str
+        Text to search.
+    complementary_search : bool
+        The text must not be in the element.
+    search_in_fields : list
+        Fields of the element to search in.
+
+    Returns
+    -------
+    callable
+        Function that receives an element and returns True if it satisfies the search.
+    """
+    search_text = search_text.lower()
+
+    def predicate(item) -> bool:
+        found = any(search_text in v for v in get_values(o=item, fields=search_in_fields))
+        return found is not complementary_search
+
+    return predicate
+
+
 def search_array(array, search_text: str = None, complementary_search: bool = False,
                  search_in_fields: list = None) -> list:
     """Look for the string 'text' in the elements of the array.
@@ -395,28 +581,8 @@ def search_array(array, search_text: str = None, complementary_search: bool = Fa
     list
         Filtered array.
     """
-
-    found = []
-
-    for item in array:
-
-        values = get_values(o=item, fields=search_in_fields)
-
-        if not complementary_search:
-            for v in values:
-                if search_text.lower() in v:
-                    found.append(item)
-                    break
-        else:
-            not_in_values = True
-            for v in values:
-                if search_text.lower() in v:
-                    not_in_values = False
-                    break
-            if not_in_values:
-                found.append(item)
-
-    return found
+    return list(filter(get_search_predicate(search_text=search_text, complementary_search=complementary_search,
+                                            search_in_fields=search_in_fields), array))
 
 
 def select_array(array: list, select: list = None, required_fields: set = None,
@@ -750,11 +916,34 @@ def md5(fname):
     return hash_md5.hexdigest()
 
 
+HASH_BUFFER_SIZE = 1048576
+_hash_buffer = threading.local()
+
+
 def blake2b(fname):
+    """Calculate the BLAKE2b hash of a file.
+
+    The file is read into a buffer that is reused by every call made from the same thread. Memory mapping is avoided
+    on purpose: a file truncated while it is being hashed would raise SIGBUS instead of an exception.
+
+    Parameters
+    ----------
+    fname : str
+        Path of the file.
+
+    Returns
+    -------
+    str
+        Hexadecimal BLAKE2b hash.
+    """
     hash_blake2b = hashlib.blake2b()
-    with open(fname, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_blake2b.update(chunk)
+    try:
+        buffer = _hash_buffer.buffer
+    except AttributeError:
+        buffer = _hash_buffer.buffer = memoryview(bytearray(HASH_BUFFER_SIZE))
+    with open(fname, 'rb', buffering=0) as f:
+        while size := f.readinto(buffer):
+            hash_blake2b.update(buffer[:size])
     return hash_blake2b.hexdigest()
 
 
@@ -1250,6 +1439,224 @@ def get_timeframe_in_seconds(timeframe: str) -> int:
     return seconds
 
 
+QUERY_OPERATORS = {'=': operator.eq,
+                   '!=': operator.ne,
+                   '<': operator.lt,
+                   '>': operator.gt}
+QUERY_DATE_PATTERNS = ('%Y-%m-%d', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%fZ')
+QUERY_CACHE_SIZE = 256
+
+# Get the elements of a single 'q' clause: field name, nested field names, operator and value
+re_query_clause = re.compile(
+    r"\(?" +
+    # Field name: name of the field to look on DB.
+    r"([\w]+)" +
+    # New capturing group for text after the first dot.
+    r"\.?([\w.]*)?" +
+    # Operator: looks for '=', '!=', '<', '>' or '~'.
+    rf"([{''.join(list(QUERY_OPERATORS) + ['~'])}]{{1,2}})" +
+    # Value: A string.
+    r"((?:(?:\((?:\[[\[\]\w _\-.,:?\\/'\"=@%<>{}]*]|[\[\]\w _\-.:?\\/'\"=@%<>{}]*)\))*"
+    r"(?:\[[\[\]\w _\-.,:?\\/'\"=@%<>{}]*]|[\[\]\w _\-.:?\\/'\"=@%<>{}]+)"
+    r"(?:\((?:\[[\[\]\w _\-.,:?\\/'\"=@%<>{}]*]|[\[\]\w _\-.:?\\/'\"=@%<>{}]*)\))*)+)" +
+    r"\)?"
+)
+
+
+class QueryClause(typing.NamedTuple):
+    """Parsed 'q' clause. Literal operands are converted only once, when the query is compiled."""
+    field_name: str
+    field_subnames: tuple
+    op: str
+    value: str
+    date_value: typing.Optional[datetime]
+    int_value: typing.Optional[int]
+
+
+@lru_cache(maxsize=4096)
+def check_date_format(element: str) -> typing.Union[str, datetime]:
+    """Check if a given field is a date. If so, transform the date to the standard API format (ISO 8601).
+    If not, return the field.
+
+    Parameters
+    ----------
+    element : str
+        Item to check.
+
+    Returns
+    -------
+    str or datetime
+        In case of a date, return the element after its conversion. Otherwise it return the element.
+    """
+    for pattern in QUERY_DATE_PATTERNS:
+        try:
+            return get_utc_strptime(element, pattern)
+        except ValueError:
+            pass
+
+    return element
+
+
+def parse_query(q: str) -> typing.Tuple[typing.Tuple[QueryClause, ...], ...]:
+    """Parse a 'q' string into a list of OR clauses, each one of them being a list of AND clauses.
+
+    Parameters
+    ----------
+    q : str
+        Query for filtering a list.
+
+    Raises
+    ------
+    WazuhError(1407)
+        Parameter q is not valid.
+
+    Returns
+    -------
+    tuple
+        Tuple of OR clauses. Every OR clause is a tuple of `QueryClause` that must be satisfied at the same time.
+    """
+    or_clauses = []
+    for or_clause in q.split(','):
+        and_clauses = []
+        for and_clause in or_clause.split(';'):
+            try:
+                field_name, field_subnames, op, value = re_query_clause.match(and_clause).groups()
+            except AttributeError:
+                raise WazuhError(1407, extra_message=f"Parameter 'q' is not valid: '{and_clause}'")
+
+            date_value = int_value = None
+            if op != '~':
+                date_value = check_date_format(value)
+                date_value = date_value if isinstance(date_value, datetime) else None
+                try:
+                    int_value = int(value)
+                except ValueError:
+                    pass
+
+            and_clauses.append(QueryClause(field_name, tuple(field_subnames.split('.')) if field_subnames else (),
+                                           op, value, date_value, int_value))
+        or_clauses.append(tuple(and_clauses))
+
+    return tuple(or_clauses)
+
+
+def _get_match_candidates(iterable: typing.Union[dict, list], key_list: typing.Sequence,
+                          candidates: list) -> bool:
+    """Get the match candidates following a list of keys.
+
+    Parameters
+    ----------
+    iterable : dict or list
+        Iterable object to be iterated over.
+    key_list : list
+        List of keys.
+    candidates : list
+        Empty list that will be filled.
+
+    Returns
+    -------
+    bool
+        True if there is one match at least. False otherwise.
+    """
+    for index, key in enumerate(key_list):
+        if isinstance(iterable, list):
+            found = False
+            for element in iterable:
+                found = _get_match_candidates(element, key_list[index:], candidates) or found
+            return found
+        elif key in iterable:
+            iterable = iterable[key]
+        else:
+            return False
+
+    candidates.append(iterable)
+    return True
+
+
+def compile_query_clause(clause: QueryClause) -> typing.Callable[[dict], bool]:
+    """Build a predicate that checks a single `QueryClause` against an element.
+
+    Parameters
+    ----------
+    clause : QueryClause
+        Parsed clause.
+
+    Returns
+    -------
+    callable
+        Function that receives an element and returns True if the clause is satisfied.
+    """
+    field_name, field_subnames, op, value, date_value, int_value = clause
+
+    if op == '~':
+        def check(value1) -> bool:
+            for val in value1 if isinstance(value1, list) else (value1,):
+                # value1 should be str if operator is '~'
+                if value in (str(val) if type(val) == int else val):
+                    return True
+            return False
+    else:
+        compare = QUERY_OPERATORS[op]
+
+        def check(value1) -> bool:
+            for val in value1 if isinstance(value1, list) else (value1,):
+                operand = value
+                if date_value is not None:
+                    val = check_date_format(val)
+                    operand = date_value
+                if type(val) == int:
+                    # Cast the operand to integer if the field is an integer
+                    operand = int_value if int_value is not None else int(value)
+                if compare(val, operand):
+                    return True
+            return False
+
+    if not field_subnames:
+        return lambda elem: field_name in elem and check(elem[field_name])
+
+    def nested_check(elem: dict) -> bool:
+        if field_name not in elem:
+            return False
+        candidates = []
+        if _get_match_candidates(elem[field_name], field_subnames, candidates):
+            return any(check(candidate) for candidate in candidates if candidate)
+        return check(elem[field_name])
+
+    return nested_check
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_query(q: str) -> typing.Callable[[dict], bool]:
+    """Compile a 'q' string into a reusable predicate. Compiled queries are cached.
+
+    Parameters
+    ----------
+    q : str
+        Query for filtering a list.
+
+    Raises
+    ------
+    WazuhError(1407)
+        Parameter q is not valid.
+
+    Returns
+    -------
+    callable
+        Function that receives an element and returns True if it satisfies the query.
+    """
+    or_clauses = tuple(tuple(compile_query_clause(clause) for clause in and_clauses)
+                       for and_clauses in parse_query(q))
+
+    if len(or_clauses) == 1 and len(or_clauses[0]) == 1:
+        return or_clauses[0][0]
+
+    def predicate(elem: dict) -> bool:
+        # An element matches if all the AND clauses of, at least, one OR clause are satisfied
+        return any(all(check(elem) for check in and_clauses) for and_clauses in or_clauses)
+
+    return predicate
+
+
 def filter_array_by_query(q: str, input_array: typing.List) -> typing.List:
     """Filter a list of dictionaries by 'q' parameter, like as a SQL query.
 
@@ -1260,168 +1667,92 @@ def filter_array_by_query(q: str, input_array: typing.List) -> typing.List:
     q : str
         query for filtering a list.
 
+    Raises
+    ------
+    WazuhError(1407)
+        Parameter q is not valid.
+
     Returns
     -------
     list
         List with processed query.
     """
+    predicate = compile_query(q)
+    return [elem for elem in input_array if predicate(elem)]
 
-    def check_date_format(element: str) -> typing.Union[str, datetime]:
-        """Check if a given field is a date. If so, transform the date to the standard API format (ISO 8601).
-        If not, return the field.
 
-        Parameters
-        ----------
-        element : str
-            Item to check.
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_substitution_plan(query: str, params: tuple) -> tuple:
+    """Split a query template in literal parts and the names of the `:name` parameters found between them. Plans are
+    cached, so queries built with the same template only need to bind the values.
 
-        Returns
-        -------
-        str or datetime
-            In case of a date, return the element after its conversion. Otherwise it return the element.
-        """
-        date_patterns = ['%Y-%m-%d', '%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S.%fZ']
+    Parameters
+    ----------
+    query : str
+        Query template.
+    params : tuple
+        Names of the parameters that can be used in the template.
 
-        for pattern in date_patterns:
-            try:
-                return get_utc_strptime(element, pattern)
-            except ValueError:
-                pass
+    Returns
+    -------
+    tuple
+        Literal parts in the even positions and parameter names in the odd ones.
+    """
+    if not params:
+        return query,
 
-        return element
+    # Longer names first, so a parameter is not replaced by another one that is a prefix of it
+    names = '|'.join(re.escape(param) for param in sorted(params, key=len, reverse=True))
+    return tuple(re.split(r':\b(' + names + r')\b', query))
 
-    def check_clause(value1: typing.Union[str, int], op: str, value2: str) -> bool:
-        """Check an operation between value1 and value2. 'value1' could be an integer, it is necessary cast value2 to
-        integer if this happens
 
-        Parameters
-        ----------
-        value1 : str or int
-            First value of the operation.
-        op : str
-            Operation to be done.
-        value2 : str
-            Second value of the operation.
+def get_query_cache_stats() -> dict:
+    """Get the statistics of the caches used to filter results and to build database queries.
 
-        Returns
-        -------
-        bool
-            True if operation is satisfied, False otherwise.
-        """
-        operators = {'=': operator.eq,
-                     '!=': operator.ne,
-                     '<': operator.lt,
-                     '>': operator.gt}
-        value1 = [value1] if not isinstance(value1, list) else value1
-        for val in value1:
-            if op == '~':
-                # value1 should be str if operator is '~'
-                val = str(val) if type(val) == int else val
-                if value2 in val:
-                    return True
-            else:
-                # cast value2 to integer if value1 is integer
-                value2 = check_date_format(value2)
-                if type(value2) == datetime:
-                    val = check_date_format(val)
-                value2 = int(value2) if type(val) == int else value2
-                if operators[op](val, value2):
-                    return True
+    Returns
+    -------
+    dict
+        Hits, misses, size, maximum size and hit rate of each cache.
+    """
+    stats = {}
+    for name, cached_function in (('q_predicates', compile_query), ('sql_templates', compile_substitution_plan)):
+        info = cached_function.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize,
+                       'hit_rate': info.hits / lookups if lookups else 0.0}
 
-        return False
+    return stats
 
-    def get_match_candidates(iterable: typing.Union[dict, list], key_list: list, candidates: list) -> bool:
-        """Get the match candidates following a list of keys.
 
-        Parameters
-        ----------
-        iterable : dict or list
-            Iterable object to be iterated over.
-        key_list : list
-            List of keys.
-        candidates : list
-            Empty list that will be filled
+def get_id_ranges(ids: typing.Iterable[int], min_range_size: int = 3) -> typing.Tuple[list, list]:
+    """Group integer IDs in runs of consecutive values.
 
-        Raises
-        ------
-        WazuhError(1407)
-            Parameter q is not valid.
+    Parameters
+    ----------
+    ids : iterable
+        Integer IDs.
+    min_range_size : int
+        Minimum number of consecutive IDs to be grouped in a range.
 
-        Returns
-        -------
-        bool
-            True if there is one match at least. False otherwise.
-        """
-        for index, key in enumerate(key_list):
-            if isinstance(iterable, list):
-                candidate_list = list()
-                for element in list(iterable):
-                    candidate_list.append(get_match_candidates(element, key_list[index:], candidates))
-                if True in candidate_list:
-                    return True
-                else:
-                    return False
-            else:
-                if key in iterable:
-                    iterable = iterable[key]
-                else:
-                    return False
+    Returns
+    -------
+    list
+        (first, last) tuples of the runs with, at least, `min_range_size` IDs.
+    list
+        IDs that are not part of any range.
+    """
+    ranges, singles = [], []
+    sorted_ids = sorted(set(ids))
+    run_ends = [i for i, (previous, current) in enumerate(zip(sorted_ids, sorted_ids[1:]), 1) if current != previous + 1]
+    start = 0
+    for end in (*run_ends, len(sorted_ids)):
+        if end - start >= min_range_size:
+            ranges.append((sorted_ids[start], sorted_ids[end - 1]))
         else:
-            candidates.append(iterable)
-            return True
-
-    # compile regular expression only one time when function is called
-    # get elements in a clause
-    operators = ['=', '!=', '<', '>', '~']
-    re_get_elements = re.compile(
-        r"\(?" +
-        # Field name: name of the field to look on DB.
-        r"([\w]+)" +
-        # New capturing group for text after the first dot.
-        r"\.?([\w.]*)?" +
-        # Operator: looks for '=', '!=', '<', '>' or '~'.
-        rf"([{''.join(operators)}]{{1,2}})" +
-        # Value: A string.
-        r"((?:(?:\((?:\[[\[\]\w _\-.,:?\\/'\"=@%<>{}]*]|[\[\]\w _\-.:?\\/'\"=@%<>{}]*)\))*"
-        r"(?:\[[\[\]\w _\-.,:?\\/'\"=@%<>{}]*]|[\[\]\w _\-.:?\\/'\"=@%<>{}]+)"
-        r"(?:\((?:\[[\[\]\w _\-.,:?\\/'\"=@%<>{}]*]|[\[\]\w _\-.:?\\/'\"=@%<>{}]*)\))*)+)" +
-        r"\)?"
-    )
-
-    # get a list with OR clauses
-    or_clauses = q.split(',')
-    output_array = []
-    # process elements of input_array
-    for elem in input_array:
-        # if an element matches an OR clause, it will be added to output
-        for or_clause in or_clauses:
-            # all AND clauses should match for adding an element to output
-            and_clauses = or_clause.split(';')
-            match = True  # flag for checking clauses
-            for and_clause in and_clauses:
-                # get elements in a clause
-                try:
-                    field_name, field_subnames, op, value = re_get_elements.match(and_clause).groups()
-                except AttributeError:
-                    raise WazuhError(1407, extra_message=f"Parameter 'q' is not valid: '{and_clause}'")
-
-                # check if a clause is satisfied
-                match_candidates = list()
-                if field_subnames and field_name in elem and \
-                        get_match_candidates(deepcopy(elem[field_name]), field_subnames.split('.'), match_candidates):
-                    if any([check_clause(candidate, op, value) for candidate in match_candidates if candidate]):
-                        continue
-                else:
-                    if field_name in elem and check_clause(elem[field_name], op, value):
-                        continue
-                match = False
-                break
+            singles.extend(sorted_ids[start:end])
+        start = end
 
-            # if match = True, add element to output and break the loop
-            if match:
-                output_array.append(elem)
-                break
-    return output_array
+    return ranges, singles
 
 
 class AbstractDatabaseBackend:
@@ -1438,6 +1769,9 @@ class AbstractDatabaseBackend:
     def execute(self, query, request, count=False):
         raise NotImplementedError
 
+    def stream(self, query, request, key=None):
+        raise NotImplementedError
+
 
 class WazuhDBBackend(AbstractDatabaseBackend):
     """
@@ -1456,35 +1790,45 @@ class WazuhDBBackend(AbstractDatabaseBackend):
         super().__init__()
 
     def connect_to_db(self):
-        return WazuhDBConnection(request_slice=self.request_slice)
+        return connection_pool.acquire(request_slice=self.request_slice, factory=WazuhDBConnection)
 
     def close_connection(self):
-        self.conn.close()
+        connection_pool.release(self.conn)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"wazuh-db connection pool: {connection_pool.stats()}. "
+                         f"Query caches: {get_query_cache_stats()}")
+
+    @staticmethod
+    def _format_param(value) -> str:
+        """Format a request parameter as an SQL literal."""
+        if isinstance(value, list):
+            values = list()
+            for element in value:
+                if isinstance(element, (int, float)) or (isinstance(element, str) and element.isnumeric()):
+                    values.append(element)
+                else:
+                    values.append(f"'{element}'")
+            return f"{','.join(values)}"
+        elif isinstance(value, (int, float)):
+            return f"{value}"
+        elif isinstance(value, str):
+            return f"'{value}'"
+
+        raise TypeError(f'Invalid type for request parameters: {type(value)}')
 
     def _substitute_params(self, query, request):
         """
         Substitute request parameters in query. This is only necessary when the backend is wdb. Sqlite substitutes
         parameters by itself.
         """
-        for k, v in request.items():
-            if isinstance(v, list):
-                values = list()
-                for element in v:
-                    if isinstance(element, (int, float)) or (isinstance(element, str) and element.isnumeric()):
-                        values.append(element)
-                    else:
-                        values.append(f"'{element}'")
-                value = f"{','.join(values)}"
-            elif isinstance(v, (int, float)):
-                value = f"{v}"
-            elif isinstance(v, str):
-                value = f"'{v}'"
-            else:
-                raise TypeError(f'Invalid type for request parameters: {type(v)}')
-            # Escape backslash to avoid re error
-            value = value.replace('\\', '\\\\')
-            query = re.sub(r':\b' + re.escape(str(k)) + r'\b', value, query)
-        return query
+        values = {str(k): self._format_param(v) for k, v in request.items()}
+        plan = compile_substitution_plan(query, tuple(values))
+        if len(plan) == 1:
+            return query
+
+        parts = list(plan)
+        parts[1::2] = [values[param] for param in plan[1::2]]
+        return ''.join(parts)
 
     def _render_query(self, query):
         """Render query attending the format."""
@@ -1497,15 +1841,44 @@ class WazuhDBBackend(AbstractDatabaseBackend):
         else:
             return f'agent {self.agent_id} sql {query}'
 
-    def execute(self, query, request, count=False):
+    def execute(self, query, request, count=False, date_fields=None):
         """Execute SQL query through WazuhDB socket."""
         query = self._substitute_params(query, request)
+        if date_fields:
+            return self.conn.execute(query=self._render_query(query), count=count, date_fields=date_fields)
         return self.conn.execute(query=self._render_query(query), count=count)
 
+    def stream(self, query, request, key=None, date_fields=None):
+        """Execute SQL query through WazuhDB socket, yielding the results page by page."""
+        query = self._substitute_params(query, request)
+        return self.conn.stream(query=self._render_query(query), key=key, date_fields=date_fields or None)
+
+
+class AsyncWazuhDBBackend(WazuhDBBackend):
+    """
+    This class describes a wazuh db backend that executes database queries without blocking the event loop.
+    """
+
+    def connect_to_db(self):
+        return AsyncWazuhDBConnection(request_slice=self.request_slice)
+
+    def close_connection(self):
+        self.conn.close()
+
+    async def execute(self, query, request, count=False, date_fields=None):
+        """Execute SQL query through WazuhDB socket."""
+        query = self._substitute_params(query, request)
+        return await self.conn.execute(query=self._render_query(query), count=count, date_fields=date_fields or None)
+
 
 class WazuhDBQuery(object):
     """This class describes a database query for wazuh."""
 
+    backend_class = WazuhDBBackend
+    # Names of the response fields that may contain dates, used as schema to decode the responses of wazuh-db. They
+    # are not the same as `date_fields`, which are used to filter. If None, every value of the responses is checked.
+    date_schema = None
+
     def __init__(self, offset: int, limit: int, table: str, sort: dict, search: dict, select: list, query: str,
                  fields: dict, default_sort_field: str, count: bool, get_data: bool, backend: str,
                  default_sort_order: str = 'ASC', filters: dict = {}, min_select_fields: set = set(),
@@ -1821,11 +2194,69 @@ class WazuhDBQuery(object):
         query_with_select_fields = self.query.format(','.join(map(lambda x: f"{self.fields[x]} as '{x}'",
                                                                   set(self.select) | self.min_select_fields)))
 
-        self._data = self.backend.execute(query_with_select_fields, self.request)
+        self._data = self.backend.execute(query_with_select_fields, self.request, date_fields=self.date_schema)
 
     def _format_data_into_dictionary(self):
         return {'items': self._data, 'totalItems': self.total_items}
 
+    def stream(self, key: str = None) -> typing.Iterator[dict]:
+        """Build the query and yield the items as they are received from the database. The total number of items is not
+        computed and the data of each page is formatted separately.
+
+        If the RBAC filter does not fit in the query (see `run`), every resource matching the rest of filters is
+        requested and the items of the resources not allowed are discarded as they are received. The offset and limit
+        are applied after discarding them, as `oversized_run` does.
+
+        Parameters
+        ----------
+        key : str
+            Selected field with unique values used to paginate. If specified, the items are sorted by this field and each
+            page is requested after the last key instead of using an offset.
+
+        Raises
+        ------
+        WazuhInternalError(1123)
+            Error communicating with socket. Query too long.
+
+        Yields
+        ------
+        dict
+            Formatted items.
+        """
+        rbac_ids = set(self.legacy_filters.get('rbac_ids', set())) if self.legacy_filters is not None else set()
+        oversized = len(','.join(rbac_ids)) >= common.MAX_QUERY_FILTERS_RESERVED_SIZE and \
+            not self._compress_rbac_filter(rbac_ids)
+        if oversized:
+            resource = self._get_rbac_resource()
+            if resource not in set(self.select) | self.min_select_fields:
+                raise WazuhError(1724, extra_message=resource)
+            del self.legacy_filters['rbac_ids']
+            offset, limit = self.offset, self.limit
+            self.offset, self.limit = 0, None
+
+        self._add_select_to_query()
+        self._add_filters_to_query()
+        self._add_search_to_query()
+        if key is None:
+            self._add_sort_to_query()
+        elif key not in set(self.select) | self.min_select_fields:
+            raise WazuhError(1724, extra_message=key)
+        self._add_limit_to_query()
+
+        query_with_select_fields = self.query.format(','.join(map(lambda x: f"{self.fields[x]} as '{x}'",
+                                                                  set(self.select) | self.min_select_fields)))
+        items = self._stream_items(query_with_select_fields, key)
+        if oversized:
+            items = (item for item in items if (str(item[resource]).zfill(3) in rbac_ids) != self.rbac_negate)
+            items = islice(items, offset, offset + limit if limit is not None else None)
+        yield from items
+
+    def _stream_items(self, query: str, key: str = None) -> typing.Iterator[dict]:
+        """Run a query built by `stream` and yield the formatted items of each page."""
+        for page in self.backend.stream(query, self.request, key=key, date_fields=self.date_schema):
+            self._data = page
+            yield from self._format_data_into_dictionary()['items']
+
     def _filter_status(self, status_filter):
         raise NotImplementedError
 
@@ -1845,8 +2276,34 @@ class WazuhDBQuery(object):
         else:
             raise WazuhError(1412, date_filter['value'])
 
-    def general_run(self) -> dict:
-        """Build the query and runs it on the database.
+    @staticmethod
+    def _run_steps(steps: typing.Generator):
+        """Run a query built by a generator like `_general_run_steps`, calling the methods that access the database.
+
+        Parameters
+        ----------
+        steps : typing.Generator
+            Generator that yields the methods that access the database.
+
+        Returns
+        -------
+        dict
+            Value returned by the generator.
+        """
+        try:
+            while True:
+                next(steps)()
+        except StopIteration as e:
+            return e.value
+
+    def _general_run_steps(self) -> typing.Generator:
+        """Build the query and yield the methods that run it on the database, so the code is shared by `general_run`
+        and its asynchronous version.
+
+        Yields
+        ------
+        callable
+            Method that accesses the database.
 
         Returns
         -------
@@ -1857,15 +2314,55 @@ class WazuhDBQuery(object):
         self._add_filters_to_query()
         self._add_search_to_query()
         if self.count:
-            self._get_total_items()
+            yield self._get_total_items
             if not self.data:
                 return {'totalItems': self.total_items}
         self._add_sort_to_query()
         self._add_limit_to_query()
         if self.data:
-            self._execute_data_query()
+            yield self._execute_data_query
             return self._format_data_into_dictionary()
 
+    def _oversized_run_steps(self) -> typing.Generator:
+        """Build the query and yield the methods that run it on the database when the size of the query exceeds the
+        maximum available in the communication. See `_general_run_steps`.
+
+        Yields
+        ------
+        callable
+            Method that accesses the database.
+
+        Returns
+        -------
+        dict
+            Dictionary with the formatted data.
+
+        Raises
+        ------
+        WazuhInternalError(1123)
+            Error communicating with socket. Query too long.
+        """
+        original_count, original_negate = self.count, self.rbac_negate
+        rbac_ids, resource, original_select = self._add_oversized_query()
+        yield self._execute_data_query
+        count = self._filter_oversized_data(rbac_ids, resource, original_select)
+        result = yield from self._general_run_steps()
+        self.count, self.rbac_negate = original_count, original_negate
+        if original_count:
+            result['totalItems'] = count
+
+        return result
+
+    def general_run(self) -> dict:
+        """Build the query and runs it on the database.
+
+        Returns
+        -------
+        dict
+            Dictionary with the formatted data.
+        """
+        return self._run_steps(self._general_run_steps())
+
     def oversized_run(self) -> dict:
         """Method used when the size of the query exceeds the maximum available in the communication.
         Builds the query and runs it on the database.
@@ -1875,6 +2372,21 @@ class WazuhDBQuery(object):
         dict
             Dictionary with the formatted data.
 
+        Raises
+        ------
+        WazuhInternalError(1123)
+            Error communicating with socket. Query too long.
+        """
+        return self._run_steps(self._oversized_run_steps())
+
+    def _add_oversized_query(self) -> tuple:
+        """Build the query used to get every resource matching the filters except the RBAC ones.
+
+        Returns
+        -------
+        tuple
+            RBAC resources used to filter, name of the resource field and originally selected fields.
+
         Raises
         ------
         WazuhInternalError(1123)
@@ -1887,18 +2399,52 @@ class WazuhDBQuery(object):
         self._add_search_to_query()
         self._add_sort_to_query()
 
-        resource = None
-        final_ids = list()
-        resources = list()
-        if self.__class__.__name__ == 'WazuhDBQueryAgents':
-            resource = 'id'
-        elif self.__class__.__name__ == 'WazuhDBQueryGroups':
-            resource = 'name'
-        else:
-            raise WazuhInternalError(1123)
+        resource = self._get_rbac_resource()
         self.select = [resource]
         self._add_select_to_query()
-        self._execute_data_query()
+
+        return rbac_ids, resource, original_select
+
+    def _get_rbac_resource(self) -> str:
+        """Get the name of the field filtered by the RBAC resources.
+
+        Returns
+        -------
+        str
+            Name of the resource field.
+
+        Raises
+        ------
+        WazuhInternalError(1123)
+            Error communicating with socket. Query too long.
+        """
+        if self.__class__.__name__ in {'WazuhDBQueryAgents', 'AsyncWazuhDBQueryAgents'}:
+            return 'id'
+        elif self.__class__.__name__ == 'WazuhDBQueryGroups':
+            return 'name'
+
+        raise WazuhInternalError(1123)
+
+    def _filter_oversized_data(self, rbac_ids: set, resource: str, original_select: set) -> int:
+        """Filter the resources received with the query built by `_add_oversized_query` and prepare the query used to
+        get the allowed ones.
+
+        Parameters
+        ----------
+        rbac_ids : set
+            RBAC resources used to filter.
+        resource : str
+            Name of the resource field.
+        original_select : set
+            Originally selected fields.
+
+        Returns
+        -------
+        int
+            Total number of allowed resources.
+        """
+        final_ids = list()
+        resources = list()
         try:
             resources = list(map(lambda d: str(d[resource]).zfill(3), self._data))
             maximum_value = min(self.limit, len(resources)) if self.limit is not None else len(resources)
@@ -1919,14 +2465,11 @@ class WazuhDBQuery(object):
 
         self.select = original_select
         self.reset()
+        # `final_ids` only contains allowed resources, even when the original filter was negated
         self.legacy_filters['rbac_ids'] = final_ids
-        original_count = self.count
-        self.count = False
-        result = self.general_run()
-        if original_count:
-            result['totalItems'] = count
+        self.count, self.rbac_negate = False, False
 
-        return result
+        return count
 
     def run(self) -> dict:
         """Generic function that will redirect the information to the function that needs to be used for the specific
@@ -1941,8 +2484,25 @@ class WazuhDBQuery(object):
             return self.general_run()
 
         rbac_ids = set(self.legacy_filters.get('rbac_ids', set()))
-        return self.general_run() if len(','.join(rbac_ids)) < common.MAX_QUERY_FILTERS_RESERVED_SIZE else \
-            self.oversized_run()
+        if len(','.join(rbac_ids)) < common.MAX_QUERY_FILTERS_RESERVED_SIZE or self._compress_rbac_filter(rbac_ids):
+            return self.general_run()
+
+        return self.oversized_run()
+
+    def _compress_rbac_filter(self, rbac_ids: set) -> bool:
+        """Replace the list of RBAC resources with an equivalent filter that fits in the query, if possible.
+
+        Parameters
+        ----------
+        rbac_ids : set
+            RBAC resources used to filter.
+
+        Returns
+        -------
+        bool
+            True if the filter was replaced, False otherwise.
+        """
+        return False
 
     def reset(self):
         """Reset query to its initial value. Useful when doing several requests to the same DB."""
@@ -1969,6 +2529,104 @@ class WazuhDBQuery(object):
         return value == "all"
 
 
+class AsyncWazuhDBQuery(WazuhDBQuery):
+    """Database query run with an `AsyncWazuhDBBackend`, so concurrent queries do not block the event loop.
+
+    It is meant to be combined with `WazuhDBQuery` subclasses that build their backend with `backend_class`,
+    e.g. `class AsyncWazuhDBQueryAgents(AsyncWazuhDBQuery, WazuhDBQueryAgents)`. The methods that access the database
+    (`run`, `general_run`, `oversized_run`, `_get_total_items` and `_execute_data_query`) are coroutines. The items
+    cannot be streamed.
+    """
+
+    backend_class = AsyncWazuhDBBackend
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+    async def _get_total_items(self):
+        query_with_select_fields = self.query.format(','.join(map(lambda x: f"{self.fields[x]} as '{x}'",
+                                                                  self.select | self.min_select_fields)))
+        self.total_items = await self.backend.execute(self._default_count_query().format(query_with_select_fields),
+                                                      self.request, True)
+
+    async def _execute_data_query(self):
+        query_with_select_fields = self.query.format(','.join(map(lambda x: f"{self.fields[x]} as '{x}'",
+                                                                  set(self.select) | self.min_select_fields)))
+
+        self._data = await self.backend.execute(query_with_select_fields, self.request, date_fields=self.date_schema)
+
+    @staticmethod
+    async def _run_steps(steps: typing.Generator):
+        """Run a query built by a generator like `_general_run_steps`, awaiting the methods that access the database.
+
+        Parameters
+        ----------
+        steps : typing.Generator
+            Generator that yields the methods that access the database.
+
+        Returns
+        -------
+        dict
+            Value returned by the generator.
+        """
+        try:
+            while True:
+                await next(steps)()
+        except StopIteration as e:
+            return e.value
+
+    async def general_run(self) -> dict:
+        """Build the query and runs it on the database.
+
+        Returns
+        -------
+        dict
+            Dictionary with the formatted data.
+        """
+        return await self._run_steps(self._general_run_steps())
+
+    async def oversized_run(self) -> dict:
+        """Method used when the size of the query exceeds the maximum available in the communication.
+        Builds the query and runs it on the database.
+
+        Returns
+        -------
+        dict
+            Dictionary with the formatted data.
+
+        Raises
+        ------
+        WazuhInternalError(1123)
+            Error communicating with socket. Query too long.
+        """
+        return await self._run_steps(self._oversized_run_steps())
+
+    def stream(self, key: str = None):
+        """Streaming is not supported by the asynchronous queries.
+
+        Raises
+        ------
+        WazuhInternalError(1000)
+            Always.
+        """
+        raise WazuhInternalError(1000, extra_message='Streaming is only available on the synchronous query classes. '
+                                                     'Use run instead')
+
+    async def run(self) -> dict:
+        """Generic function that will redirect the information to the function that needs to be used for the specific
+        case.
+
+        Returns
+        -------
+        dict
+            Dictionary with the formatted data.
+        """
+        return await super().run()
+
+
 class WazuhDBQueryDistinct(WazuhDBQuery):
     """Retrieve unique values for a given field."""
 
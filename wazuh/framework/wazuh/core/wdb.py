@@ -6,16 +6,31 @@ import contextlib
 import asyncio
 import datetime
 import json
+import os
 import re
 import socket
 import struct
-from typing import List, Union
+import threading
+import time
+import weakref
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from wazuh.core import common
 from wazuh.core.common import MAX_SOCKET_BUFFER_SIZE
 from wazuh.core.exception import WazuhInternalError, WazuhError
 
 DATE_FORMAT = re.compile(r'\d{4}\/\d{2}\/\d{2} \d{2}:\d{2}:\d{2}')
+HEADER_SIZE = 4
+POOL_MAX_SIZE = 8
+POOL_TIMEOUT = 10
+MAX_IN_FLIGHT_COMMANDS = 16
+TRAILING_PAGINATION = re.compile(r'(?: limit (\d+))?(?: offset (\d+))?$')
 
 
 class AsyncWazuhDBConnection:
@@ -23,7 +38,7 @@ class AsyncWazuhDBConnection:
     Represent an async connection to the wdb socket.
     """
 
-    def __init__(self, loop: asyncio.AbstractEventLoopPolicy = None):
+    def __init__(self, loop: asyncio.AbstractEventLoopPolicy = None, request_slice: int = 500):
         """Class constructor.
 
         Parameters
@@ -31,9 +46,12 @@ class AsyncWazuhDBConnection:
         loop : asyncio.AbstractEventLoopPolicy
             Event loop. It's optional and can always be determined automatically when self.open_connection() is
             awaited from a coroutine.
+        request_slice : int
+            Maximum number of items to request from wazuh-db on the first call of `execute`.
         """
         self.socket_path = common.WDB_SOCKET
         self.loop = loop
+        self.request_slice = request_slice
         self._reader = None
         self._writer = None
 
@@ -69,19 +87,11 @@ class AsyncWazuhDBConnection:
                 await self.open_connection()
 
             # Send message.
-            encoded_msg = msg.encode(encoding='utf-8')
-            packed_msg = struct.pack('<I', len(encoded_msg)) + encoded_msg
-            self._writer.write(packed_msg)
+            self._write(msg)
             await self._writer.drain()
 
             # Read the response when it's ready.
-            try:
-                data = await self._reader.readexactly(4)
-                data_size = struct.unpack('<I', data[0:4])[0]
-                data = await self._reader.readexactly(data_size)
-                data = data.decode(encoding='utf-8', errors='ignore').split(" ", 1)
-            except asyncio.IncompleteReadError as e:
-                raise WazuhInternalError(2010, extra_message=e)
+            data = await self._read()
 
             if raw:
                 return data
@@ -94,8 +104,42 @@ class AsyncWazuhDBConnection:
                 await self.open_connection()
             raise WazuhInternalError(2005, extra_message=e)
 
-    async def run_wdb_command(self, command):
-        """Run command in wdb and return list of retrieved information.
+    def _write(self, msg: str):
+        """Add the header to a message and write it to the socket, without waiting for it to be sent.
+
+        Parameters
+        ----------
+        msg : str
+            Message to be sent to wazuh-db.
+        """
+        encoded_msg = msg.encode(encoding='utf-8')
+        self._writer.write(struct.pack('<I', len(encoded_msg)) + encoded_msg)
+
+    async def _read(self) -> list:
+        """Read the next response from the socket.
+
+        Raises
+        ------
+        WazuhInternalError(2010)
+            The connection was closed before the response was completely read.
+
+        Returns
+        -------
+        list
+            Status and, if any, payload of the response.
+        """
+        try:
+            data = await self._reader.readexactly(4)
+            data_size = struct.unpack('<I', data[0:4])[0]
+            data = await self._reader.readexactly(data_size)
+        except asyncio.IncompleteReadError as e:
+            raise WazuhInternalError(2010, extra_message=e)
+
+        return data.decode(encoding='utf-8', errors='ignore').split(" ", 1)
+
+    @staticmethod
+    def _check_result(result: list) -> list:
+        """Check the status of a wazuh-db response.
 
         The response of wdb socket can contain 2 elements, a STATUS and a PAYLOAD.
         State value can be:
@@ -105,16 +149,19 @@ class AsyncWazuhDBConnection:
 
         Parameters
         ----------
-        command : str
-            Command to be executed inside wazuh-db
+        result : list
+            Status and payload of the response.
+
+        Raises
+        ------
+        WazuhInternalError(2007)
+            Unsuccessful query.
 
         Returns
         -------
-        response : list
-            List with JSON results
+        list
+            Same response.
         """
-        result = await self._send(command, raw=True)
-
         # result[0] -> status
         # result[1] -> payload
         if len(result) > 1:
@@ -127,6 +174,250 @@ class AsyncWazuhDBConnection:
 
         return result
 
+    async def run_wdb_command(self, command):
+        """Run command in wdb and return list of retrieved information.
+
+        Parameters
+        ----------
+        command : str
+            Command to be executed inside wazuh-db
+
+        Returns
+        -------
+        response : list
+            List with JSON results
+        """
+        return self._check_result(await self._send(command, raw=True))
+
+    async def run_many(self, commands: Iterable[str], max_in_flight: int = MAX_IN_FLIGHT_COMMANDS,
+                       return_exceptions: bool = False) -> list:
+        """Run several commands in wdb using the same connection, without waiting for each response before sending the
+        next command. wazuh-db answers the commands of a connection in order.
+
+        Parameters
+        ----------
+        commands : iterable
+            Commands to be executed inside wazuh-db.
+        max_in_flight : int
+            Maximum number of commands sent whose response has not been read yet.
+        return_exceptions : bool
+            If `True`, the exceptions raised by unsuccessful commands are returned in the position of their response.
+            Otherwise, the first one is raised once all the responses have been read.
+
+        Raises
+        ------
+        WazuhInternalError(2005)
+            Error connecting with wazuh-db.
+        WazuhInternalError(2007)
+            Unsuccessful command.
+        WazuhInternalError(2010)
+            The connection was closed before every response was read.
+
+        Returns
+        -------
+        list
+            Status and payload of each command, in the same order.
+        """
+        results = []
+        pending = 0
+        try:
+            if None in [self._writer, self._reader]:
+                await self.open_connection()
+
+            for command in commands:
+                if pending == max_in_flight:
+                    results.append(await self._read())
+                    pending -= 1
+                self._write(command)
+                pending += 1
+                await self._writer.drain()
+
+            for _ in range(pending):
+                results.append(await self._read())
+        except (FileNotFoundError, ConnectionError) as e:
+            # The responses of the commands already sent cannot be matched anymore
+            self.close()
+            self._reader = self._writer = None
+            raise WazuhInternalError(2005, extra_message=e)
+        except WazuhInternalError:
+            self.close()
+            self._reader = self._writer = None
+            raise
+
+        checked_results = []
+        for result in results:
+            try:
+                checked_results.append(self._check_result(result))
+            except WazuhInternalError as e:
+                if not return_exceptions:
+                    raise
+                checked_results.append(e)
+
+        return checked_results
+
+    async def iterate(self, command: str, payload: dict = None, pivot_key: str = None) -> AsyncIterator[list]:
+        """Run a paginated command (e.g. `global sync-agent-groups-get`) until wazuh-db responds with the `ok` status.
+
+        The command of the next page is sent before yielding each response, so wazuh-db prepares it while the caller
+        processes the current one.
+
+        Parameters
+        ----------
+        command : str
+            Command to be executed inside wazuh-db. The JSON payload is appended to it.
+        payload : dict
+            Payload of the command.
+        pivot_key : str
+            Key of the payload updated, on each page, with the ID of the last item received. If not specified, the same
+            command is sent while the status is `due`.
+
+        Raises
+        ------
+        WazuhInternalError(2005)
+            Error connecting with wazuh-db.
+        WazuhInternalError(2007)
+            Unsuccessful command or the ID of the last item of a `due` page could not be obtained.
+
+        Yields
+        ------
+        list
+            Status and payload of each page.
+        """
+        payload = {} if payload is None else dict(payload)
+        if pivot_key:
+            payload.setdefault(pivot_key, 0)
+
+        try:
+            if None in [self._writer, self._reader]:
+                await self.open_connection()
+
+            self._write(command + json.dumps(payload))
+            await self._writer.drain()
+            while True:
+                result = self._check_result(await self._read())
+                last_page = result[0] == 'ok'
+                if not last_page:
+                    if pivot_key:
+                        try:
+                            payload[pivot_key] = json.loads(result[1])[-1]['data'][-1]['id']
+                        except (IndexError, KeyError, TypeError, ValueError):
+                            # Sending the same command again would return the same page forever
+                            raise WazuhInternalError(2007, extra_message=f"The '{pivot_key}' of the next page could "
+                                                                         f"not be obtained from the response")
+                    self._write(command + json.dumps(payload))
+                    await self._writer.drain()
+
+                yield result
+                if last_page:
+                    break
+        except (FileNotFoundError, ConnectionError) as e:
+            self.close()
+            self._reader = self._writer = None
+            raise WazuhInternalError(2005, extra_message=e)
+        except BaseException:
+            # A request may be pending, so the connection cannot be reused
+            self.close()
+            self._reader = self._writer = None
+            raise
+
+    async def _send_page(self, query_lower: str, step: int, offset: int, date_fields: set = None) -> tuple:
+        """Send one page of a paginated query, splitting it in halves while the response is bigger than the maximum
+        socket buffer size. See `WazuhDBConnection._send_page`.
+
+        Parameters
+        ----------
+        query_lower : str
+            Query with `:limit` and `:offset` wildcards.
+        step : int
+            Number of rows to request.
+        offset : int
+            Offset of the first row.
+        date_fields : set
+            Names of the fields that contain dates.
+
+        Raises
+        ------
+        WazuhError(2003)
+            Error in wdb request.
+        WazuhInternalError(2009)
+            A single row is bigger than the maximum socket buffer size.
+
+        Returns
+        -------
+        tuple
+            Received rows and the number of rows to request in the next page.
+        """
+        request = query_lower.replace(':limit', f'limit {step}').replace(':offset', f'offset {offset}')
+        result = await self._send(request, raw=True)
+        if result[0] == 'err':
+            raise WazuhError(2003, result[1])
+
+        if len(result[1]) < MAX_SOCKET_BUFFER_SIZE:
+            rows = WazuhDBConnection.loads(result[1], date_fields=date_fields)
+            return rows, step * 2 if len(result[1]) * 2 < MAX_SOCKET_BUFFER_SIZE else step
+        elif step == 1:
+            raise WazuhInternalError(2009)
+
+        rows, _ = await self._send_page(query_lower, step // 2, offset, date_fields)
+        remaining_rows, next_step = await self._send_page(query_lower, step // 2 + step % 2, step // 2 + offset,
+                                                          date_fields)
+        return [*rows, *remaining_rows], next_step
+
+    async def execute(self, query: str, count: bool = False, date_fields: set = None) -> Union[list, tuple, int]:
+        """Send a SQL select query to wdb socket, requesting the results page by page like `WazuhDBConnection.execute`
+        without blocking the event loop.
+
+        Parameters
+        ----------
+        query : str
+            Select query, e.g. `global sql select id from agent`.
+        count : bool
+            Whether to return the total number of items along with them.
+        date_fields : set
+            Names of the fields that contain dates. If specified, the responses are decoded using them as schema (see
+            `WazuhDBConnection.loads`).
+
+        Raises
+        ------
+        WazuhError(2004)
+            Database query not valid.
+        WazuhError(2003)
+            Error in wdb request.
+        WazuhError(2006)
+            The response could not be decoded.
+        WazuhInternalError(2005)
+            Error connecting with wazuh-db.
+
+        Returns
+        -------
+        list, tuple or int
+            Items, items and their total number if `count` is True, or the result of a count query.
+        """
+        query_lower, countq, offset, lim = WazuhDBConnection._prepare_pagination(WazuhDBConnection._parse_query(query))
+        if countq is None:
+            return list((await self._send(query_lower))[0].values())[0]
+
+        try:
+            total = list((await self._send(countq))[0].values())[0]
+        except IndexError:
+            total = 0
+
+        limit = lim if lim != 0 and lim < total else total
+        response = []
+        try:
+            off = offset
+            while off < limit + offset:
+                step = limit if self.request_slice > limit > 0 else self.request_slice
+                # Min() used to avoid fetching more items than the maximum specified in `limit`.
+                rows, self.request_slice = await self._send_page(query_lower, min(limit + offset - off, step), off,
+                                                                 date_fields)
+                response.extend(rows)
+                off += step
+        except ValueError as e:
+            raise WazuhError(2006, str(e))
+
+        return (response, total) if count else response
+
 
 class WazuhDBConnection:
     """
@@ -143,19 +434,56 @@ class WazuhDBConnection:
         """
         self.socket_path = common.WDB_SOCKET
         self.request_slice = request_slice
+        # Receive buffer, reused by every response read from this connection
+        self._buffer = bytearray(MAX_SOCKET_BUFFER_SIZE)
+        self._connect()
+
+    def _connect(self):
+        """Connect to the wdb socket.
+
+        Raises
+        ------
+        WazuhInternalError(2005)
+            Could not connect to wdb socket.
+        """
         try:
             self.__conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
             self.__conn.connect(self.socket_path)
         except OSError as e:
             raise WazuhInternalError(2005, e)
 
+    def reconnect(self):
+        """Close the current socket and connect again to wazuh-db."""
+        with contextlib.suppress(OSError):
+            self.__conn.close()
+        self._connect()
+
+    def is_alive(self) -> bool:
+        """Check, without blocking, that the socket is still connected and there is no pending data to be read.
+
+        Returns
+        -------
+        bool
+            True if the connection can be used to send a new request, False otherwise.
+        """
+        try:
+            # An empty read means that wazuh-db closed the connection
+            self.__conn.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+
+        return False
+
     def close(self):
         self.__conn.close()
 
     def __del__(self):
         self.close()
 
-    def __query_input_validation(self, query: str):
+    @staticmethod
+    def __query_input_validation(query: str):
         """Check input queries have the correct format
 
         Accepted query formats:
@@ -232,15 +560,16 @@ class WazuhDBConnection:
         self.__conn.send(packed_msg)
 
         # Get the data size (4 bytes)
-        data = self.__conn.recv(4)
-        data_size = struct.unpack('<I', data[0:4])[0]
-
-        data = self._recvall(data_size).decode(encoding='utf-8', errors='ignore').split(" ", 1)
+        data_size = struct.unpack('<I', self._recvall(HEADER_SIZE))[0]
 
         # Max size socket buffer is 64KB
         if data_size >= MAX_SOCKET_BUFFER_SIZE:
+            # Discard the response so the connection can still be used
+            self._recvall(data_size)
             raise WazuhInternalError(2009)
 
+        data = str(self._recvall(data_size), encoding='utf-8', errors='ignore').split(" ", 1)
+
         if data[0] == "err":
             raise WazuhError(2003, data[1])
         elif raw:
@@ -248,14 +577,32 @@ class WazuhDBConnection:
         else:
             return WazuhDBConnection.loads(data[1])
 
-    def _recvall(self, data_size, buffer_size=4096):
-        data = bytearray()
-        while len(data) < data_size:
-            packet = self.__conn.recv(buffer_size)
-            if not packet:
-                return data
-            data.extend(packet)
-        return data
+    def _recvall(self, data_size: int) -> memoryview:
+        """Receive `data_size` bytes into the connection buffer, without intermediate copies.
+
+        Parameters
+        ----------
+        data_size : int
+            Number of bytes to receive.
+
+        Returns
+        -------
+        memoryview
+            View of the received bytes. It is only valid until the next read from this connection. If wazuh-db closes
+            the connection, the bytes received until then are returned. Data that does not fit in the buffer is
+            discarded.
+        """
+        view = memoryview(self._buffer)
+        buffer_size = len(view)
+        received = 0
+        while received < data_size:
+            offset = received % buffer_size if data_size > buffer_size else received
+            nbytes = self.__conn.recv_into(view[offset:], min(data_size - received, buffer_size - offset))
+            if not nbytes:
+                break
+            received += nbytes
+
+        return view[:min(received, buffer_size)]
 
     @staticmethod
     def json_decoder(dct):
@@ -271,7 +618,79 @@ class WazuhDBConnection:
         return result
 
     @staticmethod
-    def loads(string: str) -> dict:
+    @lru_cache(maxsize=4096)
+    def _parse_date(value: str) -> Union[datetime.datetime, str]:
+        """Convert a wazuh-db date string to a datetime object.
+
+        Parameters
+        ----------
+        value : str
+            Value to convert.
+
+        Returns
+        -------
+        datetime.datetime or str
+            Converted date, or the same value if it does not match the wazuh-db date format.
+        """
+        if not DATE_FORMAT.match(value):
+            return value
+        if len(value) != 19:
+            return datetime.datetime.strptime(value, '%Y/%m/%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc)
+
+        # Format: %Y/%m/%d %H:%M:%S
+        return datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]),
+                                 int(value[14:16]), int(value[17:19]), tzinfo=datetime.timezone.utc)
+
+    @staticmethod
+    def _decode_nested(value):
+        """Apply `json_decoder` to every object inside a value, as it is done when there is no schema.
+
+        Parameters
+        ----------
+        value : dict or list
+            Decoded value.
+
+        Returns
+        -------
+        dict or list
+            Value with the `"(null)"` values removed and the dates converted in every object.
+        """
+        if type(value) is dict:
+            return WazuhDBConnection.json_decoder({k: WazuhDBConnection._decode_nested(v) for k, v in value.items()})
+        elif type(value) is list:
+            return [WazuhDBConnection._decode_nested(v) for v in value]
+        return value
+
+    @staticmethod
+    def _clean_row(row, date_fields: tuple):
+        """Remove the `"(null)"` values of a row and convert the fields included in `date_fields`.
+
+        Parameters
+        ----------
+        row : dict or any
+            Decoded row.
+        date_fields : tuple
+            Names of the fields that contain dates.
+
+        Returns
+        -------
+        dict or any
+            Cleaned row.
+        """
+        if type(row) is not dict:
+            return WazuhDBConnection._decode_nested(row)
+
+        result = {k: v if type(v) not in (dict, list) else WazuhDBConnection._decode_nested(v)
+                  for k, v in row.items() if v != "(null)"}
+        for field in date_fields:
+            value = result.get(field)
+            if type(value) is str:
+                result[field] = WazuhDBConnection._parse_date(value)
+
+        return result
+
+    @staticmethod
+    def loads(string: str, date_fields: set = None) -> dict:
         """Custom implementation for the JSON loads method with the class decoder.
         This method takes care of the possible emtpy objects that may be load.
 
@@ -279,20 +698,121 @@ class WazuhDBConnection:
         ----------
         string : str
             String response from `wazuh-db`. It must be a dumped JSON.
+        date_fields : set
+            Names of the fields that contain dates. If specified, orjson is used to parse the string, if available, and
+            only these fields of the top-level objects, like the rows of a SQL query, are converted to datetime objects.
+            Nested objects are decoded as without it. Otherwise, every string value of every object is checked.
 
         Returns
         -------
         dict
             JSON object.
         """
-        data = json.loads(string, object_hook=WazuhDBConnection.json_decoder)
+        if date_fields is None:
+            data = json.loads(string, object_hook=WazuhDBConnection.json_decoder)
+            if '"(null)"' in string:
+                # To prevent empty dictionaries, clean data if there was any `"(null)"` within the string
+                data = [item for item in data if item]
+
+            return data
+
+        data = None
+        if orjson is not None:
+            with contextlib.suppress(orjson.JSONDecodeError):
+                data = orjson.loads(string)
+        if data is None:
+            data = json.loads(string)
+
+        date_fields = tuple(date_fields)
+        if type(data) is not list:
+            return WazuhDBConnection._clean_row(data, date_fields)
+
+        data = [WazuhDBConnection._clean_row(row, date_fields) for row in data]
         if '"(null)"' in string:
             # To prevent empty dictionaries, clean data if there was any `"(null)"` within the string
             data = [item for item in data if item]
 
         return data
 
-    def __query_lower(self, query: str) -> str:
+    @staticmethod
+    def _parse_query(query: str) -> str:
+        """Convert a query to lower, except the text between quotes, and check its format.
+
+        Parameters
+        ----------
+        query : str
+            Query to be parsed.
+
+        Raises
+        ------
+        WazuhError(2004)
+            Database query not valid.
+
+        Returns
+        -------
+        str
+            Query converted to lower.
+        """
+        query_lower = WazuhDBConnection.__query_lower(query)
+        WazuhDBConnection.__query_input_validation(query_lower)
+
+        return query_lower
+
+    @staticmethod
+    def _prepare_pagination(query_lower: str) -> tuple:
+        """Replace the limit and offset of a select query with the `:limit` and `:offset` wildcards and build the query
+        used to count its results.
+
+        Parameters
+        ----------
+        query_lower : str
+            Query converted to lower.
+
+        Returns
+        -------
+        tuple
+            Query with wildcards, count query, offset and limit of the original query. If the original query is already
+            a count query, it is returned as is and the count query is None.
+        """
+        # Remove text inside 'where' clause to prevent finding reserved words (offset/count)
+        query_without_where = re.sub(r'where \([^()]*\)', 'where ()', query_lower)
+
+        # if the query has already a parameter limit / offset, divide using it
+        offset = 0
+        if re.search(r'offset \d+', query_without_where):
+            offset = int(re.compile(r".* offset (\d+)").match(query_lower).group(1))
+            # Replace offset with a wildcard
+            query_lower = ' :offset'.join(query_lower.rsplit((' offset {}'.format(offset)), 1))
+
+        if re.search(r'.?select count\([\w \*]+\)( as [^,]+)? from', query_without_where):
+            return query_lower, None, offset, 0
+
+        lim = 0
+        if re.search(r'limit \d+', query_without_where):
+            lim = int(re.compile(r".* limit (\d+)").match(query_lower).group(1))
+            # Replace limit with a wildcard
+            query_lower = ' :limit'.join(query_lower.rsplit((' limit {}'.format(lim)), 1))
+
+        regex = re.compile(r"\w+(?: \d*|)? sql select ([A-Z a-z0-9,*_` \.\-%\(\):\']+?) from")
+        select = regex.match(query_lower).group(1)
+        gb_regex = re.compile(r"(group by [^\s]+)")
+        countq = query_lower.replace(select, "count(*)", 1).replace(":limit", "").replace(":offset", "")
+        try:
+            group_by = gb_regex.search(query_lower)
+            if group_by:
+                countq = countq.replace(group_by.group(1), '')
+        except IndexError:
+            pass
+
+        if ':limit' not in query_lower:
+            query_lower += ' :limit'
+        if ':offset' not in query_lower:
+            query_lower += ' :offset'
+
+        return query_lower, countq, offset, lim
+
+    @staticmethod
+    def __query_lower(query: str) -> str:
         """Convert a query to lower except the words between "".
 
         Parameters
@@ -305,23 +825,11 @@ class WazuhDBConnection:
         str
             New query.
         """
+        # Text between quotes is in the odd positions
+        parts = query.split("'")
+        parts[::2] = [part.lower() for part in parts[::2]]
 
-        to_lower = True
-        new_query = ""
-
-        for i in query:
-            if to_lower and i != "'":
-                new_query += i.lower()
-            elif to_lower and i == "'":
-                new_query += i
-                to_lower = False
-            elif not to_lower and i != "'":
-                new_query += i
-            elif not to_lower and i == "'":
-                new_query += i
-                to_lower = True
-
-        return new_query
+        return "'".join(parts)
 
     def delete_agents_db(self, agents_id: List[str]) -> dict:
         """Delete agents db through wazuh-db service.
@@ -360,34 +868,132 @@ class WazuhDBConnection:
         """
         return self._send(query, raw)
 
-    def execute(self, query, count=False, delete=False, update=False):
-        """
-        Send a SQL query to wdb socket.
+    def _send_page(self, query_lower: str, step: int, offset: int, date_fields: set = None) -> tuple:
+        """Send one page of a paginated query, splitting it in halves while the response does not fit in the socket
+        buffer.
+
+        Parameters
+        ----------
+        query_lower : str
+            Query with `:limit` and `:offset` wildcards.
+        step : int
+            Number of rows to request.
+        offset : int
+            Offset of the first row.
+        date_fields : set
+            Names of the fields that contain dates.
+
+        Raises
+        ------
+        WazuhInternalError(2009)
+            A single row does not fit in the socket buffer.
+
+        Returns
+        -------
+        tuple
+            Received rows and the number of rows to request in the next page.
         """
+        try:
+            request = query_lower.replace(':limit', 'limit {}'.format(step)).replace(':offset',
+                                                                                     'offset {}'.format(offset))
+            request_response = self._send(request, raw=True)[1]
+            rows = WazuhDBConnection.loads(request_response, date_fields=date_fields)
+            return rows, step * 2 if len(request_response) * 2 < MAX_SOCKET_BUFFER_SIZE else step
+        except WazuhInternalError:
+            # if the step is already 1, it can't be divided
+            if step == 1:
+                raise WazuhInternalError(2009)
+
+            rows, _ = self._send_page(query_lower, step // 2, offset, date_fields)
+            # Add step // 2 remaining when the step is odd to avoid losing information
+            remaining_rows, next_step = self._send_page(query_lower, step // 2 + step % 2, step // 2 + offset,
+                                                        date_fields)
+            return [*rows, *remaining_rows], next_step
+
+    def stream(self, query: str, key: str = None, date_fields: set = None) -> Iterator[list]:
+        """Send a SQL select query to wdb socket and yield the results page by page, without counting them first.
+
+        If `key` is specified, pages are requested with `WHERE key > last_key` instead of `OFFSET`, so wazuh-db does not
+        scan again the rows of the previous pages. In that case, the rows are sorted by `key`, which must be a unique
+        column of the query result.
 
-        def send_request_to_wdb(query_lower, step, off, response):
-            try:
-                request = query_lower.replace(':limit', 'limit {}'.format(step)).replace(':offset',
-                                                                                         'offset {}'.format(off))
-                request_response = self._send(request, raw=True)[1]
-                response.extend(WazuhDBConnection.loads(request_response))
-                if len(request_response) * 2 < MAX_SOCKET_BUFFER_SIZE:
-                    return step * 2
-                else:
-                    return step
-            except WazuhInternalError:
-                # if the step is already 1, it can't be divided
-                if step == 1:
-                    raise WazuhInternalError(2009)
+        Parameters
+        ----------
+        query : str
+            Query to be sent. It may end with `LIMIT` and `OFFSET` clauses.
+        key : str
+            Column used to paginate.
+        date_fields : set
+            Names of the fields that contain dates. See `loads`.
 
-                send_request_to_wdb(query_lower, step // 2, off, response)
-                # Add step // 2 remaining when the step is odd to avoid losing information
-                return send_request_to_wdb(query_lower, step // 2 + step % 2, step // 2 + off, response)
+        Raises
+        ------
+        WazuhError(2006)
+            The query is not valid.
+        WazuhInternalError(2007)
+            Error retrieving the data.
 
+        Yields
+        ------
+        list
+            Rows of each page.
+        """
         query_lower = self.__query_lower(query)
-
         self.__query_input_validation(query_lower)
 
+        pagination = TRAILING_PAGINATION.search(query_lower)
+        limit = int(pagination.group(1)) if pagination.group(1) else None
+        offset = int(pagination.group(2) or 0)
+        query_lower = query_lower[:pagination.start()]
+
+        if key is not None:
+            target, select = query_lower.split(' sql ', 1)
+            keyset_query = f"{target} sql select * from ({select}) {{}}order by {key} :limit :offset"
+            query_lower = keyset_query.format('')
+        else:
+            query_lower += ' :limit :offset'
+
+        received = 0
+        # The page size grows while the responses fit in the socket buffer, without changing the connection one
+        request_slice = self.request_slice
+        try:
+            while limit is None or received < limit:
+                step = request_slice if limit is None else min(request_slice, limit - received)
+                rows, request_slice = self._send_page(query_lower, step, offset, date_fields)
+                if rows:
+                    yield rows
+                received += len(rows)
+                if len(rows) < step:
+                    break
+
+                if key is None:
+                    offset += step
+                else:
+                    # Keep paginating from the last received key
+                    offset = 0
+                    last_key = rows[-1][key]
+                    last_key = "'{}'".format(last_key.replace("'", "''")) if isinstance(last_key, str) else last_key
+                    query_lower = keyset_query.format(f'where {key} > {last_key} ')
+        except ValueError as e:
+            raise WazuhError(2006, str(e))
+        except (WazuhError, WazuhInternalError) as e:
+            raise e
+        except Exception as e:
+            raise WazuhInternalError(2007, str(e))
+
+    def execute(self, query, count=False, delete=False, update=False, date_fields=None):
+        """
+        Send a SQL query to wdb socket. If `date_fields` is specified, the response is decoded using it as schema
+        (see `loads`).
+        """
+
+        def send_request_to_wdb(query_lower, step, off, response):
+            rows, next_step = self._send_page(query_lower, step, off, date_fields)
+            response.extend(rows)
+            return next_step
+
+        query_lower = self._parse_query(query)
+
         # only for delete queries
         if delete:
             regex = re.compile(r"\w+ \d+? (sql delete from ([a-z0-9,_ ]+)|\w+ delete$)")
@@ -403,65 +1009,207 @@ class WazuhDBConnection:
                 raise WazuhError(2004, "Update query is wrong")
             return self._send(query_lower)
 
-        # Remove text inside 'where' clause to prevent finding reserved words (offset/count)
-        query_without_where = re.sub(r'where \([^()]*\)', 'where ()', query_lower)
+        query_lower, countq, offset, lim = self._prepare_pagination(query_lower)
+        if countq is None:
+            return list(self._send(query_lower)[0].values())[0]
 
-        # if the query has already a parameter limit / offset, divide using it
-        offset = 0
-        if re.search(r'offset \d+', query_without_where):
-            offset = int(re.compile(r".* offset (\d+)").match(query_lower).group(1))
-            # Replace offset with a wildcard
-            query_lower = ' :offset'.join(query_lower.rsplit((' offset {}'.format(offset)), 1))
+        try:
+            total = list(self._send(countq)[0].values())[0]
+        except IndexError:
+            total = 0
 
-        if not re.search(r'.?select count\([\w \*]+\)( as [^,]+)? from', query_without_where):
-            lim = 0
-            if re.search(r'limit \d+', query_without_where):
-                lim = int(re.compile(r".* limit (\d+)").match(query_lower).group(1))
-                # Replace limit with a wildcard
-                query_lower = ' :limit'.join(query_lower.rsplit((' limit {}'.format(lim)), 1))
-
-            regex = re.compile(r"\w+(?: \d*|)? sql select ([A-Z a-z0-9,*_` \.\-%\(\):\']+?) from")
-            select = regex.match(query_lower).group(1)
-            gb_regex = re.compile(r"(group by [^\s]+)")
-            countq = query_lower.replace(select, "count(*)", 1).replace(":limit", "").replace(":offset", "")
-            try:
-                group_by = gb_regex.search(query_lower)
-                if group_by:
-                    countq = countq.replace(group_by.group(1), '')
-            except IndexError:
-                pass
+        limit = lim if lim != 0 and lim < total else total
 
-            try:
-                total = list(self._send(countq)[0].values())[0]
-            except IndexError:
-                total = 0
+        response = []
+        try:
+            off = offset
+            while off < limit + offset:
+                step = limit if self.request_slice > limit > 0 else self.request_slice
+                # Min() used to avoid fetching more items than the maximum specified in `limit`.
+                self.request_slice = send_request_to_wdb(query_lower, min(limit + offset - off, step), off, response)
+                off += step
+        except ValueError as e:
+            raise WazuhError(2006, str(e))
+        except (WazuhError, WazuhInternalError) as e:
+            raise e
+        except Exception as e:
+            raise WazuhInternalError(2007, str(e))
+
+        if count:
+            return response, total
+        else:
+            return response
+
+
+class WazuhDBConnectionPool:
+    """Bounded, per-process pool of `WazuhDBConnection` objects.
 
-            limit = lim if lim != 0 and lim < total else total
+    Idle connections are checked before being reused and reconnected if wazuh-db closed them. Connections that are
+    never released are not counted once they are garbage collected, so they cannot exhaust the pool.
+    """
 
-            response = []
-            if ':limit' not in query_lower:
-                query_lower += ' :limit'
-            if ':offset' not in query_lower:
-                query_lower += ' :offset'
+    def __init__(self, max_size: int = POOL_MAX_SIZE, timeout: float = POOL_TIMEOUT):
+        """Class constructor.
 
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of connections in use at the same time.
+        timeout : float
+            Maximum number of seconds to wait for a connection when all of them are in use.
+        """
+        self.max_size = max_size
+        self.timeout = timeout
+        self._lock = threading.Condition()
+        self._pid = os.getpid()
+        self._idle = {}
+        self._in_use = weakref.WeakSet()
+        self._stats = {'created': 0, 'reused': 0, 'reconnects': 0, 'waits': 0, 'discarded': 0}
+
+    def _check_pid(self):
+        """Drop the connections inherited from the parent process after a fork."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = {}
+            self._in_use = weakref.WeakSet()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def acquire(self, request_slice: int = 500, factory: Callable = None) -> WazuhDBConnection:
+        """Get a connection from the pool, or create it if there are no idle ones.
+
+        Parameters
+        ----------
+        request_slice : int
+            Maximum number of items to request from wazuh-db on the first call.
+        factory : callable
+            Class used to create new connections. Idle connections are only reused by callers using the same factory.
+            Default `WazuhDBConnection`.
+
+        Raises
+        ------
+        WazuhInternalError(2005)
+            No connection was released before the timeout or it was not possible to connect to wazuh-db.
+
+        Returns
+        -------
+        WazuhDBConnection
+            Connection ready to be used.
+        """
+        factory = factory or WazuhDBConnection
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            self._check_pid()
+            if len(self._in_use) >= self.max_size:
+                self._stats['waits'] += 1
+            while len(self._in_use) >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WazuhInternalError(2005, extra_message='All the wazuh-db connections of the pool are in use')
+                # Wake up periodically, in-use connections may be released by the garbage collector
+                self._lock.wait(min(remaining, 0.1))
+
+            idle = self._idle.get(factory)
+            conn = idle.pop() if idle else None
+            if conn is None:
+                conn = factory(request_slice=request_slice)
+                self._stats['created'] += 1
+                # Only WazuhDBConnection objects are managed by the pool
+                isinstance(conn, WazuhDBConnection) and self._in_use.add(conn)
+                return conn
+
+            self._stats['reused'] += 1
+            self._in_use.add(conn)
+
+        if not conn.is_alive():
             try:
-                off = offset
-                while off < limit + offset:
-                    step = limit if self.request_slice > limit > 0 else self.request_slice
-                    # Min() used to avoid fetching more items than the maximum specified in `limit`.
-                    self.request_slice = send_request_to_wdb(query_lower, min(limit + offset - off, step), off,
-                                                             response)
-                    off += step
-            except ValueError as e:
-                raise WazuhError(2006, str(e))
-            except (WazuhError, WazuhInternalError) as e:
-                raise e
-            except Exception as e:
-                raise WazuhInternalError(2007, str(e))
-
-            if count:
-                return response, total
-            else:
-                return response
+                conn.reconnect()
+            except WazuhInternalError:
+                self._discard(conn)
+                raise
+            with self._lock:
+                self._stats['reconnects'] += 1
+
+        conn.request_slice = request_slice
+        return conn
+
+    def release(self, conn: WazuhDBConnection, discard: bool = False):
+        """Give a connection back to the pool.
+
+        Parameters
+        ----------
+        conn : WazuhDBConnection
+            Connection obtained with `acquire`. Objects that are not `WazuhDBConnection` instances are closed.
+        discard : bool
+            Close the connection instead of keeping it. Used when its state is unknown after an error.
+        """
+        if discard or not isinstance(conn, WazuhDBConnection):
+            self._discard(conn)
+            return
+
+        with self._lock:
+            if conn in self._in_use:
+                self._in_use.discard(conn)
+                self._idle.setdefault(type(conn), []).append(conn)
+            self._lock.notify()
+
+    def _discard(self, conn: WazuhDBConnection):
+        with self._lock:
+            self._in_use.discard(conn)
+            self._stats['discarded'] += 1
+            self._lock.notify()
+        with contextlib.suppress(Exception):
+            conn.close()
+
+    @contextlib.contextmanager
+    def connection(self, request_slice: int = 500, factory: Callable = None):
+        """Context manager that acquires a connection and releases it when finished.
+
+        Parameters
+        ----------
+        request_slice : int
+            Maximum number of items to request from wazuh-db on the first call.
+        factory : callable
+            Class used to create new connections. Default `WazuhDBConnection`.
+
+        Yields
+        ------
+        WazuhDBConnection
+            Connection ready to be used.
+        """
+        conn = self.acquire(request_slice=request_slice, factory=factory)
+        try:
+            yield conn
+        except (WazuhError, WazuhInternalError):
+            # Errors reported by wazuh-db leave the connection ready for the next request
+            self.release(conn)
+            raise
+        except Exception:
+            self.release(conn, discard=True)
+            raise
         else:
-            return list(self._send(query_lower)[0].values())[0]
+            self.release(conn)
+
+    def clear(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conn in (conn for connections in idle.values() for conn in connections):
+            with contextlib.suppress(Exception):
+                conn.close()
+
+    def stats(self) -> dict:
+        """Get the pool statistics.
+
+        Returns
+        -------
+        dict
+            Maximum size, number of connections in use and idle, and counters of created, reused, reconnected and
+            discarded connections, and of the times a caller had to wait for a free connection.
+        """
+        with self._lock:
+            self._check_pid()
+            return {'max_size': self.max_size, 'in_use': len(self._in_use),
+                    'idle': sum(len(connections) for connections in self._idle.values()), **self._stats}
+
+
+connection_pool = WazuhDBConnectionPool()
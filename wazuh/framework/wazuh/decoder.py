@@ -12,11 +12,11 @@ import xmltodict
 import wazuh.core.configuration as configuration
 from wazuh.core import common
 from wazuh.core.analysis import send_reload_ruleset_msg
-from wazuh.core.decoder import load_decoders_from_file, check_status, REQUIRED_FIELDS, SORT_FIELDS, DECODER_FIELDS, \
-    DECODER_FILES_FIELDS, DECODER_FILES_REQUIRED_FIELDS
+from wazuh.core.decoder import load_decoders_from_file, check_status, decoders_cache, REQUIRED_FIELDS, SORT_FIELDS, \
+    DECODER_FIELDS, DECODER_FILES_FIELDS, DECODER_FILES_REQUIRED_FIELDS
 from wazuh.core.exception import WazuhInternalError, WazuhError
 from wazuh.core.results import AffectedItemsWazuhResult
-from wazuh.core.rule import format_rule_decoder_file
+from wazuh.core.rule import format_rule_decoder_file, get_ruleset_files_key
 from wazuh.core.utils import process_array, safe_move, validate_wazuh_xml, \
     upload_file, to_relative_path, full_copy
 from wazuh.core.logtest import validate_dummy_logtest
@@ -71,36 +71,46 @@ def get_decoders(names: list = None, status: str = None, filename: list = None,
     result = AffectedItemsWazuhResult(none_msg='No decoder was returned',
                                       some_msg='Some decoders were not returned',
                                       all_msg='All selected decoders were returned')
-    all_decoders = list()
     if names is None:
         names = list()
 
-    for decoder_file in get_decoders_files(limit=None).affected_items:
-        all_decoders.extend(load_decoders_from_file(decoder_file['filename'], decoder_file['relative_dirname'],
+    def load_decoders():
+        decoders = list()
+        for decoder_file in decoder_files:
+            decoders.extend(load_decoders_from_file(decoder_file['filename'], decoder_file['relative_dirname'],
                                                     decoder_file['status']))
+        return decoders
+
+    # The cached decoders are shared by every request, so they are filtered by row number instead of being modified
+    decoder_files = get_decoders_files(limit=None).affected_items
+    all_decoders, decoders_table = decoders_cache.get(get_ruleset_files_key(decoder_files), load_decoders)
 
     status = check_status(status)
     status = ['enabled', 'disabled'] if status == 'all' else [status]
     parameters = {'relative_dirname': relative_dirname, 'filename': filename, 'name': names, 'parents': parents,
                   'status': status}
-    decoders = list(all_decoders)
+    rows = list()
     no_existent_files = names[:]
-    for d in all_decoders:
+    for row, d in enumerate(all_decoders):
+        keep = True
         for key, value in parameters.items():
             if value:
                 if key == 'name':
-                    if d[key] not in value and d in decoders:
-                        decoders.remove(d)
+                    if d[key] not in value:
+                        keep = False
                     elif d[key] in no_existent_files:
                         no_existent_files.remove(d[key])
-                elif key == 'status' and d[key] not in value and d in decoders:
-                    decoders.remove(d)
-                elif key == 'filename' and d[key] not in filename and d in decoders:
-                    decoders.remove(d)
-                elif key == 'relative_dirname' and d[key] != relative_dirname and d in decoders:
-                    decoders.remove(d)
-                elif 'parent' in d['details'] and parents and d in decoders:
-                    decoders.remove(d)
+                elif key == 'status' and d[key] not in value:
+                    keep = False
+                elif key == 'filename' and d[key] not in filename:
+                    keep = False
+                elif key == 'relative_dirname' and d[key] != relative_dirname:
+                    keep = False
+                elif 'parent' in d['details'] and parents:
+                    keep = False
+        if keep:
+            rows.append(row)
+    decoders = decoders_table.take(rows) if decoders_table is not None else [all_decoders[row] for row in rows]
 
     for decoder_name in no_existent_files:
         result.add_failed_item(id_=decoder_name, error=WazuhError(1504))
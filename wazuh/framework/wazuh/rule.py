@@ -16,8 +16,9 @@ from wazuh.core.cluster.cluster import get_node
 from wazuh.core.cluster.utils import read_cluster_config
 from wazuh.core.exception import WazuhError
 from wazuh.core.results import AffectedItemsWazuhResult
-from wazuh.core.rule import check_status, load_rules_from_file, format_rule_decoder_file, REQUIRED_FIELDS, \
-    RULE_REQUIREMENTS, SORT_FIELDS, RULE_FIELDS, RULE_FILES_FIELDS, RULE_FILES_REQUIRED_FIELDS
+from wazuh.core.rule import check_status, load_rules_from_file, format_rule_decoder_file, get_ruleset_files_key, \
+    rules_cache, REQUIRED_FIELDS, RULE_REQUIREMENTS, SORT_FIELDS, RULE_FIELDS, RULE_FILES_FIELDS, \
+    RULE_FILES_REQUIRED_FIELDS
 from wazuh.core.utils import process_array, safe_move, \
     validate_wazuh_xml, upload_file, full_copy, to_relative_path
 from wazuh.core.logtest import validate_dummy_logtest
@@ -98,7 +99,6 @@ def get_rules(rule_ids: list = None, status: str = None, group: str = None, pci_
     result = AffectedItemsWazuhResult(none_msg='No rule was returned',
                                       some_msg='Some rules were not returned',
                                       all_msg='All selected rules were returned')
-    rules = list()
     if rule_ids is None:
         rule_ids = list()
     levels = None
@@ -108,17 +108,25 @@ def get_rules(rule_ids: list = None, status: str = None, group: str = None, pci_
         if len(levels) < 0 or len(levels) > 2:
             raise WazuhError(1203)
 
-    for rule_file in get_rules_files(limit=None).affected_items:
-        rules.extend(load_rules_from_file(rule_file['filename'], rule_file['relative_dirname'], rule_file['status']))
+    def load_rules():
+        rules = list()
+        for rule_file in rule_files:
+            rules.extend(load_rules_from_file(rule_file['filename'], rule_file['relative_dirname'],
+                                              rule_file['status']))
+        return rules
+
+    # The cached rules are shared by every request, so they are filtered by row number instead of being modified
+    rule_files = get_rules_files(limit=None).affected_items
+    all_rules, rules_table = rules_cache.get(get_ruleset_files_key(rule_files), load_rules)
 
     status = check_status(status)
     status = ['enabled', 'disabled'] if status == 'all' else [status]
     parameters = {'groups': group, 'pci_dss': pci_dss, 'gpg13': gpg13, 'gdpr': gdpr, 'hipaa': hipaa,
                   'nist_800_53': nist_800_53, 'tsc': tsc, 'mitre': mitre, 'relative_dirname': relative_dirname,
                   'filename': filename, 'id': rule_ids, 'level': levels, 'status': status}
-    original_rules = list(rules)
+    rows = list()
     no_existent_ids = rule_ids[:]
-    for r in original_rules:
+    for row, r in enumerate(all_rules):
         if r['id'] in no_existent_ids:
             no_existent_ids.remove(r['id'])
         for key, value in parameters.items():
@@ -129,8 +137,10 @@ def get_rules(rule_ids: list = None, status: str = None, group: str = None, pci_
                         (key == 'filename' and r[key] not in filename) or \
                         (key == 'status' and r[key] not in value) or \
                         (not isinstance(value, list) and value not in r[key]):
-                    rules.remove(r)
                     break
+        else:
+            rows.append(row)
+    rules = rules_table.take(rows) if rules_table is not None else [all_rules[row] for row in rows]
 
     for rule_id in no_existent_ids:
         result.add_failed_item(id_=rule_id, error=WazuhError(1208))
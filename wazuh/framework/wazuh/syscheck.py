@@ -9,11 +9,11 @@ from wazuh.core import common
 from wazuh.core.agent import Agent, get_agents_info, get_rbac_filters, WazuhDBQueryAgents
 from wazuh.core.exception import WazuhInternalError, WazuhError, WazuhResourceNotFound
 from wazuh.core.results import AffectedItemsWazuhResult
-from wazuh.core.syscheck import WazuhDBQuerySyscheck, syscheck_delete_agent
+from wazuh.core.syscheck import AsyncWazuhDBQuerySyscheck, WazuhDBQuerySyscheck, syscheck_delete_agent
 from wazuh.core.utils import WazuhVersion
 from wazuh.core.wazuh_queue import WazuhQueue
 from wazuh.core.wdb import WazuhDBConnection
-from wazuh.rbac.decorators import expose_resources
+from wazuh.rbac.decorators import expose_resources, async_list_handler
 
 
 @expose_resources(actions=["syscheck:run"], resources=["agent:id:{agent_list}"],
@@ -169,6 +169,71 @@ def last_scan(agent_list: list) -> AffectedItemsWazuhResult:
     return result
 
 
+def _get_files_query_kwargs(filters: dict = None, q: str = '', summary: bool = False) -> dict:
+    """Get the filters, query and fields used by `files` to query the syscheck database.
+
+    Parameters
+    ----------
+    filters : dict
+        Fields to filter by.
+    q : str
+        Query to filter by.
+    summary : bool
+        Returns a summary grouping by filename.
+
+    Returns
+    -------
+    dict
+        `filters`, `query` and `fields` parameters of the query.
+    """
+    if filters is None:
+        filters = {}
+    parameters = {"date": "date", "arch": "arch", "value.type": "value_type", "value.name": "value_name",
+                  "mtime": "mtime", "file": "file", "size": "size", "perm": "perm",
+                  "uname": "uname", "gname": "gname", "md5": "md5", "sha1": "sha1", "sha256": "sha256",
+                  "inode": "inode", "gid": "gid", "uid": "uid", "type": "type", "changes": "changes",
+                  "attributes": "attributes"}
+    summary_parameters = {"date": "date", "mtime": "mtime", "file": "file"}
+
+    if 'hash' in filters:
+        q = f'(md5={filters["hash"]},sha1={filters["hash"]},sha256={filters["hash"]})' + ('' if not q else ';' + q)
+        del filters['hash']
+
+    return {'filters': filters, 'query': q, 'fields': summary_parameters if summary else parameters}
+
+
+def _get_files_result(data: dict) -> AffectedItemsWazuhResult:
+    """Create the result of `files` with the items returned by the query."""
+    result = AffectedItemsWazuhResult(all_msg='FIM findings of the agent were returned',
+                                      none_msg='No FIM information was returned')
+    result.affected_items = data['items']
+    result.total_affected_items = data['totalItems']
+
+    return result
+
+
+@expose_resources(actions=["syscheck:read"], resources=["agent:id:{agent_list}"], post_proc_func=async_list_handler)
+async def files_async(agent_list: list = None, offset: int = 0, limit: int = common.DATABASE_LIMIT, sort: dict = None,
+                      search: str = None, select: list = None, filters: dict = None, q: str = '', nested: bool = True,
+                      summary: bool = False, distinct: bool = False) -> AffectedItemsWazuhResult:
+    """Return a list of files from the syscheck database of the specified agents, without blocking the event loop.
+    Same as `files`.
+
+    Returns
+    -------
+    AffectedItemsWazuhResult
+        Confirmation/Error message.
+    """
+    async with AsyncWazuhDBQuerySyscheck(agent_id=agent_list[0], offset=offset, limit=limit, sort=sort, search=search,
+                                         nested=nested, select=select, table='fim_entry', distinct=distinct,
+                                         min_select_fields={'file'},
+                                         **_get_files_query_kwargs(filters, q, summary)) as db_query:
+        data = await db_query.run()
+
+    return _get_files_result(data)
+
+
+@common.async_variant(files_async)
 @expose_resources(actions=["syscheck:read"], resources=["agent:id:{agent_list}"])
 def files(agent_list: list = None, offset: int = 0, limit: int = common.DATABASE_LIMIT, sort: dict = None,
           search: str = None, select: list = None, filters: dict = None, q: str = '', nested: bool = True,
@@ -205,28 +270,9 @@ def files(agent_list: list = None, offset: int = 0, limit: int = common.DATABASE
     AffectedItemsWazuhResult
         Confirmation/Error message.
     """
-    if filters is None:
-        filters = {}
-    parameters = {"date": "date", "arch": "arch", "value.type": "value_type", "value.name": "value_name",
-                  "mtime": "mtime", "file": "file", "size": "size", "perm": "perm",
-                  "uname": "uname", "gname": "gname", "md5": "md5", "sha1": "sha1", "sha256": "sha256",
-                  "inode": "inode", "gid": "gid", "uid": "uid", "type": "type", "changes": "changes",
-                  "attributes": "attributes"}
-    summary_parameters = {"date": "date", "mtime": "mtime", "file": "file"}
-    result = AffectedItemsWazuhResult(all_msg='FIM findings of the agent were returned',
-                                      none_msg='No FIM information was returned')
-
-    if 'hash' in filters:
-        q = f'(md5={filters["hash"]},sha1={filters["hash"]},sha256={filters["hash"]})' + ('' if not q else ';' + q)
-        del filters['hash']
-
     with WazuhDBQuerySyscheck(agent_id=agent_list[0], offset=offset, limit=limit, sort=sort, search=search,
-                              filters=filters, nested=nested, query=q, select=select, table='fim_entry',
-                              distinct=distinct, fields=summary_parameters if summary else parameters,
-                              min_select_fields={'file'}) as db_query:
-        db_query = db_query.run()
-
-    result.affected_items = db_query['items']
-    result.total_affected_items = db_query['totalItems']
+                              nested=nested, select=select, table='fim_entry', distinct=distinct,
+                              min_select_fields={'file'}, **_get_files_query_kwargs(filters, q, summary)) as db_query:
+        data = db_query.run()
 
-    return result
+    return _get_files_result(data)
@@ -2,14 +2,104 @@
 # Created by Wazuh, Inc. <info@wazuh.com>.
 # This program is free software; you can redistribute it and/or modify it under the terms of GPLv2
 
+import asyncio
+
 from wazuh.core import common
 from wazuh.core.agent import get_agents_info
 from wazuh.core.exception import WazuhResourceNotFound
 from wazuh.core.results import AffectedItemsWazuhResult, merge
-from wazuh.core.syscollector import WazuhDBQuerySyscollector, get_valid_fields, Type
-from wazuh.rbac.decorators import expose_resources
+from wazuh.core.syscollector import AsyncWazuhDBQuerySyscollector, WazuhDBQuerySyscollector, get_valid_fields, \
+    get_valid_fields_async, Type
+from wazuh.rbac.decorators import expose_resources, async_list_handler
+
+# Maximum number of agent databases queried at the same time by `get_item_agent_async`
+MAX_CONCURRENT_AGENT_QUERIES = 16
+
+
+def _get_item_agent_result(sort: dict = None) -> AffectedItemsWazuhResult:
+    """Create the result of `get_item_agent`."""
+    return AffectedItemsWazuhResult(
+        none_msg='No syscollector information was returned',
+        some_msg='Some syscollector information was not returned',
+        all_msg='All specified syscollector information was returned',
+        sort_fields=['agent_id'] if sort is None else sort['fields'],
+        sort_casting=['str'],
+        sort_ascending=[sort['order'] == 'asc' for _ in sort['fields']] if sort is not None else ['True']
+    )
+
+
+def _add_agent_items(result: AffectedItemsWazuhResult, agent: str, data: dict):
+    """Add the syscollector information of an agent to the affected items of `result`."""
+    for item in data['items']:
+        item['agent_id'] = agent
+        result.affected_items.append(item)
+    result.total_affected_items += data['totalItems']
+
+
+def _sort_item_agent_result(result: AffectedItemsWazuhResult, sort: dict = None) -> AffectedItemsWazuhResult:
+    """Sort the affected items of `result` by the requested fields."""
+    # Avoid that integer type fields are casted to string, this prevents sort parameter malfunctioning
+    try:
+        if len(result.affected_items) and sort and len(sort['fields']) == 1:
+            fields = sort['fields'][0].split('.')
+            element = result.affected_items[0][fields.pop(0)]
+            for field in fields:
+                element = element[field]
+            element_type = type(element).__name__
+            result.sort_casting = [element_type] if element_type not in ['str', 'datetime'] else ['str']
+    except KeyError:
+        pass
+
+    result.affected_items = merge(*[[res] for res in result.affected_items],
+                                  criteria=result.sort_fields,
+                                  ascending=result.sort_ascending,
+                                  types=result.sort_casting)
 
+    return result
 
+
+@expose_resources(actions=['syscollector:read'], resources=['agent:id:{agent_list}'],
+                  post_proc_func=async_list_handler)
+async def get_item_agent_async(agent_list: list, offset: int = 0, limit: int = common.DATABASE_LIMIT,
+                               select: dict = None, search: dict = None, sort: dict = None, filters: dict = None,
+                               q: str = '', array: bool = True, nested: bool = True, element_type: str = 'os',
+                               distinct: bool = False) -> AffectedItemsWazuhResult:
+    """Get syscollector information about a list of agents, without blocking the event loop. The agents are queried
+    concurrently. Same as `get_item_agent`.
+
+    Returns
+    -------
+    AffectedItemsWazuhResult
+        Syscollector information.
+    """
+    result = _get_item_agent_result(sort)
+    system_agents = get_agents_info()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_AGENT_QUERIES)
+
+    async def get_agent_data(agent: str) -> dict:
+        if agent not in system_agents:
+            raise WazuhResourceNotFound(1701)
+        async with semaphore:
+            table, valid_select_fields = await get_valid_fields_async(Type(element_type), agent_id=agent)
+            async with AsyncWazuhDBQuerySyscollector(agent_id=agent, offset=offset, limit=limit, select=select,
+                                                     search=search, sort=sort, filters=filters,
+                                                     fields=valid_select_fields, table=table, array=array,
+                                                     nested=nested, query=q, distinct=distinct) as db_query:
+                return await db_query.run()
+
+    responses = await asyncio.gather(*map(get_agent_data, agent_list), return_exceptions=True)
+    for agent, data in zip(agent_list, responses):
+        if isinstance(data, WazuhResourceNotFound):
+            result.add_failed_item(id_=agent, error=data)
+        elif isinstance(data, Exception):
+            raise data
+        else:
+            _add_agent_items(result, agent, data)
+
+    return _sort_item_agent_result(result, sort)
+
+
+@common.async_variant(get_item_agent_async)
 @expose_resources(actions=['syscollector:read'], resources=['agent:id:{agent_list}'])
 def get_item_agent(agent_list: list, offset: int = 0, limit: int = common.DATABASE_LIMIT, select: dict = None,
                    search: dict = None, sort: dict = None, filters: dict = None, q: str = '', array: bool = True,
@@ -48,15 +138,7 @@ def get_item_agent(agent_list: list, offset: int = 0, limit: int = common.DATABA
     AffectedItemsWazuhResult
         Syscollector information.
     """
-    result = AffectedItemsWazuhResult(
-        none_msg='No syscollector information was returned',
-        some_msg='Some syscollector information was not returned',
-        all_msg='All specified syscollector information was returned',
-        sort_fields=['agent_id'] if sort is None else sort['fields'],
-        sort_casting=['str'],
-        sort_ascending=[sort['order'] == 'asc' for _ in sort['fields']] if sort is not None else ['True']
-    )
-
+    result = _get_item_agent_result(sort)
     system_agents = get_agents_info()
     for agent in agent_list:
         try:
@@ -69,28 +151,8 @@ def get_item_agent(agent_list: list, offset: int = 0, limit: int = common.DATABA
                                           array=array, nested=nested, query=q, distinct=distinct) as db_query:
                 data = db_query.run()
 
-            for item in data['items']:
-                item['agent_id'] = agent
-                result.affected_items.append(item)
-            result.total_affected_items += data['totalItems']
+            _add_agent_items(result, agent, data)
         except WazuhResourceNotFound as e:
             result.add_failed_item(id_=agent, error=e)
 
-    # Avoid that integer type fields are casted to string, this prevents sort parameter malfunctioning
-    try:
-        if len(result.affected_items) and sort and len(sort['fields']) == 1:
-            fields = sort['fields'][0].split('.')
-            element = result.affected_items[0][fields.pop(0)]
-            for field in fields:
-                element = element[field]
-            element_type = type(element).__name__
-            result.sort_casting = [element_type] if element_type not in ['str', 'datetime'] else ['str']
-    except KeyError:
-        pass
-
-    result.affected_items = merge(*[[res] for res in result.affected_items],
-                                  criteria=result.sort_fields,
-                                  ascending=result.sort_ascending,
-                                  types=result.sort_casting)
-
-    return result
+    return _sort_item_agent_result(result, sort)
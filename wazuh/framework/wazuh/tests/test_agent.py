@@ -26,7 +26,7 @@ with patch('wazuh.core.common.wazuh_uid'):
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
 
         from wazuh.agent import add_agent, assign_agents_to_group, create_group, delete_agents, delete_groups, \
-            get_agent_conf, get_agent_config, get_agent_groups, get_agents, get_agents_in_group, get_agents_keys, \
+            get_agent_conf, get_agent_config, get_agent_groups, get_agents, get_agents_async, get_agents_in_group, get_agents_keys, \
             get_agents_summary, get_agents_summary_os, get_agents_summary_status, get_agents_sync_group, \
             get_distinct_agents, get_file_conf, get_full_overview, get_group_files, get_outdated_agents, \
             get_upgrade_result, remove_agent_from_group, remove_agent_from_groups, remove_agents_from_group, \
@@ -321,6 +321,38 @@ def test_agent_get_agents(socket_mock, send_mock, agent_list, expected_items):
         assert (failed_item.message == 'Agent does not exist' for failed_item in result.failed_items.keys())
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('agent_list, kwargs', [
+    (['001', '002', '003'], {'select': ['id', 'name']}),
+    (['001', '400', '002', '500'], {'sort': {'fields': ['name'], 'order': 'desc'}}),
+    (full_agent_list, {'q': 'status=active', 'limit': 2, 'offset': 1})
+])
+@patch('wazuh.agent.get_agents_info', return_value=set(full_agent_list))
+@patch('wazuh.core.wdb.AsyncWazuhDBConnection._send')
+@patch('wazuh.core.wdb.WazuhDBConnection._send', side_effect=send_msg_to_wdb)
+@patch('socket.socket.connect')
+async def test_agent_get_agents_async(socket_mock, send_mock, async_send_mock, mock_get_agents_info, agent_list,
+                                      kwargs):
+    """Test that `get_agents_async` returns the same result as `get_agents`.
+
+    Parameters
+    ----------
+    agent_list : List of str
+        List of agent ID's.
+    kwargs : dict
+        Parameters of the query.
+    """
+    async def send(msg, raw=False):
+        return send_msg_to_wdb(msg, raw)
+
+    async_send_mock.side_effect = send
+    result = await get_agents_async(agent_list=agent_list, **kwargs)
+    expected = get_agents(agent_list=agent_list, **kwargs)
+    assert isinstance(result, AffectedItemsWazuhResult), 'The returned object is not an "AffectedItemsWazuhResult".'
+    assert result.render() == expected.render()
+    assert result.total_affected_items == expected.total_affected_items
+
+
 @pytest.mark.parametrize('group, group_exists, expected_agents', [
     ('default', True, ['001', '002', '005']),
     ('not_exists_group', False, None)
@@ -23,6 +23,7 @@ with patch('wazuh.core.common.getgrnam'):
         from wazuh.core.exception import WazuhInternalError, WazuhError
         from wazuh.core.results import AffectedItemsWazuhResult
         from wazuh import decoder
+        from wazuh.core.decoder import decoders_cache, load_decoders_from_file
 
 
 # Variables
@@ -62,6 +63,14 @@ def mock_wazuh_paths():
                         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_decoders_cache():
+    """Clear the decoders loaded by other tests, since some of them mock the content of the files."""
+    decoders_cache.clear()
+    yield
+    decoders_cache.clear()
+
+
 # Tests
 
 @pytest.mark.parametrize('names, status, filename, relative_dirname, parents, expected_names, expected_total_failed', [
@@ -94,6 +103,32 @@ def test_get_decoders(names, status, filename, relative_dirname, parents, expect
         os.rename(wrong_decoder_tmp_path, wrong_decoder_original_path)
 
 
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'names': ['agent-upgrade', 'non_existing', 'json'], 'status': 'enabled'},
+    {'relative_dirname': 'tests/data/decoders', 'parents': True, 'status': 'all'},
+    {'sort_by': ['name'], 'sort_ascending': False, 'select': ['name', 'position']},
+    {'search_text': 'agent', 'offset': 1, 'limit': 2}
+])
+def test_get_decoders_cache(kwargs):
+    """Test that get_decoders loads the decoders once and returns the same result with and without their columnar
+    table."""
+    wrong_decoder_original_path = os.path.join(test_data_path, 'tests/data/decoders', 'wrong_decoders.xml')
+    wrong_decoder_tmp_path = os.path.join(test_data_path, 'tests/data', 'wrong_decoders.xml')
+    try:
+        os.rename(wrong_decoder_original_path, wrong_decoder_tmp_path)
+        with patch('wazuh.decoder.load_decoders_from_file', side_effect=load_decoders_from_file) as mock_load:
+            result = decoder.get_decoders(**kwargs).to_dict()
+            loaded_files = mock_load.call_count
+            assert decoder.get_decoders(**kwargs).to_dict() == result
+            assert mock_load.call_count == loaded_files
+
+        with patch('wazuh.core.columnar.np', new=None):
+            assert decoder.get_decoders(**kwargs).to_dict() == result
+    finally:
+        os.rename(wrong_decoder_tmp_path, wrong_decoder_original_path)
+
+
 @pytest.mark.parametrize('conf, exception', [
     (decoder_ossec_conf, None),
     ({'ruleset': None}, WazuhInternalError(1500))
@@ -19,6 +19,7 @@ with patch('wazuh.core.common.wazuh_uid'):
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
 
         from wazuh import rule
+        from wazuh.core.rule import load_rules_from_file, rules_cache
         from wazuh.core.results import AffectedItemsWazuhResult
         from wazuh.core.exception import WazuhError
 
@@ -80,6 +81,15 @@ def mock_wazuh_paths():
                 with patch('wazuh.rule.to_relative_path', side_effect=lambda x: os.path.relpath(x, parent_directory)):
                     yield
 
+
+@pytest.fixture(autouse=True)
+def clear_rules_cache():
+    """Clear the rules loaded by other tests, since some of them mock the content of the files."""
+    rules_cache.clear()
+    yield
+    rules_cache.clear()
+
+
 @pytest.mark.parametrize('func', [
     rule.get_rules_files,
     rule.get_rules
@@ -190,6 +200,26 @@ def test_get_rules(mock_config, arg):
                 assert e.code == 1208
 
 
+@pytest.mark.parametrize('arg', [
+    {},
+    {'rule_ids': ['510', '999999'], 'status': 'all'},
+    {'group': 'web', 'sort_by': ['level', 'id'], 'sort_ascending': False},
+    {'level': '2-5', 'q': 'status=enabled', 'select': ['id', 'level']},
+    {'search_text': 'ssh', 'offset': 1, 'limit': 3}
+])
+@patch('wazuh.core.configuration.get_ossec_conf', return_value=other_rule_ossec_conf)
+def test_get_rules_cache(mock_config, arg):
+    """Test that get_rules loads the rules once and returns the same result with and without their columnar table."""
+    with patch('wazuh.rule.load_rules_from_file', side_effect=load_rules_from_file) as mock_load:
+        result = rule.get_rules(**arg).to_dict()
+        loaded_files = mock_load.call_count
+        assert rule.get_rules(**arg).to_dict() == result
+        assert mock_load.call_count == loaded_files
+
+    with patch('wazuh.core.columnar.np', new=None):
+        assert rule.get_rules(**arg).to_dict() == result
+
+
 def test_failed_get_rules():
     """Test error 1203 in get_rules function."""
     with pytest.raises(WazuhError, match=".* 1203 .*"):
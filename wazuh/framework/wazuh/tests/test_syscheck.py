@@ -10,7 +10,7 @@ from unittest.mock import patch, MagicMock
 
 import pytest
 
-from wazuh.tests.util import InitWDBSocketMock
+from wazuh.tests.util import AsyncInitWDBSocketMock, InitWDBSocketMock
 
 with patch('wazuh.core.common.wazuh_uid'):
     with patch('wazuh.core.common.wazuh_gid'):
@@ -22,7 +22,7 @@ with patch('wazuh.core.common.wazuh_uid'):
         from wazuh.tests.util import RBAC_bypasser
 
         wazuh.rbac.decorators.expose_resources = RBAC_bypasser
-        from wazuh.syscheck import run, clear, last_scan, files
+        from wazuh.syscheck import run, clear, last_scan, files, files_async
         from wazuh.syscheck import AffectedItemsWazuhResult
         from wazuh import WazuhError, WazuhInternalError
         from wazuh.core import common
@@ -270,3 +270,36 @@ def test_syscheck_files(socket_mock, exists_mock, agent_id, select, filters, dis
         if filters:
             for key, value in filters.items():
                 assert (item[key] == value for item in result.affected_items)
+
+
+@pytest.mark.parametrize('agent_id, kwargs', [
+    (['001'], {}),
+    (['002'], {'select': ['file', 'size', 'mtime'], 'sort': {'fields': ['file'], 'order': 'desc'}}),
+    (['000'], {'filters': {'type': 'registry_key'}, 'distinct': True, 'limit': 3, 'offset': 1}),
+    (['000'], {'summary': True}),
+    (['000'], {'q': 'type=file,type=registry_key', 'search': {'negation': False, 'value': 'HKEY'}}),
+])
+@patch('wazuh.core.utils.path.exists', return_value=True)
+@patch('socket.socket.connect')
+@patch('wazuh.core.common.WDB_PATH', new=test_data_path)
+async def test_syscheck_files_async(socket_mock, exists_mock, agent_id, kwargs):
+    """Test that `files_async` returns the same result as `files`.
+
+    Parameters
+    ----------
+    agent_id : list
+        Agent ID.
+    kwargs : dict
+        Parameters of the query.
+    """
+    with patch('wazuh.core.utils.WazuhDBConnection',
+               return_value=InitWDBSocketMock(sql_schema_file='schema_syscheck_test.sql')), \
+            patch('wazuh.core.utils.AsyncWazuhDBConnection',
+                  return_value=AsyncInitWDBSocketMock(sql_schema_file='schema_syscheck_test.sql')):
+        result = await files_async(agent_id, **kwargs)
+        expected = files(agent_id, **kwargs)
+
+    assert isinstance(result, AffectedItemsWazuhResult)
+    assert result.render() == expected.render()
+    assert result.total_affected_items == expected.total_affected_items
+
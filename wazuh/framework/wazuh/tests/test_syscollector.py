@@ -4,11 +4,11 @@
 # This program is a free software; you can redistribute it and/or modify it under the terms of GPLv2
 
 import sys
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from wazuh.tests.util import InitWDBSocketMock
+from wazuh.tests.util import AsyncInitWDBSocketMock, InitWDBSocketMock
 
 with patch('wazuh.core.common.wazuh_uid'):
     with patch('wazuh.core.common.wazuh_gid'):
@@ -127,3 +127,42 @@ def test_agent_elements(mock_agent_attr, mock_basic_info, mock_agents_info, mock
 
         assert isinstance(results, AffectedItemsWazuhResult)
         valid_fields_asserter(results.render())
+
+
+@pytest.mark.parametrize("element_type, kwargs", [
+    ('os', {}),
+    ('os', {'select': ['hostname', 'os.name']}),
+    ('packages', {'sort': {'fields': ['name'], 'order': 'desc'}, 'limit': 5}),
+    ('processes', {'search': {'negation': False, 'value': 'root'}, 'offset': 1}),
+])
+@patch('wazuh.core.utils.path.exists', return_value=True)
+@patch('wazuh.syscollector.get_agents_info', return_value=['000', '001'])
+@patch('wazuh.core.agent.Agent.get_basic_information', return_value=None)
+@patch('wazuh.core.agent.Agent.get_agent_os_name', return_value='Linux')
+async def test_get_item_agent_async(mock_agent_attr, mock_basic_info, mock_agents_info, mock_exists, element_type,
+                                    kwargs):
+    """Test that `get_item_agent_async` returns the same result as `get_item_agent`.
+
+    Parameters
+    ----------
+    element_type : str
+        Type of syscollector information to get.
+    kwargs : dict
+        Parameters of the query.
+    """
+    agents_query = MagicMock()
+    agents_query.return_value.__aenter__.return_value.run = AsyncMock(
+        return_value={'items': [{'id': '000', 'os': {'name': 'Linux'}}]})
+    with patch('wazuh.core.utils.WazuhDBConnection', return_value=InitWDBSocketMock(
+            sql_schema_file='schema_syscollector_000.sql')), \
+            patch('wazuh.core.utils.AsyncWazuhDBConnection', return_value=AsyncInitWDBSocketMock(
+                sql_schema_file='schema_syscollector_000.sql')), \
+            patch('wazuh.core.syscollector.AsyncWazuhDBQueryAgents', agents_query):
+        result = await syscollector.get_item_agent_async(agent_list=['000', '002'], element_type=element_type,
+                                                         **kwargs)
+        expected = syscollector.get_item_agent(agent_list=['000', '002'], element_type=element_type, **kwargs)
+
+    assert isinstance(result, AffectedItemsWazuhResult)
+    assert result.render() == expected.render()
+    assert result.total_affected_items == expected.total_affected_items
+
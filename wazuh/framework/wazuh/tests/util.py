@@ -27,7 +27,7 @@ class InitWDBSocketMock:
 
         return sys_db
 
-    def execute(self, query, count=False):
+    def execute(self, query, count=False, date_fields=None):
         query = re.search(r'^(?:mitre|task|global|agent \d{3}) sql (.+)$', query).group(1)
         self.__conn.execute(query)
         rows = self.__conn.execute(query).fetchall()
@@ -40,6 +40,11 @@ class InitWDBSocketMock:
         return rows
 
 
+class AsyncInitWDBSocketMock(InitWDBSocketMock):
+    async def execute(self, query, count=False, date_fields=None):
+        return super().execute(query, count=count, date_fields=date_fields)
+
+
 def get_fake_database_data(sql_file):
     """Create a fake database."""
     memory_db = sqlite3.connect(':memory:')